@@ -8,6 +8,7 @@ import sys
 from pathlib import Path
 from src.kafka_consumer import KafkaConsumerService
 from src.protobuf_decoder import ProtobufDecoder, MockProtobufDecoder
+from src.decoder_warmup import DecoderWarmup
 from src.graph_builder import TraceGraphBuilder
 
 # Setup logging
@@ -65,29 +66,32 @@ class KafkaTraceViewerApp:
                 self.decoder = ProtobufDecoder(str(proto_dir))
                 logger.info("Using real protobuf decoder")
 
-            # Load protobuf definitions for each topic
-            for topic_name, topic_config in self.topics_config.get('topics', {}).items():
-                self.decoder.load_topic_protobuf(
-                    topic_name,
-                    topic_config['proto_file'],
-                    topic_config['message_type']
-                )
+            # Load protobuf definitions for all topics concurrently
+            warmup = DecoderWarmup().run(self.decoder, self.topics_config.get('topics', {}))
+            failed = {topic: entry['error'] for topic, entry in warmup.items() if entry['status'] == 'failed'}
+            if failed:
+                raise RuntimeError(f"Failed to load protobufs for topics: {failed}")
 
             # Initialize graph builder
             self.graph_builder = TraceGraphBuilder(
                 topics_config_path=str(self.config_dir / "topics.yaml"),
-                max_traces=self.settings.get('max_traces', 1000)
+                max_traces=self.settings.get('max_traces', 1000),
+                settings=self.settings
             )
 
             # Initialize Kafka consumer
             self.kafka_consumer = KafkaConsumerService(
                 config_path=str(kafka_config_path),
                 decoder=self.decoder,
-                trace_header_field=self.settings.get('trace_header_field', 'traceparent')
+                trace_header_field=self.settings.get('trace_header_field', 'traceparent'),
+                settings=self.settings
             )
 
-            # Register message handler
-            self.kafka_consumer.add_message_handler(self.graph_builder.add_message)
+            # Register message handler, resuming from the trace store of the start environment
+            self.graph_builder.open_persistence(self.settings.get('application', {}).get('start_env', 'DEV'))
+            self.kafka_consumer.add_batch_handler(self.graph_builder.add_messages)
+            self.kafka_consumer.set_offset_checkpoints(self.graph_builder.checkpoint_offsets)
+            self.kafka_consumer.set_monitored_topics(self.graph_builder.get_monitored_topics())
 
             # Get topics from graph configuration
             topics = self.graph_builder.topic_graph.get_all_topics()
@@ -2,12 +2,13 @@ import os
 import json
 import asyncio
 import logging
+from datetime import datetime
 from pathlib import Path
 from typing import Dict, List, Any, Optional
 
-from fastapi import FastAPI, APIRouter, HTTPException, WebSocket, WebSocketDisconnect, File, UploadFile, Form
+from fastapi import FastAPI, APIRouter, HTTPException, Request, WebSocket, WebSocketDisconnect, File, UploadFile, Form
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.responses import JSONResponse, FileResponse, Response
 from fastapi.staticfiles import StaticFiles
 import yaml
 
@@ -24,6 +25,11 @@ from src.blueprint_config_models import (
 )
 from src.graph_builder import TraceGraphBuilder
 from src.protobuf_decoder import ProtobufDecoder, MockProtobufDecoder
+from src.decoder_warmup import DecoderWarmup
+from src.live_updates import LiveUpdatePublisher
+from src.connection_manager import ConnectionManager
+from src.ingest_writer import IngestWriter
+from src.read_pool import BuilderReadPool
 
 # -----------------------------------------------------------------------------
 # App and Router
@@ -66,7 +72,35 @@ async def startup_event():
     except Exception as e:
         logger.error(f"❌ Error auto-initializing gRPC: {e}")
     
-    # Initialize Kafka consumer automatically
+    # Configure WebSocket fan-out, the ingest writer and the read pool, then push coalesced changes to subscribers
+    settings_file = ROOT_DIR / "config" / "settings.yaml"
+    if settings_file.exists():
+        with open(settings_file, 'r') as f:
+            settings = yaml.safe_load(f) or {}
+        live_settings = settings.get('live_updates', {}) or {}
+        live_updates.interval = live_settings.get('interval', live_updates.interval)
+        websocket_manager.configure(settings.get('websocket', {}) or {})
+        ingest_writer.configure(settings.get('ingest', {}) or {})
+        read_pool.configure(settings.get('read_pool', {}) or {})
+    ingest_writer.start()
+    asyncio.create_task(live_updates.run())
+
+    # Initialize Kafka consumer in the background; /health reports ready once its decoders are loaded
+    decoder_warmup.mark_pending()
+    asyncio.create_task(auto_init_kafka_consumer())
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Apply the queued batches, then close the trace store and spill tier"""
+    ingest_writer.stop()
+    read_pool.shutdown()
+    if graph_builder is not None:
+        graph_builder.close()
+
+
+async def auto_init_kafka_consumer():
+    """Load topic decoders and start the Kafka consumer for the start_env environment"""
     global kafka_consumer
     try:
         from src.kafka_consumer import KafkaConsumerService
@@ -116,15 +150,7 @@ async def startup_event():
                                 topics_config = yaml.safe_load(f)
                             
                             topics_cfg = topics_config.get('topics', {})
-                            for topic_name, topic_cfg in topics_cfg.items():
-                                try:
-                                    proto_file = topic_cfg.get('proto_file', '')
-                                    message_type = topic_cfg.get('message_type', '')
-                                    if proto_file and message_type:
-                                        decoder.load_topic_protobuf(topic_name, proto_file, message_type)
-                                        logger.debug(f"   Loaded protobuf for topic '{topic_name}': {proto_file} -> {message_type}")
-                                except Exception as topic_err:
-                                    logger.warning(f"   Could not load protobuf for topic '{topic_name}': {topic_err}")
+                            await decoder_warmup.run_async(decoder, topics_cfg)
                             logger.info(f"   Loaded protobuf mappings for {len(topics_cfg)} topics")
                         except Exception as e:
                             logger.warning(f"Could not load topic protobuf mappings: {e}")
@@ -139,12 +165,16 @@ async def startup_event():
                 kafka_consumer = KafkaConsumerService(
                     config_path=str(kafka_yaml),
                     decoder=decoder,
-                    trace_header_field=trace_header_field
+                    trace_header_field=trace_header_field,
+                    settings=settings
                 )
                 
                 # Add message handler if graph_builder exists
                 if graph_builder:
-                    kafka_consumer.add_message_handler(graph_builder.add_message)
+                    graph_builder.open_persistence(start_env)
+                    kafka_consumer.add_batch_handler(ingest_writer.submit)
+                    kafka_consumer.set_offset_checkpoints(graph_builder.checkpoint_offsets)
+                    kafka_consumer.set_monitored_topics(graph_builder.get_monitored_topics())
                     logger.info("✅ Added message handler to Kafka consumer")
                 
                 # Subscribe to topics
@@ -172,6 +202,8 @@ async def startup_event():
         logger.error(f"❌ Error auto-initializing Kafka consumer: {e}")
         import traceback
         logger.error(traceback.format_exc())
+    finally:
+        decoder_warmup.settle()
 
 # -----------------------------------------------------------------------------
 # Initialization (portable for local and server)
@@ -184,6 +216,10 @@ blueprint_config_manager: Optional[BlueprintConfigurationManager] = None
 blueprint_build_manager: Optional[BlueprintBuildManager] = None
 graph_builder: Optional[TraceGraphBuilder] = None
 kafka_consumer = None  # Will be initialized on startup or environment switch
+decoder_warmup = DecoderWarmup()  # Topic decoder loading progress, reported by /health
+# Consumed batches are applied by one writer thread; endpoints read on worker threads under the builder lock
+ingest_writer = IngestWriter(lambda: graph_builder)
+read_pool = BuilderReadPool(lambda: graph_builder)
 
 try:
     blueprint_file_manager = BlueprintFileManager()
@@ -196,7 +232,15 @@ try:
 
     if topics_yaml.exists():
         logger.info(f"Loading topic graph from {topics_yaml}")
-        graph_builder = TraceGraphBuilder(str(topics_yaml))
+        builder_settings = {}
+        if settings_yaml.exists():
+            with open(settings_yaml, 'r') as f:
+                builder_settings = yaml.safe_load(f) or {}
+        graph_builder = TraceGraphBuilder(
+            str(topics_yaml),
+            max_traces=builder_settings.get('max_traces', 1000),
+            settings=builder_settings
+        )
 
     # Optional protobuf decoder init (to mirror run_local.py logging)
     if settings_yaml.exists() and topics_yaml.exists():
@@ -224,17 +268,8 @@ try:
                     decoder = ProtobufDecoder(str(proto_dir))
                     logger.info("Using real protobuf decoder (server)")
 
-            # Load per-topic protobufs (safe with missing fields)
-            for topic_name, topic_cfg in (topics_cfg.get('topics') or {}).items():
-                try:
-                    decoder.load_topic_protobuf(
-                        topic_name,
-                        topic_cfg.get('proto_file', ''),
-                        topic_cfg.get('message_type', '')
-                    )
-                    logger.info(f"Loaded protobuf for topic {topic_name}")
-                except Exception as e:
-                    logger.warning(f"Failed to load protobuf for topic {topic_name}: {e}")
+            # Load per-topic protobufs concurrently (safe with missing fields)
+            decoder_warmup.run(decoder, topics_cfg.get('topics') or {})
 
             if graph_builder is None:
                 graph_builder = TraceGraphBuilder(str(topics_yaml), max_traces=settings.get('max_traces', 1000))
@@ -253,7 +288,12 @@ if static_dir.exists():
 
 @api_router.get("/health")
 async def health():
-    return {"status": "ok"}
+    warmup = decoder_warmup.status()
+    return {
+        "status": "ok" if warmup["ready"] else "starting",
+        "ready": warmup["ready"],
+        "decoder_warmup": warmup
+    }
 
 @api_router.get("/app-config")
 async def get_app_config():
@@ -329,8 +369,9 @@ async def switch_environment(request: Dict[str, Any]):
         # Clear existing traces
         if graph_builder is not None:
             logger.info("🧹 Clearing existing traces...")
-            graph_builder.traces.clear()
-            graph_builder.trace_order.clear()
+            ingest_writer.discard_pending()
+            # The builder lock can be held for a whole ingest batch, so wait for it off the event loop
+            await asyncio.get_running_loop().run_in_executor(None, graph_builder.clear_traces)
         
         # Reinitialize Kafka consumer for new environment
         kafka_config = env_config.get('kafka', {})
@@ -361,15 +402,7 @@ async def switch_environment(request: Dict[str, Any]):
                             with open(topics_yaml_path, 'r') as f:
                                 topics_config = yaml.safe_load(f)
                             
-                            topics_cfg = topics_config.get('topics', {})
-                            for topic_name, topic_cfg in topics_cfg.items():
-                                try:
-                                    proto_file = topic_cfg.get('proto_file', '')
-                                    message_type = topic_cfg.get('message_type', '')
-                                    if proto_file and message_type:
-                                        decoder.load_topic_protobuf(topic_name, proto_file, message_type)
-                                except Exception as topic_err:
-                                    logger.warning(f"Could not load protobuf for topic '{topic_name}': {topic_err}")
+                            await decoder_warmup.run_async(decoder, topics_config.get('topics', {}))
                         except Exception as e:
                             logger.warning(f"Could not load topic protobuf mappings: {e}")
                 else:
@@ -387,12 +420,16 @@ async def switch_environment(request: Dict[str, Any]):
                 kafka_consumer = KafkaConsumerService(
                     config_path=str(kafka_yaml),
                     decoder=decoder,
-                    trace_header_field=trace_header_field
+                    trace_header_field=trace_header_field,
+                    settings=settings
                 )
                 
                 # Add message handler if graph_builder exists
                 if graph_builder:
-                    kafka_consumer.add_message_handler(graph_builder.add_message)
+                    await asyncio.get_running_loop().run_in_executor(None, graph_builder.open_persistence, new_env)
+                    kafka_consumer.add_batch_handler(ingest_writer.submit)
+                    kafka_consumer.set_offset_checkpoints(graph_builder.checkpoint_offsets)
+                    kafka_consumer.set_monitored_topics(graph_builder.get_monitored_topics())
                 
                 # Subscribe to topics
                 topics_yaml = ROOT_DIR / "config" / "topics.yaml"
@@ -1318,7 +1355,7 @@ async def get_topics():
     try:
         # Get topics with statistics from graph_builder
         if graph_builder:
-            stats = graph_builder.get_statistics()
+            stats = await read_pool.read('get_statistics')
             topic_stats = stats.get('topics', {})
             topic_details_dict = topic_stats.get('details', {})
             
@@ -1375,6 +1412,16 @@ async def update_monitored_topics(topics: List[str]):
             app.state.monitored_topics = []
         
         app.state.monitored_topics = topics
+        
+        # Push the monitored set down so unmonitored topics are dropped before decoding
+        consumer_topics = topics
+        if graph_builder is not None:
+            # Waits for the builder lock, which an ingest batch may hold, off the event loop
+            await asyncio.get_running_loop().run_in_executor(None, graph_builder.set_monitored_topics, topics)
+            consumer_topics = graph_builder.get_monitored_topics()
+        if kafka_consumer is not None:
+            kafka_consumer.set_monitored_topics(consumer_topics)
+        
         logger.info(f"Updated monitored topics: {topics}")
         
         return {
@@ -1386,12 +1433,29 @@ async def update_monitored_topics(topics: List[str]):
         logger.error(f"Failed to update monitored topics: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.get("/kafka/status")
+async def get_kafka_status():
+    """Get Kafka consumer subscription status and ingest throughput counters"""
+    try:
+        if kafka_consumer is None:
+            return {"running": False, "status": "Kafka consumer not initialized"}
+        
+        return {
+            "running": kafka_consumer.running,
+            **kafka_consumer.get_subscription_status(),
+            "ingest_writer": ingest_writer.get_stats(),
+            "read_pool": read_pool.get_stats()
+        }
+    except Exception as e:
+        logger.error(f"Failed to get Kafka status: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @api_router.get("/topics/graph")
 async def get_topic_graph():
     try:
         if graph_builder:
             # Get topic graph data with statistics and colors
-            graph_data = graph_builder.get_topic_graph_data()
+            graph_data = await read_pool.read('get_topic_graph_data')
             return graph_data
         
         # Fallback with basic data
@@ -1411,7 +1475,7 @@ async def get_disconnected_components():
     try:
         if graph_builder:
             # Get real disconnected components from graph_builder with real statistics
-            components = graph_builder.get_disconnected_graphs()
+            components = await read_pool.read('get_disconnected_graphs')
             
             return {
                 "success": True,
@@ -1428,25 +1492,40 @@ async def get_disconnected_components():
         return {"success": False, "components": [], "total_components": 0}
 
 @api_router.get("/graph/filtered")
-async def get_filtered_graph(topic: str = None, depth: int = 2):
-    """Get filtered graph centered around a topic"""
+async def get_filtered_graph(topic: str = None, depth: int = 2, direction: str = "both",
+                             time_filter: str = None, custom_minutes: int = None):
+    """Get filtered graph centered around a topic, or time filtered graph components
+
+    With `topic`, returns its neighbourhood up to `depth` hops, following
+    edges downstream, upstream or both ways (`direction`). With
+    `time_filter`, returns the disconnected components with statistics
+    over that window.
+    """
     try:
-        if not topic:
-            # Return full graph if no topic specified
-            if graph_builder:
-                topics = graph_builder.topic_graph.get_all_topics()
-                edges = graph_builder.topic_graph.edges
-                return {
-                    "nodes": [{"id": t, "label": t} for t in topics],
-                    "edges": [{"source": e.source, "target": e.destination} for e in edges]
-                }
-        
-        if graph_builder and hasattr(graph_builder, 'get_subgraph'):
-            subgraph = graph_builder.get_subgraph(topic, depth)
+        if graph_builder is None:
+            return {"nodes": [], "edges": []}
+
+        if topic:
+            try:
+                subgraph = await read_pool.read('get_subgraph', topic, depth, direction)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            if subgraph is None:
+                raise HTTPException(status_code=404, detail=f"Topic {topic} is not in the graph")
             return subgraph
-        
-        # Return empty graph
-        return {"nodes": [], "edges": []}
+
+        if time_filter:
+            return {"success": True, **await read_pool.read('get_filtered_graph_data', time_filter, custom_minutes)}
+
+        # Return full graph if no topic specified
+        topics = graph_builder.topic_graph.get_all_topics()
+        edges = graph_builder.topic_graph.edges
+        return {
+            "nodes": [{"id": t, "label": t} for t in topics],
+            "edges": [{"source": e.source, "target": e.destination} for e in edges]
+        }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Failed to get filtered graph: {e}")
         return {"nodes": [], "edges": []}
@@ -1487,7 +1566,7 @@ async def get_statistics():
     try:
         if graph_builder:
             # Get real-time statistics from graph_builder
-            return graph_builder.get_statistics()
+            return await read_pool.read('get_statistics')
         
         # Fallback when graph_builder is not available
         return {
@@ -1517,21 +1596,44 @@ async def get_statistics():
         logger.error(traceback.format_exc())
         raise HTTPException(status_code=500, detail=str(e))
 
+# Page size of /traces, which lists traces by keyset (cursor) pagination
+TRACES_PAGE_SIZE = 50
+TRACES_MAX_PAGE_SIZE = 1000
+
 @api_router.get("/traces")
-async def get_traces():
+async def get_traces(request: Request, topic: Optional[str] = None, key: Optional[str] = None,
+                     start_time: Optional[datetime] = None, end_time: Optional[datetime] = None,
+                     limit: int = TRACES_PAGE_SIZE, cursor: Optional[str] = None):
+    """List traces, most recently active first, optionally filtered by topic, message key and end time range
+
+    Pass the returned `next_cursor` as `cursor` for the next page. Responses
+    carry an ETag, and a matching If-None-Match gets an empty 304.
+    """
     try:
         if graph_builder is None:
-            return {"traces": [], "total": 0, "page": 1, "per_page": 50}
-        
-        # Get trace summary from graph_builder
-        summary = graph_builder.get_trace_summary()
-        
-        return {
-            "traces": summary.get('traces', []),
-            "total": summary.get('total_traces', 0),
-            "page": 1,
-            "per_page": 50
-        }
+            return {"traces": [], "total": 0, "per_page": limit, "next_cursor": None}
+
+        if not 1 <= limit <= TRACES_MAX_PAGE_SIZE:
+            raise HTTPException(status_code=400, detail=f"limit must be between 1 and {TRACES_MAX_PAGE_SIZE}")
+        try:
+            result = await read_pool.read('query_traces', shared=False, topic=topic, key=key,
+                                          start_time=start_time, end_time=end_time, limit=limit, cursor=cursor,
+                                          if_none_match=request.headers.get("if-none-match"))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        # no-cache: browsers revalidate every poll, sending If-None-Match themselves
+        headers = {"ETag": result['etag'], "Cache-Control": "no-cache"}
+        if result.get('not_modified'):
+            return Response(status_code=304, headers=headers)
+        return JSONResponse({
+            "traces": result['traces'],
+            "total": result['total'],
+            "per_page": limit,
+            "next_cursor": result['next_cursor']
+        }, headers=headers)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Failed to get traces: {e}")
         import traceback
@@ -1539,35 +1641,17 @@ async def get_traces():
         raise HTTPException(status_code=500, detail=str(e))
 
 @api_router.get("/trace/{trace_id}")
-async def get_trace_detail(trace_id: str):
-    """Get detailed information about a specific trace"""
+async def get_trace_detail(trace_id: str, full: bool = False):
+    """Get detailed information about a specific trace (full=true decodes projected payloads in full)"""
     try:
         if graph_builder is None:
             raise HTTPException(status_code=503, detail="Graph builder not initialized")
         
-        # Get trace from graph_builder
-        if trace_id not in graph_builder.traces:
+        # Serialized on a read worker under the builder lock, falling back to the spill tier for evicted traces
+        detail = await read_pool.read('get_trace_detail', trace_id, full, shared=False)
+        if detail is None:
             raise HTTPException(status_code=404, detail=f"Trace not found: {trace_id}")
-        
-        trace = graph_builder.traces[trace_id]
-        
-        # Build detailed trace response
-        messages = [msg.to_dict() for msg in trace.messages]
-        
-        # Calculate duration
-        duration_ms = 0
-        if trace.start_time and trace.end_time:
-            duration_ms = int((trace.end_time - trace.start_time).total_seconds() * 1000)
-        
-        return {
-            "trace_id": trace_id,
-            "start_time": trace.start_time.isoformat() if trace.start_time else None,
-            "end_time": trace.end_time.isoformat() if trace.end_time else None,
-            "duration_ms": duration_ms,
-            "message_count": len(trace.messages),
-            "topics": list(trace.topics),
-            "messages": messages
-        }
+        return detail
     except HTTPException:
         raise
     except Exception as e:
@@ -1583,42 +1667,11 @@ async def get_trace_flow(trace_id: str):
         if graph_builder is None:
             raise HTTPException(status_code=503, detail="Graph builder not initialized")
         
-        # Get trace from graph_builder
-        if trace_id not in graph_builder.traces:
+        # Built on a read worker under the builder lock, falling back to the spill tier for evicted traces
+        flow = await read_pool.read('get_trace_hops', trace_id, shared=False)
+        if flow is None:
             raise HTTPException(status_code=404, detail=f"Trace not found: {trace_id}")
-        
-        trace = graph_builder.traces[trace_id]
-        
-        # Build nodes (topics) and edges (message flow)
-        nodes = []
-        edges = []
-        topic_set = set()
-        
-        for i, msg in enumerate(trace.messages):
-            topic = msg.topic
-            if topic and topic not in topic_set:
-                nodes.append({
-                    "id": topic,
-                    "label": topic,
-                    "message_count": sum(1 for m in trace.messages if m.topic == topic)
-                })
-                topic_set.add(topic)
-            
-            # Create edge to next message's topic
-            if i < len(trace.messages) - 1:
-                next_topic = trace.messages[i + 1].topic
-                if topic and next_topic and topic != next_topic:
-                    edges.append({
-                        "source": topic,
-                        "target": next_topic,
-                        "label": f"msg {i+1}"
-                    })
-        
-        return {
-            "trace_id": trace_id,
-            "nodes": nodes,
-            "edges": edges
-        }
+        return flow
     except HTTPException:
         raise
     except Exception as e:
@@ -1630,55 +1683,39 @@ async def get_trace_flow(trace_id: str):
 # -----------------------------------------------------------------------------
 # WebSocket Connection Manager
 # -----------------------------------------------------------------------------
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
-
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.append(websocket)
-
-    def disconnect(self, websocket: WebSocket):
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
-
-    async def broadcast(self, message: dict):
-        """Broadcast message to all connected clients"""
-        dead_connections = []
-        for connection in self.active_connections:
-            try:
-                await connection.send_json(message)
-            except Exception as e:
-                logger.error(f"Error sending to WebSocket: {e}")
-                dead_connections.append(connection)
-        
-        # Remove dead connections
-        for conn in dead_connections:
-            self.disconnect(conn)
-
+# Per-client send queues drained concurrently, see src/connection_manager.py
 websocket_manager = ConnectionManager()
+# Channel subscriptions on /ws and the periodic push of graph, statistics and trace deltas
+live_updates = LiveUpdatePublisher(lambda: graph_builder, connections=websocket_manager)
 
 async def broadcast_message(message: dict):
     """Helper function to broadcast messages"""
     await websocket_manager.broadcast(message)
 
+@api_router.get("/ws/stats")
+async def get_websocket_stats():
+    """Per-client send queue depth, drops and send latency, and live update totals"""
+    return {**websocket_manager.get_stats(), "live_updates": live_updates.get_stats()}
+
 # -----------------------------------------------------------------------------
 # WebSockets
 # -----------------------------------------------------------------------------
 @api_router.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     await websocket_manager.connect(websocket)
+    live_updates.add_client(websocket)
     try:
         while True:
-            # Keep connection alive and listen for messages
+            # Clients subscribe to live update channels, see src/live_updates.py
             data = await websocket.receive_text()
-            # Echo back or handle client messages if needed
+            await live_updates.handle_message(websocket, data)
     except WebSocketDisconnect:
-        websocket_manager.disconnect(websocket)
         logger.info("WebSocket disconnected")
     except Exception as e:
-        websocket_manager.disconnect(websocket)
         logger.error(f"WebSocket error: {e}")
+    finally:
+        websocket_manager.disconnect(websocket)
+        live_updates.remove_client(websocket)
 
 @api_router.websocket("/ws/blueprint")
 async def blueprint_websocket_endpoint(websocket: WebSocket):
@@ -2537,6 +2574,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
 app.include_router(api_router)
@@ -0,0 +1,195 @@
+"""
+WebSocket fan-out with per-client send queues
+
+Every broadcast is serialized once and appended to each client's bounded
+queue, which that client's own writer task drains, so a slow browser only
+delays itself. When a queue is full the oldest message is dropped; with
+the "coalesce" policy a message also replaces any queued message with the
+same key (e.g. a live update channel) instead of queueing behind it.
+Channels that lost a message that way are reported by `take_stale` so the
+sender can resynchronize the client with a snapshot. A send that blocks
+longer than the timeout disconnects the client.
+
+Messages are queued as one shared JSON str and sent as text frames, not
+pre-encoded bytes: the dashboards JSON.parse() `event.data`, which is a
+Blob for binary frames, and ASGI has no way to pass already-encoded text
+frames, so the server's per-client UTF-8 encode is the one copy left.
+"""
+import asyncio
+import itertools
+import json
+import logging
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+QUEUE_POLICIES = ('drop_oldest', 'coalesce')
+
+
+class ClientConnection:
+    """One WebSocket client: its send queue, writer task and send metrics"""
+
+    def __init__(self, websocket, client_id: int):
+        self.websocket = websocket
+        self.client_id = client_id
+        self.queue: deque = deque()  # (key, text, enqueued monotonic time)
+        self.wakeup = asyncio.Event()
+        self.stale_keys: Set[str] = set()
+        self.writer: Optional[asyncio.Task] = None
+        self.closed = False
+        self.sent = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.bytes_sent = 0
+        self.latency_avg = 0.0  # Seconds per send, exponentially weighted
+        self.latency_max = 0.0
+        self.queue_delay_avg = 0.0  # Seconds from enqueue to send start, exponentially weighted
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'id': self.client_id,
+            'queue_depth': len(self.queue),
+            'sent': self.sent,
+            'dropped': self.dropped,
+            'coalesced': self.coalesced,
+            'bytes_sent': self.bytes_sent,
+            'send_latency_ms_avg': round(self.latency_avg * 1000, 3),
+            'send_latency_ms_max': round(self.latency_max * 1000, 3),
+            'queue_delay_ms_avg': round(self.queue_delay_avg * 1000, 3)
+        }
+
+
+class ConnectionManager:
+    """Connected WebSocket clients and concurrent, backpressure-aware broadcast to them"""
+
+    def __init__(self, max_queue: int = 100, policy: str = 'coalesce', send_timeout: float = 10.0):
+        self.max_queue = max_queue
+        self.policy = policy
+        self.send_timeout = send_timeout
+        self.connections: Dict[Any, ClientConnection] = {}
+        self.disconnected_slow = 0
+        self._ids = itertools.count(1)
+
+    @property
+    def active_connections(self) -> List[Any]:
+        return list(self.connections)
+
+    def configure(self, settings: Dict[str, Any]):
+        """Apply the `websocket` block of settings.yaml"""
+        self.max_queue = max(1, int(settings.get('send_queue', self.max_queue)))
+        self.send_timeout = float(settings.get('send_timeout', self.send_timeout))
+        policy = settings.get('queue_policy', self.policy)
+        if policy not in QUEUE_POLICIES:
+            logger.warning(f"⚠️ Unknown WebSocket queue policy {policy!r}, keeping {self.policy}")
+        else:
+            self.policy = policy
+
+    async def connect(self, websocket):
+        await websocket.accept()
+        connection = ClientConnection(websocket, next(self._ids))
+        connection.writer = asyncio.create_task(self._write(connection))
+        self.connections[websocket] = connection
+
+    def disconnect(self, websocket):
+        connection = self.connections.pop(websocket, None)
+        if connection is not None:
+            connection.closed = True
+            if connection.writer is not None and connection.writer is not asyncio.current_task():
+                connection.writer.cancel()
+
+    async def broadcast(self, message: dict, key: Optional[str] = None):
+        """Broadcast message to all connected clients"""
+        self.broadcast_text(json.dumps(message, default=str), key)
+
+    def broadcast_text(self, text: str, key: Optional[str] = None, supersedes: bool = False):
+        """Queue already serialized text for every client"""
+        for websocket in list(self.connections):
+            self.send(websocket, text, key, supersedes)
+
+    def send(self, websocket, text: str, key: Optional[str] = None, supersedes: bool = False) -> bool:
+        """Queue text for one client without waiting; False if it is not connected
+
+        `supersedes` marks a message holding the whole state of its key, such
+        as a snapshot, so that the queued messages it replaces are not stale.
+        """
+        connection = self.connections.get(websocket)
+        if connection is None or connection.closed:
+            return False
+        queue = connection.queue
+        if supersedes:
+            connection.stale_keys.discard(key)
+        if key is not None and self.policy == 'coalesce':
+            for index, (queued_key, _, _) in enumerate(queue):
+                if queued_key == key:
+                    del queue[index]
+                    connection.coalesced += 1
+                    if not supersedes:
+                        connection.stale_keys.add(key)
+                    break
+        if len(queue) >= self.max_queue:
+            dropped_key, _, _ = queue.popleft()
+            connection.dropped += 1
+            if dropped_key is not None:
+                connection.stale_keys.add(dropped_key)
+        queue.append((key, text, time.monotonic()))
+        connection.wakeup.set()
+        return True
+
+    def take_stale(self, websocket) -> Set[str]:
+        """Keys of which a queued message was dropped or coalesced since the last call"""
+        connection = self.connections.get(websocket)
+        if connection is None or not connection.stale_keys:
+            return set()
+        stale, connection.stale_keys = connection.stale_keys, set()
+        return stale
+
+    async def _write(self, connection: ClientConnection):
+        """Drain one client's queue; disconnect it if a send blocks past the timeout"""
+        websocket, queue = connection.websocket, connection.queue
+        try:
+            while not connection.closed:
+                if not queue:
+                    connection.wakeup.clear()
+                    await connection.wakeup.wait()
+                    continue
+                _, text, enqueued = queue.popleft()
+                started = time.monotonic()
+                await asyncio.wait_for(websocket.send_text(text), self.send_timeout)
+                latency = time.monotonic() - started
+                connection.sent += 1
+                connection.bytes_sent += len(text)
+                connection.latency_avg += (latency - connection.latency_avg) * 0.1
+                connection.latency_max = max(connection.latency_max, latency)
+                connection.queue_delay_avg += ((started - enqueued) - connection.queue_delay_avg) * 0.1
+        except asyncio.CancelledError:
+            pass
+        except asyncio.TimeoutError:
+            self.disconnected_slow += 1
+            logger.warning(f"⚠️ Disconnecting WebSocket client {connection.client_id}: "
+                           f"a send blocked for over {self.send_timeout}s with {len(queue)} messages queued")
+            await self._close(connection)
+        except Exception as e:
+            logger.error(f"Error sending to WebSocket: {e}")
+            await self._close(connection)
+
+    async def _close(self, connection: ClientConnection):
+        self.disconnect(connection.websocket)
+        try:
+            await asyncio.wait_for(connection.websocket.close(), 1.0)
+        except Exception:
+            pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        connections = [connection.get_stats() for connection in self.connections.values()]
+        return {
+            'clients': len(connections),
+            'queue_limit': self.max_queue,
+            'queue_policy': self.policy,
+            'send_timeout': self.send_timeout,
+            'queued': sum(c['queue_depth'] for c in connections),
+            'dropped': sum(c['dropped'] for c in connections),
+            'disconnected_slow': self.disconnected_slow,
+            'connections': connections
+        }
@@ -0,0 +1,102 @@
+"""
+Multi-process protobuf decode pool for the Kafka consumer
+"""
+import logging
+import math
+import multiprocessing
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Decoder owned by each worker process, built once by _init_worker
+_worker_decoder = None
+
+
+def _init_worker(proto_dir: str, topic_configs: Dict[str, Tuple[str, str]],
+                 projections: Dict[str, List[str]], required_fields: List[str]):
+    """Load the same per-topic message classes and projections as the parent decoder"""
+    global _worker_decoder
+
+    # Workers re-import the decoder modules, which turn on DEBUG logging
+    logging.getLogger().setLevel(logging.WARNING)
+
+    from src.protobuf_decoder import ProtobufDecoder
+
+    decoder = ProtobufDecoder(proto_dir)
+    decoder.require_fields(*required_fields)
+    for topic, (proto_file, message_type) in topic_configs.items():
+        try:
+            decoder.load_topic_protobuf(topic, proto_file, message_type, projections.get(topic))
+        except Exception as e:
+            logger.warning(f"Decode worker could not load protobuf for topic '{topic}': {e}")
+
+    _worker_decoder = decoder
+
+
+def _decode_chunk(topic: str, payloads: List[bytes]) -> List[Tuple[bool, Any]]:
+    """Decode a run of payloads from one topic partition, keeping their order"""
+    results = []
+    for payload in payloads:
+        try:
+            results.append((True, _worker_decoder.decode_message(topic, payload)))
+        except Exception as e:
+            results.append((False, str(e)))
+    return results
+
+
+class ProtobufDecodePool:
+    """Fans protobuf decoding of consumed batches out to worker processes"""
+
+    def __init__(self, decoder, workers: int):
+        self.workers = workers
+        self.topics = set(decoder.topic_configs)
+
+        # Spawn rather than fork: the parent runs librdkafka and executor threads
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(str(decoder.proto_dir), dict(decoder.topic_configs),
+                      dict(decoder.topic_projections), list(decoder.required_fields))
+        )
+
+        logger.info(f"🧵 Started protobuf decode pool with {workers} worker processes for {len(self.topics)} topics")
+
+    def decode_batch(self, items: List[Tuple[str, int, bytes]]) -> List[Tuple[bool, Any]]:
+        """
+        Decode a batch of raw payloads in parallel
+
+        Args:
+            items: (topic, partition, payload) tuples in consumption order
+
+        Returns:
+            One (success, decoded dict or error message) tuple per item, in input order
+        """
+        # Group by topic and partition so each task decodes an ordered run of one partition
+        partitions = defaultdict(list)
+        for index, (topic, partition, _) in enumerate(items):
+            partitions[(topic, partition)].append(index)
+
+        # Split large partitions so a single hot partition still spreads over all workers
+        chunk_size = max(1, math.ceil(len(items) / self.workers))
+
+        futures = []
+        for (topic, _), indexes in partitions.items():
+            for start in range(0, len(indexes), chunk_size):
+                chunk = indexes[start:start + chunk_size]
+                payloads = [items[i][2] for i in chunk]
+                futures.append((chunk, self.executor.submit(_decode_chunk, topic, payloads)))
+
+        results: List[Tuple[bool, Any]] = [None] * len(items)
+        for chunk, future in futures:
+            for index, result in zip(chunk, future.result()):
+                results[index] = result
+
+        return results
+
+    def shutdown(self):
+        """Stop the worker processes"""
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        logger.info("🛑 Protobuf decode pool stopped")
@@ -0,0 +1,153 @@
+"""
+Concurrent startup loading of per-topic protobuf decoders
+"""
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 8
+
+
+class DecoderWarmup:
+    """Loads the decoders for all configured topics in parallel and tracks readiness
+
+    Topics that share a proto file and message type are compiled once; the
+    others reuse the loaded message class. Per-topic timings are kept for
+    the /health endpoint.
+    """
+
+    def __init__(self, max_workers: int = DEFAULT_WORKERS):
+        self.max_workers = max_workers
+        self.state = 'idle'  # idle -> pending -> running -> done / skipped
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.compile_seconds: Optional[float] = None
+        self.topics: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self.state not in ('pending', 'running')
+
+    def mark_pending(self):
+        """Report not-ready until a warm-up runs (or settle() gives up on it)"""
+        with self._lock:
+            if self.state != 'running':
+                self.state = 'pending'
+
+    def settle(self):
+        """Leave the pending state if no warm-up was started"""
+        with self._lock:
+            if self.state == 'pending':
+                self.state = 'skipped'
+
+    def run(self, decoder, topics_cfg: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """Load a decoder for every topic in topics.yaml's `topics` mapping"""
+        with self._lock:
+            self.state = 'running'
+            self.started_at = time.time()
+            self.finished_at = None
+            self.compile_seconds = None
+            self.topics = {}
+
+        try:
+            # Mock decoders have nothing to load
+            loads_protobufs = hasattr(decoder, 'load_topic_protobuf')
+
+            groups: Dict[Tuple[str, str], List[str]] = {}
+            projections = {topic: (topic_cfg or {}).get('projection') for topic, topic_cfg in (topics_cfg or {}).items()}
+            for topic, topic_cfg in (topics_cfg or {}).items():
+                proto_file = (topic_cfg or {}).get('proto_file', '')
+                message_type = (topic_cfg or {}).get('message_type', '')
+                if not loads_protobufs:
+                    self.topics[topic] = {'status': 'skipped', 'error': 'decoder does not load protobufs'}
+                elif proto_file and message_type:
+                    groups.setdefault((proto_file, message_type), []).append(topic)
+                else:
+                    self.topics[topic] = {'status': 'skipped', 'error': 'proto_file or message_type not configured'}
+
+            # Compile the whole proto tree once up front so the workers only build classes
+            compiler = getattr(decoder, 'compiler', None)
+            if compiler is not None and groups:
+                started = time.perf_counter()
+                compiler.ensure_compiled()
+                self.compile_seconds = round(time.perf_counter() - started, 4)
+
+            if groups:
+                workers = max(1, min(self.max_workers, len(groups)))
+                with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="decoder-warmup") as executor:
+                    loads = {
+                        key: executor.submit(self._load, decoder, topics[0], *key, projections[topics[0]])
+                        for key, topics in groups.items()
+                    }
+                    for (proto_file, message_type), topics in groups.items():
+                        primary = topics[0]
+                        self.topics[primary] = loads[(proto_file, message_type)].result()
+                        for topic in topics[1:]:
+                            self.topics[topic] = self._share(decoder, topic, primary, proto_file, message_type, projections[topic])
+
+            loaded = sum(1 for entry in self.topics.values() if entry['status'] == 'loaded')
+            logger.info(
+                f"🔥 Decoder warm-up loaded {loaded}/{len(self.topics)} topics "
+                f"({len(groups)} distinct protobufs) in {time.time() - self.started_at:.3f}s"
+            )
+            return self.topics
+        finally:
+            with self._lock:
+                self.state = 'done'
+                self.finished_at = time.time()
+
+    async def run_async(self, decoder, topics_cfg: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """run() on a worker thread, keeping the event loop responsive"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.run, decoder, topics_cfg)
+
+    def _load(self, decoder, topic: str, proto_file: str, message_type: str,
+              projection: Optional[List[str]] = None) -> Dict[str, Any]:
+        entry = {'proto_file': proto_file, 'message_type': message_type}
+        started = time.perf_counter()
+        try:
+            if projection:
+                decoder.load_topic_protobuf(topic, proto_file, message_type, projection)
+            else:
+                decoder.load_topic_protobuf(topic, proto_file, message_type)
+            entry['status'] = 'loaded'
+        except Exception as e:
+            logger.warning(f"Could not load protobuf for topic '{topic}': {e}")
+            entry.update(status='failed', error=str(e))
+        entry['seconds'] = round(time.perf_counter() - started, 4)
+        return entry
+
+    def _share(self, decoder, topic: str, primary: str, proto_file: str, message_type: str,
+               projection: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Reuse the primary topic's decoder for a topic with the same proto and message type"""
+        if not hasattr(decoder, 'share_topic_decoder'):
+            return self._load(decoder, topic, proto_file, message_type, projection)
+
+        entry = {'proto_file': proto_file, 'message_type': message_type, 'shared_with': primary, 'seconds': 0.0}
+        if self.topics[primary]['status'] != 'loaded':
+            entry.update(status='failed', error=self.topics[primary].get('error'))
+            return entry
+        decoder.share_topic_decoder(topic, primary)
+        if projection:
+            decoder.set_projection(topic, projection)
+        entry['status'] = 'loaded'
+        return entry
+
+    def status(self) -> Dict[str, Any]:
+        """Readiness and per-topic load timings"""
+        duration = None
+        if self.started_at is not None:
+            duration = round((self.finished_at or time.time()) - self.started_at, 4)
+        return {
+            'ready': self.ready,
+            'state': self.state,
+            'duration_seconds': duration,
+            'compile_seconds': self.compile_seconds,
+            'topics': dict(self.topics)
+        }
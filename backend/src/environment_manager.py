@@ -106,10 +106,13 @@ class EnvironmentManager:
                 logger.warning(f"Error stopping Kafka consumer: {e}")
             self.kafka_consumer = None
         
-        # Clear graph builder
+        # Clear graph builder and release its trace store and spill files
         if self.graph_builder:
-            self.graph_builder.traces.clear()
-            self.graph_builder.trace_order.clear()
+            self.graph_builder.clear_traces()
+            try:
+                self.graph_builder.close()
+            except Exception as e:
+                logger.warning(f"Error closing graph builder: {e}")
             self.graph_builder = None
     
     def _initialize_services(self, config: Dict[str, Any]) -> Dict[str, Any]:
@@ -139,8 +142,11 @@ class EnvironmentManager:
             # We'll pass the config directly instead of using a file
             self.kafka_consumer = self._create_kafka_consumer_with_config(temp_config)
             
-            # Set up message handling
-            self.kafka_consumer.add_message_handler(self.graph_builder.add_message)
+            # Set up message handling, resuming from the environment's trace store
+            self.graph_builder.open_persistence(self.current_environment)
+            self.kafka_consumer.add_batch_handler(self.graph_builder.add_messages)
+            self.kafka_consumer.set_offset_checkpoints(self.graph_builder.checkpoint_offsets)
+            self.kafka_consumer.set_monitored_topics(self.graph_builder.get_monitored_topics())
             
             # Subscribe to all topics (with graceful handling of missing topics)
             all_topics = self.graph_builder.topic_graph.get_all_topics()
@@ -172,11 +178,8 @@ class EnvironmentManager:
         consumer = KafkaConsumerService.__new__(KafkaConsumerService)
         consumer.decoder = self.protobuf_decoder
         consumer.trace_header_field = self.trace_header_field
-        consumer.consumer = None
-        consumer.running = False
-        consumer.mock_mode = False
-        consumer.message_handlers = []
-        consumer.subscribed_topics = []
+        consumer.restore_state()
+        consumer.configure_processing(self.settings)
         
         # Set Kafka config directly
         consumer.kafka_config = {
@@ -2,18 +2,44 @@
 Topic graph builder and trace management with FIFO eviction
 Enhanced for Phase 2: Multiple disconnected graphs, real-time statistics, trace age analysis
 """
+import functools
+import hashlib
 import logging
-from typing import Dict, List, Optional, Set, Any
-from collections import defaultdict, deque
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Set, Any
+from collections import OrderedDict, defaultdict
 from datetime import datetime, timedelta
+from pathlib import Path
 import yaml
-import numpy as np
-from src.models import KafkaMessage, TraceInfo, TopicGraph
+from src.models import AccountedDecode, KafkaMessage, TraceInfo, TopicGraph, to_epoch_us
+from src.live_updates import ChangeTracker
+from src.payload_store import PayloadStore
+from src.trace_persistence import TracePersistence
+from src.trace_index import TraceIndex
+from src.trace_spill import TraceSpillStore
+from src.trace_statistics import StatisticsView, TraceStatistics
 
 # Set up extensive logging
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
+SUBGRAPH_DIRECTIONS = ('both', 'downstream', 'upstream')
+SUBGRAPH_CACHE_SIZE = 256  # Memoized get_subgraph results, oldest dropped first
+
+
+def _writes(method):
+    """Run a TraceGraphBuilder mutation under the builder lock and advance its version"""
+    @functools.wraps(method)
+    def locked(self, *args, **kwargs):
+        with self.lock:
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                self.version += 1
+    return locked
+
+
 class TraceGraphBuilder:
     """Manages topic graph and trace collection with FIFO eviction"""
 
@@ -25,11 +51,55 @@ class TraceGraphBuilder:
         self.topics_config_path = topics_config_path
         self.max_traces = max_traces
         self.settings = settings or {}
+
+        # Byte budget across all retained traces; 0 disables memory-based eviction
+        max_memory_mb = self.settings.get('max_trace_memory_mb', 0) or 0
+        self.max_bytes = int(max_memory_mb * 1024 * 1024)
+        self.trace_bytes: Dict[str, int] = {}
+        self.total_bytes = 0
+        self.memory_evictions = 0
+        # Per topic, the decode_fn wrapper that counts lazily decoded values of retained messages
+        self._decoders: Dict[str, AccountedDecode] = {}
+        logger.info(f"💾 Trace memory budget: {f'{max_memory_mb} MB' if self.max_bytes else 'unlimited'}")
+
+        # Raw payloads of retained messages are packed into shared segments; 0 keeps them per message
+        segment_mb = self.settings.get('payload_segment_mb', 0) or 0
+        self.payload_store = PayloadStore(int(segment_mb * 1024 * 1024)) if segment_mb > 0 else None
+        logger.info(f"🧱 Payload store: {f'{segment_mb} MB segments' if self.payload_store else 'disabled'}")
+
+        # Evicted traces are kept in an on-disk spill tier so they can still be looked up
+        self.spill: Optional[TraceSpillStore] = None
+        spill_settings = self.settings.get('trace_spill', {}) or {}
+        if spill_settings.get('enabled', False):
+            directory = Path(spill_settings.get('directory', '.trace_spill'))
+            if not directory.is_absolute():
+                directory = Path(topics_config_path).resolve().parent.parent / directory
+            try:
+                self.spill = TraceSpillStore(str(directory), spill_settings.get('segment_mb', 64),
+                                             spill_settings.get('max_mb', 1024))
+            except OSError as e:
+                logger.warning(f"⚠️ Trace spill tier disabled, cannot use {directory}: {e}")
+
+        # Consumed messages and offsets are persisted per environment once open_persistence() is called
+        self.persistence: Optional[TracePersistence] = None
+
         self.topic_graph = TopicGraph()
-        self.traces: Dict[str, TraceInfo] = {}
-        self.trace_order = deque()  # For FIFO eviction
+        # Ordered from least to most recently active trace, for O(1) touch and eviction
+        self.traces: "OrderedDict[str, TraceInfo]" = OrderedDict()
+        # Secondary indexes by end time, topic and message key, kept in step with self.traces
+        self.index = TraceIndex(self.traces)
+        self.clear_generation = 0  # Increases whenever every trace is dropped
+        # Held by every mutation and by reads made off the event loop, see src/read_pool.py
+        self.lock = threading.RLock()
+        self.version = 0  # Increases with every mutation
+        # Changed topics and traces for live updates, set by a LiveUpdatePublisher
+        self.changes: Optional[ChangeTracker] = None
         self.monitored_topics: Set[str] = set()
+        # (topic, depth, direction) -> (validity stamp, result) of get_subgraph
+        self._subgraph_cache: Dict[tuple, tuple] = {}
         self._load_topic_graph()
+        # Running per-topic and per-edge aggregates, kept in step with self.traces
+        self.statistics = TraceStatistics(self._edge_keys())
         
         logger.info("✅ TraceGraphBuilder initialized successfully")
 
@@ -68,11 +138,11 @@ class TraceGraphBuilder:
             logger.error(f"Failed to load topic graph: {e}")
             raise
 
+    @_writes
     def set_monitored_topics(self, topics: List[str]):
         """Set which topics to monitor for traces"""
-        available_topics = set(self.topic_graph.get_all_topics())
-        valid_topics = [t for t in topics if t in available_topics]
-        invalid_topics = [t for t in topics if t not in available_topics]
+        valid_topics = [t for t in topics if t in self.topic_graph]
+        invalid_topics = [t for t in topics if t not in self.topic_graph]
         
         if invalid_topics:
             logger.warning(f"Invalid topics ignored: {invalid_topics}")
@@ -80,16 +150,25 @@ class TraceGraphBuilder:
         self.monitored_topics = set(valid_topics)
         logger.info(f"Updated monitored topics: {self.monitored_topics}")
 
+    def _edge_keys(self) -> List[tuple]:
+        return [(edge.source, edge.destination) for edge in self.topic_graph.edges]
+
+    @_writes
+    def refresh_topology(self):
+        """Re-sync edge aggregates after the topic graph edges were replaced"""
+        self.statistics.set_edges(self._edge_keys())
+
     def get_monitored_topics(self) -> List[str]:
         """Get currently monitored topics"""
         return list(self.monitored_topics)
 
-    def add_message(self, message: KafkaMessage):
-        """Add a message to the appropriate trace"""
+    @_writes
+    def add_message(self, message: KafkaMessage) -> bool:
+        """Add a message to the appropriate trace, returning whether it was retained"""
         # Only process messages from monitored topics
         if message.topic not in self.monitored_topics:
             logger.debug(f"Ignoring message from non-monitored topic: {message.topic}")
-            return
+            return False
 
         if not message.trace_id:
             logger.debug(f"Message without trace ID: {message.topic}[{message.partition}]:{message.offset} using the topic name")
@@ -104,24 +183,182 @@ class TraceGraphBuilder:
 
         # Add message to trace
         trace = self.traces[message.trace_id]
+        previous_end_us = trace.end_us
+        new_topic = message.topic not in trace.topic_set
         trace.add_message(message)
+        self.index.message_added(trace, message, previous_end_us, new_topic)
+        if self.payload_store is not None:
+            message.store_payload(self.payload_store)
+        self._account_decodes(message)
+        self.statistics.add_message(message.trace_id, message)
+        self._account_bytes(message.trace_id, message.estimated_size())
+        if self.changes is not None:
+            self.changes.message_added(message)
 
         if not trace_existed:
             logger.info(f"Created new trace: {message.trace_id}")
         
         logger.debug(f"Added message to trace {message.trace_id}: {message.topic}")
 
-        # Update trace order for FIFO (always move to end when active)
-        if message.trace_id in self.trace_order:
-            self.trace_order.remove(message.trace_id)
-        self.trace_order.append(message.trace_id)
+        # Mark the trace as most recently active
+        self.traces.move_to_end(message.trace_id)
 
         # Enforce max traces limit with improved logic
         self._enforce_trace_limit()
+        self._enforce_memory_limit()
+        self._compact_payloads()
+        return True
+
+    @_writes
+    def add_messages(self, messages: List[KafkaMessage]):
+        """Add a batch of messages to their traces, persisting them and their offsets when a store is open"""
+        if self.persistence is None:
+            for message in messages:
+                self.add_message(message)
+            return
+
+        retained = [message for message in messages if self.add_message(message)]
+        try:
+            self.persistence.append(retained, consumed=messages)
+        except Exception as e:
+            logger.error(f"❌ Failed to persist {len(retained)} messages: {e}")
+
+    @_writes
+    def open_persistence(self, environment: str) -> int:
+        """Open the environment's trace store and reload its most recent traces; returns how many"""
+        store_settings = self.settings.get('trace_store', {}) or {}
+        if not store_settings.get('enabled', False):
+            return 0
+        if self.persistence is not None:
+            self.persistence.close()
+            self.persistence = None
+
+        directory = Path(store_settings.get('directory', '.trace_store'))
+        if not directory.is_absolute():
+            directory = Path(self.topics_config_path).resolve().parent.parent / directory
+        started = time.perf_counter()
+        try:
+            self.persistence = TracePersistence(str(directory / f"traces-{environment.lower()}.sqlite"),
+                                                store_settings.get('retention_hours', 24))
+            recovered = self.persistence.recent_traces(self.max_traces)
+        except Exception as e:
+            logger.error(f"❌ Trace store unavailable for {environment}: {e}")
+            self.persistence = None
+            return 0
+
+        restored = 0
+        for trace in recovered:
+            if trace.trace_id not in self.traces:
+                self._insert_trace(trace)
+                restored += 1
+        self._enforce_memory_limit()
+        logger.info(f"♻️ Restored {restored} traces for {environment} in {time.perf_counter() - started:.2f}s")
+        return restored
+
+    def checkpoint_offsets(self) -> Dict[tuple, int]:
+        """Next offset to consume per (topic, partition), from the open trace store"""
+        return self.persistence.offsets() if self.persistence is not None else {}
+
+    @_writes
+    def add_trace(self, trace: TraceInfo):
+        """Insert a fully built trace, e.g. from the mock generator"""
+        self._remove_trace(trace.trace_id)
+        self._insert_trace(trace)
+        self._enforce_memory_limit()
+        self._compact_payloads()
+
+    def _insert_trace(self, trace: TraceInfo):
+        """Retain a fully built trace and fold it into the running aggregates"""
+        self.traces[trace.trace_id] = trace
+        for message in trace.messages:
+            if self.payload_store is not None:
+                message.store_payload(self.payload_store)
+            self._account_decodes(message)
+        self.statistics.add_trace(trace)
+        self.index.trace_added(trace)
+        self._account_bytes(trace.trace_id, sum(msg.estimated_size() for msg in trace.messages))
+        if self.changes is not None:
+            self.changes.trace_changed(trace.trace_id, trace.topic_set)
+
+    def _remove_trace(self, trace_id: str):
+        """Drop a trace and retract it from the running aggregates"""
+        trace = self.traces.pop(trace_id, None)
+        if trace is not None:
+            self._release_messages(trace)
+            self.statistics.remove_trace(trace_id)
+            self.index.trace_removed(trace)
+            self.total_bytes -= self.trace_bytes.pop(trace_id, 0)
+            if self.changes is not None:
+                self.changes.trace_changed(trace_id, trace.topic_set)
+
+    def _evict_trace(self, trace_id: str):
+        """Drop a trace from memory, keeping it in the spill tier when there is one"""
+        trace = self.traces.get(trace_id)
+        if trace is not None and self.spill is not None:
+            try:
+                self.spill.spill(trace)
+            except Exception as e:
+                logger.warning(f"⚠️ Failed to spill trace {trace_id}: {e}")
+        self._remove_trace(trace_id)
+
+    def _release_messages(self, trace: TraceInfo):
+        """Give an evicted trace's payload space back to the payload store and stop counting its decodes"""
+        if self.payload_store is None and not self._decoders:
+            return
+        for message in trace.messages:
+            if self.payload_store is not None:
+                message.release_payload(self.payload_store)
+            if isinstance(message.decode_fn, AccountedDecode):
+                message.decode_fn = message.decode_fn.decode
+
+    def _account_decodes(self, message: KafkaMessage):
+        """Have a retained, not yet decoded message report its decoded size when it is decoded on a read"""
+        decode_fn = message.decode_fn
+        if decode_fn is None:
+            return
+        if isinstance(decode_fn, AccountedDecode):
+            decode_fn = decode_fn.decode
+        accounted = self._decoders.get(message.topic)
+        if accounted is None or accounted.decode is not decode_fn:
+            accounted = self._decoders[message.topic] = AccountedDecode(decode_fn, self._decoded)
+        message.decode_fn = accounted
+
+    def _decoded(self, message: KafkaMessage, size: int):
+        """Count a lazily decoded value against the memory budget
+
+        Decodes happen inside reads, which must not evict traces under them,
+        so the budget is enforced again by the next write.
+        """
+        with self.lock:
+            if message.trace_id in self.trace_bytes:
+                self._account_bytes(message.trace_id, size)
+
+    def _compact_payloads(self):
+        """Copy surviving payloads out of mostly released segments so those segments can be dropped"""
+        store = self.payload_store
+        if store is None or not store.needs_compaction():
+            return
+        segments = len(store.segments)
+        for trace in self.traces.values():
+            for message in trace.messages:
+                message.compact_payload(store)
+        store.compaction_done()
+        logger.debug(f"Compacted payload store from {segments} to {len(store.segments)} segments")
+
+    def _account_bytes(self, trace_id: str, size: int):
+        self.trace_bytes[trace_id] = self.trace_bytes.get(trace_id, 0) + size
+        self.total_bytes += size
 
     def _create_new_trace(self, trace_id: str):
-        """Create a new trace"""
-        self.traces[trace_id] = TraceInfo(trace_id=trace_id)
+        """Create a new trace, or bring it back from the spill tier or trace store if it was evicted earlier"""
+        trace = self.spill.take(trace_id) if self.spill is not None and trace_id in self.spill else None
+        if trace is None and self.persistence is not None and trace_id in self.persistence:
+            trace = self.persistence.load(trace_id)
+        if trace is None:
+            self.traces[trace_id] = TraceInfo(trace_id=trace_id)
+        else:
+            logger.debug(f"Restored trace {trace_id} from the spill tier or trace store")
+            self._insert_trace(trace)
 
     def _enforce_trace_limit(self):
         """Enforce maximum trace limit with intelligent eviction"""
@@ -130,30 +367,87 @@ class TraceGraphBuilder:
             
         # Calculate how many traces to evict (evict in batches to avoid frequent evictions)
         traces_to_evict = min(100, len(self.traces) - self.max_traces)
+        fresh_after_us = to_epoch_us(datetime.now() - timedelta(seconds=30))
         
         for _ in range(traces_to_evict):
-            if len(self.trace_order) == 0:
+            if not self.traces:
                 break
                 
-            oldest_trace_id = self.trace_order.popleft()
-            if oldest_trace_id in self.traces:
-                # Don't evict traces that have received messages in the last 30 seconds
-                trace = self.traces[oldest_trace_id]
-                if trace.messages:
-                    latest_message_time = max(msg.timestamp for msg in trace.messages)
-                    time_since_last_message = datetime.now() - latest_message_time
-                    
-                    if time_since_last_message.total_seconds() < 30:
-                        # Put it back at the end and skip eviction
-                        self.trace_order.append(oldest_trace_id)
-                        continue
-                
-                del self.traces[oldest_trace_id]
-                logger.debug(f"Evicted trace: {oldest_trace_id} (age: {time_since_last_message.total_seconds():.1f}s)")
+            oldest_trace_id, trace = next(iter(self.traces.items()))
+            
+            # Don't evict traces that have received messages in the last 30 seconds.
+            # Traces are ordered by activity, so if the least recently active one is
+            # still fresh, every other trace is too.
+            if trace.end_us is not None and trace.end_us > fresh_after_us:
+                break
+            
+            self._evict_trace(oldest_trace_id)
+            logger.debug(f"Evicted trace: {oldest_trace_id}")
+
+    def _enforce_memory_limit(self):
+        """Evict least recently active traces until retained messages fit the byte budget"""
+        if not self.max_bytes or self.total_bytes <= self.max_bytes:
+            return
+
+        # Unlike the count limit, recent activity does not protect a trace: the budget is a hard cap
+        evicted = 0
+        while self.traces and self.total_bytes > self.max_bytes:
+            oldest_trace_id = next(iter(self.traces))
+            if len(self.traces) == 1:
+                logger.warning(
+                    f"Trace {oldest_trace_id} alone exceeds the memory budget "
+                    f"({self.total_bytes} > {self.max_bytes} bytes), evicting it"
+                )
+            self._evict_trace(oldest_trace_id)
+            evicted += 1
+
+        self.memory_evictions += evicted
+        logger.debug(f"Evicted {evicted} traces to stay within the memory budget")
+
+    def get_memory_usage(self) -> Dict[str, Any]:
+        """Estimated bytes held by retained traces and the configured budget"""
+        return {
+            'estimated_bytes': self.total_bytes,
+            'max_bytes': self.max_bytes or None,
+            'utilization': self.total_bytes / self.max_bytes if self.max_bytes else None,
+            'evicted_traces': self.memory_evictions,
+            'payload_store': self.payload_store.get_stats() if self.payload_store is not None else None,
+            'spill': self.spill.get_stats() if self.spill is not None else None
+        }
+
+    @_writes
+    def clear_traces(self):
+        """Remove all traces"""
+        for trace in self.traces.values():
+            self._release_messages(trace)
+        self.traces.clear()
+        self.index.clear()
+        # Trace ids may recur after a clear (e.g. in another environment), so retire old ETags
+        self.clear_generation += 1
+        if self.spill is not None:
+            self.spill.clear()
+        self.statistics.clear()
+        self.trace_bytes.clear()
+        self.total_bytes = 0
+
+    @_writes
+    def close(self):
+        """Close the trace store and remove the spill tier's files"""
+        if self.persistence is not None:
+            self.persistence.close()
+            self.persistence = None
+        if self.spill is not None:
+            self.spill.close()
+            self.spill = None
 
     def get_trace(self, trace_id: str) -> Optional[TraceInfo]:
-        """Get trace by ID"""
-        return self.traces.get(trace_id)
+        """Get trace by ID, from memory or else from the spill tier or trace store"""
+        trace = self.traces.get(trace_id)
+        if trace is None and self.spill is not None:
+            trace = self.spill.load(trace_id)
+        if trace is None and self.persistence is not None:
+            trace = self.persistence.load(trace_id)
+        return trace
 
     def get_all_trace_ids(self) -> List[str]:
         """Get all available trace IDs"""
@@ -168,29 +462,69 @@ class TraceGraphBuilder:
             'traces': []
         }
 
-        # Sort traces by most recent first
-        sorted_traces = sorted(
-            self.traces.items(),
-            key=lambda x: x[1].end_time or x[1].start_time or datetime.min,
-            reverse=True
+        # Most recent first, straight from the end time index
+        traces, _ = self.index.query()
+        summary['traces'] = [trace.summary() for trace in traces]
+        if len(traces) < len(self.traces):
+            # Traces without messages have no end time and are not indexed
+            summary['traces'].extend(trace.summary() for trace in self.traces.values() if trace.end_us is None)
+
+        return summary
+
+    def query_traces(self, topic: Optional[str] = None, key: Optional[str] = None,
+                     start_time: Optional[datetime] = None, end_time: Optional[datetime] = None,
+                     limit: Optional[int] = None, cursor: Optional[str] = None,
+                     if_none_match: Optional[str] = None) -> Dict[str, Any]:
+        """Summaries of the traces matching every given filter, most recently active first
+
+        Served from the secondary indexes: a topic or key narrows the candidates,
+        the time range bounds trace end times, and `cursor` (the `next_cursor`
+        of the previous page) continues a listing limited to `limit` traces.
+
+        The result carries an `etag` of the page. When it matches one in
+        `if_none_match` (an If-None-Match header value) the result is just
+        `{'etag': ..., 'not_modified': True}` and no rows are built.
+        """
+        start_us = to_epoch_us(start_time) if start_time else None
+        end_us = to_epoch_us(end_time) if end_time else None
+        traces, next_entry = self.index.query(
+            topic=topic, key=key, start_us=start_us, end_us=end_us,
+            limit=limit, cursor=self._parse_cursor(cursor) if cursor else None
         )
+        # A page changes only when its traces, their message counts or the total do
+        etag = self._page_etag((topic, key, start_us, end_us, limit, cursor), traces, next_entry)
+        if if_none_match and self._etag_matches(if_none_match, etag):
+            return {'etag': etag, 'not_modified': True}
+        return {
+            'traces': [trace.summary() for trace in traces],
+            'total': len(self.traces),
+            'next_cursor': f"{next_entry[0]}:{next_entry[1]}" if next_entry else None,
+            'etag': etag
+        }
 
-        for trace_id, trace in sorted_traces:
-            summary['traces'].append({
-                'trace_id': trace_id,
-                'message_count': len(trace.messages),
-                'topics': trace.topics,
-                'start_time': trace.start_time.isoformat() if trace.start_time else None,
-                'end_time': trace.end_time.isoformat() if trace.end_time else None,
-                'duration_ms': self._calculate_duration(trace)
-            })
+    def _page_etag(self, query: tuple, traces: List[TraceInfo], next_entry: Optional[tuple]) -> str:
+        state = (self.clear_generation, len(self.traces), query, next_entry,
+                 [(trace.trace_id, len(trace.messages)) for trace in traces])
+        return '"%s"' % hashlib.blake2b(repr(state).encode(), digest_size=12).hexdigest()
 
-        return summary
+    @staticmethod
+    def _etag_matches(if_none_match: str, etag: str) -> bool:
+        if if_none_match.strip() == '*':
+            return True
+        tags = (tag.strip() for tag in if_none_match.split(','))
+        return any((tag[2:] if tag.startswith('W/') else tag) == etag for tag in tags)
+
+    @staticmethod
+    def _parse_cursor(cursor: str) -> tuple:
+        end_us, separator, trace_id = cursor.partition(':')
+        if not separator or not end_us.lstrip('-').isdigit():
+            raise ValueError(f"Invalid cursor: {cursor!r}")
+        return int(end_us), trace_id
 
     def _calculate_duration(self, trace: TraceInfo) -> Optional[int]:
         """Calculate trace duration in milliseconds"""
-        if trace.start_time and trace.end_time:
-            return int((trace.end_time - trace.start_time).total_seconds() * 1000)
+        if trace.start_us is not None and trace.end_us is not None:
+            return (trace.end_us - trace.start_us) // 1000
         return None
 
     def get_topic_graph_data(self) -> Dict[str, Any]:
@@ -201,12 +535,8 @@ class TraceGraphBuilder:
         # Create nodes for all topics
         all_topics = self.topic_graph.get_all_topics()
         for topic in all_topics:
-            # Count messages in this topic
-            message_count = sum(
-                len([msg for msg in trace.messages if msg.topic == topic])
-                for trace in self.traces.values()
-            )
-            
+            message_count = self.statistics.message_count(topic)
+
             nodes.append({
                 'id': topic,
                 'label': f"{topic}\n({message_count} msgs)",
@@ -239,16 +569,52 @@ class TraceGraphBuilder:
 
     def _count_edge_flow(self, source: str, destination: str) -> int:
         """Count message flow between two topics across all traces"""
-        flow_count = 0
-        for trace in self.traces.values():
-            source_messages = [msg for msg in trace.messages if msg.topic == source]
-            dest_messages = [msg for msg in trace.messages if msg.topic == destination]
-            
-            # Simple heuristic: if both topics have messages, count as flow
-            if source_messages and dest_messages:
-                flow_count += min(len(source_messages), len(dest_messages))
-                
-        return flow_count
+        # Simple heuristic: traces with messages on both topics count min(source, destination)
+        return self.statistics.edge_flow_messages(source, destination)
+
+    def get_trace_detail(self, trace_id: str, full: bool = False) -> Optional[Dict[str, Any]]:
+        """Trace metadata and serialized messages (full=True decodes projected payloads in full)"""
+        trace = self.get_trace(trace_id)
+        if trace is None:
+            return None
+
+        duration_ms = 0
+        if trace.start_time and trace.end_time:
+            duration_ms = int((trace.end_time - trace.start_time).total_seconds() * 1000)
+
+        return {
+            'trace_id': trace_id,
+            'start_time': trace.start_time.isoformat() if trace.start_time else None,
+            'end_time': trace.end_time.isoformat() if trace.end_time else None,
+            'duration_ms': duration_ms,
+            'message_count': len(trace.messages),
+            'topics': list(trace.topics),
+            'messages': [msg.to_dict(full=full) for msg in trace.messages]
+        }
+
+    def get_trace_hops(self, trace_id: str) -> Optional[Dict[str, Any]]:
+        """Topics of a trace and the hops between consecutive messages on different topics"""
+        trace = self.get_trace(trace_id)
+        if trace is None:
+            return None
+
+        counts = defaultdict(int)
+        for msg in trace.messages:
+            counts[msg.topic] += 1
+
+        nodes = []
+        edges = []
+        for i, msg in enumerate(trace.messages):
+            topic = msg.topic
+            if topic and topic in counts:
+                nodes.append({'id': topic, 'label': topic, 'message_count': counts.pop(topic)})
+            # Create edge to next message's topic
+            if i < len(trace.messages) - 1:
+                next_topic = trace.messages[i + 1].topic
+                if topic and next_topic and topic != next_topic:
+                    edges.append({'source': topic, 'target': next_topic, 'label': f"msg {i+1}"})
+
+        return {'trace_id': trace_id, 'nodes': nodes, 'edges': edges}
 
     def get_trace_flow_data(self, trace_id: str) -> Optional[Dict[str, Any]]:
         """Get trace flow data for visualization"""
@@ -290,7 +656,7 @@ class TraceGraphBuilder:
             'trace_id': trace_id,
             'nodes': nodes,
             'edges': edges,
-            'timeline': [msg.to_dict() for msg in sorted(trace.messages, key=lambda m: m.timestamp)],
+            'timeline': [msg.to_dict() for msg in sorted(trace.messages, key=lambda m: m.timestamp_us)],
             'stats': {
                 'total_messages': len(trace.messages),
                 'topic_count': len(trace.topics),
@@ -301,7 +667,7 @@ class TraceGraphBuilder:
     def _analyze_message_flow(self, trace: TraceInfo) -> List[tuple]:
         """Analyze message flow within a trace"""
         # Sort messages by timestamp
-        sorted_messages = sorted(trace.messages, key=lambda m: m.timestamp)
+        sorted_messages = sorted(trace.messages, key=lambda m: m.timestamp_us)
 
         flow_counts = defaultdict(int)
         topic_sequence = []
@@ -316,27 +682,27 @@ class TraceGraphBuilder:
             next_topic = topic_sequence[i + 1]
             
             # Only count if there's a defined edge in topic graph
-            if next_topic in self.topic_graph.get_destinations(current_topic):
+            if self.topic_graph.has_edge(current_topic, next_topic):
                 flow_counts[(current_topic, next_topic)] += 1
 
         # Convert to list of tuples (source, destination, count)
         return [(source, dest, count) for (source, dest), count in flow_counts.items()]
 
+    @_writes
     def cleanup_old_traces(self, max_age_hours: int = 24):
         """Clean up traces older than specified age"""
-        cutoff_time = datetime.now() - timedelta(hours=max_age_hours)
+        cutoff_us = to_epoch_us(datetime.now() - timedelta(hours=max_age_hours))
 
         to_remove = []
         for trace_id, trace in self.traces.items():
-            if trace.end_time and trace.end_time < cutoff_time:
+            if trace.end_us is not None and trace.end_us < cutoff_us:
                 to_remove.append(trace_id)
 
         for trace_id in to_remove:
-            del self.traces[trace_id]
-            if trace_id in self.trace_order:
-                self.trace_order.remove(trace_id)
+            self._evict_trace(trace_id)
 
         if to_remove:
+            self._compact_payloads()
             logger.info(f"Cleaned up {len(to_remove)} old traces")
 
         return len(to_remove)
@@ -361,30 +727,18 @@ class TraceGraphBuilder:
             'time_range': {
                 'earliest': None,
                 'latest': None
-            }
+            },
+            'memory': self.get_memory_usage(),
+            'trace_store': self.persistence.get_stats() if self.persistence is not None else None
         }
 
-        # Calculate message statistics
-        earliest_time = None
-        latest_time = None
-        topics_with_messages = set()
-
-        for trace in self.traces.values():
-            stats['messages']['total'] += len(trace.messages)
-            
-            for msg in trace.messages:
-                topics_with_messages.add(msg.topic)
-                
-                # Update message counts by topic
-                if msg.topic not in stats['messages']['by_topic']:
-                    stats['messages']['by_topic'][msg.topic] = 0
-                stats['messages']['by_topic'][msg.topic] += 1
-                
-                # Update time range
-                if earliest_time is None or msg.timestamp < earliest_time:
-                    earliest_time = msg.timestamp
-                if latest_time is None or msg.timestamp > latest_time:
-                    latest_time = msg.timestamp
+        statistics = self.statistics
+        stats['messages']['total'] = statistics.total_messages
+        for topic, aggregate in statistics.topics.items():
+            if aggregate.message_count > 0:
+                stats['messages']['by_topic'][topic] = aggregate.message_count
+        topics_with_messages = set(stats['messages']['by_topic'])
+        earliest_time, latest_time = statistics.time_range()
 
         stats['topics']['with_messages'] = len(topics_with_messages)
         
@@ -394,86 +748,99 @@ class TraceGraphBuilder:
         now = datetime.now()
         
         for topic in all_topics:
-            topic_traces = []
-            topic_message_count = stats['messages']['by_topic'].get(topic, 0)
-            
-            # Find traces that contain messages from this topic
-            for trace_id, trace in self.traces.items():
-                if any(msg.topic == topic for msg in trace.messages):
-                    topic_traces.append(trace_id)
-            
-            # Calculate comprehensive topic statistics
-            topic_stats = self._calculate_topic_statistics(topic, now)
-            
-            stats['topics']['details'][topic] = {
-                'message_count': topic_message_count,
-                'trace_count': len(topic_traces),
-                'monitored': topic in self.monitored_topics,
-                'status': 'Receiving messages' if topic_message_count > 0 else 'No messages',
-                'traces': topic_traces,
-                # P10/P50/P95 metrics in milliseconds
-                'message_age_p10_ms': round(topic_stats['trace_age_p10'] * 1000, 2),
-                'message_age_p50_ms': round(topic_stats['trace_age_p50'] * 1000, 2), 
-                'message_age_p95_ms': round(topic_stats['trace_age_p95'] * 1000, 2),
-                # Messages per minute rates
-                'messages_per_minute_total': round(topic_stats['rate_total'], 2),
-                'messages_per_minute_rolling': round(topic_stats['rate_rolling_60s'], 2),
-                # Slowest traces for this topic
-                'slowest_traces': topic_stats['slowest_traces']
-            }
+            details = stats['topics']['details'][topic] = self._topic_details(topic, now)
+            details['traces'] = statistics.topic_trace_ids(topic)
         
-        if earliest_time:
-            stats['time_range']['earliest'] = earliest_time.isoformat()
-        if latest_time:
-            stats['time_range']['latest'] = latest_time.isoformat()
+        if earliest_time is not None:
+            stats['time_range']['earliest'] = datetime.fromtimestamp(earliest_time).isoformat()
+        if latest_time is not None:
+            stats['time_range']['latest'] = datetime.fromtimestamp(latest_time).isoformat()
 
         return stats
 
+    def _topic_details(self, topic: str, now: datetime) -> Dict[str, Any]:
+        """Per-topic statistics of get_statistics, without the trace id list"""
+        topic_message_count = self.statistics.message_count(topic)
+
+        # Calculate comprehensive topic statistics
+        topic_stats = self._calculate_topic_statistics(topic, now)
+
+        return {
+            'message_count': topic_message_count,
+            'trace_count': self.statistics.trace_count(topic),
+            'monitored': topic in self.monitored_topics,
+            'status': 'Receiving messages' if topic_message_count > 0 else 'No messages',
+            # P10/P50/P95 metrics in milliseconds
+            'message_age_p10_ms': round(topic_stats['trace_age_p10'] * 1000, 2),
+            'message_age_p50_ms': round(topic_stats['trace_age_p50'] * 1000, 2),
+            'message_age_p95_ms': round(topic_stats['trace_age_p95'] * 1000, 2),
+            # Messages per minute rates
+            'messages_per_minute_total': round(topic_stats['rate_total'], 2),
+            'messages_per_minute_rolling': round(topic_stats['rate_rolling_60s'], 2),
+            # Slowest traces for this topic
+            'slowest_traces': topic_stats['slowest_traces']
+        }
+
+    def get_statistics_changes(self, topics: Iterable[str]) -> Dict[str, Any]:
+        """Totals and the per-topic statistics of the given topics, for live updates"""
+        now = datetime.now()
+        return {
+            'traces': {'total': len(self.traces)},
+            'messages': {'total': self.statistics.total_messages},
+            'topics': {topic: self._topic_details(topic, now) for topic in topics if topic in self.topic_graph}
+        }
+
+    def get_graph_changes(self, topics: Iterable[str]) -> Dict[str, Any]:
+        """Rows of get_disconnected_graphs touched by changes to the given topics, for live updates
+
+        Returns the nodes of those topics, every edge into or out of them and
+        the statistics of their components. Assumes the topology is unchanged
+        since the components were last sent.
+        """
+        now = datetime.now()
+        components = self.topic_graph.components()
+        component_of = {self.topic_graph.component_of(component[0]): index for index, component in enumerate(components)}
+        nodes, edges, touched_components = [], {}, {}
+        for topic in topics:
+            if topic not in self.topic_graph:
+                continue
+            index = component_of[self.topic_graph.component_of(topic)]
+            touched_components[index] = components[index]
+            nodes.append(self._topic_node(topic, now, self.statistics, component=index))
+            for destination in self.topic_graph.get_destinations(topic):
+                edges[(topic, destination)] = index
+            for source in self.topic_graph.get_sources(topic):
+                edges[(source, topic)] = index
+        return {
+            'nodes': nodes,
+            'edges': [self._flow_edge(source, destination, self.statistics, component=index)
+                      for (source, destination), index in edges.items()],
+            'components': [{'component_id': index,
+                            'statistics': self._calculate_component_statistics(component, now, self.statistics)}
+                           for index, component in touched_components.items()]
+        }
+
     # Phase 2: Enhanced Graph Visualization Methods
     
-    def get_disconnected_graphs(self) -> List[Dict[str, Any]]:
+    def get_disconnected_graphs(self, statistics: Optional[StatisticsView] = None) -> List[Dict[str, Any]]:
         """Get all disconnected graph components, ordered by size"""
+        statistics = statistics or self.statistics
         logger.info("🔄 Building disconnected graph components...")
         
-        # Find all connected components using DFS
-        all_topics = set(self.topic_graph.get_all_topics())
-        visited = set()
-        components = []
-        
-        def dfs(topic: str, component: Set[str]):
-            if topic in visited:
-                return
-            visited.add(topic)
-            component.add(topic)
-            
-            # Find connected topics through edges
-            for edge in self.topic_graph.edges:
-                if edge.source == topic and edge.destination not in visited:
-                    dfs(edge.destination, component)
-                elif edge.destination == topic and edge.source not in visited:
-                    dfs(edge.source, component)
-        
-        # Build components
-        for topic in all_topics:
-            if topic not in visited:
-                component = set()
-                dfs(topic, component)
-                if component:
-                    components.append(component)
-        
-        # Sort components by size (largest first)
-        components.sort(key=len, reverse=True)
-        
+        # Connected components, largest first, kept by the topic graph across requests
+        components = self.topic_graph.components()
+
         # Build graph data for each component
         graph_components = []
         for i, component in enumerate(components):
-            component_data = self._build_component_graph_data(component, i)
+            component_data = self._build_component_graph_data(component, i, statistics)
             graph_components.append(component_data)
         
         logger.info(f"✅ Found {len(graph_components)} disconnected graph components")
         return graph_components
     
-    def _build_component_graph_data(self, component_topics: Set[str], component_index: int) -> Dict[str, Any]:
+    def _build_component_graph_data(self, component_topics: List[str], component_index: int,
+                                    statistics: StatisticsView) -> Dict[str, Any]:
         """Build graph data for a single component"""
         nodes = []
         edges = []
@@ -481,36 +848,15 @@ class TraceGraphBuilder:
         
         # Build nodes with enhanced statistics
         for topic in component_topics:
-            node_stats = self._calculate_topic_statistics(topic, now)
-            
-            nodes.append({
-                'id': topic,
-                'label': f"{topic}\n{node_stats['message_count']} msgs\n{node_stats['rate_total']:.1f}/min",
-                'type': 'topic',
-                'component': component_index,
-                'monitored': topic in self.monitored_topics,
-                'statistics': node_stats,
-                'color': self._get_node_color_by_age(node_stats['median_trace_age']),
-                'size': max(20, min(80, node_stats['message_count'] / 10))  # Size based on message count
-            })
+            nodes.append(self._topic_node(topic, now, statistics, component=component_index))
         
-        # Build edges within this component
-        for edge in self.topic_graph.edges:
-            if edge.source in component_topics and edge.destination in component_topics:
-                edge_stats = self._calculate_edge_statistics(edge.source, edge.destination)
-                
-                edges.append({
-                    'source': edge.source,
-                    'target': edge.destination,
-                    'type': 'flow',
-                    'component': component_index,
-                    'flow_count': edge_stats['flow_count'],
-                    'message_rate': edge_stats['message_rate'],
-                    'width': max(2, min(10, edge_stats['flow_count'] / 5))  # Width based on flow
-                })
+        # Build edges within this component: every edge out of a member stays inside it
+        for source in component_topics:
+            for destination in self.topic_graph.get_destinations(source):
+                edges.append(self._flow_edge(source, destination, statistics, component=component_index))
         
         # Calculate component statistics
-        component_stats = self._calculate_component_statistics(component_topics, now)
+        component_stats = self._calculate_component_statistics(component_topics, now, statistics)
         
         return {
             'component_id': component_index,
@@ -522,177 +868,114 @@ class TraceGraphBuilder:
             'layout_type': 'hierarchical' if len(component_topics) > 10 else 'force_directed'
         }
     
-    def _calculate_topic_statistics(self, topic: str, now: datetime) -> Dict[str, Any]:
-        """Calculate comprehensive statistics for a topic"""
-        messages = []
-        trace_ages = []
-        trace_slowest_data = []  # For tracking slowest traces
-        
-        # Collect all messages for this topic and trace timing data
-        for trace_id, trace in self.traces.items():
-            trace_messages_for_topic = []
-            for msg in trace.messages:
-                if msg.topic == topic:
-                    messages.append(msg)
-                    trace_messages_for_topic.append(msg)
-            
-            # Calculate trace timing metrics if this trace has messages for this topic
-            if trace_messages_for_topic and trace.messages:
-                # Find the oldest message in the entire trace (start of trace)
-                oldest_message_time = min(msg.timestamp for msg in trace.messages)
-                
-                # Find when trace first reached this topic
-                first_topic_message = min(trace_messages_for_topic, key=lambda m: m.timestamp)
-                time_to_topic = (first_topic_message.timestamp - oldest_message_time).total_seconds()
-                
-                # Calculate total trace duration
-                newest_message_time = max(msg.timestamp for msg in trace.messages)
-                total_trace_duration = (newest_message_time - oldest_message_time).total_seconds()
-                
-                # Only include traces where time_to_topic > 0 (i.e., this topic wasn't the starting topic)
-                # OR if time_to_topic is 0 but there are multiple topics, use the time within the topic
-                if time_to_topic == 0 and len(trace.topics) > 1:
-                    # If this is the starting topic, calculate internal processing time
-                    if len(trace_messages_for_topic) > 1:
-                        # Use the time between first and last message in this topic as processing time
-                        last_topic_message = max(trace_messages_for_topic, key=lambda m: m.timestamp)
-                        time_to_topic = (last_topic_message.timestamp - first_topic_message.timestamp).total_seconds()
-                elif time_to_topic == 0 and len(trace.topics) == 1:
-                    # If this is the only topic in the trace, use total processing time within topic
-                    if len(trace_messages_for_topic) > 1:
-                        last_topic_message = max(trace_messages_for_topic, key=lambda m: m.timestamp)
-                        time_to_topic = (last_topic_message.timestamp - first_topic_message.timestamp).total_seconds()
-                    else:
-                        # Single message in single topic - use a small default time to avoid 0ms
-                        time_to_topic = 0.001  # 1ms minimum
-                
-                # Store data for slowest traces calculation
-                trace_slowest_data.append({
-                    'trace_id': trace_id,
-                    'time_to_topic': time_to_topic,
-                    'total_duration': total_trace_duration
-                })
-                
-                # For age percentile calculation - use time from start to each message in this topic
-                for msg in trace_messages_for_topic:
-                    age_seconds = (msg.timestamp - oldest_message_time).total_seconds()
-                    trace_ages.append(age_seconds)
-        
-        if not messages:
-            return {
-                'message_count': 0,
-                'rate_total': 0.0,
-                'rate_rolling_60s': 0.0,
-                'median_trace_age': 0,
-                'trace_age_p10': 0,
-                'trace_age_p50': 0,
-                'trace_age_p95': 0,
-                'last_message_time': None,
-                'slowest_traces': []
-            }
-        
-        # Sort messages by timestamp for rate calculations
-        messages.sort(key=lambda m: m.timestamp)
-        
-        # Calculate total message rate (messages per minute over entire time span)
-        rate_total = 0.0
-        if len(messages) > 1:
-            time_span_minutes = (messages[-1].timestamp - messages[0].timestamp).total_seconds() / 60
-            rate_total = len(messages) / max(time_span_minutes, 1)  # Avoid division by zero
-        
-        # Calculate rolling 60-second message rate
-        rate_rolling_60s = 0.0
-        sixty_seconds_ago = now - timedelta(seconds=60)
-        recent_messages = [msg for msg in messages if msg.timestamp >= sixty_seconds_ago]
-        if recent_messages:
-            # Messages per minute in the last 60 seconds
-            rate_rolling_60s = len(recent_messages)  # Already per minute since we're looking at 60 seconds
-        
-        # Calculate trace age percentiles
-        if trace_ages:
-            p10 = np.percentile(trace_ages, 10)
-            p50 = np.percentile(trace_ages, 50)  # median
-            p95 = np.percentile(trace_ages, 95)
-        else:
-            p10 = p50 = p95 = 0
-        
-        # Find the 3 slowest traces (by time to reach this topic)
-        slowest_traces = sorted(trace_slowest_data, key=lambda x: x['time_to_topic'], reverse=True)[:3]
-        
+    def _topic_node(self, topic: str, now: datetime, statistics: StatisticsView, **extra) -> Dict[str, Any]:
+        """A topic node with its statistics, in the shape the graph endpoints return"""
+        node_stats = self._calculate_topic_statistics(topic, now, statistics)
         return {
-            'message_count': len(messages),
-            'rate_total': rate_total,
-            'rate_rolling_60s': rate_rolling_60s,
-            'median_trace_age': p50,
-            'trace_age_p10': p10,
-            'trace_age_p50': p50,
-            'trace_age_p95': p95,
-            'last_message_time': messages[-1].timestamp.isoformat() if messages else None,
-            'slowest_traces': slowest_traces
+            'id': topic,
+            'label': f"{topic}\n{node_stats['message_count']} msgs\n{node_stats['rate_total']:.1f}/min",
+            'type': 'topic',
+            **extra,
+            'monitored': topic in self.monitored_topics,
+            'statistics': node_stats,
+            'color': self._get_node_color_by_age(node_stats['median_trace_age']),
+            'size': max(20, min(80, node_stats['message_count'] / 10))  # Size based on message count
         }
-    
-    def _calculate_edge_statistics(self, source_topic: str, dest_topic: str) -> Dict[str, Any]:
-        """Calculate statistics for an edge between two topics"""
-        flow_count = 0
-        message_times = []
-        
-        for trace in self.traces.values():
-            source_messages = [msg for msg in trace.messages if msg.topic == source_topic]
-            dest_messages = [msg for msg in trace.messages if msg.topic == dest_topic]
-            
-            if source_messages and dest_messages:
-                flow_count += 1
-                message_times.extend([msg.timestamp for msg in source_messages + dest_messages])
-        
-        # Calculate message rate for this edge
-        if len(message_times) > 1:
-            message_times.sort()
-            time_span = (message_times[-1] - message_times[0]).total_seconds() / 60
-            message_rate = len(message_times) / max(time_span, 1)
-        else:
-            message_rate = 0.0
-        
+
+    def _flow_edge(self, source: str, destination: str, statistics: StatisticsView, **extra) -> Dict[str, Any]:
+        """An edge with its flow statistics, in the shape the graph endpoints return"""
+        edge_stats = self._calculate_edge_statistics(source, destination, statistics)
         return {
-            'flow_count': flow_count,
-            'message_rate': message_rate
+            'source': source,
+            'target': destination,
+            'type': 'flow',
+            **extra,
+            'flow_count': edge_stats['flow_count'],
+            'message_rate': edge_stats['message_rate'],
+            'width': max(2, min(10, edge_stats['flow_count'] / 5))  # Width based on flow
+        }
+
+    def get_subgraph(self, topic: str, depth: int = 2, direction: str = 'both') -> Optional[Dict[str, Any]]:
+        """The neighbourhood of a topic up to `depth` hops, with live statistics
+
+        `direction` follows edges downstream (to destinations), upstream (to
+        sources) or both ways. Nodes carry their hop `distance` from the
+        topic, and edges are every edge between the nodes found. Results
+        are memoized per (topic, depth, direction) until the topology, the
+        statistics or the monitored topics change, and for at most a second
+        as rolling rates depend on the current time. Returns None for a
+        topic that is not in the graph.
+        """
+        if direction not in SUBGRAPH_DIRECTIONS:
+            raise ValueError(f"direction must be one of {', '.join(SUBGRAPH_DIRECTIONS)}")
+        if depth < 0:
+            raise ValueError("depth must not be negative")
+        if topic not in self.topic_graph:
+            return None
+
+        now = datetime.now()
+        key = (topic, depth, direction)
+        stamp = (self.topic_graph.version, self.statistics.generation, int(now.timestamp()), self.monitored_topics)
+        cached = self._subgraph_cache.get(key)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+
+        # Breadth-first over the adjacency maps, one hop per level
+        distances = {topic: 0}
+        frontier = [topic]
+        for distance in range(1, depth + 1):
+            next_frontier = []
+            for current in frontier:
+                neighbours = []
+                if direction != 'upstream':
+                    neighbours += self.topic_graph.get_destinations(current)
+                if direction != 'downstream':
+                    neighbours += self.topic_graph.get_sources(current)
+                for neighbour in neighbours:
+                    if neighbour not in distances:
+                        distances[neighbour] = distance
+                        next_frontier.append(neighbour)
+            if not next_frontier:
+                break
+            frontier = next_frontier
+
+        subgraph = {
+            'center': topic,
+            'depth': depth,
+            'direction': direction,
+            'nodes': [self._topic_node(node, now, self.statistics, distance=distance)
+                      for node, distance in distances.items()],
+            'edges': [self._flow_edge(source, destination, self.statistics)
+                      for source in distances
+                      for destination in self.topic_graph.get_destinations(source) if destination in distances]
         }
+
+        if key not in self._subgraph_cache and len(self._subgraph_cache) >= SUBGRAPH_CACHE_SIZE:
+            self._subgraph_cache.pop(next(iter(self._subgraph_cache)))
+        self._subgraph_cache[key] = (stamp, subgraph)
+        return subgraph
+
+    def _calculate_topic_statistics(self, topic: str, now: datetime,
+                                    statistics: Optional[StatisticsView] = None) -> Dict[str, Any]:
+        """Calculate comprehensive statistics for a topic"""
+        statistics = statistics or self.statistics
+        return statistics.topic_statistics(topic, now.timestamp())
+    
+    def _calculate_edge_statistics(self, source_topic: str, dest_topic: str,
+                                   statistics: Optional[StatisticsView] = None) -> Dict[str, Any]:
+        """Calculate statistics for an edge between two topics"""
+        statistics = statistics or self.statistics
+        return statistics.edge_statistics(source_topic, dest_topic)
     
-    def _calculate_component_statistics(self, component_topics: Set[str], now: datetime) -> Dict[str, Any]:
+    def _calculate_component_statistics(self, component_topics: List[str], now: datetime,
+                                        statistics: Optional[StatisticsView] = None) -> Dict[str, Any]:
         """Calculate statistics for an entire component"""
-        total_messages = 0
-        all_trace_ages = []
-        active_traces = 0
-        
-        for trace in self.traces.values():
-            component_messages = [msg for msg in trace.messages if msg.topic in component_topics]
-            if component_messages:
-                total_messages += len(component_messages)
-                active_traces += 1
-                
-                # Calculate trace age based on message timestamps within the trace
-                if trace.messages:
-                    # Find the oldest message in the entire trace (start of trace)
-                    oldest_message_time = min(msg.timestamp for msg in trace.messages)
-                    
-                    # For component messages, calculate age from trace start
-                    for msg in component_messages:
-                        age_seconds = (msg.timestamp - oldest_message_time).total_seconds()
-                        all_trace_ages.append(age_seconds)
-        
-        # Calculate overall statistics
-        if all_trace_ages:
-            median_age = np.percentile(all_trace_ages, 50)
-            p95_age = np.percentile(all_trace_ages, 95)
-        else:
-            median_age = p95_age = 0
-        
-        return {
-            'total_messages': total_messages,
-            'active_traces': active_traces,
-            'median_trace_age': median_age,
-            'p95_trace_age': p95_age,
-            'health_score': self._calculate_health_score(median_age, total_messages)
-        }
+        statistics = statistics or self.statistics
+        component_stats = statistics.component_statistics(component_topics)
+        component_stats['health_score'] = self._calculate_health_score(
+            component_stats['median_trace_age'], component_stats['total_messages']
+        )
+        return component_stats
     
     def _get_node_color_by_age(self, median_age_seconds: float) -> Dict[str, str]:
         """Get node color based on median trace age"""
@@ -741,38 +1024,28 @@ class TraceGraphBuilder:
         else:
             filter_time = now - timedelta(hours=24)  # Default to last 24 hours
         
-        # Filter traces based on time
-        filtered_traces = {}
+        # Windows are answered from time buckets; "all" uses the running aggregates
         if filter_time:
-            for trace_id, trace in self.traces.items():
-                if trace.start_time and trace.start_time >= filter_time:
-                    filtered_traces[trace_id] = trace
+            statistics = self.statistics.window((now - filter_time).total_seconds(), now.timestamp())
+            total_traces = statistics.total_traces
         else:
-            filtered_traces = self.traces
+            statistics = self.statistics
+            total_traces = len(self.traces)
         
-        # Temporarily replace traces for calculation
-        original_traces = self.traces
-        self.traces = filtered_traces
+        # Get disconnected graphs with filtered data
+        disconnected_graphs = self.get_disconnected_graphs(statistics)
         
-        try:
-            # Get disconnected graphs with filtered data
-            disconnected_graphs = self.get_disconnected_graphs()
-            
-            # Calculate overall filtered statistics
-            filtered_stats = {
-                'total_traces': len(filtered_traces),
-                'total_messages': sum(len(trace.messages) for trace in filtered_traces.values()),
-                'time_filter': time_filter,
-                'filter_start': filter_time.isoformat() if filter_time else None,
-                'components_count': len(disconnected_graphs)
-            }
-            
-            return {
-                'disconnected_graphs': disconnected_graphs,
-                'statistics': filtered_stats,
-                'filter_applied': time_filter
-            }
-            
-        finally:
-            # Restore original traces
-            self.traces = original_traces
\ No newline at end of file
+        # Calculate overall filtered statistics
+        filtered_stats = {
+            'total_traces': total_traces,
+            'total_messages': statistics.total_messages,
+            'time_filter': time_filter,
+            'filter_start': filter_time.isoformat() if filter_time else None,
+            'components_count': len(disconnected_graphs)
+        }
+        
+        return {
+            'disconnected_graphs': disconnected_graphs,
+            'statistics': filtered_stats,
+            'filter_applied': time_filter
+        }
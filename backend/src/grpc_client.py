@@ -510,7 +510,7 @@ class GrpcClient:
                 # Debug: Log the actual request message content AND headers
                 try:
                     from google.protobuf.json_format import MessageToDict
-                    request_dict = MessageToDict(request)
+                    request_dict = MessageToDict(request, descriptor_pool=request.DESCRIPTOR.file.pool)
                     logger.debug(f"📤 Sending request payload: {request_dict}")
                     
                     # Also log the serialized size and some byte info
@@ -729,7 +729,8 @@ class GrpcClient:
                 # First try MessageToDict
                 try:
                     from google.protobuf.json_format import MessageToDict
-                    response_dict = MessageToDict(response, preserving_proto_field_name=True)
+                    response_dict = MessageToDict(response, preserving_proto_field_name=True,
+                                                  descriptor_pool=response.DESCRIPTOR.file.pool)
                     logger.debug(f"📨 Response converted using MessageToDict: {response_dict}")
                     if response_dict:  # If we got data, we're done
                         logger.info(f"📨 Final response data: {response_dict}")
@@ -1346,7 +1347,7 @@ class GrpcClient:
                 
                 # Convert to dict for inspection
                 from google.protobuf.json_format import MessageToDict
-                message_dict = MessageToDict(request_message)
+                message_dict = MessageToDict(request_message, descriptor_pool=request_message.DESCRIPTOR.file.pool)
                 
                 return {
                     'success': True,
@@ -3,22 +3,42 @@ gRPC Proto File Loader
 
 Dynamically loads and compiles user-provided proto files for gRPC services.
 Proto files are NOT committed to the repository and must be provided by users.
+
+Message and stub classes are built from the descriptor pool of the shared
+ProtoCompiler, so no _pb2/_pb2_grpc modules are generated or imported.
 """
-import os
-import sys
 import logging
-import importlib
-import importlib.util
-import tempfile
+import types
 from pathlib import Path
 from typing import Dict, Any, Optional, List
 import grpc
-from grpc_tools import protoc
-import grpc_tools
 import yaml
+from google.protobuf import message_factory
+from google.protobuf.descriptor import ServiceDescriptor
+
+from .proto_compiler import get_proto_compiler
 
 logger = logging.getLogger(__name__)
 
+
+def _stub_class(service: ServiceDescriptor) -> type:
+    """Client stub class for a service, equivalent to the one grpc_tools generates"""
+    methods = []
+    for method in service.methods:
+        request_class = message_factory.GetMessageClass(method.input_type)
+        response_class = message_factory.GetMessageClass(method.output_type)
+        kind = f"{'stream' if method.client_streaming else 'unary'}_{'stream' if method.server_streaming else 'unary'}"
+        methods.append((method.name, kind, f"/{service.full_name}/{method.name}", request_class, response_class))
+
+    def __init__(self, channel: grpc.Channel):
+        for name, kind, path, request_class, response_class in methods:
+            setattr(self, name, getattr(channel, kind)(
+                path,
+                request_serializer=request_class.SerializeToString,
+                response_deserializer=response_class.FromString))
+
+    return type(f"{service.name}Stub", (), {'__init__': __init__, '__doc__': f"Client stub for {service.full_name}"})
+
 class GrpcProtoLoader:
     """Manages loading and compilation of user-provided proto files"""
     
@@ -26,10 +46,10 @@ class GrpcProtoLoader:
         """Initialize the gRPC proto loader with the entire proto root directory"""
         self.proto_root = Path(proto_root_dir)
         self.proto_dir = self.proto_root / "grpc"  # gRPC proto files subdirectory
-        self.temp_dir = None
         self.compiled_modules: Dict[str, Any] = {}
         self.service_stubs: Dict[str, Any] = {}
         self.service_definitions: Dict[str, Dict] = {}  # Store parsed service definitions
+        self.compiler = get_proto_compiler(str(self.proto_root))  # Shared with the Kafka topic decoders
         
         # Ensure proto root exists
         self.proto_root.mkdir(parents=True, exist_ok=True)
@@ -93,144 +113,15 @@ class GrpcProtoLoader:
         return validation_results
     
     def compile_proto_files(self) -> bool:
-        """Compile proto files to Python modules"""
+        """Compile the proto tree into the shared descriptor pool"""
         logger.info("🔨 Starting proto file compilation...")
         
-        try:
-            # Create temporary directory for compiled modules
-            self.temp_dir = tempfile.mkdtemp(prefix="grpc_protos_")
-            logger.info(f"📁 Created temp directory: {self.temp_dir}")
-            
-            # Add temp directory to Python path
-            if self.temp_dir not in sys.path:
-                sys.path.insert(0, self.temp_dir)
-            
-            # Find all proto files in the entire proto root directory (not just grpc subdir)
-            proto_files = list(self.proto_root.rglob("*.proto"))
-            logger.info(f"📄 Found {len(proto_files)} proto files")
-            
-            if not proto_files:
-                logger.error("❌ No proto files found")
-                return False
-            
-            # Compile each proto file
-            for proto_file in proto_files:
-                self._compile_single_proto(proto_file)
-            
-            # Create __init__.py files for Python package structure
-            self._create_init_files()
-            
-            # Rename 'grpc' directory to 'proto_gen' to avoid conflicts with system grpc
-            self._rename_grpc_to_proto_gen()
-            
-            # Create missing utilities module for gRPC version checking
-            self._create_utilities_module()
-            
-            logger.info("✅ Proto compilation completed successfully")
-            return True
-            
-        except Exception as e:
-            logger.error(f"💥 Proto compilation failed: {str(e)}")
-            logger.error(f"🔴 Error type: {type(e).__name__}")
+        if not self.compiler.ensure_compiled():
+            logger.error(f"💥 Proto compilation failed: {self.compiler.error}")
             return False
-    
-    def _compile_single_proto(self, proto_file: Path):
-        """Compile a single proto file"""
-        logger.debug(f"🔨 Compiling proto file: {proto_file}")
-        
-        # Calculate relative path from proto_root (not proto_dir)
-        rel_path = proto_file.relative_to(self.proto_root)
-        
-        # Get the grpc_tools proto path for well-known types
-        grpc_tools_proto_path = Path(grpc_tools.__file__).parent / "_proto"
-        
-        # Create a flattened module name to avoid conflicts
-        # grpc/ingress_server/ingress_server.proto -> grpc_ingress_server_ingress_server
-        module_name = str(rel_path).replace('/', '_').replace('.proto', '')
-        
-        # Prepare protoc arguments - use proto_root as the proto_path and include grpc_tools path
-        args = [
-            "grpc_tools.protoc",
-            f"--proto_path={self.proto_root}",
-            f"--proto_path={grpc_tools_proto_path}",
-            f"--python_out={self.temp_dir}",
-            f"--grpc_python_out={self.temp_dir}",
-            str(rel_path)
-        ]
-        
-        logger.debug(f"🛠️  Protoc command: {' '.join(args)}")
-        logger.debug(f"🏷️  Module name will be: {module_name}")
-        
-        # Run protoc
-        result = protoc.main(args)
-        if result != 0:
-            raise RuntimeError(f"protoc failed with exit code {result} for {proto_file}")
         
-        logger.debug(f"✅ Successfully compiled: {proto_file}")
-    
-    def _create_init_files(self):
-        """Create __init__.py files for Python package structure"""
-        logger.debug("📦 Creating __init__.py files for package structure")
-        
-        # Create __init__.py files for all directories in the temp directory
-        for root, dirs, files in os.walk(self.temp_dir):
-            for dir_name in dirs:
-                init_file = Path(root) / dir_name / "__init__.py"
-                if not init_file.exists():
-                    init_file.touch()
-                    logger.debug(f"📄 Created: {init_file}")
-        
-        # Also create root __init__.py files
-        grpc_init = Path(self.temp_dir) / "grpc" / "__init__.py"
-        if not grpc_init.exists():
-            grpc_init.parent.mkdir(parents=True, exist_ok=True)
-            grpc_init.touch()
-            logger.debug(f"📄 Created: {grpc_init}")
-        
-        logger.debug("✅ Package structure created")
-    
-    def _rename_grpc_to_proto_gen(self):
-        """Move all generated files to proto_gen directory to avoid conflicts with system grpc package"""
-        logger.debug("🔄 Moving generated files to proto_gen directory...")
-        
-        temp_path = Path(self.temp_dir)
-        proto_gen_dir = temp_path / "proto_gen"
-        
-        # Create proto_gen directory
-        proto_gen_dir.mkdir(exist_ok=True)
-        
-        # Create __init__.py for proto_gen
-        (proto_gen_dir / "__init__.py").touch()
-        
-        # Move all generated directories and files to proto_gen
-        for item in temp_path.iterdir():
-            if item.name == 'proto_gen':
-                continue  # Skip the proto_gen directory itself
-                
-            target_path = proto_gen_dir / item.name
-            
-            try:
-                if target_path.exists():
-                    # If target exists, remove it first
-                    import shutil
-                    if target_path.is_dir():
-                        shutil.rmtree(target_path)
-                    else:
-                        target_path.unlink()
-                
-                # Move the item
-                item.rename(target_path)
-                logger.debug(f"📁 Moved {item.name} to proto_gen/{item.name}")
-                
-            except Exception as e:
-                logger.warning(f"⚠️  Failed to move {item.name}: {e}")
-        
-        # Update all Python import statements in the generated files
-        for py_file in proto_gen_dir.rglob("*.py"):
-            if py_file.name != "__init__.py":
-                self._update_imports_in_file(py_file)
-        
-        logger.debug("✅ Directory restructuring completed")
+        logger.info(f"✅ Proto compilation completed successfully ({len(self.compiler.files)} files)")
+        return True
     
     def list_available_services(self) -> Dict[str, List[str]]:
         """List all available services and their methods from parsed service definitions"""
@@ -251,113 +142,30 @@ class GrpcProtoLoader:
         return services
     
     def get_message_class(self, service_name: str, message_name: str):
-        """Get a message class from the compiled modules"""
+        """Get a message class declared in a service's proto file or in the files it imports"""
         logger.debug(f"📝 Getting message class: {service_name}.{message_name}")
         
         if service_name not in self.compiled_modules:
             logger.error(f"❌ Service not found: {service_name}")
             return None
         
-        pb2_module = self.compiled_modules[service_name].get('pb2')
-        if not pb2_module:
-            logger.error(f"❌ pb2 module not found for {service_name}")
-            return None
-        
-        # Try direct access first
-        if hasattr(pb2_module, message_name):
-            logger.debug(f"✅ Found message class directly: {message_name}")
-            return getattr(pb2_module, message_name)
-        
-        # Search all imported modules that contain pb2 in their name
-        pb2_modules = [attr for attr in dir(pb2_module) if not attr.startswith('_') and 'pb2' in attr]
-        logger.debug(f"🔍 Searching {len(pb2_modules)} pb2 modules for {message_name}")
-        
-        for attr_name in pb2_modules:
-            try:
-                imported_module = getattr(pb2_module, attr_name)
-                
-                if hasattr(imported_module, message_name):
-                    logger.debug(f"✅ Found message class in imported module {attr_name}: {message_name}")
-                    return getattr(imported_module, message_name)
-                    
-            except Exception as e:
-                logger.debug(f"🔍 Error accessing module {attr_name}: {e}")
+        # Breadth-first through the imports, as the generated module's imported _pb2 modules were searched
+        pending = [self.compiled_modules[service_name]['descriptor']]
+        seen = set()
+        while pending:
+            file_descriptor = pending.pop(0)
+            if file_descriptor.name in seen:
                 continue
+            seen.add(file_descriptor.name)
+            descriptor = file_descriptor.message_types_by_name.get(message_name)
+            if descriptor is not None:
+                logger.debug(f"✅ Found message class in {file_descriptor.name}: {message_name}")
+                return message_factory.GetMessageClass(descriptor)
+            pending.extend(file_descriptor.dependencies)
         
         logger.error(f"❌ Message class not found: {message_name}")
-        logger.debug(f"Available pb2 modules: {pb2_modules}")
-
         return None
     
-    def _create_utilities_module(self):
-        """Create missing _utilities.py module for gRPC version checking"""
-        logger.debug("🔧 Creating _utilities.py module...")
-        
-        proto_gen_dir = Path(self.temp_dir) / "proto_gen"
-        if proto_gen_dir.exists():
-            utilities_file = proto_gen_dir / "_utilities.py"
-            
-            utilities_code = '''# Generated utilities for gRPC version checking
-def first_version_is_lower(version1, version2):
-    """Compare two version strings to check if version1 < version2"""
-    try:
-        from packaging import version
-        return version.parse(version1) < version.parse(version2)
-    except ImportError:
-        # Fallback to simple string comparison if packaging is not available
-        v1_parts = [int(x) for x in version1.split('.')]
-        v2_parts = [int(x) for x in version2.split('.')]
-        
-        # Pad with zeros to make same length
-        max_len = max(len(v1_parts), len(v2_parts))
-        v1_parts.extend([0] * (max_len - len(v1_parts)))
-        v2_parts.extend([0] * (max_len - len(v2_parts)))
-        
-        return v1_parts < v2_parts
-'''
-            
-            with open(utilities_file, 'w') as f:
-                f.write(utilities_code)
-            
-            logger.debug(f"📝 Created utilities module: {utilities_file}")
-        
-        logger.debug("✅ Utilities module created")
-    
-    def _update_imports_in_file(self, py_file: Path):
-        """Update import statements in generated Python files"""
-        try:
-            with open(py_file, 'r') as f:
-                content = f.read()
-            
-            # Replace imports to add proto_gen prefix for all relevant imports
-            updated_content = content
-            
-            # Replace imports from 'grpc.' to 'proto_gen.'
-            updated_content = updated_content.replace('from grpc.', 'from proto_gen.')
-            updated_content = updated_content.replace('import grpc.', 'import proto_gen.')
-            
-            # Replace imports from 'eadp.' to 'proto_gen.eadp.'
-            updated_content = updated_content.replace('from eadp.', 'from proto_gen.eadp.')
-            updated_content = updated_content.replace('import eadp.', 'import proto_gen.eadp.')
-            
-            # Replace imports from 'common.' to 'proto_gen.common.'
-            updated_content = updated_content.replace('from common.', 'from proto_gen.common.')
-            updated_content = updated_content.replace('import common.', 'import proto_gen.common.')
-            
-            # Replace imports from 'events.' to 'proto_gen.events.'
-            updated_content = updated_content.replace('from events.', 'from proto_gen.events.')
-            updated_content = updated_content.replace('import events.', 'import proto_gen.events.')
-            
-            if content != updated_content:
-                with open(py_file, 'w') as f:
-                    f.write(updated_content)
-                logger.debug(f"📝 Updated imports in {py_file.name}")
-                
-        except Exception as e:
-            logger.warning(f"⚠️  Failed to update imports in {py_file}: {e}")
-        
-        logger.debug("✅ Imports updated")
-    
     def load_service_modules(self, environment_config: dict = None) -> bool:
         """Load gRPC service modules based on environment configuration"""
         try:
@@ -365,7 +173,7 @@ def first_version_is_lower(version1, version2):
             self.compiled_modules.clear()
             self.service_definitions.clear()
             
-            if not self.temp_dir or not Path(self.temp_dir).exists():
+            if not self.compiler.compiled:
                 logger.error("❌ Proto files not compiled yet - call compile_proto_files() first")
                 return False
             
@@ -487,123 +295,29 @@ def first_version_is_lower(version1, version2):
             return None
     
     def _load_service_modules_for_service(self, service_name: str, service_proto_path: str) -> bool:
-        """Load compiled modules for a specific service"""
-        try:
-            logger.debug(f"📦 Loading modules for service: {service_name}")
-            
-            # Convert proto path to module path
-            # e.g., eadp/cadie/ingressserver/v1/ingress_service.proto -> proto_gen.eadp.cadie.ingressserver.v1.ingress_service_pb2
-            proto_path_parts = Path(service_proto_path).with_suffix('').parts
-            module_base = 'proto_gen.' + '.'.join(proto_path_parts)
-            
-            pb2_module_name = f"{module_base}_pb2"
-            grpc_module_name = f"{module_base}_pb2_grpc"
-            
-            logger.debug(f"🔍 Attempting to load: {pb2_module_name} and {grpc_module_name}")
-            
-            # Try to import the modules
-            pb2_module = self._import_module(pb2_module_name)
-            grpc_module = self._import_module(grpc_module_name)
-            
-            if pb2_module and grpc_module:
-                self.compiled_modules[service_name] = {
-                    'pb2': pb2_module,
-                    'grpc': grpc_module
-                }
-                logger.info(f"✅ Successfully loaded modules for {service_name}")
-                return True
-            else:
-                logger.error(f"❌ Failed to load one or both modules for {service_name}")
-                # Try fallback paths for backward compatibility
-                return self._try_fallback_module_loading(service_name)
-                
-        except Exception as e:
-            logger.error(f"❌ Error loading modules for {service_name}: {str(e)}")
-            return False
-    
-    def _try_fallback_module_loading(self, service_name: str) -> bool:
-        """Try fallback module loading with known service module mappings"""
-        logger.debug(f"🔄 Attempting fallback loading for {service_name}")
+        """Build message and stub classes for a service from the shared descriptor pool"""
+        logger.debug(f"📦 Loading modules for service: {service_name}")
         
-        # Known module mappings for the new structure
-        service_module_mappings = {
-            'ingress_server': {
-                'pb2': 'proto_gen.eadp.cadie.ingressserver.v1.ingress_service_pb2',
-                'grpc': 'proto_gen.eadp.cadie.ingressserver.v1.ingress_service_pb2_grpc'
-            },
-            'asset_storage': {
-                'pb2': 'proto_gen.eadp.cadie.shared.storageinterface.v1.storage_service_admin_pb2',
-                'grpc': 'proto_gen.eadp.cadie.shared.storageinterface.v1.storage_service_admin_pb2_grpc'
-            }
-        }
-        
-        if service_name not in service_module_mappings:
-            logger.warning(f"⚠️  No fallback mapping for service: {service_name}")
+        file_descriptor = self.compiler.get_file(service_proto_path)
+        if file_descriptor is None:
+            logger.error(f"❌ {service_proto_path} is not part of the compiled proto tree")
             return False
         
-        mapping = service_module_mappings[service_name]
-        
-        try:
-            # Try to load the mapped modules
-            pb2_module = self._import_module(mapping['pb2'])
-            grpc_module = self._import_module(mapping['grpc'])
-            
-            if pb2_module and grpc_module:
-                self.compiled_modules[service_name] = {
-                    'pb2': pb2_module,
-                    'grpc': grpc_module
-                }
-                logger.info(f"✅ Fallback loading successful for {service_name}")
-                return True
-            else:
-                logger.error(f"❌ Failed to load fallback modules for {service_name}")
-                return False
-                
-        except Exception as e:
-            logger.error(f"❌ Fallback loading failed for {service_name}: {str(e)}")
-            return False
-    def _import_module(self, module_name: str) -> Optional[Any]:
-        """Import a compiled module with simplified import handling"""
-        try:
-            logger.debug(f"📦 Importing module: {module_name}")
-            
-            # Simply try to import the module directly since temp_dir is in sys.path
-            import importlib
-            module = importlib.import_module(module_name)
-            logger.debug(f"✅ Successfully imported: {module_name}")
-            return module
-            
-        except Exception as e:
-            logger.error(f"❌ Failed to import {module_name}: {str(e)}")
-            logger.error(f"🔴 Error type: {type(e).__name__}")
-            import traceback
-            logger.error(f"🔴 Traceback: {traceback.format_exc()}")
-            return None
-    
-    def _debug_temp_directory(self):
-        """Debug what's in the temp directory"""
-        logger.info(f"🔍 Debugging temp directory: {self.temp_dir}")
-        if self.temp_dir and Path(self.temp_dir).exists():
-            for root, dirs, files in os.walk(self.temp_dir):
-                level = root.replace(self.temp_dir, '').count(os.sep)
-                indent = ' ' * 2 * level
-                logger.info(f"{indent}{os.path.basename(root)}/")
-                subindent = ' ' * 2 * (level + 1)
-                for file in files:
-                    logger.info(f"{subindent}{file}")
-        
-        # Also check what's in sys.path
-        logger.info(f"🔍 Python path includes temp dir: {self.temp_dir in sys.path}")
-        
-        # Try to list what's importable
-        try:
-            import pkgutil
-            logger.info("🔍 Available packages:")
-            for importer, modname, ispkg in pkgutil.iter_modules():
-                if 'grpc' in modname.lower():
-                    logger.info(f"  {modname} (package: {ispkg})")
-        except Exception as e:
-            logger.error(f"Failed to list packages: {e}")
+        # Module-like namespaces in place of the generated _pb2 and _pb2_grpc modules
+        pb2_module = types.ModuleType(f"{file_descriptor.package}.messages")
+        for name, descriptor in file_descriptor.message_types_by_name.items():
+            setattr(pb2_module, name, message_factory.GetMessageClass(descriptor))
+        grpc_module = types.ModuleType(f"{file_descriptor.package}.stubs")
+        for name, descriptor in file_descriptor.services_by_name.items():
+            setattr(grpc_module, f"{name}Stub", _stub_class(descriptor))
+        
+        self.compiled_modules[service_name] = {
+            'pb2': pb2_module,
+            'grpc': grpc_module,
+            'descriptor': file_descriptor
+        }
+        logger.info(f"✅ Successfully loaded modules for {service_name}")
+        return True
     
     def create_service_stub(self, service_name: str, channel: grpc.Channel) -> Optional[Any]:
         """Create a gRPC service stub"""
@@ -643,20 +357,12 @@ def first_version_is_lower(version1, version2):
 
     
     def cleanup(self):
-        """Cleanup temporary files and modules"""
+        """Forget the loaded services and stubs"""
         logger.info("🧹 Cleaning up proto loader...")
         
-        # Remove temp directory from path
-        if self.temp_dir and self.temp_dir in sys.path:
-            sys.path.remove(self.temp_dir)
-        
-        # Clear compiled modules
         self.compiled_modules.clear()
         self.service_stubs.clear()
         
-        # Note: We don't delete the temp directory here as it might still be needed
-        # The OS will clean it up eventually
-        
         logger.info("✅ Proto loader cleanup completed")
     
     def get_proto_status(self) -> Dict[str, Any]:
@@ -667,6 +373,6 @@ def first_version_is_lower(version1, version2):
             'proto_files_present': validation,
             'compiled_modules': list(self.compiled_modules.keys()),
             'service_stubs': list(self.service_stubs.keys()),
-            'temp_directory': self.temp_dir,
+            'compile_seconds': self.compiler.compile_seconds,
             'proto_directory': str(self.proto_dir)
         }
\ No newline at end of file
@@ -0,0 +1,137 @@
+"""
+Single-writer ingest for the TraceGraphBuilder
+
+The Kafka consumer hands its batches to an IngestWriter instead of
+applying them itself. One writer thread applies them in arrival order,
+merging whatever queued up while it was busy into one call to
+add_messages, so the builder lock is taken once per merged batch rather
+than once per consumer batch. The queue is bounded: when the writer falls
+behind, submit() blocks the consumer thread, which stops polling Kafka
+instead of buffering without limit.
+"""
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from src.models import KafkaMessage
+
+logger = logging.getLogger(__name__)
+
+
+class IngestWriter:
+    """Applies consumed message batches to a TraceGraphBuilder from one thread"""
+
+    def __init__(self, get_builder: Callable[[], Any], max_pending: int = 64, max_batch_messages: int = 5000):
+        self.get_builder = get_builder  # The current TraceGraphBuilder
+        self.max_batch_messages = max_batch_messages
+        # (generation, messages), a flush() event, or None to stop
+        self.pending: queue.Queue = queue.Queue(maxsize=max_pending)
+        self._thread: Optional[threading.Thread] = None
+        self._generation = 0  # Batches submitted before discard_pending() are skipped
+        self.batches_submitted = 0
+        self.batches_applied = 0
+        self.messages_applied = 0
+        self.apply_seconds = 0.0
+        self.max_apply_seconds = 0.0
+        self.submit_wait_seconds = 0.0
+
+    def configure(self, settings: Dict[str, Any]):
+        """Apply the `ingest` block of settings.yaml before start()"""
+        self.max_batch_messages = int(settings.get('max_merged_messages', self.max_batch_messages))
+        queue_batches = int(settings.get('queue_batches', self.pending.maxsize))
+        if queue_batches != self.pending.maxsize and self._thread is None:
+            self.pending = queue.Queue(maxsize=queue_batches)
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="ingest-writer", daemon=True)
+            self._thread.start()
+            logger.info(f"✍️ Ingest writer started (queue of {self.pending.maxsize} batches)")
+
+    def stop(self, timeout: float = 5.0):
+        """Apply what is already queued, then stop the writer thread"""
+        if self._thread is None:
+            return
+        self.pending.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def submit(self, messages: List[KafkaMessage]):
+        """Queue a batch for the writer, blocking while the queue is full; used as a consumer batch handler"""
+        if not messages:
+            return
+        started = time.perf_counter()
+        self.pending.put((self._generation, messages))
+        self.submit_wait_seconds += time.perf_counter() - started
+        self.batches_submitted += 1
+
+    def discard_pending(self):
+        """Skip the batches queued so far, e.g. those of an environment being switched away from"""
+        self._generation += 1
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every batch submitted so far has been applied"""
+        done = threading.Event()
+        self.pending.put(done)
+        return done.wait(timeout)
+
+    def _run(self):
+        while True:
+            item = self.pending.get()
+            if item is None:
+                return
+            if isinstance(item, threading.Event):
+                item.set()
+                continue
+            # Merge the batches that queued up behind this one
+            batch = self._current(item)
+            waiting = []
+            while len(batch) < self.max_batch_messages:
+                try:
+                    item = self.pending.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None or isinstance(item, threading.Event):
+                    waiting.append(item)
+                    break
+                batch.extend(self._current(item))
+            self._apply(batch)
+            for item in waiting:
+                if item is None:
+                    return
+                item.set()
+
+    def _current(self, item) -> List[KafkaMessage]:
+        generation, messages = item
+        return list(messages) if generation == self._generation else []
+
+    def _apply(self, batch: List[KafkaMessage]):
+        builder = self.get_builder()
+        if not batch or builder is None:
+            return
+        started = time.perf_counter()
+        try:
+            builder.add_messages(batch)
+        except Exception as e:
+            logger.error(f"❌ Ingest writer failed to apply {len(batch)} messages: {e}")
+            return
+        elapsed = time.perf_counter() - started
+        self.batches_applied += 1
+        self.messages_applied += len(batch)
+        self.apply_seconds += elapsed
+        self.max_apply_seconds = max(self.max_apply_seconds, elapsed)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'running': self._thread is not None and self._thread.is_alive(),
+            'queued_batches': self.pending.qsize(),
+            'queue_limit': self.pending.maxsize,
+            'batches_submitted': self.batches_submitted,
+            'batches_applied': self.batches_applied,
+            'messages_applied': self.messages_applied,
+            'avg_apply_ms': round(self.apply_seconds / self.batches_applied * 1000, 3) if self.batches_applied else 0.0,
+            'max_apply_ms': round(self.max_apply_seconds * 1000, 3),
+            'submit_wait_seconds': round(self.submit_wait_seconds, 3)
+        }
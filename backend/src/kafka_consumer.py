@@ -7,7 +7,8 @@ import random
 import time
 import traceback
 import os
-from typing import Dict, List, Callable, Optional
+from functools import partial
+from typing import Any, Dict, List, Callable, Optional, Set
 from confluent_kafka import Consumer, KafkaError, KafkaException
 import yaml
 from datetime import datetime
@@ -21,7 +22,7 @@ logger = logging.getLogger(__name__)
 class KafkaConsumerService:
     """Kafka consumer with SASL/SCRAM authentication and mock support"""
 
-    def __init__(self, config_path: str, decoder: ProtobufDecoder, trace_header_field: str):
+    def __init__(self, config_path: str, decoder: ProtobufDecoder, trace_header_field: str, settings: dict = None):
         logger.info(f"🔄 Initializing KafkaConsumerService")
         logger.info(f"📄 Config path: {config_path}")
         logger.info(f"🎯 Trace header field: {trace_header_field}")
@@ -30,11 +31,8 @@ class KafkaConsumerService:
         self.config_path = config_path
         self.decoder = decoder
         self.trace_header_field = trace_header_field
-        self.consumer = None
-        self.running = False
-        self.mock_mode = False
-        self.message_handlers: List[Callable[[KafkaMessage], None]] = []
-        self.subscribed_topics = []
+        self.restore_state()
+        self.configure_processing(settings)
         self._load_config()
         
         logger.info(f"✅ KafkaConsumerService initialized successfully")
@@ -95,10 +93,173 @@ class KafkaConsumerService:
             logger.error(f"🔴 Traceback: {traceback.format_exc()}")
             raise
 
+    def restore_state(self, monitored_topics: Optional[List[str]] = None,
+                      offset_checkpoints: Optional[Callable[[], Dict[tuple, int]]] = None):
+        """
+        Reset the runtime state: no Kafka consumer, handlers or subscription
+        
+        Optionally restores the monitored topics and the offset checkpoints the
+        consumer resumes from, as set_monitored_topics/set_offset_checkpoints would.
+        """
+        self.consumer = None
+        self.running = False
+        self.mock_mode = False
+        self.message_handlers: List[Callable[[KafkaMessage], None]] = []
+        self.batch_handlers: List[Callable[[List[KafkaMessage]], None]] = []
+        self.subscribed_topics = []
+        self.monitored_topics: Optional[Set[str]] = set(monitored_topics) if monitored_topics is not None else None  # None means every subscribed topic
+        self._pause_state_dirty = monitored_topics is not None
+        self.offset_checkpoints = offset_checkpoints
+
+    def configure_processing(self, settings: dict = None):
+        """Read the message_processing section of settings.yaml and reset throughput counters"""
+        self.settings = settings or {}
+        # Projected topics must still decode the trace id field
+        if hasattr(self.decoder, 'require_fields'):
+            self.decoder.require_fields(self.trace_header_field)
+        processing = self.settings.get('message_processing', {}) or {}
+
+        self.batch_mode = bool(processing.get('batch_consume', False))
+        self.batch_size = max(1, int(processing.get('batch_size', 100)))
+        self.batch_timeout = float(processing.get('processing_timeout', 1.0))
+        self.decode_workers = int(processing.get('decode_workers', 0) or 0)
+        # Lazy decoding needs a decoder that can pull the trace field out of raw bytes
+        self.lazy_decode = bool(processing.get('lazy_decode', False)) and hasattr(self.decoder, 'extract_field')
+        self.decode_pool = None
+        # Per-topic lazy decoders, shared by every message of the topic
+        self._lazy_decoders: Dict[str, Callable[[bytes], Dict[str, Any]]] = {}
+
+        self.metrics = {
+            'messages_consumed': 0,
+            'messages_processed': 0,
+            'messages_failed': 0,
+            'messages_filtered': 0,
+            'batches': 0,
+            'last_batch_size': 0,
+            'last_batch_seconds': 0.0,
+            'processing_seconds': 0.0,
+            'started_at': None
+        }
+
+        logger.info(f"📦 Batch mode: {self.batch_mode} (batch_size={self.batch_size}, timeout={self.batch_timeout}s, decode_workers={self.decode_workers}, lazy_decode={self.lazy_decode})")
+
     def add_message_handler(self, handler: Callable[[KafkaMessage], None]):
         """Add a message handler callback"""
         self.message_handlers.append(handler)
 
+    def add_batch_handler(self, handler: Callable[[List[KafkaMessage]], None]):
+        """Add a handler that receives every processed batch as a list of messages"""
+        self.batch_handlers.append(handler)
+
+    def set_offset_checkpoints(self, checkpoints: Optional[Callable[[], Dict[tuple, int]]]):
+        """Resume assigned partitions from checkpointed offsets ((topic, partition) -> next offset)"""
+        self.offset_checkpoints = checkpoints
+
+    def _dispatch_batch(self, batch: List[KafkaMessage]):
+        """Hand a batch of processed messages to all registered handlers"""
+        if not batch:
+            return
+
+        for handler in self.batch_handlers:
+            try:
+                handler(batch)
+            except Exception as e:
+                logger.error(f"Error in batch handler: {e}")
+
+        for handler in self.message_handlers:
+            for kafka_msg in batch:
+                try:
+                    handler(kafka_msg)
+                except Exception as e:
+                    logger.error(f"Error in message handler: {e}")
+
+    def _record_batch(self, consumed: int, processed: int, elapsed: float):
+        """Update throughput counters after a batch has been handled"""
+        metrics = self.metrics
+        metrics['messages_consumed'] += consumed
+        metrics['messages_processed'] += processed
+        metrics['messages_failed'] += consumed - processed
+        metrics['batches'] += 1
+        metrics['last_batch_size'] = consumed
+        metrics['last_batch_seconds'] = elapsed
+        metrics['processing_seconds'] += elapsed
+
+    def get_throughput_stats(self) -> Dict[str, Any]:
+        """Get ingest throughput counters"""
+        metrics = dict(self.metrics)
+        started_at = metrics.pop('started_at')
+        uptime = time.time() - started_at if started_at else 0.0
+
+        return {
+            'batch_mode': self.batch_mode,
+            'batch_size': self.batch_size,
+            'batch_timeout': self.batch_timeout,
+            'decode_workers': self.decode_pool.workers if self.decode_pool else 0,
+            'lazy_decode': self.lazy_decode,
+            **metrics,
+            'uptime_seconds': round(uptime, 3),
+            'messages_per_second': round(metrics['messages_processed'] / uptime, 2) if uptime > 0 else 0.0,
+            'processing_rate': round(metrics['messages_processed'] / metrics['processing_seconds'], 2) if metrics['processing_seconds'] > 0 else 0.0,
+            'avg_batch_size': round(metrics['messages_consumed'] / metrics['batches'], 2) if metrics['batches'] else 0.0
+        }
+
+    def set_monitored_topics(self, topics: Optional[List[str]]):
+        """
+        Restrict ingest to the given topics without restarting the consumer
+        
+        Partitions of other topics are paused by the consumer thread on its next
+        loop, and any of their messages already fetched are skipped before decoding.
+        Passing None monitors every subscribed topic again.
+        """
+        self.monitored_topics = set(topics) if topics is not None else None
+        self._pause_state_dirty = True
+        logger.info(f"🎯 Consumer monitoring topics: {'all' if topics is None else sorted(self.monitored_topics)}")
+
+    def _is_monitored(self, topic: str) -> bool:
+        """Whether messages from this topic should be processed"""
+        monitored = self.monitored_topics
+        return monitored is None or topic in monitored
+
+    def _on_assign(self, consumer, partitions):
+        """Rebalance callback: resume from checkpointed offsets and reapply the pause state"""
+        self._pause_state_dirty = True
+        if self.offset_checkpoints is None:
+            return
+
+        try:
+            checkpoints = self.offset_checkpoints()
+            resumed = 0
+            for tp in partitions:
+                offset = checkpoints.get((tp.topic, tp.partition))
+                if offset is not None:
+                    tp.offset = offset
+                    resumed += 1
+            if resumed:
+                consumer.assign(partitions)
+                logger.info(f"⏩ Resuming {resumed} of {len(partitions)} assigned partitions from checkpointed offsets")
+        except Exception as e:
+            logger.warning(f"⚠️  Could not apply checkpointed offsets: {e}")
+
+    def _apply_partition_pauses(self):
+        """Pause partitions of unmonitored topics and resume monitored ones (consumer thread only)"""
+        self._pause_state_dirty = False
+        try:
+            assignment = self.consumer.assignment()
+            if not assignment:
+                return
+
+            to_pause = [tp for tp in assignment if not self._is_monitored(tp.topic)]
+            to_resume = [tp for tp in assignment if self._is_monitored(tp.topic)]
+
+            if to_pause:
+                self.consumer.pause(to_pause)
+            if to_resume:
+                self.consumer.resume(to_resume)
+
+            logger.info(f"⏸️  Paused {len(to_pause)} partitions, {len(to_resume)} active")
+        except Exception as e:
+            logger.warning(f"⚠️  Could not update paused partitions: {e}")
+
     def subscribe_to_topics(self, topics: List[str]):
         """Subscribe to specified topics with graceful handling of missing topics"""
         self.subscribed_topics = topics
@@ -109,7 +270,7 @@ class KafkaConsumerService:
                 self.consumer = Consumer(self.kafka_config)
                 
                 # Try to subscribe to all topics first
-                self.consumer.subscribe(topics)
+                self.consumer.subscribe(topics, on_assign=self._on_assign)
                 logger.info(f"✅ Successfully subscribed to topics: {topics}")
                 
                 # Verify topics exist by getting metadata (with timeout)
@@ -127,7 +288,7 @@ class KafkaConsumerService:
                         
                         if valid_topics:
                             # Re-subscribe to only valid topics
-                            self.consumer.subscribe(valid_topics)
+                            self.consumer.subscribe(valid_topics, on_assign=self._on_assign)
                             self.subscribed_topics = valid_topics
                             logger.info(f"✅ Re-subscribed to existing topics only: {valid_topics}")
                         else:
@@ -166,7 +327,7 @@ class KafkaConsumerService:
             if newly_available:
                 # Add newly available topics to subscription
                 updated_topics = self.subscribed_topics + newly_available
-                self.consumer.subscribe(updated_topics)
+                self.consumer.subscribe(updated_topics, on_assign=self._on_assign)
                 self.subscribed_topics = updated_topics
                 logger.info(f"✅ Added newly available topics: {newly_available}")
                 logger.info(f"📡 Now subscribed to: {updated_topics}")
@@ -180,14 +341,16 @@ class KafkaConsumerService:
             return {
                 'mode': 'mock',
                 'subscribed_topics': self.subscribed_topics,
-                'status': 'All topics available in mock mode'
+                'status': 'All topics available in mock mode',
+                'throughput': self.get_throughput_stats()
             }
             
         if not self.consumer:
             return {
                 'mode': 'real',
                 'subscribed_topics': [],
-                'status': 'Consumer not initialized'
+                'status': 'Consumer not initialized',
+                'throughput': self.get_throughput_stats()
             }
             
         try:
@@ -199,18 +362,21 @@ class KafkaConsumerService:
                 'subscribed_topics': self.subscribed_topics,
                 'existing_topics': list(existing_topics),
                 'missing_topics': [topic for topic in getattr(self, '_original_topics', self.subscribed_topics) if topic not in existing_topics],
-                'status': f'Subscribed to {len(self.subscribed_topics)} topics'
+                'status': f'Subscribed to {len(self.subscribed_topics)} topics',
+                'throughput': self.get_throughput_stats()
             }
         except Exception as e:
             return {
                 'mode': 'real',
                 'subscribed_topics': self.subscribed_topics,
-                'status': f'Error getting topic info: {e}'
+                'status': f'Error getting topic info: {e}',
+                'throughput': self.get_throughput_stats()
             }
 
     def start_consuming(self):
         """Start consuming messages"""
         self.running = True
+        self.metrics['started_at'] = time.time()
         logger.info("Starting message consumption...")
 
         if self.mock_mode:
@@ -223,12 +389,19 @@ class KafkaConsumerService:
         if not self.consumer:
             raise RuntimeError("Consumer not initialized. Call subscribe_to_topics first.")
 
+        if self.batch_mode:
+            self._start_batch_consuming()
+            return
+
         # Topic refresh counter
         poll_count = 0
         topic_refresh_interval = 300  # Refresh every 5 minutes (300 polls of 1 second each)
 
         try:
             while self.running:
+                if self._pause_state_dirty:
+                    self._apply_partition_pauses()
+
                 msg = self.consumer.poll(timeout=1.0)
 
                 if msg is None:
@@ -240,31 +413,22 @@ class KafkaConsumerService:
                     continue
 
                 if msg.error():
-                    error_code = msg.error().code()
-                    error_msg = str(msg.error())
-                    
-                    if error_code == KafkaError._PARTITION_EOF:
-                        logger.debug(f"Reached end of partition {msg.topic()}[{msg.partition()}]")
-                    elif error_code == KafkaError.UNKNOWN_TOPIC_OR_PART:
-                        # Handle unknown topic or partition error gracefully
-                        logger.warning(f"⚠️  Topic/partition not available: {error_msg}")
-                        logger.info("💡 This is expected when topics are configured but not yet created on the broker")
-                        # Don't log this as an error repeatedly - it's handled gracefully
-                    elif "Unknown topic" in error_msg or "topic not available" in error_msg.lower():
-                        # Handle various forms of topic not found errors
-                        logger.warning(f"⚠️  Topic availability issue: {error_msg}")
-                        logger.info("💡 Continuing consumption - this topic may be created later")
-                    else:
-                        logger.error(f"❌ Consumer error: {error_msg}")
+                    self._log_consumer_error(msg)
+                    continue
+
+                # Skip fetched messages of topics that were just unmonitored
+                if not self._is_monitored(msg.topic()):
+                    self.metrics['messages_filtered'] += 1
                     continue
 
                 # Process message
                 try:
+                    started = time.perf_counter()
                     kafka_msg = self._process_message(msg)
                     if kafka_msg:
                         # Call all registered handlers
-                        for handler in self.message_handlers:
-                            handler(kafka_msg)
+                        self._dispatch_batch([kafka_msg])
+                    self._record_batch(1, 1 if kafka_msg else 0, time.perf_counter() - started)
 
                 except Exception as e:
                     logger.error(f"Error processing message: {e}")
@@ -274,6 +438,115 @@ class KafkaConsumerService:
         finally:
             self.stop_consuming()
 
+    def _start_batch_consuming(self):
+        """Consume from real Kafka in batches using Consumer.consume()"""
+        topic_refresh_interval = 300  # Seconds between checks for newly created topics
+        last_refresh = time.monotonic()
+
+        logger.info(f"📦 Consuming in batches of up to {self.batch_size} messages ({self.batch_timeout}s budget)")
+        self._start_decode_pool()
+
+        try:
+            while self.running:
+                if self._pause_state_dirty:
+                    self._apply_partition_pauses()
+
+                msgs = self.consumer.consume(num_messages=self.batch_size, timeout=self.batch_timeout)
+
+                if time.monotonic() - last_refresh >= topic_refresh_interval:
+                    self.refresh_topic_subscription()
+                    last_refresh = time.monotonic()
+
+                if not msgs:
+                    continue
+
+                started = time.perf_counter()
+                valid_msgs = []
+                for msg in msgs:
+                    if msg.error():
+                        self._log_consumer_error(msg)
+                        continue
+                    if not self._is_monitored(msg.topic()):
+                        self.metrics['messages_filtered'] += 1
+                        continue
+                    valid_msgs.append(msg)
+
+                consumed = len(valid_msgs)
+                batch = self._process_batch(valid_msgs)
+
+                try:
+                    self._dispatch_batch(batch)
+                except Exception as e:
+                    logger.error(f"Error processing batch: {e}")
+
+                self._record_batch(consumed, len(batch), time.perf_counter() - started)
+
+        except KeyboardInterrupt:
+            logger.info("Consumer interrupted")
+        finally:
+            self.stop_consuming()
+
+    def _start_decode_pool(self):
+        """Start the process-pool decode stage when decode_workers is configured"""
+        if self.decode_workers <= 0 or self.lazy_decode or self.decode_pool is not None:
+            return
+        if not getattr(self.decoder, 'topic_configs', None):
+            logger.info("ℹ️ Decoder has no loaded protobuf topics, decoding in the consumer thread")
+            return
+
+        try:
+            from src.decode_pool import ProtobufDecodePool
+            self.decode_pool = ProtobufDecodePool(self.decoder, self.decode_workers)
+        except Exception as e:
+            logger.warning(f"⚠️  Could not start decode pool, decoding in the consumer thread: {e}")
+            self.decode_pool = None
+
+    def _process_batch(self, msgs) -> List[KafkaMessage]:
+        """Process a batch of Kafka messages, decoding on the process pool when available"""
+        decoded_values = [None] * len(msgs)
+
+        if self.decode_pool is not None:
+            pooled = [i for i, msg in enumerate(msgs) if msg.topic() in self.decode_pool.topics]
+            if pooled:
+                try:
+                    results = self.decode_pool.decode_batch(
+                        [(msgs[i].topic(), msgs[i].partition(), msgs[i].value()) for i in pooled]
+                    )
+                    for i, (success, value) in zip(pooled, results):
+                        if success:
+                            decoded_values[i] = value
+                        else:
+                            # Decoding failed in the worker; the retry below logs the error
+                            logger.debug(f"Pool decode failed for {msgs[i].topic()}[{msgs[i].partition()}]:{msgs[i].offset()}: {value}")
+                except Exception as e:
+                    logger.error(f"❌ Decode pool failed, decoding batch in the consumer thread: {e}")
+
+        batch = []
+        for msg, decoded_value in zip(msgs, decoded_values):
+            kafka_msg = self._process_message(msg, decoded_value)
+            if kafka_msg:
+                batch.append(kafka_msg)
+        return batch
+
+    def _log_consumer_error(self, msg):
+        """Log a consumer error returned in place of a message"""
+        error_code = msg.error().code()
+        error_msg = str(msg.error())
+
+        if error_code == KafkaError._PARTITION_EOF:
+            logger.debug(f"Reached end of partition {msg.topic()}[{msg.partition()}]")
+        elif error_code == KafkaError.UNKNOWN_TOPIC_OR_PART:
+            # Handle unknown topic or partition error gracefully
+            logger.warning(f"⚠️  Topic/partition not available: {error_msg}")
+            logger.info("💡 This is expected when topics are configured but not yet created on the broker")
+            # Don't log this as an error repeatedly - it's handled gracefully
+        elif "Unknown topic" in error_msg or "topic not available" in error_msg.lower():
+            # Handle various forms of topic not found errors
+            logger.warning(f"⚠️  Topic availability issue: {error_msg}")
+            logger.info("💡 Continuing consumption - this topic may be created later")
+        else:
+            logger.error(f"❌ Consumer error: {error_msg}")
+
     def _start_mock_consuming(self):
         """Start consuming mock messages"""
         trace_counter = 1
@@ -281,22 +554,24 @@ class KafkaConsumerService:
         
         try:
             while self.running:
+                started = time.perf_counter()
+                batch = []
+
                 # Generate mock messages for each subscribed topic
                 for topic in self.subscribed_topics:
                     if not self.running:
                         break
+                    if not self._is_monitored(topic):
+                        continue
                         
                     # Create mock message
-                    kafka_msg = self._create_mock_message(topic, trace_counter, message_counter)
-                    
-                    # Call all registered handlers
-                    for handler in self.message_handlers:
-                        try:
-                            handler(kafka_msg)
-                        except Exception as e:
-                            logger.error(f"Error in message handler: {e}")
-                    
+                    batch.append(self._create_mock_message(topic, trace_counter, message_counter))
                     message_counter += 1
+
+                # Call all registered handlers
+                if batch:
+                    self._dispatch_batch(batch)
+                    self._record_batch(len(batch), len(batch), time.perf_counter() - started)
                     
                 # Increment trace occasionally
                 if random.random() < 0.3:  # 30% chance to start new trace
@@ -346,8 +621,8 @@ class KafkaConsumerService:
             trace_id=trace_id_value or current_trace_id
         )
 
-    def _process_message(self, msg) -> Optional[KafkaMessage]:
-        """Process a single Kafka message"""
+    def _process_message(self, msg, decoded_value: Optional[Dict[str, Any]] = None) -> Optional[KafkaMessage]:
+        """Process a single Kafka message, optionally with a payload already decoded by the pool"""
         try:
             # Extract headers
             headers = {}
@@ -355,14 +630,26 @@ class KafkaConsumerService:
                 headers = {k: v.decode('utf-8') if isinstance(v, bytes) else str(v)
                           for k, v in msg.headers()}
 
-            # Decode protobuf message
-            decoded_value = self.decoder.decode_message(msg.topic(), msg.value())
+            topic = msg.topic()
+            value = msg.value()
+
+            # Decode protobuf message, or defer it until the payload is needed
+            decode_fn = None
+            lazy = self.lazy_decode and decoded_value is None
+            if lazy:
+                decode_fn = self._lazy_decoders.get(topic)
+                if decode_fn is None:
+                    decode_fn = self._lazy_decoders[topic] = partial(self.decoder.decode_message, topic)
+            elif decoded_value is None:
+                decoded_value = self.decoder.decode_message(topic, value)
 
             # Extract trace ID from headers or decoded message
             raw_trace_id = None
             trace_id = None
             if self.trace_header_field in headers:
                 raw_trace_id = headers[self.trace_header_field]
+            elif lazy:
+                raw_trace_id = self.decoder.extract_field(topic, value, self.trace_header_field)
             elif self.trace_header_field in decoded_value:
                 raw_trace_id = decoded_value[self.trace_header_field]
             if raw_trace_id:
@@ -374,15 +661,17 @@ class KafkaConsumerService:
 
             # Create KafkaMessage object
             kafka_msg = KafkaMessage(
-                topic=msg.topic(),
+                topic=topic,
                 partition=msg.partition(),
                 offset=msg.offset(),
                 key=msg.key().decode('utf-8') if msg.key() else None,
                 timestamp=datetime.fromtimestamp(msg.timestamp()[1] / 1000.0),
                 headers=headers,
-                raw_value=msg.value(),
+                raw_value=value,
                 decoded_value=decoded_value,
-                trace_id=trace_id
+                trace_id=trace_id,
+                decode_fn=decode_fn,
+                full_decode_fn=self.decoder.full_decoder(topic) if hasattr(self.decoder, 'full_decoder') else None
             )
 
             logger.debug(f"Processed message: {kafka_msg.topic}[{kafka_msg.partition}]:{kafka_msg.offset}")
@@ -398,6 +687,9 @@ class KafkaConsumerService:
         if self.consumer:
             self.consumer.close()
             logger.info("Consumer stopped")
+        if self.decode_pool is not None:
+            self.decode_pool.shutdown()
+            self.decode_pool = None
 
     async def start_consuming_async(self):
         """Start consuming messages asynchronously"""
@@ -0,0 +1,265 @@
+"""
+Push-based live updates for WebSocket clients
+
+TraceGraphBuilder notes which topics and traces changed in a ChangeTracker
+as messages arrive. Every tick the LiveUpdatePublisher drains it and pushes
+one coalesced delta per subscribed channel, serialized once for all of its
+subscribers, so the work follows the rate of change rather than the number
+of clients.
+
+Clients send {"action": "subscribe" | "unsubscribe", "channels": [...]}.
+Channels are "graph" (the disconnected components of /graph/disconnected),
+"statistics" (the per-topic details of /statistics) and "trace:<trace_id>".
+Subscribing answers with a snapshot of each channel, after which only
+deltas follow; a topology change or a cleared builder sends snapshots again.
+Trace deltas carry the messages from `from_index` on, and clients skip any
+index they already hold.
+
+With a ConnectionManager, messages are queued per client under their
+channel; a channel that lost a queued delta to backpressure is resent as a
+snapshot on the next tick.
+"""
+import asyncio
+import json
+import logging
+import threading
+from typing import Any, Callable, Dict, Iterable, Optional, Set, Tuple
+
+from src.models import KafkaMessage
+
+logger = logging.getLogger(__name__)
+
+TRACE_CHANNEL_PREFIX = 'trace:'
+
+
+class ChangeTracker:
+    """Topics and traces changed since the last drain
+
+    Written by the thread ingesting messages and drained on the event loop.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._topics: Set[str] = set()
+        self._traces: Set[str] = set()
+
+    def message_added(self, message: KafkaMessage):
+        with self._lock:
+            self._topics.add(message.topic)
+            self._traces.add(message.trace_id)
+
+    def trace_changed(self, trace_id: str, topics: Iterable[str]):
+        """A whole trace was added or removed"""
+        with self._lock:
+            self._topics.update(topics)
+            self._traces.add(trace_id)
+
+    def drain(self) -> Tuple[Set[str], Set[str]]:
+        """Changed topics and trace ids, resetting both"""
+        with self._lock:
+            topics, traces = self._topics, self._traces
+            self._topics, self._traces = set(), set()
+        return topics, traces
+
+
+class LiveUpdatePublisher:
+    """Channel subscriptions of WebSocket clients and the periodic push of coalesced deltas"""
+
+    def __init__(self, get_builder: Callable[[], Any], interval: float = 1.0, connections=None):
+        self.get_builder = get_builder  # The current TraceGraphBuilder, which environment switches replace
+        self.interval = interval
+        self.connections = connections  # ConnectionManager queueing sends per client, or None to send directly
+        self.subscriptions: Dict[Any, Set[str]] = {}  # client -> channels
+        self._builder = None
+        self._topology_version = None
+        self._clear_generation = None
+        self._trace_sent: Dict[str, int] = {}  # trace id -> messages pushed to its channel so far
+        self.ticks = 0
+        self.messages_sent = 0
+        self.bytes_sent = 0
+
+    # ------------------------------------------------------------------
+    # Clients
+    # ------------------------------------------------------------------
+
+    def add_client(self, client):
+        self.subscriptions.setdefault(client, set())
+
+    def remove_client(self, client):
+        self.subscriptions.pop(client, None)
+
+    async def handle_message(self, client, text: str):
+        """Apply a subscribe or unsubscribe request from a client"""
+        try:
+            request = json.loads(text)
+            action, channels = request.get('action'), request.get('channels', [])
+            if action not in ('subscribe', 'unsubscribe') or not isinstance(channels, list):
+                raise ValueError("expected {\"action\": \"subscribe\" | \"unsubscribe\", \"channels\": [...]}")
+            for channel in channels:
+                if channel not in ('graph', 'statistics') and not str(channel).startswith(TRACE_CHANNEL_PREFIX):
+                    raise ValueError(f"unknown channel {channel!r}")
+        except (ValueError, AttributeError) as e:
+            await self._send(client, json.dumps({'type': 'error', 'detail': str(e)}))
+            return
+
+        subscribed = self.subscriptions.setdefault(client, set())
+        if action == 'unsubscribe':
+            subscribed.difference_update(channels)
+            return
+        builder = self.get_builder()
+        for channel in channels:
+            if channel in subscribed:
+                continue
+            subscribed.add(channel)
+            if builder is not None:
+                text = await self._under_lock(builder, lambda: self._dumps(self._snapshot(builder, channel)))
+                await self._send(client, text, channel, True)
+
+    # ------------------------------------------------------------------
+    # Publishing
+    # ------------------------------------------------------------------
+
+    async def run(self):
+        """Publish changes every `interval` seconds until cancelled"""
+        logger.info(f"📡 Live updates every {self.interval}s")
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.tick()
+            except Exception as e:
+                logger.error(f"❌ Live update tick failed: {e}")
+
+    async def tick(self):
+        """Push one coalesced delta, or a snapshot after a reset, to every subscribed channel"""
+        builder = self.get_builder()
+        if builder is None:
+            return
+        reset = builder is not self._builder
+        if reset:
+            if self._builder is not None:
+                self._builder.changes = None
+            builder.changes = ChangeTracker()
+            self._builder = builder
+        topics, traces = builder.changes.drain()
+        self.ticks += 1
+
+        topology_version, clear_generation = builder.topic_graph.version, builder.clear_generation
+        reset = reset or topology_version != self._topology_version or clear_generation != self._clear_generation
+        self._topology_version, self._clear_generation = topology_version, clear_generation
+        if not self.subscriptions:
+            return
+        if not reset:
+            await self._resync_stale(builder)
+        if not reset and not topics and not traces:
+            return
+
+        channels = set().union(*self.subscriptions.values())
+        texts = await self._under_lock(builder, self._payloads, builder, channels, reset, topics, traces)
+        for channel, text in texts.items():
+            for client, subscribed in list(self.subscriptions.items()):
+                if channel in subscribed:
+                    await self._send(client, text, channel, reset)
+
+    def _payloads(self, builder, channels: Set[str], reset: bool, topics: Set[str], traces: Set[str]) -> Dict[str, str]:
+        """Serialized snapshot or delta of each channel, once per channel whatever the number of subscribers"""
+        self._forget_unsubscribed_traces(channels)
+        payloads: Dict[str, Dict[str, Any]] = {}
+        if reset:
+            payloads = {channel: self._snapshot(builder, channel) for channel in channels}
+        else:
+            if 'graph' in channels and topics:
+                payloads['graph'] = {'type': 'graph_delta', 'channel': 'graph', **builder.get_graph_changes(topics)}
+            if 'statistics' in channels and topics:
+                payloads['statistics'] = {'type': 'statistics_delta', 'channel': 'statistics',
+                                          **builder.get_statistics_changes(topics)}
+            for trace_id in traces:
+                channel = TRACE_CHANNEL_PREFIX + trace_id
+                if channel in channels:
+                    payload = self._trace_delta(builder, trace_id)
+                    if payload is not None:
+                        payloads[channel] = payload
+        return {channel: self._dumps(payload) for channel, payload in payloads.items()}
+
+    async def _resync_stale(self, builder):
+        """Snapshot the channels of which a client's queue dropped or coalesced a delta"""
+        if self.connections is None:
+            return
+        stale = {client: self.connections.take_stale(client) & subscribed
+                 for client, subscribed in list(self.subscriptions.items())}
+        channels = set().union(*stale.values())
+        if not channels:
+            return
+        snapshots = await self._under_lock(
+            builder, lambda: {channel: self._dumps(self._snapshot(builder, channel)) for channel in channels})
+        for client, client_channels in stale.items():
+            for channel in client_channels:
+                await self._send(client, snapshots[channel], channel, True)
+
+    def _snapshot(self, builder, channel: str) -> Dict[str, Any]:
+        if channel == 'graph':
+            components = builder.get_disconnected_graphs()
+            return {'type': 'graph_snapshot', 'channel': channel, 'components': components,
+                    'total_components': len(components)}
+        if channel == 'statistics':
+            return {'type': 'statistics_snapshot', 'channel': channel,
+                    **builder.get_statistics_changes(builder.topic_graph.get_all_topics())}
+        trace_id = channel[len(TRACE_CHANNEL_PREFIX):]
+        trace = builder.get_trace(trace_id)
+        if trace is not None and trace_id in builder.traces:
+            self._trace_sent.setdefault(trace_id, len(trace.messages))
+        return {'type': 'trace_snapshot', 'channel': channel, 'trace_id': trace_id,
+                'trace': trace.to_dict() if trace is not None else None}
+
+    def _trace_delta(self, builder, trace_id: str) -> Optional[Dict[str, Any]]:
+        trace = builder.traces.get(trace_id)
+        if trace is None:
+            return None  # Evicted; it stays available from /trace/{trace_id}
+        sent = self._trace_sent.get(trace_id, 0)
+        if sent == len(trace.messages):
+            return None  # Already in the snapshot
+        if sent > len(trace.messages):
+            sent = 0  # Recreated after an eviction without a spill tier
+        self._trace_sent[trace_id] = len(trace.messages)
+        return {'type': 'trace_delta', 'channel': TRACE_CHANNEL_PREFIX + trace_id, 'trace_id': trace_id,
+                'summary': trace.summary(), 'from_index': sent,
+                'messages': [message.to_dict() for message in trace.messages[sent:]]}
+
+    def _forget_unsubscribed_traces(self, channels: Set[str]):
+        for trace_id in [t for t in self._trace_sent if TRACE_CHANNEL_PREFIX + t not in channels]:
+            del self._trace_sent[trace_id]
+
+    @staticmethod
+    async def _under_lock(builder, function: Callable, *args):
+        """Call function on a worker thread holding the builder lock, so ingest cannot change what it reads"""
+        def locked():
+            with builder.lock:
+                return function(*args)
+        return await asyncio.to_thread(locked)
+
+    @staticmethod
+    def _dumps(payload: Dict[str, Any]) -> str:
+        return json.dumps(payload, separators=(',', ':'), default=str)
+
+    async def _send(self, client, text: str, channel: Optional[str] = None, snapshot: bool = False):
+        if self.connections is not None:
+            if not self.connections.send(client, text, channel, supersedes=snapshot):
+                self.remove_client(client)  # Already disconnected
+                return
+        else:
+            try:
+                await client.send_text(text)
+            except Exception as e:
+                logger.warning(f"⚠️ Dropping live update client: {e}")
+                self.remove_client(client)
+                return
+        self.messages_sent += 1
+        self.bytes_sent += len(text)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'clients': len(self.subscriptions),
+            'interval': self.interval,
+            'ticks': self.ticks,
+            'messages_sent': self.messages_sent,
+            'bytes_sent': self.bytes_sent
+        }
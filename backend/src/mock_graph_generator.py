@@ -209,11 +209,12 @@ class MockGraphGenerator:
         mock_config = self.generate_mock_topic_graph_config(num_components=4)
         
         # Clear existing configuration
-        graph_builder.topic_graph.edges.clear()
+        graph_builder.topic_graph.clear()
         
         # Apply new edges
         for edge_config in mock_config['topic_edges']:
             graph_builder.topic_graph.add_edge(edge_config['source'], edge_config['destination'])
+        graph_builder.refresh_topology()
         
         # Set monitored topics
         graph_builder.monitored_topics = set(mock_config['default_monitored_topics'])
@@ -222,12 +223,10 @@ class MockGraphGenerator:
         mock_traces = self.generate_mock_traces_with_age_variation(graph_builder.topic_graph, num_traces=75)
         
         # Clear existing traces and add mock ones
-        graph_builder.traces.clear()
-        graph_builder.trace_order.clear()
+        graph_builder.clear_traces()
         
         for trace_id, trace in mock_traces.items():
-            graph_builder.traces[trace_id] = trace
-            graph_builder.trace_order.append(trace_id)
+            graph_builder.add_trace(trace)
         
         logger.info(f"✅ Applied mock configuration: {len(mock_config['topic_edges'])} edges, {len(mock_traces)} traces")
         logger.info(f"📊 Components: {mock_config['components_info']['component_sizes']}")
@@ -1,26 +1,199 @@
 """
 Data models for the Marauder's Map application
 """
-from dataclasses import dataclass, field
-from typing import Dict, List, Optional, Any
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, KeysView, List, Optional, Tuple, Any
 from datetime import datetime
 import json
+import sys
+
+from src.payload_store import SPAN_MASK, SPAN_SHIFT, PayloadStore
+
+
+# Bytes counted for a span handle; constant, so compaction moving a payload (and so its span int) keeps estimates stable
+SPAN_HANDLE_SIZE = sys.getsizeof(1 << SPAN_SHIFT)
+
+
+def estimate_size(value: Any) -> int:
+    """Approximate bytes held by a value and everything it references"""
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple, set)):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value)
+    return sys.getsizeof(value)
+
+
+def to_epoch_us(value: datetime) -> int:
+    """Microseconds since the epoch for a datetime (naive datetimes are local time)"""
+    return int(value.replace(microsecond=0).timestamp()) * 1_000_000 + value.microsecond
+
+
+def from_epoch_us(value: int) -> datetime:
+    """Naive local datetime for microseconds since the epoch, the inverse of to_epoch_us"""
+    seconds, micros = divmod(value, 1_000_000)
+    return datetime.fromtimestamp(seconds).replace(microsecond=micros)
+
+
+class AccountedDecode:
+    """A topic's shared decode_fn that reports the bytes each lazy decode adds to its message
+
+    The graph builder wraps decode_fn in one of these when it retains a lazily
+    decoded message, so the memoized decoded value counts against its budget.
+    """
+    __slots__ = ('decode', 'on_decoded')
+
+    def __init__(self, decode: Callable[[bytes], Dict[str, Any]],
+                 on_decoded: Callable[['KafkaMessage', int], None]):
+        self.decode = decode
+        self.on_decoded = on_decoded  # Called with the message and the estimated size of its decoded value
+
+    def __call__(self, raw_value: bytes) -> Dict[str, Any]:
+        return self.decode(raw_value)
+
 
-@dataclass
 class KafkaMessage:
-    """Represents a decoded Kafka message"""
-    topic: str
-    partition: int
-    offset: int
-    key: Optional[str]
-    timestamp: datetime
-    headers: Dict[str, str]
-    raw_value: bytes
-    decoded_value: Dict[str, Any]
-    trace_id: Optional[str] = None
+    """Represents a decoded Kafka message
 
-    def to_dict(self) -> Dict[str, Any]:
-        """Convert to JSON-serializable dictionary"""
+    Slotted to keep per-message overhead low when many messages are retained:
+    the topic name is interned and the timestamp is stored as epoch
+    microseconds, with `timestamp` rebuilding the datetime on access.
+
+    In lazy decode mode decoded_value starts as None and decode_fn (shared by
+    all messages of the topic) decodes raw_value the first time the payload
+    is needed.
+
+    For topics with a field projection decoded_value only holds the projected
+    fields; full_decode_fn (shared by all messages of the topic) decodes the
+    whole payload on request without keeping it.
+
+    Once a message is retained its payload can be moved into a PayloadStore:
+    the message then holds the segment and a packed offset/length span
+    instead of its own bytes object, and `raw_value` is a read-only
+    memoryview into the segment.
+    """
+    __slots__ = ('topic', 'partition', 'offset', 'key', 'timestamp_us', '_headers',
+                 '_payload', '_span', 'decoded_value', 'trace_id', 'decode_fn', 'full_decode_fn')
+
+    def __init__(self, topic: str, partition: int, offset: int, key: Optional[str],
+                 timestamp: datetime, headers: Dict[str, str], raw_value: bytes,
+                 decoded_value: Optional[Dict[str, Any]], trace_id: Optional[str] = None,
+                 decode_fn: Optional[Callable[[bytes], Dict[str, Any]]] = None,
+                 full_decode_fn: Optional[Callable[[bytes], Dict[str, Any]]] = None):
+        self.topic = sys.intern(topic)
+        self.partition = partition
+        self.offset = offset
+        self.key = key
+        self.timestamp_us = to_epoch_us(timestamp)
+        self.headers = headers
+        self.raw_value = raw_value
+        self.decoded_value = decoded_value
+        self.trace_id = sys.intern(trace_id) if trace_id else trace_id
+        self.decode_fn = decode_fn
+        self.full_decode_fn = full_decode_fn
+
+    @property
+    def timestamp(self) -> datetime:
+        return from_epoch_us(self.timestamp_us)
+
+    @timestamp.setter
+    def timestamp(self, value: datetime):
+        self.timestamp_us = to_epoch_us(value)
+
+    @property
+    def raw_value(self) -> bytes:
+        """The raw payload: bytes, or a read-only memoryview once moved into a PayloadStore"""
+        if self._span is None:
+            return self._payload
+        return self._payload.view(self._span)
+
+    @raw_value.setter
+    def raw_value(self, value: bytes):
+        self._payload = value
+        self._span = None
+
+    @property
+    def is_payload_stored(self) -> bool:
+        """Whether the payload lives in a PayloadStore segment"""
+        return self._span is not None
+
+    def store_payload(self, store: PayloadStore):
+        """Move the payload into a store, dropping this message's own bytes object"""
+        if self._span is None and self._payload:
+            self._payload, self._span = store.append(self._payload)
+
+    def compact_payload(self, store: PayloadStore):
+        """Move the payload out of a sparse segment during a store compaction"""
+        if self._span is not None:
+            self._payload, self._span = store.relocate(self._payload, self._span)
+
+    def release_payload(self, store: PayloadStore):
+        """Give the payload's space back to the store; the message keeps a detached view of it"""
+        if self._span is not None:
+            segment, span = self._payload, self._span
+            store.release(segment, span)
+            self.raw_value = segment.view(span)
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return self._headers if self._headers is not None else {}
+
+    @headers.setter
+    def headers(self, value: Optional[Dict[str, str]]):
+        # Most messages have no headers; don't keep an empty dict for each of them
+        self._headers = value or None
+
+    def __repr__(self) -> str:
+        return (f"KafkaMessage(topic={self.topic!r}, partition={self.partition}, offset={self.offset}, "
+                f"key={self.key!r}, timestamp={self.timestamp!r}, trace_id={self.trace_id!r})")
+
+    @property
+    def is_decoded(self) -> bool:
+        """Whether the payload has been decoded"""
+        return self.decode_fn is None
+
+    def get_decoded_value(self) -> Optional[Dict[str, Any]]:
+        """Get the decoded payload, decoding and memoizing it on first use"""
+        decode_fn = self.decode_fn
+        if decode_fn is not None:
+            try:
+                self.decoded_value = decode_fn(self.raw_value)
+            except Exception as e:
+                self.decoded_value = {'error': f'Failed to decode message: {e}'}
+            self.decode_fn = None
+            if isinstance(decode_fn, AccountedDecode):
+                decode_fn.on_decoded(self, estimate_size(self.decoded_value))
+        return self.decoded_value
+
+    @property
+    def is_projected(self) -> bool:
+        """Whether decoded_value holds only the topic's projected fields"""
+        return self.full_decode_fn is not None
+
+    def get_full_decoded_value(self) -> Optional[Dict[str, Any]]:
+        """Get the whole decoded payload, decoding it again for projected topics"""
+        if self.full_decode_fn is None:
+            return self.get_decoded_value()
+        try:
+            return self.full_decode_fn(self.raw_value)
+        except Exception as e:
+            return {'error': f'Failed to decode message: {e}'}
+
+    def estimated_size(self) -> int:
+        """Approximate bytes held by this message, including its payloads"""
+        size = sys.getsizeof(self) + sys.getsizeof(self.timestamp_us)
+        if self._span is None:
+            size += estimate_size(self._payload)
+        else:
+            # The payload's bytes in its segment plus the span handle, whichever offset it has
+            size += (self._span & SPAN_MASK) + SPAN_HANDLE_SIZE
+        size += estimate_size(self._headers)
+        size += estimate_size(self.key) + estimate_size(self.trace_id)
+        if self.decoded_value is not None:
+            size += estimate_size(self.decoded_value)
+        return size
+
+    def to_dict(self, full: bool = False) -> Dict[str, Any]:
+        """Convert to JSON-serializable dictionary, with the whole payload if full is set"""
         return {
             'topic': self.topic,
             'partition': self.partition,
@@ -28,30 +201,88 @@ class KafkaMessage:
             'key': self.key,
             'timestamp': self.timestamp.isoformat(),
             'headers': self.headers,
-            'decoded_value': self.decoded_value,
+            'decoded_value': self.get_full_decoded_value() if full else self.get_decoded_value(),
             'trace_id': self.trace_id
         }
 
-@dataclass
+
 class TraceInfo:
-    """Represents a complete trace with all its messages"""
-    trace_id: str
-    messages: List[KafkaMessage] = field(default_factory=list)
-    topics: List[str] = field(default_factory=list)
-    start_time: Optional[datetime] = None
-    end_time: Optional[datetime] = None
+    """Represents a complete trace with all its messages
+
+    Time bounds are kept as epoch microseconds, and topics in an insertion
+    ordered dict that serves as the trace's topic set: membership checks are
+    constant time and `topics` still lists them in first-seen order. The
+    listing row returned by `summary()` is cached until the trace changes.
+    """
+    __slots__ = ('trace_id', 'messages', '_topics', 'start_us', 'end_us', '_summary')
+
+    def __init__(self, trace_id: str, messages: Optional[List[KafkaMessage]] = None,
+                 topics: Optional[List[str]] = None, start_time: Optional[datetime] = None,
+                 end_time: Optional[datetime] = None):
+        self.trace_id = trace_id
+        self.messages: List[KafkaMessage] = messages if messages is not None else []
+        self._topics: Dict[str, None] = dict.fromkeys(topics or ())
+        self.start_us: Optional[int] = to_epoch_us(start_time) if start_time else None
+        self.end_us: Optional[int] = to_epoch_us(end_time) if end_time else None
+        self._summary: Optional[Dict[str, Any]] = None
+
+    @property
+    def topics(self) -> List[str]:
+        return list(self._topics)
+
+    @property
+    def topic_set(self) -> KeysView[str]:
+        return self._topics.keys()
+
+    @property
+    def start_time(self) -> Optional[datetime]:
+        return from_epoch_us(self.start_us) if self.start_us is not None else None
+
+    @start_time.setter
+    def start_time(self, value: Optional[datetime]):
+        self.start_us = to_epoch_us(value) if value is not None else None
+        self._summary = None
+
+    @property
+    def end_time(self) -> Optional[datetime]:
+        return from_epoch_us(self.end_us) if self.end_us is not None else None
+
+    @end_time.setter
+    def end_time(self, value: Optional[datetime]):
+        self.end_us = to_epoch_us(value) if value is not None else None
+        self._summary = None
+
+    def __repr__(self) -> str:
+        return f"TraceInfo(trace_id={self.trace_id!r}, messages={len(self.messages)}, topics={self.topics!r})"
 
     def add_message(self, message: KafkaMessage):
         """Add a message to this trace"""
         self.messages.append(message)
-        if message.topic not in self.topics:
-            self.topics.append(message.topic)
+        self._summary = None
+        if message.topic not in self._topics:
+            self._topics[message.topic] = None
 
         # Update time bounds
-        if self.start_time is None or message.timestamp < self.start_time:
-            self.start_time = message.timestamp
-        if self.end_time is None or message.timestamp > self.end_time:
-            self.end_time = message.timestamp
+        ts = message.timestamp_us
+        if self.start_us is None or ts < self.start_us:
+            self.start_us = ts
+        if self.end_us is None or ts > self.end_us:
+            self.end_us = ts
+
+    def summary(self) -> Dict[str, Any]:
+        """Listing row for this trace, without messages (shared: do not modify)"""
+        row = self._summary
+        if row is None:
+            start_us, end_us = self.start_us, self.end_us
+            row = self._summary = {
+                'trace_id': self.trace_id,
+                'message_count': len(self.messages),
+                'topics': self.topics,
+                'start_time': from_epoch_us(start_us).isoformat() if start_us is not None else None,
+                'end_time': from_epoch_us(end_us).isoformat() if end_us is not None else None,
+                'duration_ms': (end_us - start_us) // 1000 if start_us is not None and end_us is not None else None
+            }
+        return row
 
     def to_dict(self) -> Dict[str, Any]:
         """Convert to JSON-serializable dictionary"""
@@ -64,38 +295,150 @@ class TraceInfo:
             'messages': [msg.to_dict() for msg in self.messages]
         }
 
-@dataclass
+@dataclass(frozen=True)
 class TopicEdge:
     """Represents a connection between two topics"""
     source: str
     destination: str
 
-@dataclass
 class TopicGraph:
-    """Represents the complete topic graph"""
-    edges: List[TopicEdge] = field(default_factory=list)
+    """Represents the complete topic graph
+
+    Edges are kept in insertion order with out- and in-adjacency maps for
+    constant time lookups. Connected components (ignoring edge direction)
+    are tracked by a union-find over topics that absorbs each added edge;
+    removing an edge marks it stale, as union-find cannot split, and it is
+    rebuilt on the next component query. `version` increases with every
+    topology change so derived views can be cached against it.
+    """
+
+    def __init__(self, edges: Optional[Iterable[TopicEdge]] = None):
+        self._edges: Dict[Tuple[str, str], TopicEdge] = {}
+        self._out: Dict[str, Dict[str, None]] = {}  # topic -> ordered set of destinations
+        self._in: Dict[str, Dict[str, None]] = {}   # topic -> ordered set of sources
+        self._parent: Dict[str, str] = {}           # union-find forest, one entry per topic
+        self._size: Dict[str, int] = {}
+        self._stale_components = False
+        self._components: Optional[List[List[str]]] = None
+        self.version = 0
+        for edge in edges or ():
+            self.add_edge(edge.source, edge.destination)
+
+    @property
+    def edges(self) -> List[TopicEdge]:
+        """All edges, in insertion order"""
+        return list(self._edges.values())
+
+    def __len__(self) -> int:
+        return len(self._edges)
+
+    def has_edge(self, source: str, destination: str) -> bool:
+        return (source, destination) in self._edges
+
+    def add_edge(self, source: str, destination: str) -> bool:
+        """Add an edge to the graph, returning False if it was already present"""
+        key = (source, destination)
+        if key in self._edges:
+            return False
+        self._edges[key] = TopicEdge(source, destination)
+        for topic in key:
+            if topic not in self._parent:
+                self._parent[topic] = topic
+                self._size[topic] = 1
+                self._out[topic] = {}
+                self._in[topic] = {}
+        self._out[source][destination] = None
+        self._in[destination][source] = None
+        if not self._stale_components:
+            self._union(source, destination)
+        self._changed()
+        return True
+
+    def remove_edge(self, source: str, destination: str) -> bool:
+        """Remove an edge, and any topic left without edges; returns False if absent"""
+        if self._edges.pop((source, destination), None) is None:
+            return False
+        del self._out[source][destination]
+        del self._in[destination][source]
+        for topic in (source, destination):
+            if topic in self._parent and not self._out[topic] and not self._in[topic]:
+                for index in (self._parent, self._size, self._out, self._in):
+                    del index[topic]
+        self._stale_components = True
+        self._changed()
+        return True
 
-    def add_edge(self, source: str, destination: str):
-        """Add an edge to the graph"""
-        edge = TopicEdge(source, destination)
-        if edge not in self.edges:
-            self.edges.append(edge)
+    def clear(self):
+        """Remove every edge and topic"""
+        for index in (self._edges, self._out, self._in, self._parent, self._size):
+            index.clear()
+        self._stale_components = False
+        self._changed()
 
     def get_destinations(self, source: str) -> List[str]:
         """Get all destination topics for a source topic"""
-        return [edge.destination for edge in self.edges if edge.source == source]
+        return list(self._out.get(source, ()))
 
     def get_sources(self, destination: str) -> List[str]:
         """Get all source topics for a destination topic"""
-        return [edge.source for edge in self.edges if edge.destination == destination]
+        return list(self._in.get(destination, ()))
 
     def get_all_topics(self) -> List[str]:
-        """Get all unique topics in the graph"""
-        topics = set()
-        for edge in self.edges:
-            topics.add(edge.source)
-            topics.add(edge.destination)
-        return list(topics)
+        """Get all unique topics in the graph, in first-seen order"""
+        return list(self._parent)
+
+    def __contains__(self, topic: str) -> bool:
+        return topic in self._parent
+
+    def component_of(self, topic: str) -> Optional[str]:
+        """Representative topic of the component holding `topic`, or None if not in the graph"""
+        if topic not in self._parent:
+            return None
+        self._rebuild_if_stale()
+        return self._find(topic)
+
+    def components(self) -> List[List[str]]:
+        """Connected components as lists of topics, largest first (shared: do not modify)
+
+        Computed once per topology change.
+        """
+        if self._components is None:
+            self._rebuild_if_stale()
+            members: Dict[str, List[str]] = {}
+            for topic in self._parent:
+                members.setdefault(self._find(topic), []).append(topic)
+            self._components = sorted(members.values(), key=len, reverse=True)
+        return self._components
+
+    def _changed(self):
+        self.version += 1
+        self._components = None
+
+    def _find(self, topic: str) -> str:
+        parent = self._parent
+        while parent[topic] != topic:
+            parent[topic] = parent[parent[topic]]  # Path halving
+            topic = parent[topic]
+        return topic
+
+    def _union(self, a: str, b: str):
+        a, b = self._find(a), self._find(b)
+        if a == b:
+            return
+        if self._size[a] < self._size[b]:
+            a, b = b, a
+        self._parent[b] = a
+        self._size[a] += self._size[b]
+
+    def _rebuild_if_stale(self):
+        if not self._stale_components:
+            return
+        for topic in self._parent:
+            self._parent[topic] = topic
+            self._size[topic] = 1
+        for source, destination in self._edges:
+            self._union(source, destination)
+        self._stale_components = False
 
 @dataclass
 class TopicConfig:
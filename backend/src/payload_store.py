@@ -0,0 +1,142 @@
+"""
+Arena storage for the raw payloads of retained Kafka messages
+"""
+from typing import Any, Dict, Tuple
+
+DEFAULT_SEGMENT_BYTES = 8 * 1024 * 1024
+# Full segments with less than this share of their capacity live are compacted
+DEFAULT_COMPACT_RATIO = 0.25
+
+# A payload's position in its segment is packed into one int: offset << SPAN_SHIFT | length
+SPAN_SHIFT = 32
+SPAN_MASK = (1 << SPAN_SHIFT) - 1
+
+
+class PayloadSegment:
+    """Fixed-size append-only bytearray holding many payloads back to back"""
+    __slots__ = ('buffer', 'used', 'live_count', 'live_bytes')
+
+    def __init__(self, capacity: int):
+        self.buffer = bytearray(capacity)
+        self.used = 0
+        self.live_count = 0
+        self.live_bytes = 0
+
+    @property
+    def capacity(self) -> int:
+        return len(self.buffer)
+
+    def view(self, span: int) -> memoryview:
+        """Read-only view of the payload at a packed span"""
+        offset = span >> SPAN_SHIFT
+        return memoryview(self.buffer)[offset:offset + (span & SPAN_MASK)].toreadonly()
+
+
+class PayloadStore:
+    """
+    Packs message payloads into large append-only segments
+
+    Payloads are copied into the active segment and referenced by
+    (segment, span) handles, so retained messages don't each own a bytes
+    object. Segments are never written again once full; a segment is
+    dropped when the last payload in it is released, and views still held
+    elsewhere keep its buffer alive, so they never see reused space.
+
+    A few long-lived payloads would pin mostly released segments, so full
+    segments whose live share drops below compact_ratio are marked sparse.
+    Once they waste a whole segment's worth of space, needs_compaction()
+    asks the owner of the handles to relocate() its payloads: survivors in
+    sparse segments are copied to the active one and the sparse segments
+    are dropped.
+    """
+
+    def __init__(self, segment_bytes: int = DEFAULT_SEGMENT_BYTES, compact_ratio: float = DEFAULT_COMPACT_RATIO):
+        self.segment_bytes = segment_bytes
+        self.compact_ratio = compact_ratio
+        self.active = PayloadSegment(segment_bytes)
+        self.segments: Dict[int, PayloadSegment] = {id(self.active): self.active}
+        self.sparse: Dict[int, PayloadSegment] = {}
+        self.payloads = 0
+        self.released_segments = 0
+        self.compactions = 0
+        self.relocated_bytes = 0
+
+    def append(self, payload) -> Tuple[PayloadSegment, int]:
+        """Copy a payload into the store, returning its (segment, span) handle"""
+        length = len(payload)
+        segment = self.active
+        if segment.used + length > segment.capacity:
+            if length > self.segment_bytes:
+                # Oversized payloads get a segment of their own and leave the active one as is
+                segment = PayloadSegment(length)
+            else:
+                retired, segment = self.active, PayloadSegment(self.segment_bytes)
+                self.active = segment
+                self._check_segment(retired)
+            self.segments[id(segment)] = segment
+
+        offset = segment.used
+        segment.buffer[offset:offset + length] = payload
+        segment.used += length
+        segment.live_count += 1
+        segment.live_bytes += length
+        self.payloads += 1
+        return segment, offset << SPAN_SHIFT | length
+
+    def release(self, segment: PayloadSegment, span: int):
+        """Release a payload; its segment is dropped once nothing in it is live"""
+        segment.live_count -= 1
+        segment.live_bytes -= span & SPAN_MASK
+        self.payloads -= 1
+        if segment is not self.active:
+            self._check_segment(segment)
+
+    def _check_segment(self, segment: PayloadSegment):
+        """Drop a full segment with nothing live in it, or mark it sparse when little is"""
+        if segment.live_count <= 0:
+            self._drop(segment)
+        elif segment.live_bytes < segment.capacity * self.compact_ratio:
+            self.sparse[id(segment)] = segment
+
+    def needs_compaction(self) -> bool:
+        """Whether sparse segments waste at least one segment's worth of space"""
+        if not self.sparse:
+            return False
+        wasted = sum(segment.capacity - segment.live_bytes for segment in self.sparse.values())
+        return wasted >= self.segment_bytes
+
+    def relocate(self, segment: PayloadSegment, span: int) -> Tuple[PayloadSegment, int]:
+        """Handle for a payload after compaction: copied to the active segment if its own is sparse"""
+        if id(segment) not in self.sparse:
+            return segment, span
+        moved = self.append(segment.view(span))
+        self.release(segment, span)
+        self.relocated_bytes += span & SPAN_MASK
+        return moved
+
+    def compaction_done(self):
+        """Finish a relocate() pass over every live handle"""
+        # Anything still marked had no handle passed in; leave it to be found again on a later release
+        self.sparse.clear()
+        self.compactions += 1
+
+    def _drop(self, segment: PayloadSegment):
+        self.sparse.pop(id(segment), None)
+        if self.segments.pop(id(segment), None) is not None:
+            self.released_segments += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        capacity = sum(segment.capacity for segment in self.segments.values())
+        live = sum(segment.live_bytes for segment in self.segments.values())
+        return {
+            'payloads': self.payloads,
+            'segments': len(self.segments),
+            'segment_bytes': self.segment_bytes,
+            'allocated_bytes': capacity,
+            'live_bytes': live,
+            'fill_ratio': live / capacity if capacity else 0.0,
+            'released_segments': self.released_segments,
+            'sparse_segments': len(self.sparse),
+            'compactions': self.compactions,
+            'relocated_bytes': self.relocated_bytes
+        }
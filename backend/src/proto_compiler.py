@@ -0,0 +1,161 @@
+"""
+Shared in-process protobuf compilation engine
+
+Compiles a whole proto tree with one in-process protoc invocation, registers
+every file in a descriptor pool of its own and hands out message classes
+built by message_factory. The Kafka topic decoders and the gRPC proto loader
+share one engine per proto root, so each tree is compiled once per process
+and again only when its files change.
+"""
+import logging
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Type
+
+import grpc_tools
+from google.protobuf import descriptor_pb2, descriptor_pool, message_factory
+from google.protobuf.descriptor import FileDescriptor
+from google.protobuf.message import Message
+from grpc_tools import protoc
+
+logger = logging.getLogger(__name__)
+
+# Well-known types (google/protobuf/*.proto) shipped with grpc_tools
+WELL_KNOWN_PROTO_PATH = Path(grpc_tools.__file__).parent / "_proto"
+
+_compilers: Dict[Path, 'ProtoCompiler'] = {}
+_compilers_lock = threading.Lock()
+
+
+def get_proto_compiler(proto_root: str) -> 'ProtoCompiler':
+    """Process-wide compiler for a proto root"""
+    root = Path(proto_root).resolve()
+    with _compilers_lock:
+        compiler = _compilers.get(root)
+        if compiler is None:
+            compiler = _compilers[root] = ProtoCompiler(root)
+        return compiler
+
+
+class ProtoCompiler:
+    """Compiles a proto tree once and serves message classes from one descriptor pool
+
+    The pool is private to the compiler, so _pb2 modules generated elsewhere
+    for the same files (e.g. by the per-topic fallback) never collide with it;
+    the gRPC stubs are built from this pool's service descriptors as well.
+
+    Every lookup re-checks the tree's file list, mtimes and sizes; when they
+    changed since the last successful compile the tree is compiled into a
+    fresh pool, and a failed compile is retried on the next lookup. Classes
+    handed out earlier keep working off their old pool.
+    """
+
+    def __init__(self, proto_root: Path):
+        self.proto_root = Path(proto_root)
+        self.pool = descriptor_pool.DescriptorPool()
+        self.files: List[str] = []
+        self.compiled = False
+        self.error: Optional[str] = None
+        self.compile_seconds: Optional[float] = None
+        self.compilations = 0
+        self._signature: Optional[Tuple] = None  # Tree state of the last successful compile
+        self._lock = threading.Lock()
+
+    def proto_files(self) -> List[str]:
+        """Every .proto under the root, relative to it"""
+        return [path for path, _, _ in self._tree_signature()]
+
+    def _tree_signature(self) -> Tuple:
+        """(relative path, mtime, size) of every .proto under the root"""
+        signature = []
+        for path in self.proto_root.rglob("*.proto"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue  # Removed while walking
+            signature.append((path.relative_to(self.proto_root).as_posix(), stat.st_mtime_ns, stat.st_size))
+        return tuple(sorted(signature))
+
+    def _run_protoc(self, files: List[str], *outputs: str) -> None:
+        args = [
+            "grpc_tools.protoc",
+            f"--proto_path={self.proto_root}",
+            f"--proto_path={WELL_KNOWN_PROTO_PATH}",
+            *outputs,
+            *files
+        ]
+        result = protoc.main(args)
+        if result != 0:
+            raise RuntimeError(f"protoc failed with exit code {result} for {len(files)} proto files under {self.proto_root}")
+
+    def ensure_compiled(self) -> bool:
+        """Compile the tree into a fresh descriptor pool if it changed since the last compile; False if that failed"""
+        with self._lock:
+            signature = self._tree_signature()
+            if signature == self._signature:
+                return True
+
+            started = time.perf_counter()
+            try:
+                files = [path for path, _, _ in signature]
+                if not files:
+                    raise FileNotFoundError(f"No proto files under {self.proto_root}")
+
+                with tempfile.TemporaryDirectory(prefix="proto_tree_") as temp_dir:
+                    descriptor_set_path = Path(temp_dir) / "tree.pb"
+                    self._run_protoc(files, f"--descriptor_set_out={descriptor_set_path}", "--include_imports")
+                    descriptor_set = descriptor_pb2.FileDescriptorSet.FromString(descriptor_set_path.read_bytes())
+
+                # The set is in dependency order and includes the well-known types it imports
+                pool = descriptor_pool.DescriptorPool()
+                for file_proto in descriptor_set.file:
+                    pool.Add(file_proto)
+
+                self.pool = pool
+                self.files = files
+                self._signature = signature
+                self.compiled = True
+                self.error = None
+                self.compilations += 1
+                self.compile_seconds = time.perf_counter() - started
+                logger.info(f"⚡ Compiled {len(files)} proto files in-process in {self.compile_seconds:.3f}s")
+            except Exception as e:
+                # Not cached: the next call compiles again, e.g. once the broken file is fixed
+                self._signature = None
+                self.compiled = False
+                self.error = str(e)
+                logger.warning(f"⚠️  In-process proto compilation failed, falling back to per-topic compilation: {e}")
+                return False
+            return True
+
+    def get_message_class(self, proto_file: str, message_type: str) -> Optional[Type[Message]]:
+        """Message class for a (possibly nested, dot-separated) message declared in a proto file"""
+        if not self.ensure_compiled():
+            return None
+
+        try:
+            file_descriptor = self.pool.FindFileByName(Path(proto_file).as_posix())
+        except KeyError:
+            return None
+
+        name, *nested = message_type.split('.')
+        descriptor = file_descriptor.message_types_by_name.get(name)
+        for nested_name in nested:
+            if descriptor is None:
+                break
+            descriptor = descriptor.nested_types_by_name.get(nested_name)
+        if descriptor is None:
+            return None
+
+        return message_factory.GetMessageClass(descriptor)
+
+    def get_file(self, proto_file: str) -> Optional[FileDescriptor]:
+        """Descriptor of a compiled proto file, or None"""
+        if not self.ensure_compiled():
+            return None
+        try:
+            return self.pool.FindFileByName(Path(proto_file).as_posix())
+        except KeyError:
+            return None
@@ -0,0 +1,241 @@
+"""
+Fast protobuf message to dict conversion
+
+Produces the same output as json_format.MessageToDict(message,
+preserving_proto_field_name=True) without its per-field reflection: a
+converter is built once per message descriptor and cached, and set fields
+are walked directly with ListFields(). Well-known types (Timestamp, Any,
+Struct, wrappers, ...) and messages carrying extensions are handed to
+MessageToDict.
+"""
+import base64
+import math
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from google.protobuf import json_format
+from google.protobuf.descriptor import Descriptor, FieldDescriptor
+from google.protobuf.internal.type_checkers import ToShortestFloat
+from google.protobuf.message import Message
+
+# Messages with a special JSON mapping in json_format
+SPECIAL_JSON_TYPES = frozenset([
+    'google.protobuf.Any',
+    'google.protobuf.Duration',
+    'google.protobuf.FieldMask',
+    'google.protobuf.ListValue',
+    'google.protobuf.Struct',
+    'google.protobuf.Timestamp',
+    'google.protobuf.Value',
+])
+WRAPPERS_FILE = 'google/protobuf/wrappers.proto'
+
+Converter = Callable[[Any], Any]
+
+# Projection field checks besides comparing with the default value
+_PRESENT = object()
+_NON_EMPTY = object()
+
+_converters: Dict[Descriptor, Converter] = {}
+_converters_lock = threading.Lock()
+
+
+def message_to_dict(message: Message) -> Dict[str, Any]:
+    """Drop-in replacement for MessageToDict(message, preserving_proto_field_name=True)"""
+    converter = _converters.get(message.DESCRIPTOR)
+    if converter is None:
+        converter = get_converter(message.DESCRIPTOR)
+    return converter(message)
+
+
+def get_converter(descriptor: Descriptor) -> Converter:
+    """Cached converter for a message type"""
+    converter = _converters.get(descriptor)
+    if converter is None:
+        with _converters_lock:
+            converter = _build_message_converter(descriptor)
+    return converter
+
+
+def _json_format(message: Message) -> Any:
+    # Any payloads resolve against the message's own pool, e.g. a ProtoCompiler's
+    return json_format.MessageToDict(message, preserving_proto_field_name=True,
+                                     descriptor_pool=message.DESCRIPTOR.file.pool)
+
+
+def _build_message_converter(descriptor: Descriptor) -> Converter:
+    """Converter for a message type; registered before its fields so recursive types resolve"""
+    if descriptor in _converters:
+        return _converters[descriptor]
+
+    if descriptor.full_name in SPECIAL_JSON_TYPES or descriptor.file.name == WRAPPERS_FILE:
+        _converters[descriptor] = _json_format
+        return _json_format
+
+    fields: Dict[FieldDescriptor, tuple] = {}  # field -> (name, value converter or None)
+
+    def convert(message: Message) -> Dict[str, Any]:
+        result = {}
+        for field, value in message.ListFields():
+            entry = fields.get(field)
+            if entry is None:
+                # An extension, or a type another thread is still building
+                return _json_format(message)
+            name, convert_value = entry
+            result[name] = value if convert_value is None else convert_value(value)
+        return result
+
+    _converters[descriptor] = convert
+    for field in descriptor.fields:
+        fields[field] = (field.name, _field_converter(field))
+    return convert
+
+
+def _field_converter(field: FieldDescriptor) -> Optional[Converter]:
+    """Converter for a field's whole value (map, repeated or singular); None means as-is"""
+    if field.message_type is not None and field.message_type.GetOptions().map_entry:
+        convert_key = _map_key if field.message_type.fields_by_name['key'].type == FieldDescriptor.TYPE_BOOL else str
+        convert_value = _value_converter(field.message_type.fields_by_name['value'])
+        if convert_value is None:
+            return lambda entries: {convert_key(key): entries[key] for key in entries}
+        return lambda entries: {convert_key(key): convert_value(entries[key]) for key in entries}
+
+    convert_value = _value_converter(field)
+    if field.is_repeated:
+        if convert_value is None:
+            return list
+        return lambda values: [convert_value(value) for value in values]
+    return convert_value
+
+
+def _value_converter(field: FieldDescriptor) -> Optional[Converter]:
+    """Converter for a single value of a field; None means as-is"""
+    cpp_type = field.cpp_type
+    if cpp_type == FieldDescriptor.CPPTYPE_MESSAGE:
+        return _build_message_converter(field.message_type)
+    if cpp_type == FieldDescriptor.CPPTYPE_ENUM:
+        if field.enum_type.full_name == 'google.protobuf.NullValue':
+            return lambda value: None
+        names = {value.number: value.name for value in field.enum_type.values}
+        return lambda value: names.get(value, value)
+    if cpp_type == FieldDescriptor.CPPTYPE_STRING:
+        return _bytes if field.type == FieldDescriptor.TYPE_BYTES else None
+    if cpp_type in (FieldDescriptor.CPPTYPE_INT64, FieldDescriptor.CPPTYPE_UINT64):
+        return str
+    if cpp_type == FieldDescriptor.CPPTYPE_FLOAT:
+        return _float
+    if cpp_type == FieldDescriptor.CPPTYPE_DOUBLE:
+        return _double
+    return None
+
+
+def _map_key(key: bool) -> str:
+    return 'true' if key else 'false'
+
+
+def _bytes(value: bytes) -> str:
+    return base64.b64encode(value).decode('utf-8')
+
+
+def _non_finite(value: float) -> Any:
+    if math.isnan(value):
+        return 'NaN'
+    return '-Infinity' if value < 0 else 'Infinity'
+
+
+def _double(value: float) -> Any:
+    if math.isfinite(value):
+        return value
+    return _non_finite(value)
+
+
+def _float(value: float) -> Any:
+    if math.isfinite(value):
+        return ToShortestFloat(value)
+    return _non_finite(value)
+
+
+def build_projector(descriptor: Descriptor, paths: List[str]) -> Tuple[Converter, List[str]]:
+    """Converter that only emits the given dot-separated field paths
+
+    The output has the same shape as a full conversion with every other
+    field left out; a path ending at a message field keeps that whole
+    sub-message. Paths cannot descend into maps or well-known types.
+    Returns the converter and the paths that do not name a field.
+    """
+    tree: Dict[str, Optional[dict]] = {}
+    unknown = []
+    for path in paths:
+        parts = path.split('.')
+        if not _resolves(descriptor, parts):
+            unknown.append(path)
+            continue
+        node = tree
+        for part in parts[:-1]:
+            if part in node and node[part] is None:
+                break  # already projected whole
+            node = node.setdefault(part, {})
+        else:
+            node[parts[-1]] = None  # the whole field
+    return _build_projection(descriptor, tree), unknown
+
+
+def _resolves(descriptor: Descriptor, parts: List[str]) -> bool:
+    """Whether a split field path names a field, descending only through plain messages"""
+    for depth, part in enumerate(parts):
+        field = descriptor.fields_by_name.get(part)
+        if field is None:
+            return False
+        if depth < len(parts) - 1:
+            if not _can_descend(field):
+                return False
+            descriptor = field.message_type
+    return True
+
+
+def _can_descend(field: FieldDescriptor) -> bool:
+    message_type = field.message_type
+    return (message_type is not None and not message_type.GetOptions().map_entry
+            and message_type.full_name not in SPECIAL_JSON_TYPES and message_type.file.name != WRAPPERS_FILE)
+
+
+def _build_projection(descriptor: Descriptor, tree: Dict[str, Optional[dict]]) -> Converter:
+    steps = []
+    for field in sorted((descriptor.fields_by_name[name] for name in tree), key=lambda f: f.number):
+        subtree = tree[field.name]
+        if subtree is None:
+            convert_value = _field_converter(field)
+        else:
+            project = _build_projection(field.message_type, subtree)
+            convert_value = (lambda values, project=project: [project(value) for value in values]) if field.is_repeated else project
+        # Fields are set when ListFields() would report them: present, non-empty or non-default
+        if field.is_repeated:
+            check = _NON_EMPTY
+        elif field.has_presence:
+            check = _PRESENT
+        else:
+            check = field.default_value
+        steps.append((field.name, check, convert_value))
+
+    def project(message: Message) -> Dict[str, Any]:
+        result = {}
+        for name, check, convert_value in steps:
+            if check is _PRESENT:
+                if not message.HasField(name):
+                    continue
+                value = getattr(message, name)
+            else:
+                value = getattr(message, name)
+                if check is _NON_EMPTY:
+                    if not value:
+                        continue
+                elif value == check and not _is_negative_zero(value):
+                    continue
+            result[name] = value if convert_value is None else convert_value(value)
+        return result
+
+    return project
+
+
+def _is_negative_zero(value: Any) -> bool:
+    return type(value) is float and value == 0 and math.copysign(1, value) < 0
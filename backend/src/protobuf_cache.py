@@ -3,69 +3,167 @@ Protobuf compilation caching system to avoid recompiling on every startup
 """
 import os
 import hashlib
+import json
 import pickle
 import shutil
+import threading
 import importlib.util
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 import logging
 
 logger = logging.getLogger(__name__)
 
+INDEX_FILE = "proto_index.json"
+
+# Loading generated modules temporarily edits sys.path; loads on different threads take turns
+MODULE_IMPORT_LOCK = threading.RLock()
+
+
+def parse_proto_imports(content: str) -> List[str]:
+    """Import paths declared by a .proto file, in declaration order"""
+    imports = []
+    for line in content.split('\n'):
+        line = line.strip()
+        if line.startswith('import "') and line.endswith('";'):
+            imports.append(line[8:-2])  # Remove 'import "' and '";'
+    return imports
+
+
 class ProtobufCache:
-    """Manages protobuf compilation caching"""
+    """Manages protobuf compilation caching
+
+    Entries are content addressed: each one is keyed by the hash of its proto
+    file's transitive import closure, so editing an unrelated proto does not
+    invalidate it. The proto tree is hashed once per process, and files whose
+    mtime and size match the persisted index are not re-read.
+    """
     
     def __init__(self, proto_dir: str, cache_dir: str = None):
         self.proto_dir = Path(proto_dir)
         self.cache_dir = Path(cache_dir or (self.proto_dir.parent / ".protobuf_cache"))
         self.cache_dir.mkdir(exist_ok=True)
-        
-    def _get_proto_files_hash(self) -> str:
-        """Calculate hash of all proto files to detect changes"""
-        hasher = hashlib.md5()
-        
-        # Get all proto files and their content
-        proto_files = []
+        self._index: Optional[Dict[str, Dict[str, Any]]] = None  # relative path -> digest and imports
+        self._closure_keys: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def _get_index(self) -> Dict[str, Dict[str, Any]]:
+        """Digest and imports of every proto file, built on first use"""
+        with self._lock:
+            if self._index is None:
+                self._index = self._scan_proto_tree()
+            return self._index
+
+    def _scan_proto_tree(self) -> Dict[str, Dict[str, Any]]:
+        """Hash proto files, reusing persisted digests for files whose mtime and size are unchanged"""
+        index_path = self.cache_dir / INDEX_FILE
+        try:
+            previous = json.loads(index_path.read_text())
+        except (OSError, ValueError):
+            previous = {}
+
+        index = {}
+        rehashed = 0
         for proto_file in sorted(self.proto_dir.rglob("*.proto")):
-            proto_files.append((str(proto_file.relative_to(self.proto_dir)), proto_file.read_text()))
-        
-        # Hash the combined content
-        for file_path, content in proto_files:
-            hasher.update(file_path.encode())
-            hasher.update(content.encode())
-            
-        return hasher.hexdigest()
-    
-    def _get_cache_path(self, topic: str, proto_file: str) -> Path:
-        """Get cache path for a specific topic/proto combination"""
-        safe_topic = topic.replace('/', '_').replace('-', '_')
-        safe_proto = proto_file.replace('/', '_').replace('.proto', '')
-        return self.cache_dir / f"{safe_topic}_{safe_proto}"
+            relative_path = proto_file.relative_to(self.proto_dir).as_posix()
+            stat = proto_file.stat()
+            entry = previous.get(relative_path)
+            if entry and entry.get('mtime_ns') == stat.st_mtime_ns and entry.get('size') == stat.st_size:
+                index[relative_path] = entry
+                continue
+
+            content = proto_file.read_bytes()
+            index[relative_path] = {
+                'mtime_ns': stat.st_mtime_ns,
+                'size': stat.st_size,
+                'digest': hashlib.md5(content).hexdigest(),
+                'imports': parse_proto_imports(content.decode('utf-8', errors='replace'))
+            }
+            rehashed += 1
+
+        if rehashed or index.keys() != previous.keys():
+            try:
+                index_path.write_text(json.dumps(index))
+            except OSError as e:
+                logger.warning(f"Could not persist proto index: {e}")
+
+        logger.info(f"🔐 Indexed {len(index)} proto files ({rehashed} re-hashed)")
+        return index
+
+    def refresh(self):
+        """Forget the in-process index so the next lookup re-checks the proto tree"""
+        with self._lock:
+            self._index = None
+            self._closure_keys.clear()
+
+    def _resolve_proto(self, proto_file: str) -> Optional[str]:
+        """Index key for a configured proto file, by relative path or by file name"""
+        index = self._get_index()
+        relative_path = Path(proto_file).as_posix()
+        if relative_path in index:
+            return relative_path
+        file_name = os.path.basename(proto_file)
+        for candidate in index:
+            if os.path.basename(candidate) == file_name:
+                return candidate
+        return None
+
+    def get_closure_key(self, proto_file: str) -> Optional[str]:
+        """Hash of a proto file and everything it transitively imports"""
+        root = self._resolve_proto(proto_file)
+        if root is None:
+            return None
+        if root in self._closure_keys:
+            return self._closure_keys[root]
+
+        index = self._get_index()
+        closure = set()
+        pending = [root]
+        while pending:
+            current = pending.pop()
+            if current in closure or current not in index:
+                continue
+            closure.add(current)
+            pending.extend(index[current]['imports'])
+
+        hasher = hashlib.md5()
+        for relative_path in sorted(closure):
+            hasher.update(relative_path.encode())
+            hasher.update(index[relative_path]['digest'].encode())
+        key = hasher.hexdigest()
+        self._closure_keys[root] = key
+        return key
+
+    def _get_cache_path(self, topic: str, proto_file: str) -> Optional[Path]:
+        """Cache path for a proto file's current import closure (shared by topics using the same proto)"""
+        key = self.get_closure_key(proto_file)
+        if key is None:
+            return None
+        return self.cache_dir / f"{self._safe_proto_name(proto_file)}-{key}"
+
+    @staticmethod
+    def _safe_proto_name(proto_file: str) -> str:
+        return proto_file.replace('/', '_').replace('.proto', '')
     
     def is_cache_valid(self, topic: str, proto_file: str) -> bool:
-        """Check if cached compilation is still valid"""
+        """Check if a compilation exists for the proto's current import closure"""
         cache_path = self._get_cache_path(topic, proto_file)
-        hash_file = cache_path / "hash.txt"
-        
-        if not cache_path.exists() or not hash_file.exists():
-            return False
-            
-        try:
-            cached_hash = hash_file.read_text().strip()
-            current_hash = self._get_proto_files_hash()
-            return cached_hash == current_hash
-        except:
+        if cache_path is None:
             return False
+        return (cache_path / "class_info.pkl").exists() and (cache_path / "generated").is_dir()
     
     def save_compilation(self, topic: str, proto_file: str, generated_files: Dict[str, Path], message_class: Any):
         """Save compiled protobuf to cache"""
         cache_path = self._get_cache_path(topic, proto_file)
+        if cache_path is None:
+            return
         cache_path.mkdir(exist_ok=True)
         
         try:
-            # Save hash
-            current_hash = self._get_proto_files_hash()
-            (cache_path / "hash.txt").write_text(current_hash)
+            # Drop entries for older import closures of the same proto
+            for stale_path in self.cache_dir.glob(f"{self._safe_proto_name(proto_file)}-*"):
+                if stale_path != cache_path and stale_path.is_dir():
+                    shutil.rmtree(stale_path, ignore_errors=True)
             
             # Save generated Python files
             py_files_dir = cache_path / "generated"
@@ -124,23 +222,24 @@ class ProtobufCache:
             
             # Add cache directory to Python path temporarily for imports
             import sys
-            original_path = sys.path[:]
-            sys.path.insert(0, str(py_files_dir))
+            with MODULE_IMPORT_LOCK:
+                original_path = sys.path[:]
+                sys.path.insert(0, str(py_files_dir))
             
-            try:
-                spec.loader.exec_module(proto_module)
+                try:
+                    spec.loader.exec_module(proto_module)
                 
-                # Get the message class
-                if hasattr(proto_module, message_type):
-                    message_class = getattr(proto_module, message_type)
-                    logger.info(f"📦 Loaded cached protobuf for topic '{topic}' -> {message_type}")
-                    return message_class
-                else:
-                    logger.warning(f"Message type '{message_type}' not found in cached module")
-                    return None
+                    # Get the message class
+                    if hasattr(proto_module, message_type):
+                        message_class = getattr(proto_module, message_type)
+                        logger.info(f"📦 Loaded cached protobuf for topic '{topic}' -> {message_type}")
+                        return message_class
+                    else:
+                        logger.warning(f"Message type '{message_type}' not found in cached module")
+                        return None
                     
-            finally:
-                sys.path = original_path
+                finally:
+                    sys.path = original_path
                 
         except Exception as e:
             logger.error(f"Failed to load cache for {topic}: {e}")
@@ -151,4 +250,5 @@ class ProtobufCache:
         if self.cache_dir.exists():
             shutil.rmtree(self.cache_dir)
             self.cache_dir.mkdir(exist_ok=True)
-            logger.info("🗑️  Cleared protobuf cache")
\ No newline at end of file
+            logger.info("🗑️  Cleared protobuf cache")
+        self.refresh()
\ No newline at end of file
@@ -6,7 +6,8 @@ import importlib.util
 import tempfile
 import subprocess
 import shutil
-from typing import Dict, Any, Optional, List
+from functools import partial
+from typing import Callable, Dict, Any, Optional, List
 from google.protobuf.message import Message
 from google.protobuf import descriptor_pb2
 from google.protobuf import descriptor_pool
@@ -14,6 +15,9 @@ from google.protobuf import message_factory
 import logging
 from pathlib import Path
 
+from src.protobuf_cache import MODULE_IMPORT_LOCK
+from src.proto_converter import build_projector, message_to_dict
+
 # Set up extensive logging
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
@@ -22,19 +26,72 @@ class ProtobufDecodingError(Exception):
     """Custom exception for protobuf decoding errors"""
     pass
 
+def _read_varint(data: bytes, pos: int) -> tuple:
+    """Read a base-128 varint, returning (value, new position)"""
+    result = 0
+    shift = 0
+    while True:
+        if pos >= len(data) or shift > 63:
+            raise ValueError("Truncated or oversized varint")
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+
+def scan_string_field(data: bytes, field_number: int) -> Optional[str]:
+    """
+    Read a top-level string field straight from the protobuf wire format
+    
+    Only tags are walked; nested messages are skipped without being parsed.
+    Raises ValueError on payloads it cannot walk (malformed data or groups).
+    """
+    value = None
+    pos = 0
+    end = len(data)
+    while pos < end:
+        tag, pos = _read_varint(data, pos)
+        number, wire_type = tag >> 3, tag & 0x7
+        if wire_type == 0:
+            _, pos = _read_varint(data, pos)
+        elif wire_type == 1:
+            pos += 8
+        elif wire_type == 2:
+            length, pos = _read_varint(data, pos)
+            if number == field_number:
+                # Last occurrence wins, as in a full parse
+                value = bytes(data[pos:pos + length]).decode('utf-8')
+            pos += length
+        elif wire_type == 5:
+            pos += 4
+        else:
+            raise ValueError(f"Unsupported wire type {wire_type}")
+    if pos != end:
+        raise ValueError("Truncated field")
+    return value
+
 class ProtobufDecoder:
     """Handles protobuf message decoding for multiple topics with caching"""
 
     def __init__(self, proto_dir: str):
         self.proto_dir = Path(proto_dir)
         self.topic_decoders: Dict[str, 'TopicDecoder'] = {}
+        self.topic_configs: Dict[str, tuple] = {}  # topic -> (proto_file, message_type), for decode workers
+        self.topic_projections: Dict[str, List[str]] = {}  # topic -> configured field paths
+        self.required_fields: List[str] = []  # added to every projection (e.g. the trace id field)
+        self._full_decoders: Dict[str, Callable[[bytes], Dict[str, Any]]] = {}
         
         # Initialize cache
         from src.protobuf_cache import ProtobufCache
         self.cache = ProtobufCache(str(self.proto_dir))
+
+        # Whole-tree in-process compiler, shared with the gRPC proto loader
+        from src.proto_compiler import get_proto_compiler
+        self.compiler = get_proto_compiler(str(self.proto_dir))
         
-    def load_topic_protobuf(self, topic: str, proto_file: str, message_type: str):
-        """Load protobuf definition for a specific topic"""
+    def load_topic_protobuf(self, topic: str, proto_file: str, message_type: str, projection: Optional[List[str]] = None):
+        """Load protobuf definition for a specific topic, optionally decoding only the projected fields"""
         logger.info(f"🔄 Loading protobuf for topic: {topic}")
         logger.info(f"📄 Proto file: {proto_file}")
         logger.info(f"🎯 Message type: {message_type}")
@@ -76,9 +133,15 @@ class ProtobufDecoder:
                 
             logger.info(f"🎯 Using proto file: {proto_path}")
             
-            # Try to load from cache first
-            cached_class = self.cache.load_compilation(topic, proto_file, message_type)
-            if cached_class:
+            # Shared descriptor pool first, then the on-disk cache
+            relative_path = proto_path.relative_to(self.proto_dir).as_posix()
+            pooled_class = self.compiler.get_message_class(relative_path, message_type)
+            cached_class = None if pooled_class else self.cache.load_compilation(topic, proto_file, message_type)
+            if pooled_class:
+                decoder = CachedTopicDecoder(topic, message_type, pooled_class)
+                self.topic_decoders[topic] = decoder
+                logger.info(f"✅ Successfully loaded protobuf decoder for topic '{topic}' from the shared descriptor pool with message type '{message_type}'")
+            elif cached_class:
                 decoder = CachedTopicDecoder(topic, message_type, cached_class)
                 self.topic_decoders[topic] = decoder
                 logger.info(f"✅ Successfully loaded CACHED protobuf decoder for topic '{topic}' with message type '{message_type}'")
@@ -87,6 +150,9 @@ class ProtobufDecoder:
                 decoder = TopicDecoder(str(proto_path), message_type, self.cache, topic, proto_file)
                 self.topic_decoders[topic] = decoder
                 logger.info(f"✅ Successfully loaded and CACHED protobuf decoder for topic '{topic}' with message type '{message_type}'")
+
+            self.topic_configs[topic] = (proto_file, message_type)
+            self.set_projection(topic, projection)
             
         except Exception as e:
             logger.error(f"💥 Failed to load protobuf for topic '{topic}': {str(e)}")
@@ -95,13 +161,14 @@ class ProtobufDecoder:
                 logger.error(f"🔴 Caused by: {e.__cause__}")
             raise
 
-    def decode_message(self, topic: str, message_bytes: bytes) -> Dict[str, Any]:
+    def decode_message(self, topic: str, message_bytes: bytes, full: bool = False) -> Dict[str, Any]:
         """
         Decode protobuf message for a specific topic
         
         Args:
             topic: Kafka topic name
             message_bytes: Raw message bytes
+            full: Decode every field even if the topic has a projection
             
         Returns:
             Decoded message as dictionary
@@ -109,7 +176,81 @@ class ProtobufDecoder:
         if topic not in self.topic_decoders:
             raise ValueError(f"No protobuf decoder loaded for topic: {topic}")
             
-        return self.topic_decoders[topic].decode_message(message_bytes)
+        return self.topic_decoders[topic].decode_message(message_bytes, full=full)
+
+    def set_projection(self, topic: str, paths: Optional[List[str]]):
+        """Decode only these dot-separated field paths for a topic (None or empty decodes everything)"""
+        topic_decoder = self.topic_decoders[topic]
+        self._full_decoders.pop(topic, None)
+        if not paths:
+            self.topic_projections.pop(topic, None)
+            topic_decoder.projector = None
+            return
+
+        self.topic_projections[topic] = list(paths)
+        effective = list(dict.fromkeys(list(paths) + self.required_fields))
+        topic_decoder.projector, unknown = build_projector(topic_decoder.message_class.DESCRIPTOR, effective)
+        unknown = [path for path in unknown if path not in self.required_fields]
+        if unknown:
+            logger.warning(f"⚠️  Ignoring projection fields not in {topic_decoder.message_type} for topic '{topic}': {unknown}")
+        logger.info(f"✂️  Topic '{topic}' decodes projected fields: {[path for path in effective if path not in unknown]}")
+
+    def require_fields(self, *paths: str):
+        """Always include these field paths in projections (fields missing from a message type are skipped)"""
+        added = [path for path in paths if path and path not in self.required_fields]
+        if not added:
+            return
+        self.required_fields.extend(added)
+        for topic, configured in list(self.topic_projections.items()):
+            self.set_projection(topic, configured)
+
+    def full_decoder(self, topic: str) -> Optional[Callable[[bytes], Dict[str, Any]]]:
+        """Shared callable decoding a topic's payload in full, or None if the topic is not projected"""
+        if topic not in self.topic_projections:
+            return None
+        decoder = self._full_decoders.get(topic)
+        if decoder is None:
+            decoder = self._full_decoders[topic] = partial(self.decode_message, topic, full=True)
+        return decoder
+
+    def extract_field(self, topic: str, message_bytes: bytes, field_name: str) -> Optional[Any]:
+        """
+        Extract a single top-level field without decoding the whole message
+        
+        String fields are read with a wire-format scan; anything else falls
+        back to a full decode.
+        
+        Args:
+            topic: Kafka topic name
+            message_bytes: Raw message bytes
+            field_name: Proto field name (as it appears in decoded dicts)
+            
+        Returns:
+            Field value, or None when the message does not set it
+        """
+        if topic not in self.topic_decoders:
+            raise ValueError(f"No protobuf decoder loaded for topic: {topic}")
+        
+        message_class = self.topic_decoders[topic].message_class
+        field = message_class.DESCRIPTOR.fields_by_name.get(field_name) if message_class else None
+        if field is None:
+            return None
+        
+        if field.type == field.TYPE_STRING and not field.is_repeated:
+            try:
+                return scan_string_field(message_bytes, field.number)
+            except ValueError as e:
+                logger.debug(f"Wire scan failed for {topic}.{field_name}, decoding fully: {e}")
+        
+        return self.decode_message(topic, message_bytes, full=True).get(field_name)
+
+    def share_topic_decoder(self, topic: str, source_topic: str):
+        """Decode a topic with the message class already loaded for another topic"""
+        proto_file, message_type = self.topic_configs[source_topic]
+        message_class = self.topic_decoders[source_topic].message_class
+        self.topic_decoders[topic] = CachedTopicDecoder(topic, message_type, message_class)
+        self.topic_configs[topic] = (proto_file, message_type)
+        self.set_projection(topic, None)
 
     def get_available_topics(self) -> List[str]:
         """Get list of topics with loaded protobuf decoders"""
@@ -122,12 +263,15 @@ class CachedTopicDecoder:
         self.topic = topic
         self.message_type = message_type
         self.message_class = message_class
+        self.projector = None  # Set by ProtobufDecoder.set_projection
     
-    def decode_message(self, message_bytes: bytes) -> Dict[str, Any]:
+    def decode_message(self, message_bytes: bytes, full: bool = False) -> Dict[str, Any]:
         """Decode protobuf message to dictionary using cached class"""
         try:
             message_obj = self.message_class()
             message_obj.ParseFromString(message_bytes)
+            if self.projector is not None and not full:
+                return self.projector(message_obj)
             return self._message_to_dict(message_obj)
         except Exception as e:
             logger.error(f"Failed to decode protobuf message for {self.topic}: {e}")
@@ -135,8 +279,7 @@ class CachedTopicDecoder:
     
     def _message_to_dict(self, message: Message) -> Dict[str, Any]:
         """Convert protobuf message to dictionary"""
-        from google.protobuf.json_format import MessageToDict
-        return MessageToDict(message, preserving_proto_field_name=True)
+        return message_to_dict(message)
 
 class TopicDecoder:
     """Handles protobuf decoding for a single topic with caching support"""
@@ -148,6 +291,7 @@ class TopicDecoder:
         self.cache = cache
         self.topic = topic
         self.proto_file = proto_file
+        self.projector = None  # Set by ProtobufDecoder.set_projection
         self._load_proto_definition()
 
     def _load_proto_definition(self):
@@ -255,39 +399,41 @@ class TopicDecoder:
                 logger.debug(f"📦 Loading module: {module_name}")
                 
                 # Add the temp directory to Python path temporarily to handle imports
+                # (sys.path is process-wide, so concurrent loads take turns)
                 import sys
-                original_path = sys.path[:]
-                temp_dir_added = False
+                with MODULE_IMPORT_LOCK:
+                    original_path = sys.path[:]
+                    temp_dir_added = False
                 
-                try:
-                    # Add temp directory to sys.path for imports
-                    if temp_dir not in sys.path:
-                        sys.path.insert(0, temp_dir)
-                        temp_dir_added = True
-                        logger.debug(f"🔗 Added temp directory to Python path: {temp_dir}")
+                    try:
+                        # Add temp directory to sys.path for imports
+                        if temp_dir not in sys.path:
+                            sys.path.insert(0, temp_dir)
+                            temp_dir_added = True
+                            logger.debug(f"🔗 Added temp directory to Python path: {temp_dir}")
                     
-                    # Add the directory containing the generated files to path
-                    generated_dir = os.path.dirname(target_py_file)
-                    if generated_dir not in sys.path:
-                        sys.path.insert(0, generated_dir)
-                        logger.debug(f"🔗 Added generated directory to Python path: {generated_dir}")
+                        # Add the directory containing the generated files to path
+                        generated_dir = os.path.dirname(target_py_file)
+                        if generated_dir not in sys.path:
+                            sys.path.insert(0, generated_dir)
+                            logger.debug(f"🔗 Added generated directory to Python path: {generated_dir}")
                     
-                    # Also add the parent directory for relative imports
-                    parent_dir = os.path.dirname(generated_dir)
-                    if parent_dir not in sys.path:
-                        sys.path.insert(0, parent_dir)
-                        logger.debug(f"🔗 Added parent directory to Python path: {parent_dir}")
+                        # Also add the parent directory for relative imports
+                        parent_dir = os.path.dirname(generated_dir)
+                        if parent_dir not in sys.path:
+                            sys.path.insert(0, parent_dir)
+                            logger.debug(f"🔗 Added parent directory to Python path: {parent_dir}")
                     
-                    logger.debug(f"🐍 Current Python path: {sys.path[:5]}...")  # Show first 5 entries
+                        logger.debug(f"🐍 Current Python path: {sys.path[:5]}...")  # Show first 5 entries
                     
-                    spec.loader.exec_module(proto_module)
-                    logger.debug(f"✅ Module loaded successfully")
+                        spec.loader.exec_module(proto_module)
+                        logger.debug(f"✅ Module loaded successfully")
                     
-                finally:
-                    # Restore original Python path
-                    if temp_dir_added:
-                        sys.path = original_path
-                        logger.debug(f"🔄 Restored original Python path")
+                    finally:
+                        # Restore original Python path
+                        if temp_dir_added:
+                            sys.path = original_path
+                            logger.debug(f"🔄 Restored original Python path")
                 
                 # Get the specific message class
                 if hasattr(proto_module, self.message_type):
@@ -330,24 +476,18 @@ class TopicDecoder:
         dependencies = []
         
         try:
-            content = proto_file.read_text()
-            lines = content.split('\n')
-            
-            for line in lines:
-                line = line.strip()
-                if line.startswith('import "') and line.endswith('";'):
-                    # Extract import path
-                    import_path = line[8:-2]  # Remove 'import "' and '";'
+            from src.protobuf_cache import parse_proto_imports
+
+            for import_path in parse_proto_imports(proto_file.read_text()):
+                # Check if the imported file exists
+                imported_file = proto_root / import_path
+                if imported_file.exists():
+                    dependencies.append(import_path)
+                    logger.debug(f"🔗 Found dependency: {import_path}")
                     
-                    # Check if the imported file exists
-                    imported_file = proto_root / import_path
-                    if imported_file.exists():
-                        dependencies.append(import_path)
-                        logger.debug(f"🔗 Found dependency: {import_path}")
-                        
-                        # Recursively find dependencies of dependencies
-                        sub_deps = self._find_dependencies(imported_file, proto_root)
-                        dependencies.extend(sub_deps)
+                    # Recursively find dependencies of dependencies
+                    sub_deps = self._find_dependencies(imported_file, proto_root)
+                    dependencies.extend(sub_deps)
             
         except Exception as e:
             logger.warning(f"Could not analyze dependencies for {proto_file}: {e}")
@@ -362,12 +502,13 @@ class TopicDecoder:
         
         return unique_deps
 
-    def decode_message(self, message_bytes: bytes) -> Dict[str, Any]:
+    def decode_message(self, message_bytes: bytes, full: bool = False) -> Dict[str, Any]:
         """
         Decode protobuf message to dictionary
         
         Args:
             message_bytes: Raw message bytes
+            full: Decode every field even if a projection is set
             
         Returns:
             Decoded message as dictionary
@@ -379,6 +520,8 @@ class TopicDecoder:
             message_obj = self.message_class()
             message_obj.ParseFromString(message_bytes)
             
+            if self.projector is not None and not full:
+                return self.projector(message_obj)
             return self._message_to_dict(message_obj)
 
         except Exception as e:
@@ -387,8 +530,7 @@ class TopicDecoder:
 
     def _message_to_dict(self, message: Message) -> Dict[str, Any]:
         """Convert protobuf message to dictionary"""
-        from google.protobuf.json_format import MessageToDict
-        return MessageToDict(message, preserving_proto_field_name=True)
+        return message_to_dict(message)
 
 class MockProtobufDecoder:
     """Mock decoder for development and testing"""
@@ -0,0 +1,147 @@
+"""
+Worker threads for TraceGraphBuilder reads
+
+Endpoints await builder methods through a BuilderReadPool rather than
+calling them on the event loop. A call that computes a result runs on a
+worker thread holding the builder lock, so it sees the state between two
+applied batches and never a dictionary that changes size under it.
+
+Results of shared reads are published as immutable snapshots keyed by the
+builder version, the topology version and the current second. Concurrent
+or repeated requests for the same view await the same result instead of
+computing it again. A shared read waits only briefly for the lock: while
+the writer (or another read) keeps holding it, the read is answered with
+the last snapshot published for the same method and arguments, provided
+that snapshot misses no more than the batch being applied. A snapshot that
+lags further, or that already answered `max_stale_reads` reads in a row,
+is not served again; the read then waits for the lock, so under steady
+ingest a view can trail by one batch but never drift. A view that was
+never published always waits.
+"""
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class BuilderReadPool:
+    """Runs TraceGraphBuilder reads on worker threads and shares results per builder version"""
+
+    def __init__(self, get_builder: Callable[[], Any], workers: int = 4, cache_size: int = 64,
+                 lock_wait: float = 0.02, max_stale_reads: int = 5):
+        self.get_builder = get_builder  # The current TraceGraphBuilder
+        self.workers = workers
+        self.cache_size = cache_size
+        self.lock_wait = lock_wait  # Seconds a shared read waits for the lock before using its snapshot
+        self.max_stale_reads = max_stale_reads  # Consecutive snapshot answers per view before a read waits
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="builder-read")
+        self._results: "OrderedDict[tuple, asyncio.Future]" = OrderedDict()
+        # (method, args, kwargs) -> (builder, version key, result) of the last computed shared read
+        self._published: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._published_lock = threading.Lock()
+        self._stale_hits: Dict[tuple, int] = {}  # View -> snapshot answers since it was last computed
+        self.reads = 0
+        self.shared = 0
+        self.stale = 0
+        self.stale_refused = 0
+
+    def configure(self, settings: Dict[str, Any]):
+        """Apply the `read_pool` block of settings.yaml before the first read"""
+        workers = max(1, int(settings.get('workers', self.workers)))
+        if workers != self.workers:
+            self.executor.shutdown(wait=False)
+            self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="builder-read")
+            self.workers = workers
+        self.cache_size = int(settings.get('cache_size', self.cache_size))
+        self.lock_wait = float(settings.get('lock_wait_ms', self.lock_wait * 1000)) / 1000
+        self.max_stale_reads = int(settings.get('max_stale_reads', self.max_stale_reads))
+
+    async def read(self, method: str, *args, shared: bool = True, **kwargs) -> Any:
+        """Call builder.<method>(*args, **kwargs) on a worker thread under the builder lock
+
+        With `shared`, a call equal to one made for the same builder version
+        within the same second returns that call's result, and a call made
+        while the lock stays held may return the last published result.
+        """
+        builder = self.get_builder()
+        loop = asyncio.get_running_loop()
+        self.reads += 1
+        if not shared:
+            return (await loop.run_in_executor(self.executor, self._call, builder, method, args, kwargs))[0]
+
+        view = (method, args, tuple(sorted(kwargs.items())))
+        key = (id(builder), builder.version, builder.topic_graph.version, int(time.time())) + view
+        future = self._results.get(key)
+        if future is not None and future.get_loop() is loop:
+            self.shared += 1
+        else:
+            future = loop.run_in_executor(self.executor, self._call, builder, method, args, kwargs, view)
+            # Failed reads and stale snapshots are not shared under this version
+            future.add_done_callback(
+                lambda f: f.cancelled() or (f.exception() is None and f.result()[1]) or self._results.pop(key, None))
+            self._results[key] = future
+            while len(self._results) > self.cache_size:
+                self._results.popitem(last=False)
+        # A cancelled request must not cancel the result other requests await
+        return (await asyncio.shield(future))[0]
+
+    def _call(self, builder, method: str, args: tuple, kwargs: Dict[str, Any],
+              view: Optional[tuple] = None) -> Tuple[Any, bool]:
+        """(result, whether it reflects the current version) of one read"""
+        published = self._published.get(view) if view is not None else None
+        if published is not None and published[0] is builder:
+            if not builder.lock.acquire(timeout=self.lock_wait):
+                if self._serve_stale(view, published):
+                    return published[2], False
+                builder.lock.acquire()
+        else:
+            builder.lock.acquire()
+        try:
+            version = (builder.version, builder.topic_graph.version, int(time.time()))
+            if published is not None and published[0] is builder and published[1] == version:
+                return published[2], True
+            result = getattr(builder, method)(*args, **kwargs)
+        finally:
+            builder.lock.release()
+
+        if view is not None:
+            with self._published_lock:
+                self._published[view] = (builder, version, result)
+                self._published.move_to_end(view)
+                self._stale_hits.pop(view, None)
+                while len(self._published) > self.cache_size:
+                    self._stale_hits.pop(self._published.popitem(last=False)[0], None)
+        return result, True
+
+    def _serve_stale(self, view: tuple, published: tuple) -> bool:
+        """Whether a read that timed out on the lock may be answered with its published snapshot"""
+        builder, (version, _, _), _ = published
+        with self._published_lock:
+            hits = self._stale_hits.get(view, 0)
+            # The builder version only advances once a batch is applied, so an equal
+            # version means the snapshot misses at most the batch holding the lock
+            if hits >= self.max_stale_reads or builder.version != version:
+                self.stale_refused += 1
+                return False
+            self._stale_hits[view] = hits + 1
+            self.stale += 1
+            return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'workers': self.workers,
+            'reads': self.reads,
+            'shared': self.shared,
+            'stale': self.stale,
+            'stale_refused': self.stale_refused,
+            'cached_results': len(self._results),
+            'published_views': len(self._published)
+        }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,241 @@
+"""
+Streaming summaries used by the trace statistics: a mergeable quantile sketch,
+a bounded top-K tracker and time-bucket rings
+"""
+import bisect
+import heapq
+import math
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class DDSketch:
+    """
+    Quantile sketch with relative-error guarantees (DDSketch, Masson et al. 2019)
+
+    Values are counted in logarithmically sized bins, so a quantile is returned
+    within `relative_accuracy` of the true value. Bins only hold counts, which
+    makes sketches mergeable by addition and lets a value be removed again.
+    Bin keys are also kept in sorted order, so quantiles walk them directly.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01, max_bins: int = 2048, min_value: float = 1e-6):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.max_bins = max_bins
+        self.min_value = min_value
+        self.bins: Dict[int, int] = {}
+        self._keys: List[int] = []  # Keys of self.bins, ascending
+        self.zero_count = 0
+        self.count = 0
+
+    def _key(self, value: float) -> int:
+        return math.ceil(math.log(value) / self._log_gamma)
+
+    def _value(self, key: int) -> float:
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def add(self, value: float, count: int = 1):
+        """Count a non-negative value"""
+        self.count += count
+        if value < self.min_value:
+            self.zero_count += count
+            return
+        key = self._key(value)
+        current = self.bins.get(key)
+        if current is None:
+            bisect.insort(self._keys, key)
+            self.bins[key] = count
+            if len(self.bins) > self.max_bins:
+                self._collapse()
+        else:
+            self.bins[key] = current + count
+
+    def remove(self, value: float, count: int = 1):
+        """Uncount a value previously passed to add()"""
+        if value < self.min_value:
+            removed = min(count, self.zero_count)
+            self.zero_count -= removed
+        else:
+            key = self._key(value)
+            if key not in self.bins:
+                # The value's bin was folded into the lowest bin by _collapse
+                if not self._keys or key > self._keys[0]:
+                    return
+                key = self._keys[0]
+            current = self.bins[key]
+            removed = min(count, current)
+            if current - removed > 0:
+                self.bins[key] = current - removed
+            else:
+                del self.bins[key]
+                del self._keys[bisect.bisect_left(self._keys, key)]
+        self.count -= removed
+
+    def _collapse(self):
+        """Fold the lowest bins together to respect max_bins"""
+        excess = len(self._keys) - self.max_bins + 1
+        target = self._keys[excess]
+        for key in self._keys[:excess]:
+            self.bins[target] += self.bins.pop(key)
+        del self._keys[:excess]
+
+    def merge(self, other: 'DDSketch'):
+        """Add another sketch's counts to this one"""
+        if other.gamma != self.gamma:
+            raise ValueError("Cannot merge sketches with different relative accuracy")
+        added = False
+        for key, count in other.bins.items():
+            current = self.bins.get(key)
+            added = added or current is None
+            self.bins[key] = (current or 0) + count
+        if added:
+            self._keys = sorted(self.bins)
+        self.zero_count += other.zero_count
+        self.count += other.count
+        if len(self.bins) > self.max_bins:
+            self._collapse()
+
+    def copy(self) -> 'DDSketch':
+        sketch = DDSketch(self.relative_accuracy, self.max_bins, self.min_value)
+        sketch.bins = dict(self.bins)
+        sketch._keys = list(self._keys)
+        sketch.zero_count = self.zero_count
+        sketch.count = self.count
+        return sketch
+
+    @classmethod
+    def merged(cls, sketches: Iterable['DDSketch']) -> 'DDSketch':
+        """Merge several sketches into a new one"""
+        result = None
+        for sketch in sketches:
+            if result is None:
+                result = sketch.copy()
+            else:
+                result.merge(sketch)
+        return result if result is not None else cls()
+
+    def quantile(self, q: float) -> float:
+        """Approximate q-quantile (0 <= q <= 1); 0 for an empty sketch"""
+        return self.quantiles([q])[0]
+
+    def quantiles(self, qs: Iterable[float]) -> List[float]:
+        """Approximate quantiles, answered in one walk over the sorted bins"""
+        qs = list(qs)
+        results: List[float] = [0] * len(qs)
+        if self.count <= 0:
+            return results
+        seen = self.zero_count
+        index = 0
+        keys = self._keys
+        for position in sorted(range(len(qs)), key=qs.__getitem__):
+            rank = qs[position] * (self.count - 1)
+            if rank < self.zero_count:
+                continue
+            while index < len(keys) - 1 and seen + self.bins[keys[index]] <= rank:
+                seen += self.bins[keys[index]]
+                index += 1
+            results[position] = self._value(keys[index])
+        return results
+
+
+class TopK:
+    """
+    Largest values per key, for "slowest traces" lists
+
+    Keeps a bounded min-heap of candidate (value, key) entries next to the
+    current value of every key. Entries whose key was removed or whose value
+    changed are skipped when read; if too few valid entries remain, the heap
+    is rebuilt from the current values.
+    """
+
+    def __init__(self, k: int = 3, capacity: Optional[int] = None):
+        self.k = k
+        self.capacity = capacity or k * 4
+        self.values: Dict[str, Tuple[float, object]] = {}  # key -> (value, payload)
+        self._heap: List[Tuple[float, str]] = []
+
+    def set(self, key: str, value: float, payload: object = None):
+        previous = self.values.get(key)
+        self.values[key] = (value, payload)
+        if previous is not None and previous[0] == value:
+            return
+        if len(self._heap) < self.capacity:
+            heapq.heappush(self._heap, (value, key))
+        elif value > self._heap[0][0]:
+            heapq.heapreplace(self._heap, (value, key))
+
+    def discard(self, key: str):
+        self.values.pop(key, None)
+
+    def _valid(self) -> List[Tuple[float, str]]:
+        valid = []
+        seen = set()
+        for value, key in self._heap:
+            current = self.values.get(key)
+            if current is not None and current[0] == value and key not in seen:
+                valid.append((value, key))
+                seen.add(key)
+        return valid
+
+    def top(self) -> List[Tuple[str, float, object]]:
+        """Up to k (key, value, payload) tuples, largest value first"""
+        valid = self._valid()
+        if len(valid) < min(self.k, len(self.values)):
+            valid = heapq.nlargest(self.capacity, ((v, key) for key, (v, _) in self.values.items()))
+            self._heap = list(valid)
+            heapq.heapify(self._heap)
+        top = heapq.nlargest(self.k, valid)
+        return [(key, value, self.values[key][1]) for value, key in top]
+
+
+class TimeBucketRing:
+    """
+    Fixed number of time buckets of equal width, reused round-robin
+
+    Each slot remembers which bucket index it currently holds, so buckets
+    that fell out of the ring are recognised and replaced lazily.
+    """
+
+    def __init__(self, resolution: float, size: int, factory):
+        self.resolution = resolution
+        self.size = size
+        self.factory = factory
+        self._slots: List[object] = [None] * size
+        self._indexes: List[int] = [-1] * size
+
+    @property
+    def span(self) -> float:
+        """Seconds covered by the ring"""
+        return self.resolution * self.size
+
+    def bucket(self, ts: float):
+        """Bucket holding timestamp ts, or None if it is older than the ring"""
+        index = int(ts // self.resolution)
+        position = index % self.size
+        current = self._indexes[position]
+        if current == index:
+            return self._slots[position]
+        if current > index:
+            return None
+        self._slots[position] = self.factory()
+        self._indexes[position] = index
+        return self._slots[position]
+
+    def get(self, ts: float):
+        """Bucket holding timestamp ts if the ring still has it, without creating one"""
+        index = int(ts // self.resolution)
+        position = index % self.size
+        return self._slots[position] if self._indexes[position] == index else None
+
+    def since(self, start_ts: float) -> List[object]:
+        """Buckets overlapping [start_ts, ...), including ones ahead of the clock"""
+        first_index = int(start_ts // self.resolution)
+        return [
+            slot for slot, index in zip(self._slots, self._indexes)
+            if slot is not None and index >= first_index
+        ]
+
+    def clear(self):
+        self._slots = [None] * self.size
+        self._indexes = [-1] * self.size
@@ -0,0 +1,232 @@
+"""
+Secondary indexes over retained traces: by end time, topic and message key
+
+Time-ordered indexes are bucketed sorted lists of (end_us, trace_id)
+entries: finding a position is a bisect over bucket maxima and then within
+one bucket, and inserting or deleting shifts at most one bucket. When a
+trace's end time advances its entry moves; as messages mostly arrive in
+time order that is a delete and an append near the tail.
+"""
+from bisect import bisect_left, bisect_right, insort
+from typing import Dict, Iterator, List, Mapping, Optional, Tuple, Union
+
+from src.models import KafkaMessage, TraceInfo
+
+Entry = Tuple[int, str]  # (end_us, trace_id)
+
+BUCKET_SIZE = 512
+
+
+class TimeOrderedIds:
+    """Sorted (end_us, trace_id) entries in buckets of bounded size"""
+
+    def __init__(self):
+        self._buckets: List[List[Entry]] = []
+        self._maxes: List[Entry] = []
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def add(self, entry: Entry):
+        buckets = self._buckets
+        if not buckets:
+            buckets.append([entry])
+            self._maxes.append(entry)
+        elif entry > self._maxes[-1]:
+            # The common case: the newest entry goes at the tail
+            bucket = buckets[-1]
+            bucket.append(entry)
+            self._maxes[-1] = entry
+            if len(bucket) > 2 * BUCKET_SIZE:
+                buckets[-1:] = [bucket[:BUCKET_SIZE], bucket[BUCKET_SIZE:]]
+                self._maxes[-1:] = [bucket[BUCKET_SIZE - 1], bucket[-1]]
+        else:
+            pos = bisect_right(self._maxes, entry)
+            if pos == len(buckets):
+                pos -= 1
+                buckets[pos].append(entry)
+                self._maxes[pos] = entry
+            else:
+                insort(buckets[pos], entry)
+            if len(buckets[pos]) > 2 * BUCKET_SIZE:
+                bucket = buckets[pos]
+                buckets[pos:pos + 1] = [bucket[:BUCKET_SIZE], bucket[BUCKET_SIZE:]]
+                self._maxes[pos:pos + 1] = [bucket[BUCKET_SIZE - 1], bucket[-1]]
+        self.size += 1
+
+    def discard(self, entry: Entry):
+        pos = bisect_left(self._maxes, entry)
+        if pos == len(self._buckets):
+            return
+        bucket = self._buckets[pos]
+        index = bisect_left(bucket, entry)
+        if bucket[index] != entry:
+            return
+        del bucket[index]
+        self.size -= 1
+        if not bucket:
+            del self._buckets[pos]
+            del self._maxes[pos]
+        elif index == len(bucket):
+            self._maxes[pos] = bucket[-1]
+
+    def descending(self, below: Optional[Entry] = None) -> Iterator[Entry]:
+        """Entries from the newest down, starting strictly below `below` when given"""
+        buckets = self._buckets
+        if below is None:
+            pos, index = len(buckets) - 1, None
+        else:
+            pos = bisect_left(self._maxes, below)
+            if pos == len(buckets):
+                pos, index = pos - 1, None
+            else:
+                index = bisect_left(buckets[pos], below)
+        while pos >= 0:
+            bucket = buckets[pos]
+            for i in range(len(bucket) - 1 if index is None else index - 1, -1, -1):
+                yield bucket[i]
+            pos, index = pos - 1, None
+
+    def __iter__(self) -> Iterator[Entry]:
+        for bucket in self._buckets:
+            yield from bucket
+
+
+class TraceIndex:
+    """Indexes of the traces in a trace_id -> TraceInfo mapping, kept in step by TraceGraphBuilder
+
+    Every retained trace has exactly one entry, at its current end time, in
+    the time index and in the index of each of its topics.
+    """
+
+    def __init__(self, traces: Mapping[str, TraceInfo]):
+        self.traces = traces
+        self.by_time = TimeOrderedIds()
+        self.by_topic: Dict[str, TimeOrderedIds] = {}
+        # key -> trace id, or an ordered set of trace ids once the key is seen in several traces
+        self.by_key: Dict[str, Union[str, Dict[str, None]]] = {}
+
+    # ------------------------------------------------------------------
+    # Updates
+    # ------------------------------------------------------------------
+
+    def message_added(self, trace: TraceInfo, message: KafkaMessage, previous_end_us: Optional[int], new_topic: bool):
+        """Index a message just added to a trace, given the trace's end time and topics before it"""
+        trace_id = trace.trace_id
+        if message.key is not None:
+            self._add_key(message.key, trace_id)
+
+        entry = (trace.end_us, trace_id)
+        if trace.end_us != previous_end_us:
+            previous = (previous_end_us, trace_id)
+            if previous_end_us is not None:
+                self.by_time.discard(previous)
+            self.by_time.add(entry)
+            for topic in trace.topic_set:
+                index = self._topic_index(topic)
+                if previous_end_us is not None and not (new_topic and topic == message.topic):
+                    index.discard(previous)
+                index.add(entry)
+        elif new_topic:
+            self._topic_index(message.topic).add(entry)
+
+    def trace_added(self, trace: TraceInfo):
+        """Index a fully built trace"""
+        entry = (trace.end_us, trace.trace_id)
+        if trace.end_us is not None:
+            self.by_time.add(entry)
+            for topic in trace.topic_set:
+                self._topic_index(topic).add(entry)
+        for message in trace.messages:
+            if message.key is not None:
+                self._add_key(message.key, trace.trace_id)
+
+    def trace_removed(self, trace: TraceInfo):
+        """Retract a trace that was dropped from the mapping"""
+        entry = (trace.end_us, trace.trace_id)
+        if trace.end_us is not None:
+            self.by_time.discard(entry)
+            for topic in trace.topic_set:
+                index = self.by_topic.get(topic)
+                if index is not None:
+                    index.discard(entry)
+        for message in trace.messages:
+            key = message.key
+            trace_ids = self.by_key.get(key) if key is not None else None
+            if trace_ids is None:
+                continue
+            if type(trace_ids) is str:
+                if trace_ids == trace.trace_id:
+                    del self.by_key[key]
+            else:
+                trace_ids.pop(trace.trace_id, None)
+                if not trace_ids:
+                    del self.by_key[key]
+
+    def clear(self):
+        self.by_time = TimeOrderedIds()
+        self.by_topic.clear()
+        self.by_key.clear()
+
+    def _add_key(self, key: str, trace_id: str):
+        trace_ids = self.by_key.get(key)
+        if trace_ids is None:
+            self.by_key[key] = trace_id
+        elif type(trace_ids) is str:
+            if trace_ids != trace_id:
+                self.by_key[key] = {trace_ids: None, trace_id: None}
+        else:
+            trace_ids[trace_id] = None
+
+    def _topic_index(self, topic: str) -> TimeOrderedIds:
+        index = self.by_topic.get(topic)
+        if index is None:
+            index = self.by_topic[topic] = TimeOrderedIds()
+        return index
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def query(self, topic: Optional[str] = None, key: Optional[str] = None,
+              start_us: Optional[int] = None, end_us: Optional[int] = None,
+              limit: Optional[int] = None, cursor: Optional[Entry] = None) -> Tuple[List[TraceInfo], Optional[Entry]]:
+        """Traces matching every given filter, most recently active first
+
+        The time range applies to a trace's end time. Returns at most `limit`
+        traces and, when more match, the cursor to pass for the next page.
+        """
+        below = cursor
+        if end_us is not None and (below is None or (end_us + 1, '') < below):
+            below = (end_us + 1, '')
+
+        if key is not None:
+            entries = self._key_entries(key, topic, below)
+        else:
+            index = self.by_time if topic is None else self.by_topic.get(topic)
+            entries = index.descending(below) if index is not None else iter(())
+
+        results: List[TraceInfo] = []
+        for end, trace_id in entries:
+            if start_us is not None and end < start_us:
+                break
+            if limit is not None and len(results) == limit:
+                last = results[-1]
+                return results, (last.end_us, last.trace_id)
+            results.append(self.traces[trace_id])
+        return results, None
+
+    def _key_entries(self, key: str, topic: Optional[str], below: Optional[Entry]) -> Iterator[Entry]:
+        """Entries of the traces holding a message with the key, newest first"""
+        trace_ids = self.by_key.get(key, ())
+        entries = []
+        for trace_id in (trace_ids,) if type(trace_ids) is str else trace_ids:
+            trace = self.traces.get(trace_id)
+            if trace is None or trace.end_us is None or (topic is not None and topic not in trace.topic_set):
+                continue
+            entry = (trace.end_us, trace_id)
+            if below is None or entry < below:
+                entries.append(entry)
+        entries.sort(reverse=True)
+        return iter(entries)
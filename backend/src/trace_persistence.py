@@ -0,0 +1,230 @@
+"""
+Persistent SQLite store of consumed messages and consumer offset checkpoints
+
+Every batch handed to TraceGraphBuilder.add_messages is written in one
+transaction together with the next offset to consume for each partition,
+so on restart the in-memory traces are rebuilt from the store and the
+consumer resumes exactly where the stored messages end.
+"""
+import json
+import logging
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from functools import partial
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from src.models import KafkaMessage, TraceInfo, from_epoch_us, to_epoch_us
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_VERSION = 1
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    trace_id TEXT NOT NULL,
+    topic TEXT NOT NULL,
+    kafka_partition INTEGER NOT NULL,
+    kafka_offset INTEGER NOT NULL,
+    key TEXT,
+    timestamp_us INTEGER NOT NULL,
+    headers TEXT,
+    raw_value BLOB,
+    decoded_value TEXT,
+    projected INTEGER NOT NULL DEFAULT 0,
+    UNIQUE (topic, kafka_partition, kafka_offset)
+);
+CREATE INDEX IF NOT EXISTS messages_trace ON messages (trace_id);
+CREATE TABLE IF NOT EXISTS traces (
+    trace_id TEXT PRIMARY KEY,
+    last_us INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS traces_last ON traces (last_us);
+CREATE TABLE IF NOT EXISTS offsets (
+    topic TEXT NOT NULL,
+    kafka_partition INTEGER NOT NULL,
+    next_offset INTEGER NOT NULL,
+    PRIMARY KEY (topic, kafka_partition)
+);
+"""
+
+MESSAGE_COLUMNS = "trace_id, topic, kafka_partition, kafka_offset, key, timestamp_us, headers, raw_value, decoded_value, projected"
+# SQLite's default limit on host parameters per statement is 999
+LOAD_CHUNK = 500
+
+
+class TracePersistence:
+    """SQLite-backed message log with per-partition offset checkpoints"""
+
+    def __init__(self, path: str, retention_hours: float = 24, prune_interval: float = 60):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.retention_us = int(retention_hours * 3600 * 1_000_000)
+        self.prune_interval = prune_interval
+        self._last_prune = 0.0
+        # Per-topic decode functions of stored messages, bound late so recovered messages can use them
+        self.decoders: Dict[str, Tuple[Optional[Callable], Optional[Callable]]] = {}
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+        if version not in (0, SCHEMA_VERSION):
+            raise RuntimeError(f"Unsupported trace store schema version {version} in {self.path}")
+        self._conn.executescript(SCHEMA)
+        self._conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+        self._conn.commit()
+        # Ids of the stored traces, so looking up a trace that was never stored costs no query
+        self._trace_ids: Set[str] = {row[0] for row in self._conn.execute("SELECT trace_id FROM traces")}
+
+        self.stored_messages = 0
+        self.pruned_traces = 0
+        logger.info(f"🗄️ Trace store: {self.path} (retention {retention_hours}h)")
+
+    def append(self, messages: List[KafkaMessage], consumed: Iterable[KafkaMessage] = ()):
+        """Store messages and checkpoint offsets past every consumed message, in one transaction
+
+        `consumed` also covers messages that were read but not retained (e.g.
+        from unmonitored topics) so they are not consumed again on restart.
+        """
+        next_offsets: Dict[Tuple[str, int], int] = {}
+        for msg in (*messages, *consumed):
+            key = (msg.topic, msg.partition)
+            if msg.offset + 1 > next_offsets.get(key, -1):
+                next_offsets[key] = msg.offset + 1
+
+        rows = []
+        last_us: Dict[str, int] = {}
+        for msg in messages:
+            if msg.decode_fn is not None or msg.full_decode_fn is not None:
+                self.decoders[msg.topic] = (msg.decode_fn, msg.full_decode_fn)
+            rows.append(self._message_row(msg))
+            if msg.timestamp_us > last_us.get(msg.trace_id, -1):
+                last_us[msg.trace_id] = msg.timestamp_us
+
+        with self._lock:
+            with self._conn:  # One transaction, rolled back on error
+                self._conn.executemany(
+                    f"INSERT OR IGNORE INTO messages ({MESSAGE_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                self._conn.executemany(
+                    "INSERT INTO traces (trace_id, last_us) VALUES (?, ?) "
+                    "ON CONFLICT (trace_id) DO UPDATE SET last_us = max(last_us, excluded.last_us)",
+                    last_us.items())
+                self._conn.executemany(
+                    "INSERT INTO offsets (topic, kafka_partition, next_offset) VALUES (?, ?, ?) "
+                    "ON CONFLICT (topic, kafka_partition) DO UPDATE SET next_offset = max(next_offset, excluded.next_offset)",
+                    [(topic, partition, offset) for (topic, partition), offset in next_offsets.items()])
+            self.stored_messages += len(rows)
+            self._trace_ids.update(last_us)
+            if time.monotonic() - self._last_prune >= self.prune_interval:
+                self._prune()
+
+    @staticmethod
+    def _message_row(msg: KafkaMessage) -> tuple:
+        decoded = None
+        if msg.is_decoded and msg.decoded_value is not None:
+            decoded = json.dumps(msg.decoded_value, separators=(',', ':'), default=str)
+        headers = json.dumps(msg.headers, separators=(',', ':')) if msg.headers else None
+        raw_value = msg.raw_value
+        return (msg.trace_id, msg.topic, msg.partition, msg.offset, msg.key, msg.timestamp_us, headers,
+                bytes(raw_value) if raw_value is not None else None, decoded, int(msg.is_projected))
+
+    def offsets(self) -> Dict[Tuple[str, int], int]:
+        """Next offset to consume for each (topic, partition) with stored messages"""
+        with self._lock:
+            rows = self._conn.execute("SELECT topic, kafka_partition, next_offset FROM offsets").fetchall()
+        return {(topic, partition): offset for topic, partition, offset in rows}
+
+    def recent_traces(self, limit: int) -> List[TraceInfo]:
+        """The most recently active traces, least recent first"""
+        with self._lock:
+            trace_ids = [row[0] for row in self._conn.execute(
+                "SELECT trace_id FROM traces ORDER BY last_us DESC LIMIT ?", (limit,))]
+        trace_ids.reverse()
+        traces = self._load(trace_ids)
+        return [traces[trace_id] for trace_id in trace_ids if trace_id in traces]
+
+    def __contains__(self, trace_id: str) -> bool:
+        return trace_id in self._trace_ids
+
+    def load(self, trace_id: str) -> Optional[TraceInfo]:
+        """A stored trace, or None"""
+        if trace_id not in self._trace_ids:
+            return None
+        return self._load([trace_id]).get(trace_id)
+
+    def _load(self, trace_ids: List[str]) -> Dict[str, TraceInfo]:
+        traces: Dict[str, TraceInfo] = {}
+        for start in range(0, len(trace_ids), LOAD_CHUNK):
+            chunk = trace_ids[start:start + LOAD_CHUNK]
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT {MESSAGE_COLUMNS} FROM messages WHERE trace_id IN ({','.join('?' * len(chunk))}) ORDER BY id",
+                    chunk).fetchall()
+            for row in rows:
+                message = self._restore_message(row)
+                trace = traces.get(message.trace_id)
+                if trace is None:
+                    trace = traces[message.trace_id] = TraceInfo(trace_id=message.trace_id)
+                trace.add_message(message)
+        return traces
+
+    def _restore_message(self, row: tuple) -> KafkaMessage:
+        trace_id, topic, partition, offset, key, timestamp_us, headers, raw_value, decoded, projected = row
+        message = KafkaMessage(
+            topic=topic, partition=partition, offset=offset, key=key,
+            timestamp=from_epoch_us(timestamp_us), headers=json.loads(headers) if headers else None,
+            raw_value=raw_value, decoded_value=json.loads(decoded) if decoded is not None else None,
+            trace_id=trace_id,
+            decode_fn=partial(self._decode, topic) if decoded is None else None,
+            full_decode_fn=partial(self._decode_full, topic) if projected else None
+        )
+        message.timestamp_us = timestamp_us  # Exact, even across DST transitions
+        return message
+
+    def _decode(self, topic: str, payload: bytes) -> Dict[str, Any]:
+        decode_fn = self.decoders.get(topic, (None, None))[0]
+        if decode_fn is None:
+            raise LookupError(f"no decoder for topic {topic} yet")
+        return decode_fn(payload)
+
+    def _decode_full(self, topic: str, payload: bytes) -> Dict[str, Any]:
+        full_decode_fn = self.decoders.get(topic, (None, None))[1]
+        if full_decode_fn is None:
+            raise LookupError(f"no decoder for topic {topic} yet")
+        return full_decode_fn(payload)
+
+    def _prune(self):
+        """Delete traces whose last message is older than the retention (caller holds the lock)"""
+        self._last_prune = time.monotonic()
+        cutoff_us = to_epoch_us(datetime.now() - timedelta(microseconds=self.retention_us))
+        with self._conn:  # One transaction, rolled back on error
+            expired = [row[0] for row in self._conn.execute(
+                "SELECT trace_id FROM traces WHERE last_us < ?", (cutoff_us,))]
+            self._conn.execute(
+                "DELETE FROM messages WHERE trace_id IN (SELECT trace_id FROM traces WHERE last_us < ?)", (cutoff_us,))
+            pruned = self._conn.execute("DELETE FROM traces WHERE last_us < ?", (cutoff_us,)).rowcount
+        self._trace_ids.difference_update(expired)
+        if pruned:
+            self.pruned_traces += pruned
+            logger.info(f"🧹 Pruned {pruned} traces older than the retention from the trace store")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            traces = self._conn.execute("SELECT count(*) FROM traces").fetchone()[0]
+            partitions = self._conn.execute("SELECT count(*) FROM offsets").fetchone()[0]
+        return {
+            'path': str(self.path),
+            'traces': traces,
+            'partitions': partitions,
+            'stored_messages': self.stored_messages,
+            'pruned_traces': self.pruned_traces,
+            'file_bytes': self.path.stat().st_size if self.path.exists() else 0
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
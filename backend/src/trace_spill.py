@@ -0,0 +1,272 @@
+"""
+On-disk spill tier for traces evicted from TraceGraphBuilder
+
+Evicted traces are appended to preallocated segment files that are memory
+mapped for both writing and reading, and found again through an in-memory
+trace_id index. The tier is a lookback cache for the current process: each
+store works in its own directory, removed on close, and the oldest segment
+is dropped whole once the size limit is reached.
+
+Each directory has a sibling lock file that its store keeps locked while
+open. A directory whose lock can be taken belongs to a process that is gone,
+however it exited, and is removed by the next store opened in the same base.
+"""
+import logging
+import mmap
+import os
+import pickle
+import shutil
+import struct
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.models import KafkaMessage, TraceInfo, from_epoch_us
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+# Record header: payload length
+RECORD_HEADER = struct.Struct('<I')
+DIRECTORY_PREFIX = 'spill-'
+LOCK_SUFFIX = '.lock'
+
+
+def _try_lock(file) -> bool:
+    """Take an exclusive lock on an open file without waiting; False if another open file holds it"""
+    try:
+        if fcntl is not None:
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            file.seek(0)
+            msvcrt.locking(file.fileno(), msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+
+def _open_locked(path: Path):
+    """Open and lock a lock file, or None if it is held or was removed before the lock was taken"""
+    try:
+        file = open(path, 'a+b')
+    except OSError:
+        return None
+    # The file may have been unlinked by a cleaner between open() and the lock
+    if _try_lock(file) and path.exists() and os.path.samestat(os.fstat(file.fileno()), os.stat(path)):
+        return file
+    file.close()
+    return None
+
+
+class SpillSegment:
+    """One preallocated, memory-mapped segment file"""
+
+    def __init__(self, path: Path, number: int, size: int):
+        self.path = path
+        self.number = number
+        self.size = size
+        self.used = 0
+        self.trace_ids: List[str] = []
+        self._file = open(path, 'w+b')
+        self._file.truncate(size)
+        self.map = mmap.mmap(self._file.fileno(), size)
+
+    def append(self, data: bytes) -> int:
+        """Write a record and return its offset"""
+        offset = self.used
+        end = offset + RECORD_HEADER.size
+        RECORD_HEADER.pack_into(self.map, offset, len(data))
+        self.map[end:end + len(data)] = data
+        self.used = end + len(data)
+        return offset
+
+    def read(self, offset: int) -> bytes:
+        (length,) = RECORD_HEADER.unpack_from(self.map, offset)
+        start = offset + RECORD_HEADER.size
+        return self.map[start:start + length]
+
+    def close(self):
+        self.map.close()
+        self._file.close()
+        self.path.unlink(missing_ok=True)
+
+
+class TraceSpillStore:
+    """Append-only, memory-mapped store of evicted traces, indexed by trace_id"""
+
+    def __init__(self, directory: str, segment_mb: float = 64, max_mb: float = 1024):
+        self.segment_bytes = int(segment_mb * 1024 * 1024)
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        base = Path(directory)
+        base.mkdir(parents=True, exist_ok=True)
+        self._remove_stale_directories(base)
+        self._owner_lock, self.directory = self._create_directory(base)
+
+        self.segments: Dict[int, SpillSegment] = {}
+        self.active: Optional[SpillSegment] = None
+        self.index: Dict[str, Tuple[SpillSegment, int]] = {}
+        # Per-topic decode functions of spilled messages, reattached when they are loaded
+        self.decoders: Dict[str, Tuple[Optional[Callable], Optional[Callable]]] = {}
+        self._next_segment = 0
+        self._lock = threading.Lock()
+
+        self.spilled_traces = 0
+        self.dropped_traces = 0
+        self.loads = 0
+        logger.info(f"💽 Trace spill tier in {self.directory} "
+                    f"({segment_mb} MB segments, {max_mb} MB max)")
+
+    @staticmethod
+    def _create_directory(base: Path):
+        """Create a store directory, locking its lock file before the directory exists"""
+        while True:
+            fd, lock_path = tempfile.mkstemp(prefix=DIRECTORY_PREFIX, suffix=LOCK_SUFFIX, dir=base)
+            os.close(fd)
+            lock_path = Path(lock_path)
+            owner_lock = _open_locked(lock_path)
+            if owner_lock is not None:
+                directory = lock_path.with_suffix('')
+                directory.mkdir()
+                return owner_lock, directory
+
+    @staticmethod
+    def _remove_stale_directories(base: Path):
+        """Remove spill directories whose owning process no longer holds their lock"""
+        for lock_path in base.glob(f'{DIRECTORY_PREFIX}*{LOCK_SUFFIX}'):
+            lock = _open_locked(lock_path)
+            if lock is None:
+                continue  # Held by a running store
+            # Remove the directory before its lock file, so a directory without one is always stale
+            with lock:
+                shutil.rmtree(lock_path.with_suffix(''), ignore_errors=True)
+            lock_path.unlink(missing_ok=True)
+
+        # Directories left without a lock file, e.g. by a crash between the two removals
+        for path in base.glob(f'{DIRECTORY_PREFIX}*'):
+            if path.is_dir() and not path.with_name(path.name + LOCK_SUFFIX).exists():
+                shutil.rmtree(path, ignore_errors=True)
+
+    def __contains__(self, trace_id: str) -> bool:
+        return trace_id in self.index
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def spill(self, trace: TraceInfo):
+        """Append a trace; a later spill of the same trace_id replaces the earlier one"""
+        data = pickle.dumps(
+            (trace.trace_id, [self._message_record(msg) for msg in trace.messages]),
+            protocol=pickle.HIGHEST_PROTOCOL
+        )
+        with self._lock:
+            segment = self._segment_for(RECORD_HEADER.size + len(data))
+            offset = segment.append(data)
+            segment.trace_ids.append(trace.trace_id)
+            self.index[trace.trace_id] = (segment, offset)
+            self.spilled_traces += 1
+
+    def load(self, trace_id: str) -> Optional[TraceInfo]:
+        """Rebuild a spilled trace, or None if it is not in the tier"""
+        return self._read(trace_id, remove=False)
+
+    def take(self, trace_id: str) -> Optional[TraceInfo]:
+        """Load a spilled trace and remove it from the index, e.g. when it becomes active again"""
+        return self._read(trace_id, remove=True)
+
+    def _read(self, trace_id: str, remove: bool) -> Optional[TraceInfo]:
+        with self._lock:
+            entry = self.index.pop(trace_id, None) if remove else self.index.get(trace_id)
+            if entry is None:
+                return None
+            segment, offset = entry
+            data = segment.read(offset)
+            self.loads += 1
+        _, records = pickle.loads(data)
+        trace = TraceInfo(trace_id=trace_id)
+        for record in records:
+            trace.add_message(self._restore_message(trace_id, record))
+        return trace
+
+    def _message_record(self, msg: KafkaMessage) -> tuple:
+        if msg.decode_fn is not None or msg.full_decode_fn is not None:
+            self.decoders[msg.topic] = (msg.decode_fn, msg.full_decode_fn)
+        decoded_value = msg.decoded_value if msg.is_decoded else None
+        return (msg.topic, msg.partition, msg.offset, msg.key, msg.timestamp_us, msg.headers,
+                bytes(msg.raw_value), msg.is_decoded, decoded_value)
+
+    def _restore_message(self, trace_id: str, record: tuple) -> KafkaMessage:
+        topic, partition, offset, key, timestamp_us, headers, raw_value, decoded, decoded_value = record
+        decode_fn, full_decode_fn = self.decoders.get(topic, (None, None))
+        message = KafkaMessage(
+            topic=topic, partition=partition, offset=offset, key=key,
+            timestamp=from_epoch_us(timestamp_us), headers=headers, raw_value=raw_value,
+            decoded_value=decoded_value, trace_id=trace_id,
+            decode_fn=None if decoded else decode_fn, full_decode_fn=full_decode_fn
+        )
+        message.timestamp_us = timestamp_us  # Exact, even across DST transitions
+        return message
+
+    def _segment_for(self, size: int) -> SpillSegment:
+        """The segment to append a record to, rotating and enforcing the size limit as needed"""
+        segment = self.active
+        if segment is None or segment.used + size > segment.size:
+            segment = self._new_segment(max(size, self.segment_bytes))
+            if size <= self.segment_bytes:
+                self.active = segment
+            self._enforce_size_limit()
+        return segment
+
+    def _new_segment(self, size: int) -> SpillSegment:
+        self._next_segment += 1
+        path = self.directory / f'{self._next_segment:08d}.seg'
+        segment = self.segments[self._next_segment] = SpillSegment(path, self._next_segment, size)
+        return segment
+
+    def _enforce_size_limit(self):
+        """Drop the oldest segments, and the traces indexed in them, beyond the size limit"""
+        while len(self.segments) > 1 and sum(s.size for s in self.segments.values()) > self.max_bytes:
+            oldest = self.segments.pop(min(self.segments))
+            if oldest is self.active:
+                self.active = None
+            for trace_id in oldest.trace_ids:
+                entry = self.index.get(trace_id)
+                if entry is not None and entry[0] is oldest:
+                    del self.index[trace_id]
+                    self.dropped_traces += 1
+            oldest.close()
+
+    def clear(self):
+        """Forget every spilled trace"""
+        with self._lock:
+            for segment in self.segments.values():
+                segment.close()
+            self.segments.clear()
+            self.index.clear()
+            self.active = None
+
+    def close(self):
+        self.clear()
+        shutil.rmtree(self.directory, ignore_errors=True)
+        if self._owner_lock is not None:
+            self._owner_lock.close()
+            Path(self._owner_lock.name).unlink(missing_ok=True)
+            self._owner_lock = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'traces': len(self.index),
+                'segments': len(self.segments),
+                'disk_bytes': sum(segment.size for segment in self.segments.values()),
+                'used_bytes': sum(segment.used for segment in self.segments.values()),
+                'max_bytes': self.max_bytes,
+                'spilled_traces': self.spilled_traces,
+                'dropped_traces': self.dropped_traces,
+                'loads': self.loads
+            }
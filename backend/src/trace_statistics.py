@@ -0,0 +1,671 @@
+"""
+Incremental topic and edge statistics for TraceGraphBuilder
+
+Aggregates are updated as messages are added to traces and adjusted when
+traces are evicted, so statistics reads cost O(topics + edges) instead of a
+walk over every retained message.
+"""
+import heapq
+import logging
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
+
+from src.models import KafkaMessage, TraceInfo
+from src.sketches import DDSketch, TimeBucketRing, TopK
+
+logger = logging.getLogger(__name__)
+
+ROLLING_WINDOW_SECONDS = 60
+SLOWEST_TRACES = 3
+
+# Windowed views: 1-second buckets for the last 5 minutes, 1-minute buckets for a day
+SECOND_BUCKETS = 300
+MINUTE_BUCKETS = 1440
+# Timestamps further ahead of the local clock than one fine bucket are bucketed at "now",
+# so producer clock skew cannot claim ring slots that belong to the future
+MAX_FUTURE_SECONDS = 1
+
+
+class LazyExtremum:
+    """Minimum (or maximum) of per-trace values, with lazy deletion when traces go away"""
+
+    def __init__(self, largest: bool = False):
+        self._sign = -1 if largest else 1
+        self._heap: List[Tuple[float, str]] = []
+        self._values: Dict[str, float] = {}
+
+    def set(self, key: str, value: float):
+        if self._values.get(key) == value:
+            return
+        self._values[key] = value
+        heapq.heappush(self._heap, (self._sign * value, key))
+        # Superseded entries are only popped when they surface; compact if they pile up
+        if len(self._heap) > 2 * len(self._values) + 64:
+            self._heap = [(self._sign * v, k) for k, v in self._values.items()]
+            heapq.heapify(self._heap)
+
+    def discard(self, key: str):
+        self._values.pop(key, None)
+
+    def peek(self) -> Optional[float]:
+        heap = self._heap
+        while heap:
+            signed, key = heap[0]
+            if self._values.get(key) == self._sign * signed:
+                return self._sign * signed
+            heapq.heappop(heap)
+        return None
+
+
+class TopicSlice:
+    """Messages of one trace on one topic"""
+    __slots__ = ('count', 'first', 'last', 'timestamps')
+
+    def __init__(self):
+        self.count = 0
+        self.first: Optional[float] = None
+        self.last: Optional[float] = None
+        self.timestamps: List[int] = []  # Epoch microseconds, shared with the messages
+
+    def add(self, ts: float, timestamp_us: int):
+        self.count += 1
+        self.timestamps.append(timestamp_us)
+        if self.first is None or ts < self.first:
+            self.first = ts
+        if self.last is None or ts > self.last:
+            self.last = ts
+
+
+class TraceState:
+    """Per-trace bookkeeping needed to retract a trace's contributions"""
+    __slots__ = ('slices', 'start', 'end', 'started', 'clamped')
+
+    def __init__(self):
+        self.slices: Dict[str, TopicSlice] = {}
+        self.start: Optional[float] = None
+        self.end: Optional[float] = None
+        self.started: Optional[Tuple[str, float]] = None  # (topic, timestamp) of the bucket counting the trace start
+        self.clamped: Optional[Dict[int, float]] = None  # timestamp_us -> bucket time, for future timestamps
+
+    def bucket_time(self, timestamp_us: int, now: Optional[float] = None) -> float:
+        """Timestamp a message is bucketed at; pass `now` when the message is first counted"""
+        if self.clamped is not None and timestamp_us in self.clamped:
+            return self.clamped[timestamp_us]
+        ts = timestamp_us / 1_000_000
+        if now is not None and ts > now + MAX_FUTURE_SECONDS:
+            if self.clamped is None:
+                self.clamped = {}
+            self.clamped[timestamp_us] = now
+            return now
+        return ts
+
+    def time_to_topic(self, topic_slice: TopicSlice) -> float:
+        """Seconds from trace start until the trace first reached the topic"""
+        time_to_topic = topic_slice.first - self.start
+        if time_to_topic == 0:
+            if topic_slice.count > 1:
+                # Starting topic: use the processing time within the topic
+                time_to_topic = topic_slice.last - topic_slice.first
+            elif len(self.slices) == 1:
+                # Single message in a single-topic trace - use 1ms to avoid 0ms
+                time_to_topic = 0.001
+        return time_to_topic
+
+
+class TopicBucket:
+    """Traffic one topic received during one time bucket"""
+    __slots__ = ('count', 'started', 'first', 'last', 'ages', 'slowest')
+
+    def __init__(self):
+        self.count = 0
+        self.started = 0  # Traces whose first message was on this topic
+        self.first: Optional[float] = None
+        self.last: Optional[float] = None
+        self.ages = DDSketch()
+        self.slowest: List[Tuple[float, str]] = []  # Bounded min-heap of (time_to_topic, trace_id) candidates
+
+    def add(self, ts: float):
+        self.count += 1
+        if self.first is None or ts < self.first:
+            self.first = ts
+        if self.last is None or ts > self.last:
+            self.last = ts
+
+    def remove(self):
+        self.count -= 1
+        if self.count <= 0:
+            self.first = self.last = None
+
+    def offer_slowest(self, time_to_topic: float, trace_id: str):
+        entry = (time_to_topic, trace_id)
+        if len(self.slowest) < SLOWEST_TRACES * 2:
+            heapq.heappush(self.slowest, entry)
+        elif entry > self.slowest[0]:
+            heapq.heapreplace(self.slowest, entry)
+
+
+class EdgeBucket:
+    """Flow over one edge during one time bucket"""
+    __slots__ = ('flows', 'messages', 'first', 'last')
+
+    def __init__(self):
+        self.flows = 0  # Traces that reached both ends of the edge
+        self.messages = 0
+        self.first: Optional[float] = None
+        self.last: Optional[float] = None
+
+    def add(self, ts: float, flows: int, messages: int):
+        self.flows += flows
+        self.messages += messages
+        if self.first is None or ts < self.first:
+            self.first = ts
+        if self.last is None or ts > self.last:
+            self.last = ts
+
+    def remove(self, flows: int, messages: int):
+        self.flows -= flows
+        self.messages -= messages
+        if self.flows <= 0 and self.messages <= 0:
+            self.first = self.last = None
+
+
+def _bucket_rings(factory) -> Tuple[TimeBucketRing, TimeBucketRing]:
+    return (TimeBucketRing(1, SECOND_BUCKETS, factory), TimeBucketRing(60, MINUTE_BUCKETS, factory))
+
+
+def _topic_statistics_dict(message_count: int, first: Optional[float], last: Optional[float],
+                           rolling_count: int, ages: DDSketch,
+                           slowest: List[Tuple[str, float, float]]) -> Dict[str, object]:
+    """Topic statistics in the shape the graph endpoints return"""
+    p10, p50, p95 = ages.quantiles([0.10, 0.50, 0.95])
+    return {
+        'message_count': message_count,
+        # Messages per minute over the topic's whole time span
+        'rate_total': _span_rate(message_count, first, last),
+        # Messages in the last 60 seconds are already a per-minute rate
+        'rate_rolling_60s': float(rolling_count),
+        'median_trace_age': p50,
+        'trace_age_p10': p10,
+        'trace_age_p50': p50,
+        'trace_age_p95': p95,
+        'last_message_time': datetime.fromtimestamp(last).isoformat() if last is not None else None,
+        'slowest_traces': [
+            {'trace_id': trace_id, 'time_to_topic': time_to_topic, 'total_duration': duration}
+            for trace_id, time_to_topic, duration in slowest
+        ]
+    }
+
+
+def _span_rate(count: int, first: Optional[float], last: Optional[float]) -> float:
+    """Messages per minute over the span between first and last, at least one minute"""
+    if count <= 1 or first is None or last is None:
+        return 0.0
+    return count / max((last - first) / 60, 1)
+
+
+class TopicAggregate:
+    """Running statistics for one topic"""
+
+    def __init__(self):
+        self.message_count = 0
+        self.traces: Dict[str, None] = {}  # Ordered set of trace ids
+        self.first = LazyExtremum()
+        self.last = LazyExtremum(largest=True)
+        self.ages = DDSketch()  # Message ages from the start of their trace, in seconds
+        self.slowest = TopK(SLOWEST_TRACES)  # trace_id -> time_to_topic, with the trace duration as payload
+        self.recent: Dict[int, int] = {}  # epoch second -> messages, for the rolling rate
+        self.buckets = _bucket_rings(TopicBucket)
+
+
+class EdgeAggregate:
+    """Running statistics for traces that touched both ends of an edge"""
+
+    def __init__(self):
+        # trace_id -> (messages on both topics, min of the two counts, timestamp of the bucket counting the flow)
+        self.traces: Dict[str, Tuple[int, int, float]] = {}
+        self.message_count = 0
+        self.flow_messages = 0
+        self.first = LazyExtremum()
+        self.last = LazyExtremum(largest=True)
+        self.buckets = _bucket_rings(EdgeBucket)
+
+
+class TraceStatistics:
+    """Incrementally maintained per-topic and per-edge aggregates"""
+
+    def __init__(self, edges: Iterable[Tuple[str, str]] = ()):
+        self.topics: Dict[str, TopicAggregate] = {}
+        self.edges: Dict[Tuple[str, str], EdgeAggregate] = {}
+        self.edges_by_topic: Dict[str, List[Tuple[str, str]]] = {}
+        self.trace_states: Dict[str, TraceState] = {}
+        self.total_messages = 0
+        # Increases with every change to the aggregates, so derived views can be cached against it
+        self.generation = 0
+        self.set_edges(edges)
+
+    def window(self, seconds: float, now: Optional[float] = None) -> 'WindowStatistics':
+        """Statistics for messages timestamped in the last `seconds`, read from the time buckets"""
+        return WindowStatistics(self, (now or time.time()) - seconds, seconds)
+
+    def set_edges(self, edges: Iterable[Tuple[str, str]]):
+        """Replace the edge set; edge aggregates are rebuilt from the retained traces"""
+        self.generation += 1
+        self.edges = {}
+        self.edges_by_topic = {}
+        for source, destination in edges:
+            key = (source, destination)
+            if key in self.edges:
+                continue
+            self.edges[key] = EdgeAggregate()
+            self.edges_by_topic.setdefault(source, []).append(key)
+            if destination != source:
+                self.edges_by_topic.setdefault(destination, []).append(key)
+
+        for trace_id, state in self.trace_states.items():
+            for key in self.edges:
+                self._update_edge(key, trace_id, state)
+
+    def clear(self):
+        """Drop all aggregates and time buckets, keeping the edge set"""
+        self.topics.clear()
+        self.trace_states.clear()
+        self.total_messages = 0
+        self.set_edges(list(self.edges))
+
+    # ------------------------------------------------------------------
+    # Updates
+    # ------------------------------------------------------------------
+
+    def add_trace(self, trace: TraceInfo):
+        """Account for every message of a trace"""
+        for message in trace.messages:
+            self.add_message(trace.trace_id, message)
+
+    def add_message(self, trace_id: str, message: KafkaMessage):
+        """Account for a message that was just added to a trace"""
+        self.generation += 1
+        ts = message.timestamp_us / 1_000_000
+        topic = message.topic
+
+        state = self.trace_states.get(trace_id)
+        new_trace = state is None
+        if new_trace:
+            state = self.trace_states[trace_id] = TraceState()
+
+        old_start = state.start
+        if old_start is not None and ts < old_start:
+            # Every age in the trace is measured from its start; retract them before it moves
+            self._retract_ages(state)
+
+        topic_slice = state.slices.get(topic)
+        if topic_slice is None:
+            topic_slice = state.slices[topic] = TopicSlice()
+        topic_slice.add(ts, message.timestamp_us)
+
+        if state.start is None or ts < state.start:
+            state.start = ts
+        if state.end is None or ts > state.end:
+            state.end = ts
+
+        aggregate = self._topic(topic)
+        aggregate.message_count += 1
+        aggregate.traces[trace_id] = None
+        aggregate.first.set(trace_id, topic_slice.first)
+        aggregate.last.set(trace_id, topic_slice.last)
+        self.total_messages += 1
+
+        now = time.time()
+        if ts >= now - ROLLING_WINDOW_SECONDS:
+            second = int(ts)
+            aggregate.recent[second] = aggregate.recent.get(second, 0) + 1
+
+        # Trace duration, start and topic count feed every topic's time-to-topic
+        duration = state.end - state.start
+        for slice_topic, other_slice in state.slices.items():
+            self._topic(slice_topic).slowest.set(trace_id, state.time_to_topic(other_slice), duration)
+
+        # Time buckets hold the retained messages by timestamp; remove_trace() takes them out again
+        bucket_ts = state.bucket_time(message.timestamp_us, now)
+        time_to_topic = aggregate.slowest.values[trace_id][0]
+        for ring in aggregate.buckets:
+            bucket = ring.bucket(bucket_ts)
+            if bucket is not None:
+                bucket.add(bucket_ts)
+                bucket.offer_slowest(time_to_topic, trace_id)
+        if new_trace or state.start != old_start:
+            # The trace start moved to this message
+            self._count_start(state.started, -1)
+            state.started = (topic, bucket_ts)
+            self._count_start(state.started, 1)
+
+        if old_start is not None and state.start != old_start:
+            self._add_ages(state)
+        else:
+            self._add_age(aggregate, bucket_ts, ts - state.start)
+
+        for key in self.edges_by_topic.get(topic, ()):
+            self._update_edge(key, trace_id, state, bucket_ts)
+
+    def remove_trace(self, trace_id: str):
+        """Retract everything a trace contributed"""
+        state = self.trace_states.pop(trace_id, None)
+        if state is None:
+            return
+        self.generation += 1
+
+        self._retract_ages(state)
+        self._count_start(state.started, -1)
+        cutoff = int(time.time()) - ROLLING_WINDOW_SECONDS
+        touched_edges = set()
+        for topic, topic_slice in state.slices.items():
+            aggregate = self._topic(topic)
+            aggregate.message_count -= topic_slice.count
+            for ring in aggregate.buckets:
+                for ts in topic_slice.timestamps:
+                    bucket = ring.get(state.bucket_time(ts))
+                    if bucket is not None:
+                        bucket.remove()
+            aggregate.traces.pop(trace_id, None)
+            aggregate.first.discard(trace_id)
+            aggregate.last.discard(trace_id)
+            aggregate.slowest.discard(trace_id)
+            for ts in topic_slice.timestamps:
+                second = ts // 1_000_000
+                if second >= cutoff and second in aggregate.recent:
+                    aggregate.recent[second] -= 1
+                    if aggregate.recent[second] <= 0:
+                        del aggregate.recent[second]
+            self.total_messages -= topic_slice.count
+            touched_edges.update(self.edges_by_topic.get(topic, ()))
+
+        for key in touched_edges:
+            self._retract_edge(key, trace_id, state)
+
+    def _retract_ages(self, state: TraceState):
+        """Remove a trace's message ages, measured from its current start, from the sketches and buckets"""
+        for topic, topic_slice in state.slices.items():
+            aggregate = self._topic(topic)
+            for t in topic_slice.timestamps:
+                age = t / 1_000_000 - state.start
+                aggregate.ages.remove(age)
+                for ring in aggregate.buckets:
+                    bucket = ring.get(state.bucket_time(t))
+                    if bucket is not None:
+                        bucket.ages.remove(age)
+
+    def _add_ages(self, state: TraceState):
+        """Add a trace's message ages, measured from its current start, to the sketches and buckets"""
+        for topic, topic_slice in state.slices.items():
+            aggregate = self._topic(topic)
+            for t in topic_slice.timestamps:
+                self._add_age(aggregate, state.bucket_time(t), t / 1_000_000 - state.start)
+
+    @staticmethod
+    def _add_age(aggregate: TopicAggregate, bucket_ts: float, age: float):
+        aggregate.ages.add(age)
+        for ring in aggregate.buckets:
+            bucket = ring.get(bucket_ts)
+            if bucket is not None:
+                bucket.ages.add(age)
+
+    def _count_start(self, started: Optional[Tuple[str, float]], delta: int):
+        """Count (or uncount) a trace start in the buckets of its starting topic"""
+        if started is None:
+            return
+        topic, ts = started
+        for ring in self._topic(topic).buckets:
+            bucket = ring.get(ts)
+            if bucket is not None:
+                bucket.started += delta
+
+    def _topic(self, topic: str) -> TopicAggregate:
+        aggregate = self.topics.get(topic)
+        if aggregate is None:
+            aggregate = self.topics[topic] = TopicAggregate()
+        return aggregate
+
+    def _update_edge(self, key: Tuple[str, str], trace_id: str, state: TraceState, ts: Optional[float] = None):
+        """Refresh one trace's contribution to an edge; ts is the bucket time of the triggering message"""
+        source_slice = state.slices.get(key[0])
+        dest_slice = state.slices.get(key[1])
+        if source_slice is None or dest_slice is None:
+            return
+
+        edge = self.edges[key]
+        previous = edge.traces.get(trace_id)
+        self._retract_edge(key, trace_id)
+
+        # A self-loop edge counts its topic's messages twice, as the full scan did
+        message_count = source_slice.count + dest_slice.count
+        flow_messages = min(source_slice.count, dest_slice.count)
+        if previous is not None:
+            flow_ts = previous[2]
+        elif ts is not None:
+            flow_ts = ts
+        else:
+            now = time.time()
+            flow_ts = max(source_slice.first, dest_slice.first)
+            flow_ts = now if flow_ts > now + MAX_FUTURE_SECONDS else flow_ts
+        edge.traces[trace_id] = (message_count, flow_messages, flow_ts)
+        edge.message_count += message_count
+        edge.flow_messages += flow_messages
+        edge.first.set(trace_id, min(source_slice.first, dest_slice.first))
+        edge.last.set(trace_id, max(source_slice.last, dest_slice.last))
+
+        # Edge buckets count the flow once, and every message on either end by its own timestamp
+        if previous is None:
+            for ring in edge.buckets:
+                bucket = ring.bucket(flow_ts)
+                if bucket is not None:
+                    bucket.add(flow_ts, 1, 0)
+            for topic_slice in (source_slice, dest_slice):
+                for t in topic_slice.timestamps:
+                    self._add_edge_message(edge, state.bucket_time(t), 1)
+        elif ts is not None:
+            self._add_edge_message(edge, ts, message_count - previous[0])
+
+    @staticmethod
+    def _add_edge_message(edge: EdgeAggregate, ts: float, messages: int):
+        for ring in edge.buckets:
+            bucket = ring.bucket(ts)
+            if bucket is not None:
+                bucket.add(ts, 0, messages)
+
+    def _retract_edge(self, key: Tuple[str, str], trace_id: str, state: Optional[TraceState] = None):
+        """Take a trace's contribution out of an edge, and out of its buckets when the trace goes away"""
+        edge = self.edges.get(key)
+        if edge is None:
+            return
+        contribution = edge.traces.pop(trace_id, None)
+        if contribution is None:
+            return
+        edge.message_count -= contribution[0]
+        edge.flow_messages -= contribution[1]
+        edge.first.discard(trace_id)
+        edge.last.discard(trace_id)
+        if state is None:
+            return
+        for ring in edge.buckets:
+            bucket = ring.get(contribution[2])
+            if bucket is not None:
+                bucket.remove(1, 0)
+            for topic in key:
+                for t in state.slices[topic].timestamps:
+                    bucket = ring.get(state.bucket_time(t))
+                    if bucket is not None:
+                        bucket.remove(0, 1)
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def message_count(self, topic: str) -> int:
+        aggregate = self.topics.get(topic)
+        return aggregate.message_count if aggregate else 0
+
+    def trace_count(self, topic: str) -> int:
+        aggregate = self.topics.get(topic)
+        return len(aggregate.traces) if aggregate else 0
+
+    def topic_trace_ids(self, topic: str) -> List[str]:
+        aggregate = self.topics.get(topic)
+        return list(aggregate.traces) if aggregate else []
+
+    def time_range(self) -> Tuple[Optional[float], Optional[float]]:
+        """Earliest and latest retained message timestamps"""
+        firsts = [a.first.peek() for a in self.topics.values() if a.message_count > 0]
+        lasts = [a.last.peek() for a in self.topics.values() if a.message_count > 0]
+        firsts = [ts for ts in firsts if ts is not None]
+        lasts = [ts for ts in lasts if ts is not None]
+        return (min(firsts) if firsts else None, max(lasts) if lasts else None)
+
+    def rolling_count(self, topic: str, now: float) -> int:
+        """Messages on a topic with timestamps in the last ROLLING_WINDOW_SECONDS"""
+        aggregate = self.topics.get(topic)
+        if not aggregate:
+            return 0
+        cutoff = now - ROLLING_WINDOW_SECONDS
+        for second in [s for s in aggregate.recent if s + 1 <= cutoff]:
+            del aggregate.recent[second]
+        return sum(aggregate.recent.values())
+
+    def topic_statistics(self, topic: str, now: float) -> Dict[str, object]:
+        """Statistics for one topic, in the shape the graph endpoints return"""
+        aggregate = self.topics.get(topic)
+        if not aggregate or aggregate.message_count <= 0:
+            return _topic_statistics_dict(0, None, None, 0, DDSketch(), [])
+
+        return _topic_statistics_dict(
+            aggregate.message_count,
+            aggregate.first.peek(),
+            aggregate.last.peek(),
+            self.rolling_count(topic, now),
+            aggregate.ages,
+            aggregate.slowest.top()
+        )
+
+    def edge_statistics(self, source: str, destination: str) -> Dict[str, object]:
+        """Flow statistics for one edge"""
+        edge = self.edges.get((source, destination))
+        if edge is None:
+            return {'flow_count': 0, 'message_rate': 0.0}
+
+        return {
+            'flow_count': len(edge.traces),
+            'message_rate': _span_rate(edge.message_count, edge.first.peek(), edge.last.peek())
+        }
+
+    def edge_flow_messages(self, source: str, destination: str) -> int:
+        """Sum over traces of min(source messages, destination messages)"""
+        edge = self.edges.get((source, destination))
+        return edge.flow_messages if edge else 0
+
+    def component_statistics(self, component_topics: Set[str]) -> Dict[str, object]:
+        """Message totals, active traces and age percentiles for a set of topics"""
+        total_messages = 0
+        active_traces: Set[str] = set()
+        sketches: List[DDSketch] = []
+
+        for topic in component_topics:
+            aggregate = self.topics.get(topic)
+            if not aggregate or aggregate.message_count <= 0:
+                continue
+            total_messages += aggregate.message_count
+            active_traces.update(aggregate.traces)
+            sketches.append(aggregate.ages)
+
+        median_age, p95_age = DDSketch.merged(sketches).quantiles([0.50, 0.95])
+
+        return {
+            'total_messages': total_messages,
+            'active_traces': len(active_traces),
+            'median_trace_age': median_age,
+            'p95_trace_age': p95_age
+        }
+
+
+class WindowStatistics:
+    """
+    Read-only view of TraceStatistics restricted to a trailing time window
+
+    Answers the same queries as TraceStatistics by summing time buckets, so
+    the cost depends on the number of buckets rather than on retained messages.
+    Windows up to SECOND_BUCKETS seconds use 1-second buckets, longer ones
+    1-minute buckets; windows longer than a day are capped at a day.
+    """
+
+    def __init__(self, statistics: TraceStatistics, start: float, seconds: float):
+        self.statistics = statistics
+        self.start = start
+        self._ring = 0 if seconds <= SECOND_BUCKETS else 1
+
+        self._topic_buckets: Dict[str, List[TopicBucket]] = {
+            topic: aggregate.buckets[self._ring].since(start)
+            for topic, aggregate in statistics.topics.items()
+        }
+        self.total_messages = sum(
+            bucket.count for buckets in self._topic_buckets.values() for bucket in buckets
+        )
+        self.total_traces = sum(
+            bucket.started for buckets in self._topic_buckets.values() for bucket in buckets
+        )
+
+    def message_count(self, topic: str) -> int:
+        return sum(bucket.count for bucket in self._topic_buckets.get(topic, ()))
+
+    def _ages(self, topics: Iterable[str]) -> DDSketch:
+        return DDSketch.merged(
+            bucket.ages for topic in topics for bucket in self._topic_buckets.get(topic, ())
+        )
+
+    def topic_statistics(self, topic: str, now: float) -> Dict[str, object]:
+        buckets = self._topic_buckets.get(topic, [])
+        message_count = sum(bucket.count for bucket in buckets)
+        if message_count <= 0:
+            return _topic_statistics_dict(0, None, None, 0, DDSketch(), [])
+
+        first = min(bucket.first for bucket in buckets if bucket.first is not None)
+        last = max(bucket.last for bucket in buckets if bucket.last is not None)
+
+        # Candidates come from the buckets; their current values come from the live aggregate
+        current = self.statistics.topics[topic].slowest.values
+        candidates = {trace_id for bucket in buckets for _, trace_id in bucket.slowest if trace_id in current}
+        slowest = heapq.nlargest(SLOWEST_TRACES, candidates, key=lambda trace_id: current[trace_id][0])
+
+        return _topic_statistics_dict(
+            message_count,
+            first,
+            last,
+            min(self.statistics.rolling_count(topic, now), message_count),
+            self._ages([topic]),
+            [(trace_id, current[trace_id][0], current[trace_id][1]) for trace_id in slowest]
+        )
+
+    def edge_statistics(self, source: str, destination: str) -> Dict[str, object]:
+        edge = self.statistics.edges.get((source, destination))
+        if edge is None:
+            return {'flow_count': 0, 'message_rate': 0.0}
+
+        buckets = edge.buckets[self._ring].since(self.start)
+        messages = sum(bucket.messages for bucket in buckets)
+        firsts = [bucket.first for bucket in buckets if bucket.first is not None]
+        lasts = [bucket.last for bucket in buckets if bucket.last is not None]
+        return {
+            'flow_count': sum(bucket.flows for bucket in buckets),
+            'message_rate': _span_rate(messages, min(firsts, default=None), max(lasts, default=None))
+        }
+
+    def component_statistics(self, component_topics: Set[str]) -> Dict[str, object]:
+        buckets = [bucket for topic in component_topics for bucket in self._topic_buckets.get(topic, ())]
+        median_age, p95_age = self._ages(component_topics).quantiles([0.50, 0.95])
+        return {
+            'total_messages': sum(bucket.count for bucket in buckets),
+            'active_traces': sum(bucket.started for bucket in buckets),
+            'median_trace_age': median_age,
+            'p95_trace_age': p95_age
+        }
+
+
+# Either the full aggregates or a trailing window over them
+StatisticsView = Union[TraceStatistics, WindowStatistics]
@@ -1,4 +1,4 @@
-import React, { useState, useEffect, useCallback } from 'react';
+import React, { useState, useEffect, useCallback, useRef } from 'react';
 import axios from 'axios';
 import { Network } from 'vis-network';
 import { DataSet } from 'vis-data';
@@ -29,10 +29,15 @@ import { Search, Activity, Map as MapIcon, Settings, Play, Pause, RotateCcw, Ser
 
 const API_BASE_URL = process.env.REACT_APP_BACKEND_URL;
 console.log('🌐 Main App API_BASE_URL:', API_BASE_URL);
+const TRACES_PAGE_SIZE = 50;
+const TRACES_MAX_PAGE_SIZE = 1000; // The backend's limit
 
 function App() {
   // State management
   const [traces, setTraces] = useState([]);
+  const [tracesLimit, setTracesLimit] = useState(TRACES_PAGE_SIZE);
+  const tracesLimitRef = useRef(TRACES_PAGE_SIZE); // Read by long-lived callbacks such as the WebSocket handler
+  const [hasMoreTraces, setHasMoreTraces] = useState(false);
   const [selectedTrace, setSelectedTrace] = useState(null);
   const [traceFlow, setTraceFlow] = useState(null);
   const [topicGraph, setTopicGraph] = useState(null);
@@ -179,6 +184,14 @@ function App() {
     return () => clearInterval(interval);
   }, [activeTab]);
 
+  // Fetch straight away when more traces are requested
+  useEffect(() => {
+    tracesLimitRef.current = tracesLimit;
+    if (tracesLimit > TRACES_PAGE_SIZE) {
+      loadTraces();
+    }
+  }, [tracesLimit]);
+
   const loadInitialData = async () => {
     try {
       await Promise.all([
@@ -216,6 +229,7 @@ function App() {
         
         // Clear existing data and reload
         setTraces([]);
+        setTracesLimit(TRACES_PAGE_SIZE);
         setSelectedTrace(null);
         setTraceFlow(null);
         setTopicGraph(null);
@@ -262,8 +276,10 @@ function App() {
 
   const loadTraces = async () => {
     try {
-      const response = await axios.get(`${API_BASE_URL}/api/traces`);
+      // Unchanged pages are revalidated by the browser with If-None-Match and come back as 304s
+      const response = await axios.get(`${API_BASE_URL}/api/traces`, { params: { limit: tracesLimitRef.current } });
       setTraces(response.data.traces || []);
+      setHasMoreTraces(Boolean(response.data.next_cursor));
     } catch (error) {
       console.error('Error loading traces:', error);
       toast.error('Failed to load traces');
@@ -798,6 +814,16 @@ function App() {
                                 </Card>
                               ))
                             )}
+                            {hasMoreTraces && tracesLimit < TRACES_MAX_PAGE_SIZE && (
+                              <Button
+                                variant="outline"
+                                size="sm"
+                                className="w-full"
+                                onClick={() => setTracesLimit(limit => Math.min(limit + TRACES_PAGE_SIZE, TRACES_MAX_PAGE_SIZE))}
+                              >
+                                Load more traces
+                              </Button>
+                            )}
                           </div>
                         </div>
                       </div>
@@ -39,33 +39,50 @@ function EnhancedGraphVisualization() {
   const [networkInstances, setNetworkInstances] = useState({});
   const [selectedComponent, setSelectedComponent] = useState(null);
   const [realTimeEnabled, setRealTimeEnabled] = useState(true);
-  const [autoRefreshInterval, setAutoRefreshInterval] = useState(null);
 
   // Refs for network containers
   const networkRefs = useRef({});
+  // Node and edge DataSets of each rendered network, updated in place by live deltas
+  const dataSetsRef = useRef({});
 
   useEffect(() => {
-    loadDisconnectedGraphs();
-    
-    // Set up auto-refresh if real-time is enabled
-    if (realTimeEnabled) {
-      const interval = setInterval(() => {
-        loadDisconnectedGraphs(true); // Silent refresh
-      }, 10000); // Refresh every 10 seconds
-      
-      setAutoRefreshInterval(interval);
-      
-      return () => clearInterval(interval);
+    if (!realTimeEnabled) {
+      loadDisconnectedGraphs();
+      return;
     }
+
+    // Real-time: the server pushes a snapshot on subscribe, then only the changed nodes and edges
+    let ws = null;
+    let reconnectTimer = null;
+    let closed = false;
+    const connect = () => {
+      const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
+      ws = new WebSocket(`${protocol}//${window.location.host}/api/ws`);
+      ws.onopen = () => ws.send(JSON.stringify({ action: 'subscribe', channels: ['graph'] }));
+      ws.onmessage = (event) => {
+        const data = JSON.parse(event.data);
+        if (data.type === 'graph_snapshot') {
+          showComponents(data.components);
+        } else if (data.type === 'graph_delta') {
+          applyGraphDelta(data);
+        }
+      };
+      ws.onclose = () => {
+        // Attempt to reconnect after 5 seconds
+        if (!closed) reconnectTimer = setTimeout(connect, 5000);
+      };
+    };
+    connect();
+
+    return () => {
+      closed = true;
+      clearTimeout(reconnectTimer);
+      if (ws) ws.close();
+    };
   }, [realTimeEnabled]);
 
   useEffect(() => {
     return () => {
-      // Cleanup intervals on unmount
-      if (autoRefreshInterval) {
-        clearInterval(autoRefreshInterval);
-      }
-      
       // Cleanup network instances
       Object.values(networkInstances).forEach(network => {
         if (network && network.destroy) {
@@ -82,14 +99,7 @@ function EnhancedGraphVisualization() {
       const response = await axios.get(`${API_BASE_URL}/api/graph/disconnected`);
       
       if (response.data.success) {
-        setDisconnectedGraphs(response.data.components);
-        
-        // Render networks after state update
-        setTimeout(() => {
-          response.data.components.forEach((component, index) => {
-            renderComponentNetwork(component, index);
-          });
-        }, 100);
+        showComponents(response.data.components);
         
         if (!silent) {
           toast.success(`Loaded ${response.data.total_components} graph components`);
@@ -156,6 +166,79 @@ function EnhancedGraphVisualization() {
     }
   };
 
+  const showComponents = (components) => {
+    setDisconnectedGraphs(components);
+
+    // Render networks after state update
+    setTimeout(() => {
+      components.forEach((component, index) => {
+        renderComponentNetwork(component, index);
+      });
+    }, 100);
+  };
+
+  const applyGraphDelta = (delta) => {
+    const nodes = Object.fromEntries(delta.nodes.map(node => [node.id, node]));
+    const edges = Object.fromEntries(delta.edges.map(edge => [edgeId(edge), edge]));
+    const componentStats = Object.fromEntries(delta.components.map(c => [c.component_id, c.statistics]));
+
+    setDisconnectedGraphs(components => components.map(component => (
+      componentStats[component.component_id] === undefined ? component : {
+        ...component,
+        nodes: component.nodes.map(node => nodes[node.id] || node),
+        edges: component.edges.map(edge => edges[edgeId(edge)] || edge),
+        statistics: componentStats[component.component_id]
+      }
+    )));
+
+    delta.nodes.forEach(node => dataSetsRef.current[node.component]?.nodes.update(toVisNode(node)));
+    delta.edges.forEach(edge => dataSetsRef.current[edge.component]?.edges.update(toVisEdge(edge)));
+  };
+
+  const edgeId = (edge) => `${edge.source}->${edge.target}`;
+
+  const toVisNode = (node) => ({
+    id: node.id,
+    label: node.label,
+    shape: 'box',
+    color: node.color || {
+      background: node.monitored ? '#10b981' : '#6b7280',
+      border: node.monitored ? '#059669' : '#4b5563'
+    },
+    font: { 
+      color: 'white', 
+      size: 12,
+      face: 'Inter, system-ui, sans-serif'
+    },
+    margin: 10,
+    size: node.size || 30,
+    borderWidth: 2,
+    shadow: {
+      enabled: true,
+      color: 'rgba(0,0,0,0.2)',
+      size: 5,
+      x: 2,
+      y: 2
+    },
+    title: `Topic: ${node.id}\nMessages: ${node.statistics?.message_count || 0}\nRate: ${node.statistics?.rate?.toFixed(1) || 0}/min\nMedian Age: ${Math.round(node.statistics?.median_trace_age || 0)}s`
+  });
+
+  const toVisEdge = (edge) => ({
+    id: edgeId(edge),
+    from: edge.source,
+    to: edge.target,
+    arrows: { to: { enabled: true, scaleFactor: 1.2 } },
+    color: { 
+      color: edge.flow_count > 10 ? '#10b981' : '#6b7280',
+      highlight: '#3b82f6'
+    },
+    width: edge.width || Math.max(2, Math.min(8, edge.flow_count || 2)),
+    smooth: { type: 'curvedCW', roundness: 0.2 },
+    label: edge.flow_count > 0 ? `${edge.flow_count}` : '',
+    font: { size: 10, color: '#4b5563' },
+    title: `Flow: ${edge.source} → ${edge.target}\nMessages: ${edge.flow_count}\nRate: ${edge.message_rate?.toFixed(1) || 0}/min`
+  });
+
   const renderComponentNetwork = (component, containerKey) => {
     const containerId = `network-component-${containerKey}`;
     const container = document.getElementById(containerId);
@@ -170,49 +253,10 @@ function EnhancedGraphVisualization() {
     }
 
     try {
-      // Prepare nodes with enhanced styling
-      const nodes = new DataSet(component.nodes.map(node => ({
-        id: node.id,
-        label: node.label,
-        shape: 'box',
-        color: node.color || {
-          background: node.monitored ? '#10b981' : '#6b7280',
-          border: node.monitored ? '#059669' : '#4b5563'
-        },
-        font: { 
-          color: 'white', 
-          size: 12,
-          face: 'Inter, system-ui, sans-serif'
-        },
-        margin: 10,
-        size: node.size || 30,
-        borderWidth: 2,
-        shadow: {
-          enabled: true,
-          color: 'rgba(0,0,0,0.2)',
-          size: 5,
-          x: 2,
-          y: 2
-        },
-        title: `Topic: ${node.id}\nMessages: ${node.statistics?.message_count || 0}\nRate: ${node.statistics?.rate?.toFixed(1) || 0}/min\nMedian Age: ${Math.round(node.statistics?.median_trace_age || 0)}s`
-      })));
-
-      // Prepare edges with enhanced styling
-      const edges = new DataSet(component.edges.map((edge, index) => ({
-        id: `edge_${containerKey}_${index}`,
-        from: edge.source,
-        to: edge.target,
-        arrows: { to: { enabled: true, scaleFactor: 1.2 } },
-        color: { 
-          color: edge.flow_count > 10 ? '#10b981' : '#6b7280',
-          highlight: '#3b82f6'
-        },
-        width: edge.width || Math.max(2, Math.min(8, edge.flow_count || 2)),
-        smooth: { type: 'curvedCW', roundness: 0.2 },
-        label: edge.flow_count > 0 ? `${edge.flow_count}` : '',
-        font: { size: 10, color: '#4b5563' },
-        title: `Flow: ${edge.source} → ${edge.target}\nMessages: ${edge.flow_count}\nRate: ${edge.message_rate?.toFixed(1) || 0}/min`
-      })));
+      // Prepare nodes and edges with enhanced styling
+      const nodes = new DataSet(component.nodes.map(toVisNode));
+      const edges = new DataSet(component.edges.map(toVisEdge));
+      dataSetsRef.current[containerKey] = { nodes, edges };
 
       const data = { nodes, edges };
       
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Memory benchmark: per-message overhead of KafkaMessage/TraceInfo
+
+Builds the same retained trace set twice, once with the previous plain
+dataclass models and once with the slotted models in src.models, and
+reports the tracemalloc-measured bytes per message. Payloads are shared
+between messages so only the per-message overhead is measured.
+
+Usage: python tests/benchmark_message_memory.py [message_count]
+"""
+import gc
+import sys
+import tracemalloc
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from src.models import KafkaMessage, TraceInfo  # noqa: E402
+
+TOPICS = ["user-events", "processed-events", "notifications", "analytics"]
+MESSAGES_PER_TRACE = 5
+
+
+@dataclass
+class LegacyKafkaMessage:
+    """KafkaMessage as it was before the slotted representation"""
+    topic: str
+    partition: int
+    offset: int
+    key: Optional[str]
+    timestamp: datetime
+    headers: Dict[str, str]
+    raw_value: bytes
+    decoded_value: Optional[Dict[str, Any]]
+    trace_id: Optional[str] = None
+    decode_fn: Optional[Callable[[], Dict[str, Any]]] = field(default=None, repr=False, compare=False)
+
+
+@dataclass
+class LegacyTraceInfo:
+    """TraceInfo as it was before the slotted representation"""
+    trace_id: str
+    messages: List[LegacyKafkaMessage] = field(default_factory=list)
+    topics: List[str] = field(default_factory=list)
+    start_time: Optional[datetime] = None
+    end_time: Optional[datetime] = None
+
+    def add_message(self, message: LegacyKafkaMessage):
+        self.messages.append(message)
+        if message.topic not in self.topics:
+            self.topics.append(message.topic)
+        if self.start_time is None or message.timestamp < self.start_time:
+            self.start_time = message.timestamp
+        if self.end_time is None or message.timestamp > self.end_time:
+            self.end_time = message.timestamp
+
+
+def build(message_cls, trace_cls, count: int) -> Dict[str, Any]:
+    """Retain `count` messages the way the consumer and graph builder create them"""
+    raw_value = b"payload"
+    decoded_value = {"field": "value"}
+    base_time = datetime(2024, 1, 1)
+    traces = {}
+    for i in range(count):
+        # The consumer gets a fresh topic string and trace id from every Kafka message
+        topic = TOPICS[i % len(TOPICS)].encode().decode()
+        trace_id = "trace-%d" % (i // MESSAGES_PER_TRACE)
+        message = message_cls(
+            topic=topic, partition=0, offset=i, key=None,
+            timestamp=base_time + timedelta(milliseconds=i), headers={},
+            raw_value=raw_value, decoded_value=decoded_value, trace_id=trace_id
+        )
+        trace = traces.get(message.trace_id)
+        if trace is None:
+            trace = traces[message.trace_id] = trace_cls(trace_id=message.trace_id)
+        trace.add_message(message)
+    return traces
+
+
+def measure(message_cls, trace_cls, count: int) -> int:
+    """Bytes still allocated after building and retaining the traces"""
+    gc.collect()
+    tracemalloc.start()
+    traces = build(message_cls, trace_cls, count)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del traces
+    gc.collect()
+    return current
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+
+    legacy = measure(LegacyKafkaMessage, LegacyTraceInfo, count)
+    compact = measure(KafkaMessage, TraceInfo, count)
+
+    print(f"Retained messages: {count:,} ({MESSAGES_PER_TRACE} per trace)")
+    print(f"{'model':>10} | {'total MB':>9} | {'bytes/msg':>9}")
+    print("-" * 35)
+    print(f"{'dataclass':>10} | {legacy / 2**20:>9.1f} | {legacy / count:>9.0f}")
+    print(f"{'slotted':>10} | {compact / 2**20:>9.1f} | {compact / count:>9.0f}")
+    print(f"Reduction: {1 - compact / legacy:.0%}")
+
+
+if __name__ == "__main__":
+    main()
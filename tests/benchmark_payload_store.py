@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Memory benchmark: raw payload retention with and without the payload store
+
+Feeds the same messages through TraceGraphBuilder with one bytes object per
+payload and with payloads packed into PayloadStore segments, and reports
+tracemalloc-measured bytes and live allocations per retained message, plus
+the ingest rate. Payload sizes are spread like small protobuf events.
+
+Usage: python tests/benchmark_payload_store.py [message_count]
+"""
+import gc
+import logging
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from src.graph_builder import TraceGraphBuilder  # noqa: E402
+from src.models import KafkaMessage  # noqa: E402
+
+TOPICS_YAML = BACKEND_DIR / "config" / "topics.yaml"
+TOPICS = ["user-events", "processed-events", "notifications", "analytics"]
+MESSAGES_PER_TRACE = 5
+
+
+def payloads(count: int):
+    """Fresh payload objects, as the consumer gets a new bytes object per Kafka message"""
+    rng = random.Random(0)
+    sizes = [rng.randint(64, 768) for _ in range(count)]
+    return (bytes(size) for size in sizes)
+
+
+def run(count: int, segment_mb: float):
+    """Bytes and blocks still allocated, and ingest seconds, after retaining `count` messages"""
+    base_time = datetime.now() - timedelta(hours=1)
+    gc.collect()
+    tracemalloc.start()
+    builder = TraceGraphBuilder(str(TOPICS_YAML), max_traces=count,
+                                settings={'payload_segment_mb': segment_mb})
+    before, _ = tracemalloc.get_traced_memory()
+    blocks_before = sum(stat.count for stat in tracemalloc.take_snapshot().statistics('filename'))
+
+    started = time.perf_counter()
+    for i, payload in enumerate(payloads(count)):
+        builder.add_message(KafkaMessage(
+            topic=TOPICS[i % len(TOPICS)], partition=0, offset=i, key=None,
+            timestamp=base_time + timedelta(milliseconds=i), headers={},
+            raw_value=payload, decoded_value=None, trace_id="trace-%d" % (i // MESSAGES_PER_TRACE)
+        ))
+    seconds = time.perf_counter() - started
+
+    current, _ = tracemalloc.get_traced_memory()
+    blocks = sum(stat.count for stat in tracemalloc.take_snapshot().statistics('filename')) - blocks_before
+    tracemalloc.stop()
+    del builder
+    gc.collect()
+    return current - before, blocks, seconds
+
+
+def main():
+    logging.disable(logging.CRITICAL)
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+
+    print(f"Retained messages: {count:,} ({MESSAGES_PER_TRACE} per trace, payloads 64-768 B)")
+    print(f"{'payloads':>16} | {'total MB':>9} | {'bytes/msg':>9} | {'blocks/msg':>10} | {'ingest msg/s':>12}")
+    print("-" * 70)
+    results = {}
+    for name, segment_mb in (("bytes per msg", 0), ("8 MB segments", 8)):
+        size, blocks, seconds = results[name] = run(count, segment_mb)
+        print(f"{name:>16} | {size / 2**20:>9.1f} | {size / count:>9.0f} | {blocks / count:>10.2f} | {count / seconds:>12,.0f}")
+    baseline, packed = results["bytes per msg"][0], results["8 MB segments"][0]
+    print(f"Reduction: {1 - packed / baseline:.0%}")
+
+
+if __name__ == "__main__":
+    main()
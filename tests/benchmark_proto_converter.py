@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark: fast proto-to-dict converter vs json_format.MessageToDict
+
+Decodes the topic message types from config/topics.yaml (populated with the
+parity-test corpus generator) and the full config/proto corpus, and reports
+messages per second for both converters.
+
+Usage: python tests/benchmark_proto_converter.py [messages_per_type]
+"""
+import random
+import sys
+import time
+from pathlib import Path
+
+import yaml
+from google.protobuf.json_format import MessageToDict
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from proto_corpus import BACKEND_DIR, PROTO_DIR, build_corpus, fill  # noqa: E402
+from src.proto_compiler import get_proto_compiler  # noqa: E402
+from src.proto_converter import message_to_dict  # noqa: E402
+
+
+def topic_messages(per_type: int):
+    """Wire-decoded messages for each topic's configured message type"""
+    with open(BACKEND_DIR / "config" / "topics.yaml") as f:
+        topics = yaml.safe_load(f)['topics']
+    compiler = get_proto_compiler(str(PROTO_DIR))
+    rng = random.Random(0)
+    messages = []
+    for topic_cfg in topics.values():
+        cls = compiler.get_message_class(topic_cfg['proto_file'], topic_cfg['message_type'])
+        for _ in range(per_type):
+            message = cls()
+            fill(message, rng)
+            messages.append(cls.FromString(message.SerializeToString()))
+    return messages
+
+
+def rate(convert, messages, rounds: int = 3) -> float:
+    """Best-of-rounds messages per second"""
+    best = float('inf')
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for message in messages:
+            convert(message)
+        best = min(best, time.perf_counter() - started)
+    return len(messages) / best
+
+
+def main():
+    per_type = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    def json_format(message):
+        return MessageToDict(message, preserving_proto_field_name=True)
+
+    corpora = [
+        ("topic messages", topic_messages(per_type)),
+        ("config/proto corpus", list(build_corpus(samples_per_type=max(1, per_type // 200)))),
+    ]
+    print(f"{'corpus':>20} | {'messages':>8} | {'MessageToDict/s':>15} | {'fast path/s':>11} | {'speedup':>7}")
+    print("-" * 74)
+    for name, messages in corpora:
+        baseline = rate(json_format, messages)
+        fast = rate(message_to_dict, messages)
+        print(f"{name:>20} | {len(messages):>8} | {baseline:>15,.0f} | {fast:>11,.0f} | {fast / baseline:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark: trace recency tracking in TraceGraphBuilder
+
+Compares the old deque-based recency list (O(n) `remove` on every touch)
+with the OrderedDict LRU now used by TraceGraphBuilder, and measures full
+add_message ingest at increasing max_traces.
+
+Usage: python tests/benchmark_trace_store.py
+"""
+import logging
+import random
+import sys
+import time
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from src.graph_builder import TraceGraphBuilder  # noqa: E402
+from src.models import KafkaMessage  # noqa: E402
+
+TOPICS_YAML = BACKEND_DIR / "config" / "topics.yaml"
+TOPICS = ["user-events", "processed-events", "notifications", "analytics"]
+
+
+def deque_touch_rate(max_traces: int, touches: int) -> float:
+    """Touches per second with the previous deque + remove() recency list"""
+    order = deque(range(max_traces))
+    ids = [random.randrange(max_traces) for _ in range(touches)]
+    started = time.perf_counter()
+    for trace_id in ids:
+        if trace_id in order:
+            order.remove(trace_id)
+        order.append(trace_id)
+    return touches / (time.perf_counter() - started)
+
+
+def ordered_dict_touch_rate(max_traces: int, touches: int) -> float:
+    """Touches per second with OrderedDict.move_to_end"""
+    traces = OrderedDict((i, None) for i in range(max_traces))
+    ids = [random.randrange(max_traces) for _ in range(touches)]
+    started = time.perf_counter()
+    for trace_id in ids:
+        traces.move_to_end(trace_id)
+    return touches / (time.perf_counter() - started)
+
+
+def ingest_rate(max_traces: int, messages: int) -> float:
+    """Messages per second through TraceGraphBuilder.add_message at capacity"""
+    builder = TraceGraphBuilder(str(TOPICS_YAML), max_traces=max_traces)
+
+    # Old timestamps so the 30-second eviction guard does not pin traces in memory
+    base_time = datetime.now() - timedelta(hours=1)
+
+    def make(i: int, trace_id: int) -> KafkaMessage:
+        return KafkaMessage(
+            topic=TOPICS[i % len(TOPICS)], partition=0, offset=i, key=None,
+            timestamp=base_time + timedelta(milliseconds=i), headers={},
+            raw_value=b"", decoded_value={}, trace_id=f"trace-{trace_id}"
+        )
+
+    for i in range(max_traces):
+        builder.add_message(make(i, i))
+
+    batch = [make(i, random.randrange(max_traces * 2)) for i in range(messages)]
+    started = time.perf_counter()
+    for message in batch:
+        builder.add_message(message)
+    return messages / (time.perf_counter() - started)
+
+
+def main():
+    logging.disable(logging.CRITICAL)
+    random.seed(42)
+
+    print(f"{'max_traces':>10} | {'deque touch/s':>14} | {'odict touch/s':>14} | {'ingest msg/s':>13}")
+    print("-" * 62)
+    for max_traces in (1_000, 10_000, 100_000):
+        touches = 2_000 if max_traces >= 100_000 else 20_000
+        print(
+            f"{max_traces:>10} | "
+            f"{deque_touch_rate(max_traces, touches):>14,.0f} | "
+            f"{ordered_dict_touch_rate(max_traces, 200_000):>14,.0f} | "
+            f"{ingest_rate(max_traces, 50_000):>13,.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Randomly populated protobuf messages for every message type in config/proto
+
+Shared by the proto converter parity test and its benchmark. Values cover
+the cases the JSON mapping treats specially: 64-bit integers, enums
+(including unknown numbers on open enums), bytes, non-finite floats, maps
+with bool keys and the well-known types.
+"""
+import random
+import sys
+from pathlib import Path
+from typing import Iterator, List
+
+from google.protobuf.descriptor import Descriptor, FieldDescriptor
+from google.protobuf.message import Message
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from src.proto_compiler import get_proto_compiler  # noqa: E402
+
+PROTO_DIR = BACKEND_DIR / "config" / "proto"
+MAX_DEPTH = 3
+
+INT_RANGES = {
+    FieldDescriptor.TYPE_INT32: (-2**31, 2**31 - 1),
+    FieldDescriptor.TYPE_SINT32: (-2**31, 2**31 - 1),
+    FieldDescriptor.TYPE_SFIXED32: (-2**31, 2**31 - 1),
+    FieldDescriptor.TYPE_UINT32: (0, 2**32 - 1),
+    FieldDescriptor.TYPE_FIXED32: (0, 2**32 - 1),
+    FieldDescriptor.TYPE_INT64: (-2**63, 2**63 - 1),
+    FieldDescriptor.TYPE_SINT64: (-2**63, 2**63 - 1),
+    FieldDescriptor.TYPE_SFIXED64: (-2**63, 2**63 - 1),
+    FieldDescriptor.TYPE_UINT64: (0, 2**64 - 1),
+    FieldDescriptor.TYPE_FIXED64: (0, 2**64 - 1),
+}
+SPECIAL_FLOATS = [float('inf'), float('-inf'), float('nan'), 0.0, -0.0, 1e-45, 3.4e38]
+
+
+def message_descriptors() -> List[Descriptor]:
+    """Every message type declared under config/proto, nested ones included (map entries excluded)"""
+    compiler = get_proto_compiler(str(PROTO_DIR))
+    assert compiler.ensure_compiled(), compiler.error
+
+    descriptors = []
+    pending = []
+    for proto_file in compiler.files:
+        pending.extend(compiler.pool.FindFileByName(proto_file).message_types_by_name.values())
+    while pending:
+        descriptor = pending.pop(0)
+        if descriptor.GetOptions().map_entry:
+            continue
+        descriptors.append(descriptor)
+        pending.extend(descriptor.nested_types)
+    return descriptors
+
+
+def message_class(descriptor: Descriptor):
+    from google.protobuf import message_factory
+    return message_factory.GetMessageClass(descriptor)
+
+
+def build_corpus(samples_per_type: int = 5, seed: int = 0) -> Iterator[Message]:
+    """Populated messages for every type, deterministic for a seed"""
+    rng = random.Random(seed)
+    for descriptor in message_descriptors():
+        cls = message_class(descriptor)
+        for _ in range(samples_per_type):
+            message = cls()
+            fill(message, rng)
+            yield message
+
+
+def scalar(field: FieldDescriptor, rng: random.Random):
+    if field.type in INT_RANGES:
+        low, high = INT_RANGES[field.type]
+        return rng.choice([low, high, 0, rng.randint(low, high), rng.randint(-1000, 1000) if low < 0 else rng.randint(0, 1000)])
+    if field.type == FieldDescriptor.TYPE_BOOL:
+        return rng.random() < 0.5
+    if field.type == FieldDescriptor.TYPE_STRING:
+        return ''.join(rng.choice('abcXYZ_- éß中🙂') for _ in range(rng.randint(0, 12)))
+    if field.type == FieldDescriptor.TYPE_BYTES:
+        return bytes(rng.getrandbits(8) for _ in range(rng.randint(0, 16)))
+    if field.type in (FieldDescriptor.TYPE_FLOAT, FieldDescriptor.TYPE_DOUBLE):
+        if rng.random() < 0.3:
+            return rng.choice(SPECIAL_FLOATS)
+        return rng.uniform(-1e6, 1e6) * 10 ** rng.randint(-8, 8)
+    if field.type == FieldDescriptor.TYPE_ENUM:
+        numbers = [value.number for value in field.enum_type.values]
+        if not field.enum_type.is_closed and rng.random() < 0.1:
+            return max(numbers) + 7  # unknown value of an open enum
+        return rng.choice(numbers)
+    raise ValueError(f"Unexpected scalar type {field.type} for {field.full_name}")
+
+
+def fill_well_known(message: Message, rng: random.Random) -> bool:
+    """Set a valid value on a well-known type; False if the message is not one"""
+    name = message.DESCRIPTOR.full_name
+    if name == 'google.protobuf.Timestamp':
+        message.FromSeconds(rng.randint(0, 4_000_000_000))
+        message.nanos = rng.randint(0, 999_999_999)
+    elif name == 'google.protobuf.Duration':
+        message.FromMilliseconds(rng.randint(0, 10**9))
+    elif name == 'google.protobuf.Struct':
+        message.update({'text': 'value', 'number': rng.random(), 'flag': True, 'nested': {'list': [1, 'two']}})
+    elif name == 'google.protobuf.Value':
+        message.string_value = 'value'
+    elif name == 'google.protobuf.ListValue':
+        message.extend([1, 'two', None])
+    elif name == 'google.protobuf.FieldMask':
+        message.paths.extend(['field_a', 'nested.field_b'])
+    elif name == 'google.protobuf.Any':
+        from google.protobuf import timestamp_pb2
+        message.Pack(timestamp_pb2.Timestamp(seconds=rng.randint(0, 10**9)))
+    else:
+        return False
+    return True
+
+
+def fill(message: Message, rng: random.Random, depth: int = 0):
+    """Populate a random subset of a message's fields"""
+    if fill_well_known(message, rng):
+        return
+    for field in message.DESCRIPTOR.fields:
+        if rng.random() < 0.25:
+            continue
+        value = getattr(message, field.name)
+        if field.message_type is not None and field.message_type.GetOptions().map_entry:
+            key_field = field.message_type.fields_by_name['key']
+            value_field = field.message_type.fields_by_name['value']
+            for _ in range(rng.randint(0, 3)):
+                key = scalar(key_field, rng)
+                if value_field.message_type is not None:
+                    if depth < MAX_DEPTH:
+                        fill(value[key], rng, depth + 1)
+                else:
+                    value[key] = scalar(value_field, rng)
+        elif field.is_repeated:
+            for _ in range(rng.randint(0, 3)):
+                if field.message_type is not None:
+                    if depth < MAX_DEPTH:
+                        fill(value.add(), rng, depth + 1)
+                else:
+                    value.append(scalar(field, rng))
+        elif field.message_type is not None:
+            if depth < MAX_DEPTH:
+                fill(value, rng, depth + 1)
+                if not message.HasField(field.name):
+                    value.SetInParent()
+        else:
+            setattr(message, field.name, scalar(field, rng))
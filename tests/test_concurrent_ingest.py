@@ -0,0 +1,220 @@
+"""
+Single-writer ingest against concurrent reads on worker threads
+"""
+import asyncio
+import logging
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from src.graph_builder import TraceGraphBuilder  # noqa: E402
+from src.ingest_writer import IngestWriter  # noqa: E402
+from src.models import KafkaMessage  # noqa: E402
+from src.read_pool import BuilderReadPool  # noqa: E402
+
+TOPICS_YAML = BACKEND_DIR / "config" / "topics.yaml"
+
+logging.disable(logging.CRITICAL)
+
+
+def make_builder(max_traces: int = 500) -> TraceGraphBuilder:
+    builder = TraceGraphBuilder(str(TOPICS_YAML), max_traces=max_traces)
+    builder.set_monitored_topics(builder.topic_graph.get_all_topics())
+    return builder
+
+
+def make_messages(builder, count: int, start: int = 0):
+    topics = builder.topic_graph.get_all_topics()
+    base = datetime.now() - timedelta(minutes=5)
+    return [KafkaMessage(topic=topics[i % len(topics)], partition=0, offset=i, key=f"key-{i % 50}",
+                         timestamp=base + timedelta(milliseconds=i), headers={}, raw_value=b"",
+                         decoded_value={'n': i}, trace_id=f"trace-{i // 4}")
+            for i in range(start, start + count)]
+
+
+def test_reads_during_ingest_are_consistent_and_complete():
+    builder, expected = make_builder(), make_builder()
+    messages = make_messages(builder, 20000)
+    expected.add_messages(messages)
+    writer = IngestWriter(lambda: builder, max_pending=8)
+    reads = BuilderReadPool(lambda: builder, workers=3)
+    writer.start()
+
+    def consume():
+        for i in range(0, len(messages), 100):
+            writer.submit(messages[i:i + 100])
+
+    async def read_while_ingesting():
+        consumer = threading.Thread(target=consume)
+        consumer.start()
+        results = 0
+        while consumer.is_alive() or writer.pending.qsize():
+            page, statistics, components = await asyncio.gather(
+                reads.read('query_traces', shared=False, limit=20),
+                reads.read('get_statistics'),
+                reads.read('get_disconnected_graphs'))
+            # Every read sees the state between two applied batches, which hold whole four-message traces
+            assert statistics['messages']['total'] == 4 * statistics['traces']['total']
+            assert sum(statistics['messages']['by_topic'].values()) == statistics['messages']['total']
+            assert len(page['traces']) <= 20 and isinstance(components, list)
+            results += 1
+        consumer.join()
+        return results
+
+    assert asyncio.run(read_while_ingesting()) > 0
+    assert writer.flush(5)
+    writer.stop()
+    reads.shutdown()
+    assert writer.messages_applied == len(messages)
+    assert writer.batches_applied <= writer.batches_submitted == len(messages) // 100
+    assert list(builder.traces) == list(expected.traces)
+    assert builder.get_statistics()['messages'] == expected.get_statistics()['messages']
+
+
+def test_equal_reads_share_a_result_until_the_builder_changes():
+    builder = make_builder()
+    builder.add_messages(make_messages(builder, 40))
+    reads = BuilderReadPool(lambda: builder, workers=2)
+
+    async def scenario():
+        for _ in range(2):  # Retry once should a second boundary pass
+            first, second = await asyncio.gather(reads.read('get_statistics'), reads.read('get_statistics'))
+            if first is second:
+                break
+        assert first is second and reads.shared >= 1
+        builder.add_messages(make_messages(builder, 4, start=40))
+        third = await reads.read('get_statistics')
+        assert third is not first and third['messages']['total'] == 44
+        assert await reads.read('get_subgraph', "missing") is None
+
+    asyncio.run(scenario())
+    reads.shutdown()
+
+
+def test_shared_reads_do_not_wait_for_the_writer():
+    builder = make_builder()
+    builder.add_messages(make_messages(builder, 40))
+    reads = BuilderReadPool(lambda: builder, workers=2)
+    writing, release = threading.Event(), threading.Event()
+
+    def slow_write():
+        with builder.lock:  # A writer in the middle of a long batch, versioned once it is applied
+            writing.set()
+            release.wait(5)
+            builder.version += 1
+
+    async def scenario():
+        published = await reads.read('get_statistics')
+        writer = threading.Thread(target=slow_write)
+        writer.start()
+        writing.wait(5)
+        reads._results.clear()  # As when the second rolls over: the shared result is not reused
+        started = time.monotonic()
+        during = await reads.read('get_statistics')
+        waited = time.monotonic() - started
+        # A view never published has no snapshot to fall back on and waits for the lock
+        unpublished = asyncio.ensure_future(reads.read('get_disconnected_graphs'))
+        await asyncio.sleep(0.05)
+        assert not unpublished.done()
+        release.set()
+        writer.join()
+        await unpublished
+        after = await reads.read('get_statistics')
+        return published, during, waited, after
+
+    published, during, waited, after = asyncio.run(scenario())
+    reads.shutdown()
+    assert during is published and waited < 0.5 and reads.stale == 1
+    # The stale snapshot was not shared under the new version
+    assert after is not published and after['messages']['total'] == 40
+
+
+def test_snapshots_are_not_served_once_they_lag_or_keep_answering():
+    builder = make_builder()
+    builder.add_messages(make_messages(builder, 40))
+    reads = BuilderReadPool(lambda: builder, workers=1, max_stale_reads=2)
+    holding, release = threading.Event(), threading.Event()
+
+    def hold_lock():
+        with builder.lock:
+            holding.set()
+            release.wait(5)
+
+    async def read(method):
+        reads._results.clear()  # Each read computes instead of sharing the previous one
+        return await reads.read(method)
+
+    async def waits(method):
+        pending = asyncio.ensure_future(read(method))
+        await asyncio.sleep(0.1)
+        waiting = not pending.done()
+        release.set()
+        return waiting, await pending
+
+    async def scenario():
+        published = await read('get_statistics')
+        # Under steady ingest the lock is hardly ever free: after two snapshot answers a read waits
+        holder = threading.Thread(target=hold_lock)
+        holder.start()
+        holding.wait(5)
+        assert all([await read('get_statistics') is published for _ in range(2)])
+        waiting, _ = await waits('get_statistics')
+        holder.join()
+        assert waiting and reads.stale == 2 and reads.stale_refused == 1
+
+        # A snapshot older than the batch being applied is not served even once
+        await read('get_disconnected_graphs')
+        builder.add_messages(make_messages(builder, 4, start=40))
+        holding.clear()
+        release.clear()
+        holder = threading.Thread(target=hold_lock)
+        holder.start()
+        holding.wait(5)
+        waiting, _ = await waits('get_disconnected_graphs')
+        holder.join()
+        assert waiting and reads.stale == 2 and reads.stale_refused == 2
+
+    asyncio.run(scenario())
+    reads.shutdown()
+
+
+def test_discarded_batches_are_not_applied():
+    builder = make_builder()
+    writer = IngestWriter(lambda: builder)
+    writer.submit(make_messages(builder, 8))
+    writer.discard_pending()
+    writer.submit(make_messages(builder, 8, start=100))
+    writer.start()
+    assert writer.flush(5)
+    writer.stop()
+    assert sorted(builder.traces) == ["trace-25", "trace-26"]
+    assert builder.version > 0 and writer.get_stats()['messages_applied'] == 8
+
+
+def test_trace_endpoints_are_serialized_inside_the_pooled_read():
+    builder = make_builder()
+    builder.add_messages(make_messages(builder, 8))
+    reads = BuilderReadPool(lambda: builder, workers=2)
+
+    async def scenario():
+        detail, hops, missing = await asyncio.gather(
+            reads.read('get_trace_detail', "trace-1", False, shared=False),
+            reads.read('get_trace_hops', "trace-1", shared=False),
+            reads.read('get_trace_detail', "missing", shared=False))
+        return detail, hops, missing
+
+    detail, hops, missing = asyncio.run(scenario())
+    reads.shutdown()
+    trace = builder.traces["trace-1"]
+    assert missing is None
+    # Plain data, detached from the live trace that the writer keeps appending to
+    assert detail['messages'] == [m.to_dict() for m in trace.messages] and detail['message_count'] == 4
+    assert detail['messages'] is not trace.messages
+    assert [n['id'] for n in hops['nodes']] == [m.topic for m in trace.messages]
+    assert [(e['source'], e['target']) for e in hops['edges']] == \
+        [(a.topic, b.topic) for a, b in zip(trace.messages, trace.messages[1:])]
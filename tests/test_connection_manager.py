@@ -0,0 +1,157 @@
+"""
+WebSocket fan-out: concurrent per-client queues, drop and coalesce policies, stuck client timeouts
+"""
+import asyncio
+import json
+import logging
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from src.connection_manager import ConnectionManager  # noqa: E402
+from src.graph_builder import TraceGraphBuilder  # noqa: E402
+from src.live_updates import LiveUpdatePublisher  # noqa: E402
+
+TOPICS_YAML = BACKEND_DIR / "config" / "topics.yaml"
+
+logging.disable(logging.CRITICAL)
+
+
+class FakeSocket:
+    def __init__(self, delay: float = 0.0, stuck: bool = False):
+        self.sent = []
+        self.delay = delay
+        self.stuck = stuck
+        self.closed = False
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text: str):
+        if self.stuck:
+            await asyncio.Event().wait()
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.sent.append(text)
+
+    async def close(self):
+        self.closed = True
+
+
+async def drain(manager: ConnectionManager, timeout: float = 2.0):
+    deadline = time.monotonic() + timeout
+    while any(c.queue for c in manager.connections.values()) and time.monotonic() < deadline:
+        await asyncio.sleep(0.005)
+    await asyncio.sleep(0.25)  # Let the sends already taken off the queues complete
+
+
+def test_broadcast_is_serialized_once_and_fanned_out_concurrently():
+    async def scenario():
+        manager = ConnectionManager()
+        sockets = [FakeSocket(delay=0.02) for _ in range(150)]
+        for socket in sockets:
+            await manager.connect(socket)
+        started = time.monotonic()
+        for i in range(5):
+            await manager.broadcast({'type': 'build_output', 'line': i})
+        await drain(manager)
+        elapsed = time.monotonic() - started
+
+        assert all([json.loads(t)['line'] for t in s.sent] == [0, 1, 2, 3, 4] for s in sockets)
+        assert all(s.sent[0] is sockets[0].sent[0] for s in sockets)
+        assert elapsed < 1.0  # Sequential sends would take 150 * 5 * 20 ms = 15 s
+        stats = manager.get_stats()
+        assert stats['clients'] == 150 and stats['queued'] == 0
+        assert all(c['sent'] == 5 and c['send_latency_ms_avg'] > 0 for c in stats['connections'])
+        for socket in sockets:
+            manager.disconnect(socket)
+    asyncio.run(scenario())
+
+
+def test_slow_client_drops_oldest_without_delaying_others():
+    async def scenario():
+        manager = ConnectionManager(max_queue=3, policy='drop_oldest')
+        fast, slow = FakeSocket(), FakeSocket(delay=0.2)
+        await manager.connect(fast)
+        await manager.connect(slow)
+        for i in range(10):
+            manager.broadcast_text(str(i), key='graph')
+            await asyncio.sleep(0.002)  # Long enough for the fast client, not the slow one
+        await asyncio.sleep(0.05)
+        assert fast.sent == [str(i) for i in range(10)]
+        depth = {c['id']: c for c in manager.get_stats()['connections']}
+        assert depth[2]['queue_depth'] == 3 and depth[2]['dropped'] > 0
+        assert manager.take_stale(slow) == {'graph'} and manager.take_stale(fast) == set()
+        await drain(manager)
+        assert slow.sent[-3:] == ['7', '8', '9']
+        manager.disconnect(fast)
+        manager.disconnect(slow)
+    asyncio.run(scenario())
+
+
+def test_coalesce_replaces_queued_messages_of_the_same_key():
+    async def scenario():
+        manager = ConnectionManager(policy='coalesce')
+        socket = FakeSocket(delay=0.05)
+        await manager.connect(socket)
+        manager.send(socket, 'first', key='graph')
+        await asyncio.sleep(0.01)  # 'first' is being sent
+        manager.send(socket, 'delta-1', key='graph')
+        manager.send(socket, 'stats', key='statistics')
+        manager.send(socket, 'delta-2', key='graph')
+        assert [text for _, text, _ in manager.connections[socket].queue] == ['stats', 'delta-2']
+        assert manager.take_stale(socket) == {'graph'}
+
+        manager.send(socket, 'delta-3', key='graph')
+        manager.send(socket, 'snapshot', key='graph', supersedes=True)
+        assert manager.take_stale(socket) == set()
+        await drain(manager)
+        assert socket.sent == ['first', 'stats', 'snapshot']
+        manager.disconnect(socket)
+    asyncio.run(scenario())
+
+
+def test_stuck_client_is_disconnected_after_the_send_timeout():
+    async def scenario():
+        manager = ConnectionManager(send_timeout=0.05)
+        healthy, stuck = FakeSocket(), FakeSocket(stuck=True)
+        await manager.connect(healthy)
+        await manager.connect(stuck)
+        await manager.broadcast({'n': 1})
+        await asyncio.sleep(0.15)
+        assert stuck.closed and stuck not in manager.connections
+        assert manager.get_stats()['disconnected_slow'] == 1
+        assert not manager.send(stuck, 'late')
+        await manager.broadcast({'n': 2})
+        await drain(manager)
+        assert [json.loads(t)['n'] for t in healthy.sent] == [1, 2]
+        manager.disconnect(healthy)
+    asyncio.run(scenario())
+
+
+def test_live_updates_resync_a_lagging_client_with_a_snapshot():
+    async def scenario():
+        builder = TraceGraphBuilder(str(TOPICS_YAML))
+        manager = ConnectionManager(policy='coalesce')
+        publisher = LiveUpdatePublisher(lambda: builder, connections=manager)
+        await publisher.tick()
+        socket = FakeSocket(delay=0.05)
+        await manager.connect(socket)
+        publisher.add_client(socket)
+        await publisher.handle_message(socket, json.dumps({'action': 'subscribe', 'channels': ['graph']}))
+
+        builder.topic_graph.add_edge("lag-a", "lag-b")
+        await publisher.tick()  # Snapshot replaces the queued one without going stale
+        assert manager.take_stale(socket) == set()
+        manager.send(socket, '{"type":"graph_delta"}', key='graph')
+        manager.send(socket, '{"type":"graph_delta"}', key='graph')
+        await publisher.tick()  # The coalesced delta is resent as a snapshot
+        await drain(manager)
+        types = [json.loads(t)['type'] for t in socket.sent]
+        assert types[-1] == 'graph_snapshot'
+        manager.disconnect(socket)
+        publisher.remove_client(socket)
+    asyncio.run(scenario())
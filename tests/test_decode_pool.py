@@ -0,0 +1,61 @@
+"""
+Process-pool protobuf decoding: results match in-thread decoding, in input order
+"""
+import logging
+import sys
+from pathlib import Path
+
+import yaml
+from google.protobuf.descriptor import FieldDescriptor
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from src.decode_pool import ProtobufDecodePool  # noqa: E402
+from src.protobuf_decoder import ProtobufDecoder  # noqa: E402
+
+logging.disable(logging.CRITICAL)
+
+TOPICS = ["user-events", "notifications"]
+
+
+def make_payload(message_class, n: int) -> bytes:
+    """A message with every singular top-level string field set to a value unique to n"""
+    message = message_class()
+    for field in message_class.DESCRIPTOR.fields:
+        if field.type == FieldDescriptor.TYPE_STRING:
+            try:
+                setattr(message, field.name, f"{field.name}-{n}")
+            except AttributeError:
+                pass  # Repeated fields cannot be assigned
+    return message.SerializeToString()
+
+
+def test_pooled_decoding_matches_the_consumer_thread_in_input_order():
+    with open(BACKEND_DIR / "config" / "topics.yaml") as f:
+        topics = yaml.safe_load(f)['topics']
+    decoder = ProtobufDecoder(str(BACKEND_DIR / "config" / "proto"))
+    for topic in TOPICS:
+        decoder.load_topic_protobuf(topic, topics[topic]['proto_file'], topics[topic]['message_type'])
+
+    # Two topics over two partitions, interleaved, with one undecodable payload
+    items = []
+    for n in range(40):
+        topic = TOPICS[n % 2]
+        items.append((topic, n % 3 % 2, make_payload(decoder.topic_decoders[topic].message_class, n)))
+    items[17] = (items[17][0], items[17][1], b"\xff\xff\xff")
+
+    pool = ProtobufDecodePool(decoder, workers=2)
+    try:
+        assert pool.topics == set(TOPICS)
+        results = pool.decode_batch(items)
+    finally:
+        pool.shutdown()
+
+    assert len(results) == len(items)
+    for n, ((topic, _, payload), (success, value)) in enumerate(zip(items, results)):
+        if n == 17:
+            assert not success and value
+        else:
+            assert success and value == decoder.decode_message(topic, payload)
+            assert any(str(v).endswith(f"-{n}") for v in value.values())
@@ -0,0 +1,98 @@
+"""
+Decoder warm-up: parallel, deduplicated topic loading and the readiness reported by /health
+"""
+import logging
+import sys
+import threading
+from pathlib import Path
+
+import yaml
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from src.decoder_warmup import DecoderWarmup  # noqa: E402
+from src.protobuf_decoder import ProtobufDecoder  # noqa: E402
+
+logging.disable(logging.CRITICAL)
+
+
+class BlockingDecoder:
+    """Loads block until released, so all_loading is only set when the loads run in parallel"""
+
+    def __init__(self, parallel: int):
+        self.parallel = parallel
+        self.loading = 0
+        self.all_loading = threading.Event()
+        self.release = threading.Event()
+        self.lock = threading.Lock()
+        self.loaded = []
+        self.shared = []
+
+    def load_topic_protobuf(self, topic, proto_file, message_type, projection=None):
+        with self.lock:
+            self.loading += 1
+            if self.loading == self.parallel:
+                self.all_loading.set()
+        self.release.wait(5)
+        if proto_file == "broken.proto":
+            raise ValueError("syntax error")
+        self.loaded.append(topic)
+
+    def share_topic_decoder(self, topic, source_topic):
+        self.shared.append((topic, source_topic))
+
+
+def test_health_reports_starting_until_the_warmup_finishes():
+    topics = {
+        'orders': {'proto_file': "orders.proto", 'message_type': "Order"},
+        'orders-replay': {'proto_file': "orders.proto", 'message_type': "Order"},
+        'payments': {'proto_file': "payments.proto", 'message_type': "Payment"},
+        'audit': {'proto_file': "broken.proto", 'message_type': "Audit"},
+        'audit-copy': {'proto_file': "broken.proto", 'message_type': "Audit"},
+        'raw': {}
+    }
+    decoder = BlockingDecoder(parallel=3)
+    warmup = DecoderWarmup(max_workers=4)
+    assert warmup.ready and warmup.status()['state'] == 'idle'
+
+    warmup.mark_pending()
+    assert not warmup.status()['ready']
+    runner = threading.Thread(target=warmup.run, args=(decoder, topics))
+    runner.start()
+    # All three distinct protobufs are loading at once while the service reports it is starting
+    assert decoder.all_loading.wait(5)
+    assert warmup.status()['state'] == 'running' and not warmup.status()['ready']
+    decoder.release.set()
+    runner.join(5)
+
+    status = warmup.status()
+    assert status['ready'] and status['state'] == 'done' and status['duration_seconds'] is not None
+    assert sorted(decoder.loaded) == ['orders', 'payments']
+    assert decoder.shared == [('orders-replay', 'orders')]
+    entries = status['topics']
+    assert entries['orders-replay']['shared_with'] == 'orders' and entries['orders-replay']['status'] == 'loaded'
+    assert entries['audit']['status'] == 'failed' and entries['audit-copy']['error'] == "syntax error"
+    assert entries['raw']['status'] == 'skipped'
+    assert all('seconds' in entry for topic, entry in entries.items() if topic != 'raw')
+
+
+def test_a_pending_warmup_that_never_starts_settles_as_ready():
+    warmup = DecoderWarmup()
+    warmup.mark_pending()
+    assert not warmup.ready
+    warmup.settle()
+    assert warmup.ready and warmup.status()['state'] == 'skipped'
+
+
+def test_configured_topics_decode_after_the_warmup():
+    with open(BACKEND_DIR / "config" / "topics.yaml") as f:
+        topics = yaml.safe_load(f)['topics']
+    decoder = ProtobufDecoder(str(BACKEND_DIR / "config" / "proto"))
+    status = DecoderWarmup().run(decoder, topics)
+
+    assert {topic: entry['status'] for topic, entry in status.items()} == {topic: 'loaded' for topic in topics}
+    for topic in topics:
+        message_class = decoder.topic_decoders[topic].message_class
+        assert message_class.DESCRIPTOR.name == topics[topic]['message_type']
+        assert decoder.decode_message(topic, message_class().SerializeToString()) == {}
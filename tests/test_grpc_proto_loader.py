@@ -0,0 +1,98 @@
+"""
+gRPC proto loader: stubs built from the shared descriptor pool, round trips and cold start
+"""
+import json
+import logging
+import subprocess
+import sys
+import tempfile
+from concurrent import futures
+from pathlib import Path
+
+import grpc
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from src.grpc_proto_loader import GrpcProtoLoader  # noqa: E402
+
+PROTO_DIR = BACKEND_DIR / "config" / "proto"
+INGRESS = "eadp.cadie.ingressserver.v1.IngressServer"
+
+logging.disable(logging.CRITICAL)
+
+COLD_START = """
+import json, logging, sys, tempfile, time
+from pathlib import Path
+sys.path.insert(0, {backend!r})
+logging.disable(logging.CRITICAL)
+temp = Path(tempfile.gettempdir())
+before = set(temp.glob("grpc_protos_*"))
+started = time.perf_counter()
+from src.grpc_proto_loader import GrpcProtoLoader
+loader = GrpcProtoLoader({protos!r})
+ready = loader.compile_proto_files() and loader.load_service_modules()
+print(json.dumps({{
+    'ready': ready,
+    'seconds': time.perf_counter() - started,
+    'services': sorted(loader.compiled_modules),
+    'generated_modules': sorted(m for m in sys.modules if m.endswith('_pb2_grpc') or m.startswith('proto_gen')),
+    'new_temp_dirs': len(set(temp.glob("grpc_protos_*")) - before)
+}}))
+"""
+
+
+def make_loader() -> GrpcProtoLoader:
+    loader = GrpcProtoLoader(str(PROTO_DIR))
+    assert loader.compile_proto_files() and loader.load_service_modules()
+    return loader
+
+
+def test_stub_round_trip_through_a_server():
+    loader = make_loader()
+    request_class = loader.get_message_class('ingress_server', 'UpsertContentRequest')
+    response_class = loader.get_message_class('ingress_server', 'UpsertContentResponse')
+    received = []
+
+    def upsert(request, context):
+        received.append(request)
+        return response_class()
+
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=2))
+    server.add_generic_rpc_handlers([grpc.method_handlers_generic_handler(INGRESS, {
+        'UpsertContent': grpc.unary_unary_rpc_method_handler(
+            upsert, request_deserializer=request_class.FromString,
+            response_serializer=response_class.SerializeToString)
+    })])
+    port = server.add_insecure_port("127.0.0.1:0")
+    server.start()
+    try:
+        with grpc.insecure_channel(f"127.0.0.1:{port}") as channel:
+            stub = loader.create_service_stub('ingress_server', channel)
+            response = stub.UpsertContent(request_class(), timeout=5)
+    finally:
+        server.stop(None)
+
+    assert type(response) is response_class and len(received) == 1
+    assert received[0].DESCRIPTOR.full_name == "eadp.cadie.ingressserver.v1.UpsertContentRequest"
+    # Every RPC of the service is on the stub, with the generated code's method paths
+    methods = loader.compiled_modules['ingress_server']['descriptor'].services_by_name['IngressServer'].methods
+    assert all(callable(getattr(stub, method.name)) for method in methods)
+
+
+def test_message_classes_are_found_through_imports():
+    loader = make_loader()
+    assert loader.get_message_class('asset_storage', 'BatchGetSignedUrlsRequest') is not None
+    assert loader.get_message_class('ingress_server', 'NoSuchMessage') is None
+    loader.cleanup()
+    assert not loader.compiled_modules and loader.get_message_class('ingress_server', 'UpsertContentRequest') is None
+
+
+def test_cold_start_generates_and_imports_no_modules():
+    script = COLD_START.format(backend=str(BACKEND_DIR), protos=str(PROTO_DIR))
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, timeout=120,
+                            cwd=tempfile.gettempdir())
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    assert report['ready'] and report['services'] == ['asset_storage', 'ingress_server']
+    assert report['generated_modules'] == [] and report['new_temp_dirs'] == 0
+    print(f"gRPC loader cold start: {report['seconds'] * 1000:.0f} ms")
@@ -0,0 +1,212 @@
+"""
+Kafka consumer loops against a fake confluent_kafka consumer: batch dispatch order, partial batches,
+the per-message poll() default and pausing unmonitored partitions
+"""
+import logging
+import sys
+from collections import namedtuple
+from pathlib import Path
+
+import yaml
+from confluent_kafka import KafkaError
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from src.environment_manager import EnvironmentManager  # noqa: E402
+from src.kafka_consumer import KafkaConsumerService  # noqa: E402
+
+logging.disable(logging.CRITICAL)
+
+TopicPartition = namedtuple('TopicPartition', 'topic partition')
+
+
+class FakeMessage:
+    def __init__(self, topic: str, offset: int, trace: str, error=None):
+        self._topic, self._offset, self._trace, self._error = topic, offset, trace, error
+
+    def error(self):
+        return self._error
+
+    def topic(self):
+        return self._topic
+
+    def partition(self):
+        return 0
+
+    def offset(self):
+        return self._offset
+
+    def key(self):
+        return None
+
+    def value(self):
+        return b"payload-%d" % self._offset
+
+    def headers(self):
+        return [('traceparent', f"00-{self._trace}-01".encode())]
+
+    def timestamp(self):
+        return (1, 1_700_000_000_000 + self._offset)
+
+
+class FakeConsumer:
+    """Replays scripted consume()/poll() results, then stops the service
+
+    Callables in the script run in place of a fetch that returns nothing.
+    """
+
+    def __init__(self, service: KafkaConsumerService, script, assignment=()):
+        self.service = service
+        self.script = list(script)
+        self.calls = []
+        self.closed = False
+        self._assignment = list(assignment)
+        self.paused = set()
+
+    def _next(self):
+        if not self.script:
+            self.service.running = False
+            return None
+        step = self.script.pop(0)
+        if callable(step):
+            step()
+            return None
+        return step
+
+    def consume(self, num_messages, timeout):
+        self.calls.append(('consume', num_messages, timeout))
+        return self._next() or []
+
+    def poll(self, timeout):
+        self.calls.append(('poll', timeout))
+        return self._next()
+
+    def assignment(self):
+        return self._assignment
+
+    def pause(self, partitions):
+        self.calls.append(('pause', sorted(tp.topic for tp in partitions)))
+        self.paused.update(partitions)
+
+    def resume(self, partitions):
+        self.calls.append(('resume', sorted(tp.topic for tp in partitions)))
+        self.paused.difference_update(partitions)
+
+    def close(self):
+        self.closed = True
+
+
+class FakeDecoder:
+    def __init__(self):
+        self.decoded = []
+
+    def decode_message(self, topic, value):
+        self.decoded.append(value)
+        return {'size': len(value)}
+
+
+def make_service(script, assignment=(), **processing) -> KafkaConsumerService:
+    service = KafkaConsumerService.__new__(KafkaConsumerService)
+    service.decoder = FakeDecoder()
+    service.trace_header_field = 'traceparent'
+    service.restore_state()
+    service.configure_processing({'message_processing': processing})
+    service.consumer = FakeConsumer(service, script, assignment)
+    return service
+
+
+def test_batch_consume_is_off_by_default():
+    with open(BACKEND_DIR / "config" / "settings.yaml") as f:
+        settings = yaml.safe_load(f)
+    assert settings['message_processing']['batch_consume'] is False
+    assert not make_service([]).batch_mode
+
+
+def test_batch_handlers_see_each_batch_before_the_message_handlers():
+    script = [[FakeMessage("user-events", i, f"t{i % 2}") for i in range(3)],
+              [FakeMessage("user-events", i, f"t{i % 2}") for i in range(3, 5)]]
+    service = make_service(script, batch_consume=True, batch_size=3)
+    events = []
+    service.add_message_handler(lambda m: events.append(('message', m.offset)))
+    service.add_batch_handler(lambda batch: events.append(('batch', [m.offset for m in batch])))
+    service.add_batch_handler(lambda batch: 1 / 0)  # A failing handler does not stop the others
+    service.start_consuming()
+
+    assert events == [('batch', [0, 1, 2]), ('message', 0), ('message', 1), ('message', 2),
+                      ('batch', [3, 4]), ('message', 3), ('message', 4)]
+    assert service.consumer.closed and not service.running
+    assert service.get_throughput_stats()['messages_processed'] == 5
+
+
+def test_partial_batches_are_dispatched_when_the_timeout_expires():
+    script = [[FakeMessage("user-events", 0, "a"), FakeMessage("notifications", 1, "a")],
+              [],
+              [FakeMessage("user-events", 2, "b", error=KafkaError(KafkaError._PARTITION_EOF)),
+               FakeMessage("processed-events", 3, "b")]]
+    service = make_service(script, batch_consume=True, batch_size=100, processing_timeout=0.25)
+    service.set_monitored_topics(["user-events", "notifications"])
+    batches = []
+    service.add_batch_handler(batches.append)
+    service.start_consuming()
+
+    # consume() waits at most processing_timeout and whatever arrived is handled without waiting to fill
+    assert all(call == ('consume', 100, 0.25) for call in service.consumer.calls)
+    assert [[(m.offset, m.trace_id) for m in batch] for batch in batches] == [[(0, 'a'), (1, 'a')]]
+    # An empty timeout dispatches nothing; errors and unmonitored topics are dropped before decoding
+    stats = service.get_throughput_stats()
+    assert stats['batches'] == 2 and stats['messages_filtered'] == 1 and stats['last_batch_size'] == 0
+    assert service.decoder.decoded == [b"payload-0", b"payload-1"]
+
+
+def test_default_mode_polls_and_dispatches_one_message_at_a_time():
+    script = [FakeMessage("user-events", 0, "a"), None, FakeMessage("user-events", 1, "a")]
+    service = make_service(script)
+    events = []
+    service.add_batch_handler(lambda batch: events.append(('batch', [m.offset for m in batch])))
+    service.add_message_handler(lambda m: events.append(('message', m.offset)))
+    service.start_consuming()
+
+    assert {call[0] for call in service.consumer.calls} == {'poll'}
+    assert events == [('batch', [0]), ('message', 0), ('batch', [1]), ('message', 1)]
+
+
+def test_changing_the_monitored_topics_pauses_partitions_without_a_restart():
+    assignment = [TopicPartition(topic, 0) for topic in ("user-events", "notifications")]
+    service = make_service([], assignment, batch_consume=True)
+    # Changes are applied by the consumer thread on its next loop
+    service.consumer.script = [
+        [FakeMessage("user-events", 0, "a"), FakeMessage("notifications", 1, "a")],
+        lambda: service.set_monitored_topics(["notifications"]),
+        [FakeMessage("user-events", 2, "b"), FakeMessage("notifications", 3, "b")],
+        lambda: service.set_monitored_topics(None),
+        [FakeMessage("user-events", 4, "c")]
+    ]
+    handled = []
+    service.add_message_handler(lambda m: handled.append(m.offset))
+    service.start_consuming()
+
+    controls = [call for call in service.consumer.calls if call[0] in ('pause', 'resume')]
+    assert controls == [('pause', ['user-events']), ('resume', ['notifications']),
+                        ('resume', ['notifications', 'user-events'])]
+    assert not service.consumer.paused
+    # Messages of the unmonitored topic that were already fetched are skipped before decoding
+    assert handled == [0, 1, 3, 4]
+    assert service.get_throughput_stats()['messages_filtered'] == 1
+    assert service.decoder.decoded == [b"payload-0", b"payload-1", b"payload-3", b"payload-4"]
+
+
+def test_consumers_built_by_the_environment_manager_keep_the_trace_field_in_projections():
+    class ProjectingDecoder(FakeDecoder):
+        def __init__(self):
+            super().__init__()
+            self.required = []
+
+        def require_fields(self, *paths):
+            self.required.extend(paths)
+
+    decoder = ProjectingDecoder()
+    manager = EnvironmentManager(str(BACKEND_DIR / "config" / "environments"), decoder)
+    manager.trace_header_field = 'trace_id'
+    consumer = manager._create_kafka_consumer_with_config({'bootstrap_servers': "localhost:9092"})
+    assert decoder.required == ['trace_id'] and consumer.kafka_config['bootstrap.servers'] == "localhost:9092"
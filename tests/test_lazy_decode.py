@@ -0,0 +1,129 @@
+"""
+Lazy decode mode: trace ids read from the wire format, payloads decoded once on first use
+"""
+import logging
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from src.graph_builder import TraceGraphBuilder  # noqa: E402
+from src.kafka_consumer import KafkaConsumerService  # noqa: E402
+from src.protobuf_decoder import ProtobufDecoder, scan_string_field  # noqa: E402
+
+logging.disable(logging.CRITICAL)
+
+TOPIC = "test-events"
+
+
+class RawMessage:
+    """The parts of a confluent_kafka Message the consumer reads"""
+
+    def __init__(self, value: bytes, headers=None):
+        self._value, self._headers = value, headers
+
+    def topic(self):
+        return TOPIC
+
+    def partition(self):
+        return 0
+
+    def offset(self):
+        return 7
+
+    def key(self):
+        return None
+
+    def value(self):
+        return self._value
+
+    def headers(self):
+        return self._headers
+
+    def timestamp(self):
+        return (1, 1_700_000_000_000)
+
+
+@pytest.fixture
+def decoder():
+    decoder = ProtobufDecoder(str(BACKEND_DIR / "config" / "proto"))
+    decoder.load_topic_protobuf(TOPIC, "event.proto", "Event")
+    decoder.decodes = 0
+    decode_message = decoder.decode_message
+
+    def counting(*args, **kwargs):
+        decoder.decodes += 1
+        return decode_message(*args, **kwargs)
+
+    decoder.decode_message = counting
+    return decoder
+
+
+def make_event(decoder, **fields) -> bytes:
+    return decoder.topic_decoders[TOPIC].message_class(**fields).SerializeToString()
+
+
+def test_string_fields_are_read_without_a_full_decode(decoder):
+    payload = make_event(decoder, event_id="e-1", trace_id="00-abc123-01", timestamp=1_700_000_000,
+                         properties={'region': "eu", 'tier': "gold"})
+    assert decoder.extract_field(TOPIC, payload, "trace_id") == "00-abc123-01"
+    assert decoder.extract_field(TOPIC, make_event(decoder, event_id="e-2"), "trace_id") is None
+    assert decoder.extract_field(TOPIC, payload, "no_such_field") is None
+    assert decoder.decodes == 0
+
+    # Non-string fields and payloads the scan cannot walk fall back to a full decode
+    assert decoder.extract_field(TOPIC, payload, "timestamp") == "1700000000"
+    with pytest.raises(ValueError):
+        scan_string_field(payload[:-3], 1)
+    assert decoder.decodes == 1
+
+
+def test_lazy_messages_decode_once_when_first_needed(decoder):
+    consumer = KafkaConsumerService.__new__(KafkaConsumerService)
+    consumer.decoder = decoder
+    consumer.trace_header_field = "trace_id"
+    consumer.restore_state()
+    consumer.configure_processing({'message_processing': {'lazy_decode': True}})
+    assert consumer.lazy_decode
+
+    payload = make_event(decoder, event_id="e-1", trace_id="00-abc123-01")
+    message = consumer._process_message(RawMessage(payload))
+    other = consumer._process_message(RawMessage(payload, headers=[("trace_id", b"00-fromheader-01")]))
+    assert (message.trace_id, other.trace_id) == ("abc123", "fromheader")
+    assert not message.is_decoded and message.decoded_value is None and bytes(message.raw_value) == payload
+    assert decoder.decodes == 0
+    # Messages of a topic share one decoder instead of holding a closure each
+    assert message.decode_fn is other.decode_fn
+
+    assert message.to_dict()['decoded_value'] == {'trace_id': "00-abc123-01", 'event_id': "e-1"}
+    assert message.is_decoded and message.get_decoded_value() is message.decoded_value
+    message.to_dict()
+    assert decoder.decodes == 1
+
+
+def test_decoding_a_retained_message_counts_against_the_builder_budget(decoder):
+    consumer = KafkaConsumerService.__new__(KafkaConsumerService)
+    consumer.decoder = decoder
+    consumer.trace_header_field = "trace_id"
+    consumer.restore_state()
+    consumer.configure_processing({'message_processing': {'lazy_decode': True}})
+    builder = TraceGraphBuilder(str(BACKEND_DIR / "config" / "topics.yaml"), settings={'max_trace_memory_mb': 1})
+    builder.monitored_topics = {TOPIC}  # Not an edge of the topic graph, so set_monitored_topics would drop it
+
+    messages = [consumer._process_message(RawMessage(make_event(decoder, event_id=f"e-{i}", trace_id="00-t1-01")))
+                for i in range(2)]
+    builder.add_messages(messages)
+    before = builder.total_bytes
+    assert before == sum(message.estimated_size() for message in messages)
+
+    messages[0].to_dict()
+    assert builder.trace_bytes["t1"] == builder.total_bytes == sum(m.estimated_size() for m in messages) > before
+    # Messages of a topic still share one decoder once retained
+    assert messages[1].decode_fn is builder._decoders[TOPIC] and decoder.decodes == 1
+
+    builder.clear_traces()
+    messages[1].to_dict()
+    assert builder.total_bytes == 0 and not builder.trace_bytes
@@ -0,0 +1,127 @@
+"""
+Live update channels: snapshots on subscribe, coalesced deltas per tick and resets
+"""
+import asyncio
+import json
+import logging
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from src.graph_builder import TraceGraphBuilder  # noqa: E402
+from src.live_updates import LiveUpdatePublisher  # noqa: E402
+from src.models import KafkaMessage  # noqa: E402
+
+TOPICS_YAML = BACKEND_DIR / "config" / "topics.yaml"
+
+logging.disable(logging.CRITICAL)
+
+
+class FakeClient:
+    def __init__(self, fail: bool = False):
+        self.sent = []
+        self.fail = fail
+
+    async def send_text(self, text: str):
+        if self.fail:
+            raise ConnectionError("gone")
+        self.sent.append(text)
+
+    def received(self):
+        messages = [json.loads(text) for text in self.sent]
+        self.sent.clear()
+        return messages
+
+
+def make_message(i: int, trace_id: str, topic: str) -> KafkaMessage:
+    return KafkaMessage(topic=topic, partition=0, offset=i, key=None,
+                        timestamp=datetime.now() - timedelta(seconds=10) + timedelta(milliseconds=i),
+                        headers={}, raw_value=b"", decoded_value={'n': i}, trace_id=trace_id)
+
+
+def setup():
+    builder = TraceGraphBuilder(str(TOPICS_YAML))
+    publisher = LiveUpdatePublisher(lambda: builder)
+    asyncio.run(publisher.tick())  # Attaches the change tracker
+    return builder, publisher
+
+
+def subscribe(publisher, client, *channels):
+    publisher.add_client(client)
+    asyncio.run(publisher.handle_message(client, json.dumps({'action': 'subscribe', 'channels': list(channels)})))
+
+
+def test_graph_deltas_cover_only_changed_topics_and_are_serialized_once():
+    builder, publisher = setup()
+    topics = builder.topic_graph.get_all_topics()
+    first, second = FakeClient(), FakeClient()
+    subscribe(publisher, first, 'graph')
+    subscribe(publisher, second, 'graph', 'statistics')
+    assert [m['type'] for m in first.received()] == ['graph_snapshot']
+    assert [m['type'] for m in second.received()] == ['graph_snapshot', 'statistics_snapshot']
+
+    asyncio.run(publisher.tick())
+    assert first.sent == [] and second.sent == []  # Nothing changed
+
+    for i in range(5):  # Coalesced into one delta
+        builder.add_message(make_message(i, "trace-1", topics[0]))
+    asyncio.run(publisher.tick())
+    assert first.sent[0] is second.sent[0]
+    delta = first.received()[0]
+    assert delta['type'] == 'graph_delta'
+    assert [node['id'] for node in delta['nodes']] == [topics[0]]
+    assert delta['nodes'][0]['statistics']['message_count'] == 5
+    assert all(topics[0] in (edge['source'], edge['target']) for edge in delta['edges'])
+    statistics = second.received()[1]
+    assert statistics['type'] == 'statistics_delta' and list(statistics['topics']) == [topics[0]]
+    assert statistics['messages']['total'] == 5
+
+
+def test_trace_channel_sends_only_new_messages():
+    builder, publisher = setup()
+    topic = builder.topic_graph.get_all_topics()[0]
+    builder.add_message(make_message(0, "trace-1", topic))
+    client = FakeClient()
+    subscribe(publisher, client, 'trace:trace-1')
+    snapshot = client.received()[0]
+    assert snapshot['type'] == 'trace_snapshot' and len(snapshot['trace']['messages']) == 1
+
+    asyncio.run(publisher.tick())
+    builder.add_message(make_message(1, "trace-1", topic))
+    builder.add_message(make_message(2, "trace-2", topic))
+    asyncio.run(publisher.tick())
+    delta = client.received()
+    assert len(delta) == 1 and delta[0]['from_index'] == 1
+    assert [m['offset'] for m in delta[0]['messages']] == [1]
+    assert delta[0]['summary']['message_count'] == 2
+
+
+def test_topology_changes_and_clears_resend_snapshots():
+    builder, publisher = setup()
+    client = FakeClient()
+    subscribe(publisher, client, 'graph')
+    client.received()
+
+    builder.topic_graph.add_edge("new-a", "new-b")
+    asyncio.run(publisher.tick())
+    snapshot = client.received()[0]
+    assert snapshot['type'] == 'graph_snapshot'
+    assert any("new-a" in component['topics'] for component in snapshot['components'])
+
+    builder.clear_traces()
+    asyncio.run(publisher.tick())
+    assert client.received()[0]['type'] == 'graph_snapshot'
+
+
+def test_bad_requests_and_failing_clients():
+    builder, publisher = setup()
+    client, broken = FakeClient(), FakeClient(fail=True)
+    publisher.add_client(client)
+    asyncio.run(publisher.handle_message(client, '{"action": "subscribe", "channels": ["nope"]}'))
+    assert client.received()[0]['type'] == 'error'
+
+    subscribe(publisher, broken, 'graph')
+    assert broken not in publisher.subscriptions
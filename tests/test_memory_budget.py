@@ -0,0 +1,100 @@
+"""
+Byte-budget eviction: estimated trace memory stays under max_trace_memory_mb and is reported in /statistics
+"""
+import logging
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from src.graph_builder import TraceGraphBuilder  # noqa: E402
+from src.models import KafkaMessage  # noqa: E402
+
+TOPICS_YAML = BACKEND_DIR / "config" / "topics.yaml"
+TOPICS = ["user-events", "processed-events", "notifications"]
+PAYLOAD = 8 * 1024
+
+logging.disable(logging.CRITICAL)
+
+
+def make_message(i: int, trace_id: str, size: int = PAYLOAD) -> KafkaMessage:
+    return KafkaMessage(topic=TOPICS[i % len(TOPICS)], partition=0, offset=i, key=f"key-{i}",
+                        timestamp=datetime.now() - timedelta(seconds=5) + timedelta(milliseconds=i),
+                        headers={}, raw_value=bytes(size), decoded_value={'n': i}, trace_id=trace_id)
+
+
+def make_builder(budget_mb: float, **settings) -> TraceGraphBuilder:
+    builder = TraceGraphBuilder(str(TOPICS_YAML), max_traces=1000,
+                                settings={'max_trace_memory_mb': budget_mb, **settings})
+    builder.set_monitored_topics(TOPICS)
+    return builder
+
+
+def retained_bytes(builder: TraceGraphBuilder) -> int:
+    return sum(message.estimated_size() for trace in builder.traces.values() for message in trace.messages)
+
+
+def test_fresh_traces_are_evicted_least_recently_active_first_to_fit_the_budget():
+    builder = make_builder(0.25)
+    for i in range(60):
+        builder.add_message(make_message(i, f"trace-{i // 3}"))
+        # trace-0 stays active, so it outlives traces created after it
+        builder.add_message(make_message(1000 + i, "trace-0", size=16))
+        assert builder.total_bytes <= builder.max_bytes
+
+    # Recent activity does not protect a trace from the budget, unlike the count limit
+    assert len(builder.traces) < 20 and "trace-0" in builder.traces and "trace-1" not in builder.traces
+    assert builder.total_bytes == retained_bytes(builder)
+    assert sum(builder.trace_bytes.values()) == builder.total_bytes
+
+    memory = builder.get_statistics()['memory']
+    assert memory['estimated_bytes'] == builder.total_bytes and memory['max_bytes'] == builder.max_bytes
+    assert 0 < memory['utilization'] <= 1
+    assert memory['evicted_traces'] == 20 - len(builder.traces)
+
+    builder.cleanup_old_traces(max_age_hours=0)
+    assert builder.total_bytes == 0 and not builder.trace_bytes
+
+
+def test_a_trace_larger_than_the_budget_is_not_retained():
+    builder = make_builder(0.05)
+    builder.add_message(make_message(0, "small"))
+    builder.add_message(make_message(1, "huge", size=100 * 1024))
+    assert not builder.traces and builder.total_bytes == 0
+    assert builder.get_memory_usage()['evicted_traces'] == 2
+
+
+def test_payloads_in_the_payload_store_count_at_their_size_and_a_zero_budget_is_unlimited():
+    stored = make_builder(0, payload_segment_mb=1)
+    plain = make_builder(0)
+    for i in range(30):
+        stored.add_message(make_message(i, f"trace-{i}"))
+        plain.add_message(make_message(i, f"trace-{i}"))
+
+    assert len(stored.traces) == len(plain.traces) == 30
+    assert stored.get_memory_usage()['max_bytes'] is None and stored.memory_evictions == 0
+    assert stored.total_bytes == retained_bytes(stored) and plain.total_bytes == retained_bytes(plain)
+    # Segment space is counted per payload, so the two layouts account about the same bytes
+    assert abs(stored.total_bytes - plain.total_bytes) < 30 * 128
+
+
+def test_payloads_decoded_after_ingest_count_against_the_budget():
+    builder = make_builder(0.25)
+    decoded = {'text': "x" * 16 * 1024}
+    for i in range(20):
+        message = make_message(i, f"trace-{i}", size=1024)
+        message.decoded_value, message.decode_fn = None, lambda raw: dict(decoded)
+        builder.add_message(message)
+    assert builder.memory_evictions == 0 and builder.total_bytes <= builder.max_bytes
+
+    # Reads decode what they show, growing retained traces past the budget
+    for trace in list(builder.traces.values()):
+        builder.get_trace_detail(trace.trace_id)
+    assert builder.total_bytes == retained_bytes(builder) > builder.max_bytes
+
+    # The next write evicts down to the budget again
+    builder.add_message(make_message(100, "trace-new", size=16))
+    assert builder.total_bytes <= builder.max_bytes and builder.memory_evictions > 0
+    assert builder.total_bytes == retained_bytes(builder) == sum(builder.trace_bytes.values())
@@ -0,0 +1,139 @@
+"""
+Payload arena: handles, segment reclamation, compaction and TraceGraphBuilder eviction
+"""
+import logging
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from src.graph_builder import TraceGraphBuilder  # noqa: E402
+from src.models import KafkaMessage  # noqa: E402
+from src.payload_store import PayloadStore  # noqa: E402
+
+TOPICS_YAML = BACKEND_DIR / "config" / "topics.yaml"
+
+logging.disable(logging.CRITICAL)
+
+
+def make_message(i: int, trace_id: str, payload: bytes, topic: str = "user-events") -> KafkaMessage:
+    return KafkaMessage(
+        topic=topic, partition=0, offset=i, key=None,
+        timestamp=datetime.now() - timedelta(hours=1), headers={},
+        raw_value=payload, decoded_value={}, trace_id=trace_id
+    )
+
+
+def test_views_read_back_payloads():
+    store = PayloadStore(64)
+    payloads = [bytes([i]) * (i * 7 % 50) for i in range(40)]
+    handles = [store.append(payload) for payload in payloads]
+    for payload, (segment, span) in zip(payloads, handles):
+        view = segment.view(span)
+        assert view.readonly
+        assert view == payload
+    assert store.payloads == len(payloads)
+
+
+def test_oversized_payload_gets_its_own_segment():
+    store = PayloadStore(16)
+    small_segment, _ = store.append(b"a" * 10)
+    big_segment, span = store.append(b"b" * 100)
+    assert big_segment is not small_segment and big_segment.capacity == 100
+    assert store.active is small_segment
+    store.release(big_segment, span)
+    assert store.get_stats()['segments'] == 1
+
+
+def test_segments_are_dropped_once_released_and_views_stay_valid():
+    store = PayloadStore(32)
+    first = [store.append(b"x" * 16) for _ in range(2)]
+    view = first[0][0].view(first[0][1])
+    store.append(b"y" * 16)  # fills a new active segment
+    for segment, span in first:
+        store.release(segment, span)
+    stats = store.get_stats()
+    assert stats['segments'] == 1 and stats['released_segments'] == 1
+    assert stats['live_bytes'] == 16
+    store.append(b"z" * 32)  # segments are never reused, so old views are unchanged
+    assert view == b"x" * 16
+
+
+def test_builder_moves_payloads_into_store_and_reclaims_on_eviction():
+    builder = TraceGraphBuilder(str(TOPICS_YAML), max_traces=1000, settings={'payload_segment_mb': 0.001})
+    messages = [make_message(i, f"trace-{i % 50}", bytes([i % 256]) * 100) for i in range(500)]
+    for message in messages:
+        builder.add_message(message)
+    assert all(message.is_payload_stored for message in messages)
+    assert messages[3].raw_value == bytes([3]) * 100
+    store = builder.payload_store
+    assert store.payloads == 500
+
+    builder.cleanup_old_traces(max_age_hours=0)
+    assert store.payloads == 0
+    assert store.get_stats()['segments'] == 1
+    # Evicted messages keep readable payloads detached from the store
+    assert not messages[3].is_payload_stored and messages[3].raw_value == bytes([3]) * 100
+
+
+def test_lazy_decode_reads_from_the_store():
+    store = PayloadStore(1024)
+    message = make_message(0, "trace", b"\x01\x02\x03")
+    message.decoded_value = None
+    message.decode_fn = lambda payload: {'length': len(payload), 'first': payload[0]}
+    message.store_payload(store)
+    assert message.get_decoded_value() == {'length': 3, 'first': 1}
+    assert message.is_decoded
+
+
+def test_builder_without_store_keeps_bytes():
+    builder = TraceGraphBuilder(str(TOPICS_YAML), max_traces=10, settings={})
+    message = make_message(0, "trace", b"payload")
+    builder.add_message(message)
+    assert builder.payload_store is None
+    assert type(message.raw_value) is bytes
+    assert builder.get_memory_usage()['payload_store'] is None
+
+
+def test_survivors_are_copied_out_of_sparse_segments():
+    store = PayloadStore(100)
+    handles = [store.append(bytes([i]) * 10) for i in range(45)]
+    # Keep one payload in every segment: four full ones and the half-filled active one
+    kept = {i: handles[i] for i in range(0, 45, 10)}
+    for i, (segment, span) in enumerate(handles):
+        if i not in kept:
+            store.release(segment, span)
+    assert store.get_stats()['segments'] == 5 and store.needs_compaction()
+
+    moved = {i: store.relocate(*handle) for i, handle in kept.items()}
+    store.compaction_done()
+    stats = store.get_stats()
+    assert stats['segments'] == 1 and stats['live_bytes'] == 50 and stats['sparse_segments'] == 0
+    assert stats['compactions'] == 1 and stats['relocated_bytes'] == 40
+    assert all(segment.view(span) == bytes([i]) * 10 for i, (segment, span) in moved.items())
+    # Handles outside sparse segments are left where they are
+    assert store.relocate(*moved[0]) == moved[0] and not store.needs_compaction()
+
+
+def test_builder_compacts_segments_pinned_by_long_lived_traces():
+    def run(compact: bool) -> TraceGraphBuilder:
+        builder = TraceGraphBuilder(str(TOPICS_YAML), max_traces=5, settings={'payload_segment_mb': 0.001})
+        if not compact:
+            builder.payload_store.compact_ratio = 0
+        for i in range(2000):
+            # One trace stays active and keeps a payload in every other segment; the rest are evicted
+            trace_id = "pinned" if i % 20 == 0 else f"trace-{i // 5}"
+            builder.add_message(make_message(i, trace_id, bytes([i % 256]) * 100))
+        return builder
+
+    pinning = run(compact=False).payload_store.get_stats()
+    builder = run(compact=True)
+    stats = builder.payload_store.get_stats()
+    assert stats['live_bytes'] == pinning['live_bytes'] and stats['compactions'] > 0
+    assert pinning['segments'] > 90 and stats['segments'] < 40
+    assert pinning['fill_ratio'] < 0.15 and stats['fill_ratio'] > builder.payload_store.compact_ratio
+    pinned = builder.traces["pinned"].messages
+    assert [message.raw_value for message in pinned] == [bytes([i % 256]) * 100 for i in range(0, 2000, 20)]
+    assert builder.total_bytes == sum(m.estimated_size() for t in builder.traces.values() for m in t.messages)
@@ -0,0 +1,54 @@
+"""
+Shared proto compiler: recompiles when the tree changes and retries failed compiles
+"""
+import logging
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from src.proto_compiler import ProtoCompiler, get_proto_compiler  # noqa: E402
+
+logging.disable(logging.CRITICAL)
+
+ORDER = """
+syntax = "proto3";
+package compilertest;
+message Order { string id = 1; }
+"""
+
+REFUND = """
+syntax = "proto3";
+package compilertest;
+import "order.proto";
+message Refund { Order order = 1; int64 cents = 2; }
+"""
+
+
+def test_new_files_are_picked_up_without_recompiling_an_unchanged_tree(tmp_path):
+    (tmp_path / "order.proto").write_text(ORDER)
+    compiler = ProtoCompiler(tmp_path)
+    order = compiler.get_message_class("order.proto", "Order")
+    assert order is not None and compiler.get_message_class("refund.proto", "Refund") is None
+    assert compiler.ensure_compiled() and compiler.compilations == 1
+
+    (tmp_path / "refund.proto").write_text(REFUND)
+    refund = compiler.get_message_class("refund.proto", "Refund")
+    assert refund is not None and compiler.compilations == 2
+    assert refund(order={'id': "o-1"}, cents=5).order.id == "o-1"
+    # Classes from the previous pool keep working
+    assert order.FromString(order(id="o-2").SerializeToString()).id == "o-2"
+    assert get_proto_compiler(str(tmp_path)) is get_proto_compiler(str(tmp_path / "."))
+
+
+def test_a_failed_compile_is_retried_once_the_file_is_fixed(tmp_path):
+    (tmp_path / "order.proto").write_text(ORDER)
+    (tmp_path / "refund.proto").write_text(REFUND.replace("Order order", "Missing order"))
+    compiler = ProtoCompiler(tmp_path)
+    assert not compiler.ensure_compiled() and compiler.error
+    assert compiler.get_message_class("order.proto", "Order") is None
+
+    (tmp_path / "refund.proto").write_text(REFUND)
+    assert compiler.ensure_compiled() and compiler.error is None
+    assert compiler.get_message_class("refund.proto", "Refund") is not None
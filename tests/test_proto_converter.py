@@ -0,0 +1,122 @@
+"""
+Parity of the fast proto-to-dict converter with json_format.MessageToDict
+"""
+import sys
+from pathlib import Path
+
+import pytest
+from google.protobuf import message_factory, struct_pb2, timestamp_pb2, wrappers_pb2
+from google.protobuf.json_format import MessageToDict
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from proto_corpus import PROTO_DIR, build_corpus, message_class, message_descriptors  # noqa: E402
+from src.proto_compiler import get_proto_compiler  # noqa: E402
+from src.proto_converter import build_projector, message_to_dict  # noqa: E402
+
+
+def expected(message):
+    return MessageToDict(message, preserving_proto_field_name=True, descriptor_pool=message.DESCRIPTOR.file.pool)
+
+
+def test_corpus_covers_config_protos():
+    names = {descriptor.full_name for descriptor in message_descriptors()}
+    assert len(names) > 20
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_parity_with_message_to_dict(seed):
+    checked = 0
+    for message in build_corpus(samples_per_type=5, seed=seed):
+        assert message_to_dict(message) == expected(message), message.DESCRIPTOR.full_name
+        checked += 1
+    assert checked > 0
+
+
+def test_parity_after_wire_round_trip():
+    for message in build_corpus(samples_per_type=2, seed=42):
+        parsed = type(message).FromString(message.SerializeToString())
+        assert message_to_dict(parsed) == expected(parsed), message.DESCRIPTOR.full_name
+
+
+def test_empty_messages():
+    for descriptor in message_descriptors():
+        message = message_class(descriptor)()
+        assert message_to_dict(message) == expected(message), descriptor.full_name
+
+
+@pytest.mark.parametrize("message", [
+    timestamp_pb2.Timestamp(seconds=1_700_000_000, nanos=5000),
+    wrappers_pb2.Int64Value(value=-2**63),
+    struct_pb2.Value(null_value=struct_pb2.NULL_VALUE),
+])
+def test_top_level_well_known_types(message):
+    assert message_to_dict(message) == expected(message)
+
+
+def test_extensions_fall_back_to_json_format():
+    pool = get_proto_compiler(str(PROTO_DIR)).pool
+    disabled = pool.FindExtensionByName('validate.disabled')
+    # The compiler's pool has its own copy of descriptor.proto, which the extension extends
+    options = message_factory.GetMessageClass(disabled.containing_type)(deprecated=True)
+    options.Extensions[disabled] = True
+    assert message_to_dict(options) == expected(options)
+
+
+def field_paths(descriptor, prefix='', depth=0):
+    """Every field path a projection may name, descending through plain sub-messages"""
+    for field in descriptor.fields:
+        path = prefix + field.name
+        yield path
+        message_type = field.message_type
+        if (depth < 2 and message_type is not None and not message_type.GetOptions().map_entry
+                and not message_type.full_name.startswith('google.protobuf.')):
+            yield from field_paths(message_type, path + '.', depth + 1)
+
+
+def prune(value, tree):
+    """A full MessageToDict result cut down to a projection tree"""
+    if isinstance(value, list):
+        return [prune(item, tree) for item in value]
+    result = {}
+    for name, subtree in tree.items():
+        if name in value:
+            result[name] = value[name] if subtree is None else prune(value[name], subtree)
+    return result
+
+
+def projection_tree(paths):
+    tree = {}
+    for path in paths:
+        node = tree
+        parts = path.split('.')
+        for part in parts[:-1]:
+            if part in node and node[part] is None:
+                break
+            node = node.setdefault(part, {})
+        else:
+            node[parts[-1]] = None
+    return tree
+
+
+def test_projection_matches_pruned_message_to_dict():
+    import random
+    rng = random.Random(7)
+    checked = 0
+    for message in build_corpus(samples_per_type=3, seed=3):
+        paths = list(field_paths(message.DESCRIPTOR))
+        if not paths:
+            continue
+        chosen = rng.sample(paths, min(len(paths), rng.randint(1, 4)))
+        projector, unknown = build_projector(message.DESCRIPTOR, chosen)
+        assert unknown == []
+        assert projector(message) == prune(expected(message), projection_tree(chosen)), (message.DESCRIPTOR.full_name, chosen)
+        checked += 1
+    assert checked > 0
+
+
+def test_projection_reports_unknown_paths():
+    descriptor = timestamp_pb2.Timestamp.DESCRIPTOR
+    projector, unknown = build_projector(descriptor, ['seconds', 'missing', 'seconds.nested'])
+    assert unknown == ['missing', 'seconds.nested']
+    assert projector(timestamp_pb2.Timestamp(seconds=5, nanos=1)) == {'seconds': '5'}
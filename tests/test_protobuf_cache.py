@@ -0,0 +1,113 @@
+"""
+Content-addressed protobuf cache: closure keys, one hash pass per process and reuse of compiled classes
+"""
+import logging
+import os
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from src.protobuf_cache import ProtobufCache  # noqa: E402
+from src.protobuf_decoder import TopicDecoder  # noqa: E402
+
+logging.disable(logging.CRITICAL)
+
+PROTOS = {
+    "cachetest_money/money.proto": """
+syntax = "proto3";
+package cachetest.money;
+message Money { string currency = 1; int64 units = 2; }
+""",
+    "cachetest_orders/order.proto": """
+syntax = "proto3";
+package cachetest.orders;
+import "cachetest_money/money.proto";
+message Order { string id = 1; cachetest.money.Money total = 2; }
+""",
+    "cachetest_unrelated.proto": """
+syntax = "proto3";
+package cachetest.unrelated;
+message Unrelated { string id = 1; }
+"""
+}
+
+
+def write_protos(tmp_path) -> Path:
+    proto_dir = tmp_path / "proto"
+    for relative_path, content in PROTOS.items():
+        path = proto_dir / relative_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+    return proto_dir
+
+
+def edit(path: Path):
+    path.write_text(path.read_text() + "\n// edited\n")
+
+
+def test_closure_keys_change_only_with_the_imported_files(tmp_path):
+    proto_dir = write_protos(tmp_path)
+    cache = ProtobufCache(str(proto_dir), str(tmp_path / "cache"))
+    order = cache.get_closure_key("cachetest_orders/order.proto")
+    money = cache.get_closure_key("cachetest_money/money.proto")
+    assert order and money and order != money
+    # Topics may name the proto by file name only
+    assert cache.get_closure_key("order.proto") == order
+    assert cache.get_closure_key("missing.proto") is None
+
+    edit(proto_dir / "cachetest_unrelated.proto")
+    cache.refresh()
+    assert cache.get_closure_key("cachetest_orders/order.proto") == order
+
+    edit(proto_dir / "cachetest_money" / "money.proto")
+    cache.refresh()
+    assert cache.get_closure_key("cachetest_orders/order.proto") != order
+    assert cache.get_closure_key("cachetest_money/money.proto") != money
+
+
+def test_the_tree_is_hashed_once_and_unchanged_files_are_not_reread(tmp_path, monkeypatch):
+    proto_dir = write_protos(tmp_path)
+    reads = []
+    read_bytes = Path.read_bytes
+    monkeypatch.setattr(Path, "read_bytes", lambda self: reads.append(self.name) or read_bytes(self))
+
+    cache = ProtobufCache(str(proto_dir), str(tmp_path / "cache"))
+    for _ in range(40):
+        cache.get_closure_key("cachetest_orders/order.proto")
+        cache.is_cache_valid("topic", "cachetest_unrelated.proto")
+    assert sorted(reads) == ["cachetest_unrelated.proto", "money.proto", "order.proto"]
+
+    # A new process reuses the persisted digests of files whose mtime and size are unchanged
+    reads.clear()
+    restarted = ProtobufCache(str(proto_dir), str(tmp_path / "cache"))
+    assert restarted.get_closure_key("order.proto") == cache.get_closure_key("order.proto")
+    assert reads == []
+
+    edit(proto_dir / "cachetest_money" / "money.proto")
+    ProtobufCache(str(proto_dir), str(tmp_path / "cache")).get_closure_key("order.proto")
+    assert reads == ["money.proto"]
+
+
+def test_compiled_classes_are_reused_until_an_import_changes(tmp_path):
+    proto_dir = write_protos(tmp_path)
+    cache = ProtobufCache(str(proto_dir), str(tmp_path / "cache"))
+    proto_file = "cachetest_orders/order.proto"
+    compiled = TopicDecoder(str(proto_dir / proto_file), "Order", cache, "orders", proto_file).message_class
+    payload = compiled(id="o-1", total={'currency': "EUR", 'units': 5}).SerializeToString()
+
+    restarted = ProtobufCache(str(proto_dir), str(tmp_path / "cache"))
+    # Topics sharing the proto share one entry
+    assert restarted.is_cache_valid("orders-replay", proto_file)
+    cached = restarted.load_compilation("orders-replay", proto_file, "Order")
+    assert cached.FromString(payload).total.units == 5
+
+    edit(proto_dir / "cachetest_unrelated.proto")
+    assert ProtobufCache(str(proto_dir), str(tmp_path / "cache")).is_cache_valid("orders", proto_file)
+
+    edit(proto_dir / "cachetest_money" / "money.proto")
+    stale = ProtobufCache(str(proto_dir), str(tmp_path / "cache"))
+    assert not stale.is_cache_valid("orders", proto_file)
+    assert stale.load_compilation("orders", proto_file, "Order") is None
+    assert len(os.listdir(tmp_path / "cache")) == 2  # The index and the previous closure's entry
@@ -0,0 +1,66 @@
+"""
+Streaming summaries: DDSketch quantiles against exact percentiles
+"""
+import random
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from src.sketches import DDSketch  # noqa: E402
+
+QUANTILES = [0.0, 0.10, 0.25, 0.50, 0.90, 0.95, 0.99, 1.0]
+
+
+def exact(values, q):
+    ordered = sorted(values)
+    return ordered[int(q * (len(ordered) - 1))]
+
+
+def assert_parity(sketch: DDSketch, values):
+    estimates = sketch.quantiles(QUANTILES)
+    for q, estimate in zip(QUANTILES, estimates):
+        expected = exact(values, q)
+        assert abs(estimate - expected) <= sketch.relative_accuracy * expected + 1e-9, (q, estimate, expected)
+        assert sketch.quantile(q) == estimate
+
+
+def test_quantiles_are_within_the_relative_accuracy_after_adds_and_removals():
+    rng = random.Random(7)
+    sketch = DDSketch()
+    values = [rng.lognormvariate(0, 2) for _ in range(20000)] + [0.0] * 50
+    for value in values:
+        sketch.add(value)
+    assert_parity(sketch, values)
+
+    removed = set(rng.sample(range(len(values)), 12000))
+    for i in removed:
+        sketch.remove(values[i])
+    kept = [v for i, v in enumerate(values) if i not in removed]
+    assert sketch.count == len(kept)
+    assert_parity(sketch, kept)
+    # Quantiles do not depend on the order they are asked in
+    assert sketch.quantiles([0.95, 0.10, 0.50]) == [sketch.quantile(0.95), sketch.quantile(0.10), sketch.quantile(0.50)]
+
+
+def test_merged_and_collapsed_sketches_keep_their_bins_ordered():
+    rng = random.Random(11)
+    parts = [[rng.uniform(0.001, 1000) for _ in range(3000)] for _ in range(4)]
+    sketches = []
+    for part in parts:
+        sketch = DDSketch()
+        for value in part:
+            sketch.add(value)
+        sketches.append(sketch)
+    merged = DDSketch.merged(sketches)
+    assert_parity(merged, [v for part in parts for v in part])
+    assert merged._keys == sorted(merged.bins)
+
+    small = DDSketch(max_bins=16)
+    for value in parts[0]:
+        small.add(value)
+    assert len(small.bins) <= 16 and small._keys == sorted(small.bins)
+    # Collapsing only folds the lowest bins, so the upper quantiles keep their accuracy
+    assert abs(small.quantile(0.99) - exact(parts[0], 0.99)) <= 0.01 * exact(parts[0], 0.99)
+    assert DDSketch().quantiles([0.5, 0.95]) == [0, 0]
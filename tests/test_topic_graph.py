@@ -0,0 +1,148 @@
+"""
+TopicGraph adjacency maps and component index against brute-force scans of its edges
+"""
+import logging
+import random
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from src.graph_builder import TraceGraphBuilder  # noqa: E402
+from src.models import TopicGraph  # noqa: E402
+
+TOPICS_YAML = BACKEND_DIR / "config" / "topics.yaml"
+
+logging.disable(logging.CRITICAL)
+
+
+def brute_force_components(edges):
+    """Components by repeated merging of edge endpoint sets"""
+    components = []
+    for source, destination in edges:
+        touching = [c for c in components if source in c or destination in c]
+        merged = {source, destination}.union(*touching)
+        components = [c for c in components if c not in touching] + [merged]
+    return sorted(sorted(c) for c in components)
+
+
+def test_random_edits_match_brute_force():
+    rng = random.Random(0)
+    graph, edges = TopicGraph(), []
+    for step in range(600):
+        source, destination = f"t{rng.randrange(60)}", f"t{rng.randrange(60)}"
+        version = graph.version
+        if edges and rng.random() < 0.3:
+            source, destination = edges.pop(rng.randrange(len(edges)))
+            assert graph.remove_edge(source, destination)
+        elif (source, destination) in edges:
+            assert not graph.add_edge(source, destination)
+            assert graph.version == version
+            continue
+        else:
+            assert graph.add_edge(source, destination)
+            edges.append((source, destination))
+        assert graph.version > version
+
+        if step % 25 == 0:
+            assert sorted(sorted(c) for c in graph.components()) == brute_force_components(edges)
+            sizes = [len(c) for c in graph.components()]
+            assert sizes == sorted(sizes, reverse=True)
+    assert sorted((e.source, e.destination) for e in graph.edges) == sorted(edges)
+    for topic in graph.get_all_topics():
+        assert graph.get_destinations(topic) == [d for s, d in edges if s == topic]
+        assert graph.get_sources(topic) == [s for s, d in edges if d == topic]
+    assert set(graph.get_all_topics()) == {t for edge in edges for t in edge}
+
+
+def test_components_are_cached_per_topology_version():
+    graph = TopicGraph()
+    graph.add_edge("a", "b")
+    components = graph.components()
+    assert graph.components() is components
+    graph.add_edge("c", "d")
+    assert graph.components() is not components and len(graph.components()) == 2
+    assert graph.component_of("a") == graph.component_of("b") != graph.component_of("c")
+    graph.remove_edge("c", "d")
+    assert "c" not in graph and graph.component_of("c") is None
+
+
+def test_deep_chains_do_not_recurse():
+    builder = TraceGraphBuilder(str(TOPICS_YAML))
+    builder.topic_graph.clear()
+    for i in range(5000):
+        builder.topic_graph.add_edge(f"chain-{i}", f"chain-{i + 1}")
+    builder.topic_graph.add_edge("island-a", "island-b")
+    builder.refresh_topology()
+
+    components = builder.get_disconnected_graphs()
+    assert [c['topic_count'] for c in components] == [5001, 2]
+    assert len(components[0]['edges']) == 5000
+    assert components[1]['edges'][0]['source'] == "island-a"
+
+
+def brute_force_distances(edges, topic, depth, direction):
+    distances = {topic: 0}
+    for distance in range(1, depth + 1):
+        for source, destination in edges:
+            for near, far, allowed in ((source, destination, direction != 'upstream'),
+                                       (destination, source, direction != 'downstream')):
+                if allowed and distances.get(near) == distance - 1 and far not in distances:
+                    distances[far] = distance
+    return distances
+
+
+def random_graph_builder(seed: int) -> TraceGraphBuilder:
+    rng = random.Random(seed)
+    builder = TraceGraphBuilder(str(TOPICS_YAML))
+    builder.topic_graph.clear()
+    for _ in range(120):
+        builder.topic_graph.add_edge(f"t{rng.randrange(50)}", f"t{rng.randrange(50)}")
+    builder.refresh_topology()
+    return builder
+
+
+def test_subgraphs_match_brute_force():
+    builder = random_graph_builder(1)
+    edges = [(e.source, e.destination) for e in builder.topic_graph.edges]
+    for topic in builder.topic_graph.get_all_topics()[:10]:
+        for depth in range(4):
+            for direction in ('both', 'downstream', 'upstream'):
+                subgraph = builder.get_subgraph(topic, depth, direction)
+                distances = brute_force_distances(edges, topic, depth, direction)
+                assert {n['id']: n['distance'] for n in subgraph['nodes']} == distances
+                assert sorted((e['source'], e['target']) for e in subgraph['edges']) == \
+                    sorted((s, d) for s, d in edges if s in distances and d in distances)
+
+
+def memoized(builder, *args) -> dict:
+    """A subgraph that a repeated query returns as is (retrying once should a second boundary pass)"""
+    for _ in range(2):
+        subgraph = builder.get_subgraph(*args)
+        if builder.get_subgraph(*args) is subgraph:
+            return subgraph
+    raise AssertionError("subgraph was not memoized")
+
+
+def test_subgraphs_are_memoized_until_topology_statistics_or_monitoring_change():
+    builder = random_graph_builder(2)
+    topic = builder.topic_graph.get_all_topics()[0]
+    subgraph = memoized(builder, topic, 2)
+    assert builder.get_subgraph(topic, 2, 'upstream') is not subgraph
+
+    builder.statistics.generation += 1
+    assert builder.get_subgraph(topic, 2) is not subgraph
+    builder.topic_graph.add_edge(topic, "brand-new")
+    assert "brand-new" in {n['id'] for n in builder.get_subgraph(topic, 2)['nodes']}
+    builder.set_monitored_topics([topic])
+    assert builder.get_subgraph(topic, 2)['nodes'][0]['monitored']
+
+
+def test_subgraph_of_unknown_topic_or_direction():
+    builder = random_graph_builder(3)
+    assert builder.get_subgraph("missing") is None
+    with pytest.raises(ValueError):
+        builder.get_subgraph(builder.topic_graph.get_all_topics()[0], direction="sideways")
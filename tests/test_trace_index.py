@@ -0,0 +1,162 @@
+"""
+Secondary trace indexes against brute-force scans of TraceGraphBuilder.traces
+"""
+import logging
+import random
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from src.graph_builder import TraceGraphBuilder  # noqa: E402
+from src.models import KafkaMessage, from_epoch_us  # noqa: E402
+from src.trace_index import TimeOrderedIds  # noqa: E402
+
+TOPICS_YAML = BACKEND_DIR / "config" / "topics.yaml"
+TOPICS = ["user-events", "processed-events", "notifications", "analytics"]
+BASE_TIME = datetime.now() - timedelta(hours=3)
+
+logging.disable(logging.CRITICAL)
+
+
+def random_builder(seed: int, messages: int = 3000, max_traces: int = 150, tmp_path=None) -> TraceGraphBuilder:
+    """A builder fed out-of-order messages, with evictions and (optionally) spill restores"""
+    rng = random.Random(seed)
+    settings = {'trace_spill': {'enabled': True, 'directory': str(tmp_path)}} if tmp_path else {}
+    builder = TraceGraphBuilder(str(TOPICS_YAML), max_traces=max_traces, settings=settings)
+    for i in range(messages):
+        trace = rng.randrange(i // 10 + 5)
+        builder.add_message(KafkaMessage(
+            topic=rng.choice(TOPICS), partition=0, offset=i, key=rng.choice([None, 'k1', 'k2', f'k{i % 37}']),
+            timestamp=BASE_TIME + timedelta(seconds=i + rng.randint(-300, 300)), headers={},
+            raw_value=b"", decoded_value={}, trace_id=f"trace-{trace}"
+        ))
+    return builder
+
+
+def expected(builder, topic=None, key=None, start_us=None, end_us=None):
+    traces = [t for t in builder.traces.values()
+              if (topic is None or topic in t.topic_set)
+              and (key is None or any(m.key == key for m in t.messages))
+              and (start_us is None or t.end_us >= start_us)
+              and (end_us is None or t.end_us <= end_us)]
+    traces.sort(key=lambda t: (t.end_us, t.trace_id), reverse=True)
+    return [t.trace_id for t in traces]
+
+
+def paged(builder, limit, **filters):
+    ids, cursor = [], None
+    while True:
+        page = builder.query_traces(limit=limit, cursor=cursor, **filters)
+        assert len(page['traces']) <= limit
+        ids.extend(summary['trace_id'] for summary in page['traces'])
+        cursor = page['next_cursor']
+        if cursor is None:
+            return ids
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_queries_match_brute_force(seed, tmp_path):
+    builder = random_builder(seed, tmp_path=tmp_path if seed else None)
+    assert len(builder.index.by_time) == len(builder.traces)
+    ends = sorted(t.end_us for t in builder.traces.values())
+    start_us, end_us = ends[len(ends) // 4], ends[3 * len(ends) // 4]
+
+    cases = [{}, {'topic': 'notifications'}, {'key': 'k1'}, {'key': 'k1', 'topic': 'analytics'},
+             {'start_us': start_us}, {'end_us': end_us}, {'topic': 'user-events', 'start_us': start_us, 'end_us': end_us}]
+    for case in cases:
+        filters = {('start_time' if k == 'start_us' else 'end_time' if k == 'end_us' else k):
+                   (from_epoch_us(v) if k.endswith('_us') else v) for k, v in case.items()}
+        want = expected(builder, **case)
+        assert [s['trace_id'] for s in builder.query_traces(**filters)['traces']] == want, case
+        assert paged(builder, 7, **filters) == want, case
+
+
+def test_summary_lists_every_trace_most_recent_first():
+    builder = random_builder(5)
+    assert [s['trace_id'] for s in builder.get_trace_summary()['traces']] == expected(builder)
+
+
+def test_unknown_topic_and_bad_cursor():
+    builder = random_builder(1, messages=200)
+    assert builder.query_traces(topic='nope')['traces'] == []
+    with pytest.raises(ValueError):
+        builder.query_traces(cursor='garbage')
+
+
+def test_time_ordered_ids_against_a_sorted_list():
+    rng = random.Random(0)
+    index, reference = TimeOrderedIds(), []
+    for step in range(20000):
+        if reference and rng.random() < 0.4:
+            entry = rng.choice(reference)
+            reference.remove(entry)
+            index.discard(entry)
+        else:
+            entry = (rng.randint(0, 5000), f"t{step}")
+            reference.append(entry)
+            index.add(entry)
+    reference.sort()
+    assert list(index) == reference and len(index) == len(reference)
+    assert list(index.descending()) == reference[::-1]
+    below = reference[len(reference) // 2]
+    assert list(index.descending(below)) == [e for e in reversed(reference) if e < below]
+
+
+def test_summary_rows_are_cached_until_the_trace_changes():
+    builder = random_builder(2, messages=200)
+    trace = next(iter(builder.traces.values()))
+    row = trace.summary()
+    assert trace.summary() is row
+    builder.add_message(KafkaMessage(
+        topic="analytics", partition=0, offset=999, key=None, timestamp=datetime.now(), headers={},
+        raw_value=b"", decoded_value={}, trace_id=trace.trace_id
+    ))
+    assert trace.summary() is not row
+    assert trace.summary()['message_count'] == row['message_count'] + 1
+    assert trace.summary()['duration_ms'] == (trace.end_us - trace.start_us) // 1000
+
+
+def test_unchanged_pages_keep_their_etag():
+    builder = random_builder(3, messages=500)
+    first = builder.query_traces(limit=10)
+    second_page = builder.query_traces(limit=10, cursor=first['next_cursor'])
+    assert builder.query_traces(limit=10, if_none_match=first['etag']) == {'etag': first['etag'], 'not_modified': True}
+    assert builder.query_traces(limit=10, if_none_match=f'"other", W/{first["etag"]}')['not_modified']
+    assert builder.query_traces(limit=20, if_none_match=first['etag']).get('traces') is not None
+
+    # A message for the oldest trace on the second page moves it to the front: both pages change
+    moved = second_page['traces'][-1]['trace_id']
+    builder.add_message(KafkaMessage(
+        topic="analytics", partition=0, offset=999, key=None, timestamp=datetime.now(), headers={},
+        raw_value=b"", decoded_value={}, trace_id=moved
+    ))
+    refreshed = builder.query_traces(limit=10, if_none_match=first['etag'])
+    assert refreshed['traces'][0]['trace_id'] == moved and refreshed['etag'] != first['etag']
+    assert builder.query_traces(limit=10, cursor=first['next_cursor'])['etag'] != second_page['etag']
+
+    builder.clear_traces()
+    assert builder.query_traces(limit=10)['etag'] != first['etag']
+
+
+def test_cursors_continue_past_traces_inserted_between_pages():
+    builder = random_builder(4, messages=500)
+    want = expected(builder)
+    ids, cursor = [], None
+    for page_number in range(len(want)):
+        page = builder.query_traces(limit=6, cursor=cursor)
+        ids.extend(summary['trace_id'] for summary in page['traces'])
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+        # New traces sort ahead of the cursor, so later pages neither repeat nor skip rows
+        builder.add_message(KafkaMessage(
+            topic="analytics", partition=0, offset=10_000 + page_number, key=None, timestamp=datetime.now(),
+            headers={}, raw_value=b"", decoded_value={}, trace_id=f"new-{page_number}"
+        ))
+    assert ids == want
+    assert builder.query_traces(limit=1)['traces'][0]['trace_id'] == f"new-{page_number - 1}"
@@ -0,0 +1,149 @@
+"""
+Persistent trace store: restart recovery, offset checkpoints and retention
+"""
+import logging
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+from types import SimpleNamespace
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from src.environment_manager import EnvironmentManager  # noqa: E402
+from src.graph_builder import TraceGraphBuilder  # noqa: E402
+from src.kafka_consumer import KafkaConsumerService  # noqa: E402
+from src.models import KafkaMessage  # noqa: E402
+from src.trace_persistence import TracePersistence  # noqa: E402
+
+TOPICS_YAML = BACKEND_DIR / "config" / "topics.yaml"
+TOPICS = ["user-events", "processed-events", "notifications"]
+
+logging.disable(logging.CRITICAL)
+
+
+def make_message(i: int, trace_id: str, topic: str = None, age: timedelta = timedelta(minutes=5), **kwargs) -> KafkaMessage:
+    fields = dict(
+        topic=topic or TOPICS[i % len(TOPICS)], partition=i % 2, offset=i, key=f"key-{i}",
+        timestamp=datetime.now() - age + timedelta(milliseconds=i), headers={'traceparent': trace_id},
+        raw_value=b"raw-%d" % i, decoded_value={'n': i}, trace_id=trace_id
+    )
+    fields.update(kwargs)
+    return KafkaMessage(**fields)
+
+
+def make_builder(tmp_path, max_traces: int = 100) -> TraceGraphBuilder:
+    settings = {'trace_store': {'enabled': True, 'directory': str(tmp_path)}}
+    return TraceGraphBuilder(str(TOPICS_YAML), max_traces=max_traces, settings=settings)
+
+
+def test_restart_restores_recent_traces_and_offsets(tmp_path):
+    builder = make_builder(tmp_path)
+    assert builder.open_persistence("INT") == 0
+    batch = [make_message(i, f"trace-{i // 3}") for i in range(30)]
+    batch.append(make_message(99, "ignored", topic="not-monitored"))
+    builder.add_messages(batch)
+    expected = {trace_id: trace.to_dict() for trace_id, trace in builder.traces.items()}
+
+    restarted = make_builder(tmp_path, max_traces=4)
+    assert restarted.open_persistence("INT") == 4
+    assert list(restarted.traces) == ["trace-6", "trace-7", "trace-8", "trace-9"]
+    assert all(restarted.traces[t].to_dict() == expected[t] for t in restarted.traces)
+    assert restarted.get_trace("trace-0").to_dict() == expected["trace-0"]
+    assert restarted.statistics.total_messages == 12
+
+    # Offsets cover unretained messages too, and the next consumption starts past them
+    assert restarted.checkpoint_offsets() == {
+        ("user-events", 0): 25, ("user-events", 1): 28, ("processed-events", 0): 29,
+        ("processed-events", 1): 26, ("notifications", 0): 27, ("notifications", 1): 30,
+        ("not-monitored", 1): 100,
+    }
+
+
+def test_environments_have_separate_stores(tmp_path):
+    builder = make_builder(tmp_path)
+    builder.open_persistence("INT")
+    builder.add_messages([make_message(0, "int-trace")])
+    builder.clear_traces()
+    assert builder.open_persistence("PROD") == 0
+    builder.clear_traces()
+    assert builder.open_persistence("INT") == 1
+
+
+def test_new_trace_ids_do_not_query_the_store(tmp_path):
+    builder = make_builder(tmp_path, max_traces=2)
+    builder.open_persistence("INT")
+    builder.add_messages([make_message(i, f"trace-{i}") for i in range(3)])
+    assert "trace-0" not in builder.traces and "trace-0" in builder.persistence
+
+    queries = []
+    builder.persistence._conn.set_trace_callback(lambda sql: sql.startswith("SELECT") and queries.append(sql))
+    builder.add_messages([make_message(i, f"fresh-{i}") for i in range(10, 20)])
+    assert queries == []
+    # An evicted stored trace is still brought back by its next message
+    builder.add_messages([make_message(30, "trace-0")])
+    assert len(queries) == 1 and len(builder.traces["trace-0"].messages) == 2
+
+
+def test_environment_cleanup_closes_the_store_and_spill_tier(tmp_path):
+    settings = {'trace_store': {'enabled': True, 'directory': str(tmp_path / "store")},
+                'trace_spill': {'enabled': True, 'directory': str(tmp_path / "spill")}}
+    builder = TraceGraphBuilder(str(TOPICS_YAML), max_traces=1, settings=settings)
+    builder.open_persistence("INT")
+    builder.add_messages([make_message(i, f"trace-{i}") for i in range(3)])
+    spill_directory = builder.spill.directory
+    assert spill_directory.exists()
+
+    manager = EnvironmentManager(str(tmp_path / "environments"), protobuf_decoder=None)
+    manager.graph_builder = builder
+    manager._cleanup_current_environment()
+    assert manager.graph_builder is None
+    assert builder.persistence is None and builder.spill is None and not spill_directory.exists()
+    # The store was closed cleanly and can be reopened by the next builder
+    reopened = make_builder(tmp_path / "store")
+    assert reopened.open_persistence("INT") == 3
+    reopened.close()
+
+
+def test_reprocessed_offsets_are_not_stored_twice(tmp_path):
+    store = TracePersistence(str(tmp_path / "store.sqlite"))
+    messages = [make_message(i, "trace") for i in range(5)]
+    store.append(messages)
+    store.append(messages)
+    assert len(store.load("trace").messages) == 5
+    store.close()
+
+
+def test_lazy_messages_decode_once_the_topic_decoder_is_known(tmp_path):
+    store = TracePersistence(str(tmp_path / "store.sqlite"))
+    decode = lambda payload: {'length': len(payload)}  # noqa: E731
+    store.append([make_message(0, "lazy", decoded_value=None, decode_fn=decode)])
+    store.close()
+
+    reopened = TracePersistence(str(tmp_path / "store.sqlite"))
+    message = reopened.load("lazy").messages[0]
+    assert not message.is_decoded
+    reopened.append([make_message(1, "other", topic=message.topic, decoded_value=None, decode_fn=decode)])
+    assert message.get_decoded_value() == {'length': 5}
+    reopened.close()
+
+
+def test_traces_older_than_the_retention_are_pruned(tmp_path):
+    store = TracePersistence(str(tmp_path / "store.sqlite"), retention_hours=1, prune_interval=0)
+    store.append([make_message(0, "old", age=timedelta(hours=2))])
+    store.append([make_message(1, "new")])
+    assert store.load("old") is None and store.load("new") is not None
+    assert "old" not in store and "new" in store
+    assert store.get_stats()['pruned_traces'] == 1
+    store.close()
+
+
+def test_consumer_resumes_assigned_partitions_from_checkpoints():
+    consumer = KafkaConsumerService.__new__(KafkaConsumerService)
+    consumer.restore_state(offset_checkpoints=lambda: {("user-events", 0): 42})
+    assert not consumer._pause_state_dirty
+    partitions = [SimpleNamespace(topic="user-events", partition=p, offset=-1001) for p in (0, 1)]
+    assigned = []
+    consumer._on_assign(SimpleNamespace(assign=assigned.append), partitions)
+    assert [tp.offset for tp in partitions] == [42, -1001]
+    assert assigned == [partitions] and consumer._pause_state_dirty
@@ -0,0 +1,150 @@
+"""
+On-disk spill tier: round trips, builder lookups after eviction, retention and stale directory cleanup
+"""
+import logging
+import os
+import subprocess
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from src.graph_builder import TraceGraphBuilder  # noqa: E402
+from src.models import KafkaMessage, TraceInfo  # noqa: E402
+from src.trace_spill import TraceSpillStore  # noqa: E402
+
+TOPICS_YAML = BACKEND_DIR / "config" / "topics.yaml"
+TOPICS = ["user-events", "processed-events", "notifications"]
+
+logging.disable(logging.CRITICAL)
+
+
+def make_message(i: int, trace_id: str, **kwargs) -> KafkaMessage:
+    fields = dict(
+        topic=TOPICS[i % len(TOPICS)], partition=i % 3, offset=i, key=f"key-{i}",
+        timestamp=datetime.now() - timedelta(hours=2) + timedelta(milliseconds=i),
+        headers={'traceparent': trace_id}, raw_value=b"raw-%d" % i,
+        decoded_value={'n': i, 'nested': {'list': [1, 'two']}}, trace_id=trace_id
+    )
+    fields.update(kwargs)
+    return KafkaMessage(**fields)
+
+
+def make_trace(trace_id: str, count: int = 3) -> TraceInfo:
+    trace = TraceInfo(trace_id=trace_id)
+    for i in range(count):
+        trace.add_message(make_message(i, trace_id))
+    return trace
+
+
+def test_round_trip(tmp_path):
+    store = TraceSpillStore(str(tmp_path), segment_mb=0.01, max_mb=1)
+    original = make_trace("trace-1", count=4)
+    store.spill(original)
+    restored = store.load("trace-1")
+    assert restored.to_dict() == original.to_dict()
+    assert [m.timestamp_us for m in restored.messages] == [m.timestamp_us for m in original.messages]
+    assert restored.messages[0].raw_value == b"raw-0"
+    assert store.load("missing") is None
+    store.close()
+    assert not store.directory.exists()
+
+
+def test_lazy_messages_keep_their_decoder(tmp_path):
+    store = TraceSpillStore(str(tmp_path))
+    decode = lambda payload: {'length': len(payload)}  # noqa: E731
+    trace = TraceInfo(trace_id="lazy")
+    trace.add_message(make_message(0, "lazy", decoded_value=None, decode_fn=decode))
+    store.spill(trace)
+    message = store.load("lazy").messages[0]
+    assert not message.is_decoded
+    assert message.get_decoded_value() == {'length': 5}
+    store.close()
+
+
+def test_oldest_segments_are_dropped_beyond_the_size_limit(tmp_path):
+    store = TraceSpillStore(str(tmp_path), segment_mb=0.002, max_mb=0.006)
+    for i in range(200):
+        store.spill(make_trace(f"trace-{i}"))
+    stats = store.get_stats()
+    assert stats['disk_bytes'] <= store.max_bytes
+    assert stats['dropped_traces'] > 0 and stats['traces'] + stats['dropped_traces'] == 200
+    assert store.load("trace-0") is None and store.load("trace-199") is not None
+    store.close()
+
+
+OWNER = """
+import os, sys
+sys.path.insert(0, {backend!r})
+from src.trace_spill import TraceSpillStore
+store = TraceSpillStore({directory!r})
+print(store.directory, flush=True)
+sys.stdin.readline()
+os._exit(0)  # Exit without closing the store, as a crash would
+"""
+
+
+def test_directories_are_removed_only_once_their_owner_is_gone(tmp_path):
+    # Named after a live pid, as a directory of a dead process whose pid was reused would be
+    legacy = tmp_path / f"spill-{os.getpid()}-abc"
+    legacy.mkdir()
+    owner = subprocess.Popen([sys.executable, "-c", OWNER.format(backend=str(BACKEND_DIR), directory=str(tmp_path))],
+                             stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+    try:
+        owned = Path(owner.stdout.readline().strip())
+        # Directories without a lock file are stale; held ones survive stores opened here
+        first = TraceSpillStore(str(tmp_path))
+        second = TraceSpillStore(str(tmp_path))
+        assert not legacy.exists() and owned.is_dir() and first.directory.is_dir()
+    finally:
+        owner.communicate("\n", timeout=10)
+
+    # The owner is gone without cleaning up, and its lock went with it
+    third = TraceSpillStore(str(tmp_path))
+    assert not owned.exists() and first.directory.is_dir() and second.directory.is_dir()
+    for store in (first, second, third):
+        store.close()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_builder_serves_evicted_traces_and_restores_them_on_new_messages(tmp_path):
+    settings = {'trace_spill': {'enabled': True, 'directory': str(tmp_path)}}
+    builder = TraceGraphBuilder(str(TOPICS_YAML), max_traces=5, settings=settings)
+    for i in range(40):
+        builder.add_message(make_message(i, f"trace-{i // 2}"))
+    assert len(builder.traces) == 5
+    assert "trace-0" not in builder.traces
+
+    spilled = builder.get_trace("trace-0")
+    assert [m.offset for m in spilled.messages] == [0, 1]
+    assert builder.get_memory_usage()['spill']['traces'] == 15
+
+    # A late message for an evicted trace brings the whole trace back into memory
+    builder.add_message(make_message(100, "trace-0"))
+    assert [m.offset for m in builder.traces["trace-0"].messages] == [0, 1, 100]
+    assert "trace-0" not in builder.spill
+
+    builder.clear_traces()
+    assert builder.get_trace("trace-3") is None
+    builder.close()
+
+
+def test_reviving_a_spilled_trace_does_not_double_count_window_statistics(tmp_path):
+    settings = {'trace_spill': {'enabled': True, 'directory': str(tmp_path)}}
+    builder = TraceGraphBuilder(str(TOPICS_YAML), max_traces=1, settings=settings)
+    builder.set_monitored_topics(TOPICS)
+    recent = datetime.now() - timedelta(minutes=5)
+    builder.add_message(make_message(0, "trace-a", timestamp=recent))
+    builder.add_message(make_message(1, "trace-b", timestamp=recent + timedelta(seconds=1)))
+    assert "trace-a" in builder.spill
+    # The late message revives trace-a and spills trace-b
+    builder.add_message(make_message(2, "trace-a", timestamp=recent + timedelta(seconds=2)))
+    assert list(builder.traces) == ["trace-a"] and "trace-b" in builder.spill
+
+    statistics = builder.get_filtered_graph_data('last_15min')['statistics']
+    retained = builder.traces["trace-a"]
+    assert statistics['total_messages'] == len(retained.messages) == 2
+    assert statistics['total_traces'] == 1
+    builder.close()
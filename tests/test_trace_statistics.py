@@ -0,0 +1,185 @@
+"""
+Incremental trace statistics: parity with a full scan, and time-bucket windows across eviction,
+out-of-order and future timestamps
+"""
+import logging
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from src.graph_builder import TraceGraphBuilder  # noqa: E402
+from src.models import KafkaMessage  # noqa: E402
+from src.trace_statistics import TraceStatistics  # noqa: E402
+
+TOPICS_YAML = BACKEND_DIR / "config" / "topics.yaml"
+TOPICS = ["user-events", "processed-events", "notifications"]
+
+logging.disable(logging.CRITICAL)
+
+
+def make_message(i: int, trace_id: str, timestamp: datetime, topic: str = None) -> KafkaMessage:
+    return KafkaMessage(topic=topic or TOPICS[i % len(TOPICS)], partition=0, offset=i, key=f"key-{i}",
+                        timestamp=timestamp, headers={}, raw_value=b"", decoded_value={'n': i},
+                        trace_id=trace_id)
+
+
+def full_scan(builder: TraceGraphBuilder, now: float):
+    """Topic, edge and component statistics recomputed from the retained messages, as before the aggregates"""
+    traces = [[(m.topic, m.timestamp_us / 1_000_000) for m in trace.messages] for trace in builder.traces.values()]
+    topics = {}
+    for topic in builder.topic_graph.get_all_topics():
+        times, ages, slowest = [], [], []
+        for trace_id, messages in zip(builder.traces, traces):
+            here = sorted(ts for t, ts in messages if t == topic)
+            if not here:
+                continue
+            start, end = min(ts for _, ts in messages), max(ts for _, ts in messages)
+            time_to_topic = here[0] - start
+            if time_to_topic == 0 and len(here) > 1:
+                time_to_topic = here[-1] - here[0]
+            elif time_to_topic == 0 and len({t for t, _ in messages}) == 1:
+                time_to_topic = 0.001
+            slowest.append((time_to_topic, trace_id))
+            times.extend(here)
+            ages.extend(ts - start for ts in here)
+        times.sort()
+        topics[topic] = {
+            'message_count': len(times),
+            'rate_total': len(times) / max((times[-1] - times[0]) / 60, 1) if len(times) > 1 else 0.0,
+            'rate_rolling_60s': float(sum(ts >= now - 60 for ts in times)),
+            'last_message_time': datetime.fromtimestamp(times[-1]).isoformat() if times else None,
+            'slowest': sorted(slowest, reverse=True)[:3],
+            'ages': ages
+        }
+    edges = {}
+    for source, destination in builder.statistics.edges:
+        flows = [m for m in traces if any(t == source for t, _ in m) and any(t == destination for t, _ in m)]
+        times = sorted(ts for m in flows for t, ts in m if t == source) + \
+            sorted(ts for m in flows for t, ts in m if t == destination)
+        edges[(source, destination)] = {
+            'flow_count': len(flows),
+            'message_rate': len(times) / max((max(times) - min(times)) / 60, 1) if len(times) > 1 else 0.0
+        }
+    return topics, edges
+
+
+def assert_matches_full_scan(builder: TraceGraphBuilder):
+    now = time.time()
+    topics, edges = full_scan(builder, now)
+    for topic, expected in topics.items():
+        actual = builder.statistics.topic_statistics(topic, now)
+        assert actual['message_count'] == expected['message_count']
+        assert abs(actual['rate_total'] - expected['rate_total']) < 1e-6
+        assert actual['rate_rolling_60s'] == expected['rate_rolling_60s']
+        assert actual['last_message_time'] == expected['last_message_time']
+        assert [(round(s['time_to_topic'], 6), s['trace_id']) for s in actual['slowest_traces']] == \
+            [(round(value, 6), trace_id) for value, trace_id in expected['slowest']]
+        ages = sorted(expected['ages'])
+        for q, key in ((0.10, 'trace_age_p10'), (0.50, 'trace_age_p50'), (0.95, 'trace_age_p95')):
+            exact = ages[int(q * (len(ages) - 1))] if ages else 0
+            assert abs(actual[key] - exact) <= 0.01 * exact + 1e-6
+    for (source, destination), expected in edges.items():
+        actual = builder.statistics.edge_statistics(source, destination)
+        assert actual['flow_count'] == expected['flow_count']
+        assert abs(actual['message_rate'] - expected['message_rate']) < 1e-6
+    component = builder.statistics.component_statistics(set(topics))
+    assert component['total_messages'] == sum(len(trace.messages) for trace in builder.traces.values())
+    assert component['active_traces'] == len(builder.traces)
+
+
+def test_incremental_aggregates_match_a_full_scan_through_evictions_and_cleanup():
+    rng = random.Random(3)
+    builder = TraceGraphBuilder(str(TOPICS_YAML), max_traces=40)
+    builder.set_monitored_topics(builder.topic_graph.get_all_topics())
+    topics = builder.topic_graph.get_all_topics()
+    now = datetime.now()
+
+    def add_traces(prefix: str, count: int, base: datetime):
+        for n in range(count):
+            start = base + timedelta(seconds=rng.uniform(0, 20))
+            # Messages arrive out of order, on random topics, with distinct offsets from the start
+            for i in rng.sample(range(6), rng.randint(1, 6)):
+                builder.add_message(make_message(i, f"{prefix}-{n}", start + timedelta(milliseconds=i * 37 + n),
+                                                 rng.choice(topics)))
+
+    add_traces("old", 15, now - timedelta(hours=3))
+    add_traces("recent", 20, now - timedelta(seconds=55))
+    assert len(builder.traces) == 35
+    assert_matches_full_scan(builder)
+
+    # Evictions retract the oldest traces' contributions
+    add_traces("evicting", 30, now - timedelta(minutes=10))
+    assert len(builder.traces) <= 40 and not any(t.startswith("old") for t in builder.traces)
+    assert_matches_full_scan(builder)
+
+    add_traces("stale", 5, now - timedelta(hours=2))
+    assert builder.cleanup_old_traces(max_age_hours=1) > 0
+    assert_matches_full_scan(builder)
+
+
+def window_counts(statistics: TraceStatistics, seconds: float):
+    window = statistics.window(seconds)
+    return window.total_messages, window.total_traces, {t: window.message_count(t) for t in statistics.topics}
+
+
+def test_window_counts_follow_eviction_and_cleanup():
+    builder = TraceGraphBuilder(str(TOPICS_YAML), max_traces=4)
+    builder.set_monitored_topics(TOPICS)
+    base = datetime.now() - timedelta(minutes=3)
+    for i in range(30):
+        builder.add_message(make_message(i, f"trace-{i // 3}", base + timedelta(seconds=i)))
+
+    # Evicted traces leave the windows; only the retained ones are counted
+    retained = [m for trace in builder.traces.values() for m in trace.messages]
+    total, traces, by_topic = window_counts(builder.statistics, 300)
+    assert len(builder.traces) < 10
+    assert total == len(retained) and traces == len(builder.traces)
+    assert by_topic == {t: sum(m.topic == t for m in retained) for t in TOPICS}
+    assert window_counts(builder.statistics, 900)[:2] == (total, traces)
+    filtered = builder.get_filtered_graph_data('last_15min')['statistics']
+    assert (filtered['total_messages'], filtered['total_traces']) == (total, traces)
+
+    builder.cleanup_old_traces(max_age_hours=0)
+    assert not builder.traces
+    assert window_counts(builder.statistics, 300) == (0, 0, {t: 0 for t in TOPICS})
+
+
+def test_out_of_order_messages_move_the_trace_start_in_the_buckets():
+    statistics = TraceStatistics([("user-events", "processed-events")])
+    base = datetime.now() - timedelta(seconds=30)
+    arrivals = [(2, "notifications"), (0, "processed-events"), (1, "user-events"), (-5, "user-events")]
+    for i, (offset, topic) in enumerate(arrivals):
+        statistics.add_message("trace", make_message(i, "trace", base + timedelta(seconds=offset), topic))
+
+    window = statistics.window(60)
+    assert window.total_messages == 4 and window.total_traces == 1
+    # The start is credited once, to the topic of the earliest message
+    started = {t: sum(b.started for b in a.buckets[0].since(0)) for t, a in statistics.topics.items()}
+    assert started == {"notifications": 0, "processed-events": 0, "user-events": 1}
+    # Bucket ages were re-measured from the final start, like the topic sketch
+    assert window.topic_statistics("notifications", time.time())['trace_age_p50'] == \
+        statistics.topic_statistics("notifications", time.time())['trace_age_p50']
+    assert window.edge_statistics("user-events", "processed-events")['flow_count'] == 1
+
+    statistics.remove_trace("trace")
+    assert window_counts(statistics, 60) == (0, 0, {t: 0 for t in statistics.topics})
+    assert statistics.window(60).edge_statistics("user-events", "processed-events")['flow_count'] == 0
+
+
+def test_future_timestamps_are_bucketed_at_now():
+    statistics = TraceStatistics()
+    now = datetime.now()
+    # 150 s ahead and 150 s behind map to the same 1-second slot of a 300-slot ring
+    statistics.add_message("skewed", make_message(0, "skewed", now + timedelta(seconds=150), "user-events"))
+    statistics.add_message("late", make_message(1, "late", now - timedelta(seconds=150), "user-events"))
+    assert window_counts(statistics, 300)[:2] == (2, 2)
+    assert window_counts(statistics, 60)[:2] == (1, 1)
+
+    statistics.remove_trace("skewed")
+    assert window_counts(statistics, 300)[:2] == (1, 1)
+    assert window_counts(statistics, 60)[:2] == (0, 0)